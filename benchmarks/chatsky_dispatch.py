@@ -0,0 +1,153 @@
+"""
+Per-turn latency and throughput of graphs exported with `chatsky_export`, on simulated dialogues.
+
+Dialogues are random walks over a synthetic graph: every user turn is an utterance of a random
+out-edge of the current node, and a `--noise` share of turns is text no edge accepts, which goes
+to the fallback node. The same turns are run through
+
+- compiled: `CompiledGraph.step`, the dispatch tables without Chatsky;
+- pipeline: the Chatsky pipeline of `build_pipeline`, one table lookup per turn;
+- conditions: a Chatsky script with one `cnd.exact_match` per edge utterance, the usual way to
+  write such a script, whose turn cost grows with the out-degree of the node.
+
+    python benchmarks/chatsky_dispatch.py
+    python benchmarks/chatsky_dispatch.py --dialogues 5000 --nodes 1000 --density 8 --output results/dispatch.json
+"""
+
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import time
+from typing import Optional
+
+from synthetic import make_graph
+
+from chatsky_llm_autoconfig.chatsky_export import FLOW, build_pipeline, compile_graph, node_label, to_chatsky_script
+
+MODES = ("compiled", "pipeline", "conditions")
+NOISE = "something the graph does not know"
+
+
+def simulate(graph: dict, dialogues: int, turns: int, noise: float, seed: int = 0) -> list[list[str]]:
+    """User turns of `dialogues` random walks of up to `turns` turns from the start node."""
+    rng = random.Random(seed)
+    out_edges = {}
+    for edge in graph["edges"]:
+        out_edges.setdefault(edge["source"], []).append(edge)
+    start = next(node["id"] for node in graph["nodes"] if node.get("is_start"))
+    result = []
+    for _ in range(dialogues):
+        node, user_turns = start, []
+        while len(user_turns) < turns and out_edges.get(node):
+            if rng.random() < noise:
+                user_turns.append(NOISE)
+                continue
+            edge = rng.choice(out_edges[node])
+            user_turns.append(rng.choice(edge["utterances"]))
+            node = edge["target"]
+        result.append(user_turns)
+    return result
+
+
+def condition_pipeline(graph: dict):
+    """Pipeline of the exported script with every dispatch table replaced by `exact_match` conditions."""
+    import chatsky.script.conditions as cnd
+    from chatsky.pipeline import Pipeline
+    from chatsky.script import TRANSITIONS
+
+    script, start_label, fallback_label = to_chatsky_script(graph)
+    conditions = {}
+    for edge in graph["edges"]:
+        targets = conditions.setdefault(edge["source"], {})
+        targets.setdefault(edge["target"], []).extend(cnd.exact_match(utterance) for utterance in edge["utterances"])
+    for node, targets in conditions.items():
+        script[FLOW][node_label(node)][TRANSITIONS] = {(FLOW, node_label(target)): cnd.any(matches) for target, matches in targets.items()}
+    return Pipeline.from_script(script, start_label=start_label, fallback_label=fallback_label)
+
+
+def run_compiled(graph: dict, dialogues: list[list[str]]) -> list[int]:
+    compiled = compile_graph(graph)
+    latencies = []
+    for user_turns in dialogues:
+        node = compiled.start
+        for text in user_turns:
+            start = time.perf_counter_ns()
+            # None is the fallback, whose next step dispatches on all edges like the fallback node
+            node = compiled.step(node, text)
+            compiled.response(node)
+            latencies.append(time.perf_counter_ns() - start)
+    return latencies
+
+
+def run_pipeline(pipeline, dialogues: list[list[str]]) -> list[int]:
+    from chatsky.script import Message
+
+    latencies = []
+    for ctx_id, user_turns in enumerate(dialogues):
+        # the first message only moves the Chatsky start node to the start node of the graph
+        pipeline(Message(text="hi"), ctx_id)
+        for text in user_turns:
+            start = time.perf_counter_ns()
+            pipeline(Message(text=text), ctx_id)
+            latencies.append(time.perf_counter_ns() - start)
+        del pipeline.context_storage[ctx_id]
+    return latencies
+
+
+def summarize(latencies: list[int]) -> dict:
+    quantiles = statistics.quantiles(latencies, n=100) if len(latencies) > 1 else latencies * 99
+    total = sum(latencies)
+    return {
+        "turns": len(latencies),
+        "p50_us": quantiles[49] / 1000,
+        "p99_us": quantiles[98] / 1000,
+        "mean_us": total / len(latencies) / 1000,
+        "turns_per_second": len(latencies) / (total / 1e9) if total else 0.0,
+    }
+
+
+def run(graph: dict, dialogues: list[list[str]], modes: list[str]) -> dict:
+    results = {}
+    for mode in modes:
+        if mode == "compiled":
+            latencies = run_compiled(graph, dialogues)
+        else:
+            pipeline = build_pipeline(graph) if mode == "pipeline" else condition_pipeline(graph)
+            latencies = run_pipeline(pipeline, dialogues)
+        results[mode] = summarize(latencies)
+    return results
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--modes", nargs="+", choices=MODES, default=list(MODES))
+    parser.add_argument("--dialogues", type=int, default=2000)
+    parser.add_argument("--turns", type=int, default=20, help="maximum user turns per dialogue")
+    parser.add_argument("--nodes", type=int, default=200)
+    parser.add_argument("--density", type=float, default=4.0, help="parallel edges per connected node pair, i.e. utterances per transition")
+    parser.add_argument("--noise", type=float, default=0.05, help="share of user turns no edge accepts")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="save results as JSON")
+    args = parser.parse_args(argv)
+
+    graph = make_graph(args.nodes, "branching", args.density, seed=args.seed)
+    dialogues = simulate(graph, args.dialogues, args.turns, args.noise, args.seed)
+    results = run(graph, dialogues, args.modes)
+    for mode, result in results.items():
+        print(
+            f"{mode:<11} {result['turns']:>8} turns  p50 {result['p50_us']:9.1f} us  p99 {result['p99_us']:9.1f} us"
+            f"  {result['turns_per_second']:10.0f} turns/s"
+        )
+
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, "w") as f:
+            json.dump({"args": vars(args), "results": results}, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,112 @@
+"""
+Load time and memory per dialogue of a dialogue corpus: `Dialogue` objects against `corpus.load_corpus`.
+
+A corpus of `--dialogues` dialogues sampled from synthetic graphs is written as TSV and JSONL, then loaded
+
+- as `Dialogue` objects, with `json.loads` per line or `Dialogue.parse_string` per TSV block;
+- with `load_corpus`;
+- with `load_corpus` from its cache directory, i.e. memory-mapped.
+
+Memory is the tracemalloc size of the loaded objects, time the median of `--repeat` loads.
+
+    python benchmarks/corpus_loading.py
+    python benchmarks/corpus_loading.py --dialogues 100000 --output results/corpus_loading.json
+"""
+
+import argparse
+import json
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Callable, Optional
+
+from synthetic import make_dialogue, make_graph
+
+from chatsky_llm_autoconfig.corpus import load_corpus, save_corpus
+from chatsky_llm_autoconfig.dialogue import Dialogue
+
+
+def dialogues_json(path: str) -> list[Dialogue]:
+    with open(path) as f:
+        return [Dialogue(dialogue=json.loads(line)) for line in f if line.strip()]
+
+
+def dialogues_tsv(path: str) -> list[Dialogue]:
+    result = []
+    with open(path) as f:
+        for block in f.read().strip().split("\n\n"):
+            dialogue = Dialogue()
+            dialogue.parse_string(block)
+            result.append(dialogue)
+    return result
+
+
+def measure(load: Callable, repeat: int) -> dict:
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        load()
+        times.append(time.perf_counter() - start)
+    tracemalloc.start()
+    loaded = load()  # noqa: F841 - kept alive for the measurement
+    current = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return {"seconds": statistics.median(times), "bytes": current}
+
+
+def make_corpus(directory: str, dialogues: int, graphs: int = 200, seed: int = 0) -> dict:
+    samples = [make_dialogue(make_graph(30, "branching", 2.0, seed=seed + i), max_turns=20) for i in range(graphs)]
+    corpus = [samples[i % graphs] for i in range(dialogues)]
+    paths = {"tsv": os.path.join(directory, "corpus.tsv"), "jsonl": os.path.join(directory, "corpus.jsonl")}
+    for path in paths.values():
+        save_corpus(corpus, path)
+    return paths
+
+
+def run(dialogues: int, repeat: int) -> dict:
+    directory = tempfile.mkdtemp(prefix="chatsky_corpus_")
+    try:
+        paths = make_corpus(directory, dialogues)
+        cache_dir = os.path.join(directory, "corpus.cache")
+        load_corpus(paths["tsv"], cache_dir=cache_dir)
+        cases = {
+            "dialogue_jsonl": lambda: dialogues_json(paths["jsonl"]),
+            "dialogue_tsv": lambda: dialogues_tsv(paths["tsv"]),
+            "corpus_jsonl": lambda: load_corpus(paths["jsonl"]),
+            "corpus_tsv": lambda: load_corpus(paths["tsv"]),
+            "corpus_cached": lambda: load_corpus(paths["tsv"], cache_dir=cache_dir),
+        }
+        results = {}
+        for name, load in cases.items():
+            result = measure(load, repeat)
+            result["bytes_per_dialogue"] = result["bytes"] / dialogues
+            results[name] = result
+        return results
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dialogues", type=int, default=20_000)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--output", help="save results as JSON")
+    args = parser.parse_args(argv)
+
+    results = run(args.dialogues, args.repeat)
+    for name, result in results.items():
+        print(f"{name:<16} {result['seconds'] * 1000:10.1f} ms {result['bytes_per_dialogue']:10.0f} B/dialogue")
+
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, "w") as f:
+            json.dump({"args": vars(args), "results": results}, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,105 @@
+"""
+Import time of chatsky_llm_autoconfig modules, measured with `python -X importtime`.
+
+Every module is imported in a fresh interpreter `--repeat` times and the median cumulative
+import time is reported together with the heavy dependencies the import pulled in.
+Results can be saved with `--output` and compared with an earlier run with `--baseline`.
+
+    python benchmarks/import_time.py
+    python benchmarks/import_time.py --output benchmarks/results/import_time.json
+    python benchmarks/import_time.py --baseline benchmarks/results/import_time.json --threshold 1.25
+"""
+
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+
+MODULES = [
+    "chatsky_llm_autoconfig.evaluate",
+    "chatsky_llm_autoconfig.model",
+    "chatsky_llm_autoconfig.sweep",
+    "chatsky_llm_autoconfig.workqueue",
+    "chatsky_llm_autoconfig.generation_pipeline",
+    "chatsky_llm_autoconfig.incremental",
+    "chatsky_llm_autoconfig.validation",
+    "chatsky_llm_autoconfig.graph_stats",
+]
+
+# dependencies that should only be loaded when they are actually used
+HEAVY = ["matplotlib", "langchain", "langchain_core", "langchain_openai", "openai", "dotenv", "pandas", "scipy", "chatsky"]
+
+
+def measure(module: str) -> dict:
+    """Cumulative import time of `module` in microseconds and the heavy top-level packages it loaded."""
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"], capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{result.stderr}")
+
+    total, loaded = None, set()
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = (part.strip() for part in line[len("import time:") :].split("|"))  # noqa: E203
+        if not cumulative.isdigit():
+            continue
+        top_level = name.split(".")[0]
+        if top_level in HEAVY:
+            loaded.add(top_level)
+        if name == module:
+            total = int(cumulative)
+    return {"us": total, "heavy": sorted(loaded)}
+
+
+def run(modules: list[str], repeat: int) -> dict:
+    results = {}
+    for module in modules:
+        runs = [measure(module) for _ in range(repeat)]
+        results[module] = {"us": int(statistics.median(run["us"] for run in runs)), "heavy": runs[-1]["heavy"]}
+    return results
+
+
+def compare(results: dict, baseline: dict, threshold: float) -> list[str]:
+    regressions = []
+    for module, result in results.items():
+        if module not in baseline:
+            continue
+        ratio = result["us"] / max(baseline[module]["us"], 1)
+        if ratio > threshold:
+            regressions.append(f"{module}: {baseline[module]['us'] / 1000:.1f} ms -> {result['us'] / 1000:.1f} ms ({ratio:.2f}x)")
+        new_heavy = set(result["heavy"]) - set(baseline[module]["heavy"])
+        if new_heavy:
+            regressions.append(f"{module}: now imports {', '.join(sorted(new_heavy))}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("modules", nargs="*", default=MODULES)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--output", help="save results as JSON")
+    parser.add_argument("--baseline", help="JSON saved by an earlier run to compare with")
+    parser.add_argument("--threshold", type=float, default=1.25, help="allowed slowdown against the baseline")
+    args = parser.parse_args()
+
+    results = run(args.modules, args.repeat)
+    for module, result in results.items():
+        print(f"{module:<45} {result['us'] / 1000:8.1f} ms   {', '.join(result['heavy']) or '-'}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.threshold)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
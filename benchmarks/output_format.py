@@ -0,0 +1,174 @@
+"""
+Completion tokens and end-to-end generation latency of the JSON and the compact graph format.
+
+The target graphs of `--input` stand in for model answers: every graph is written once as the JSON
+the generation prompts ask for and once in the line format of `compact_format`. Tokens are counted
+with tiktoken (`--encoding`); when its encoding files cannot be loaded, e.g. offline, a regex
+word/punctuation split is used instead and the counts are marked approximate.
+
+For the latency, `DialogModel.create_graph` talks to a local fake OpenAI endpoint that answers with
+the recorded answer after `--ttft-ms` plus `--ms-per-token` per completion token, so the time covers
+the prompt, the decoding time of the answer, the HTTP round trip and the parsing into a graph dict.
+
+    python benchmarks/output_format.py
+    python benchmarks/output_format.py --ms-per-token 20 --output results/output_format.json
+"""
+
+import argparse
+import json
+import os
+import re
+import statistics
+import sys
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from typing import Callable, Optional
+
+from chatsky_llm_autoconfig.compact_format import to_compact
+from chatsky_llm_autoconfig.model import DialogModel
+
+FORMATS = ("json", "compact")
+
+
+def token_counter(encoding: str) -> tuple[Callable[[str], int], bool]:
+    """Token count function and whether it is exact."""
+    try:
+        import tiktoken
+
+        encoder = tiktoken.get_encoding(encoding)
+        return lambda text: len(encoder.encode(text)), True
+    except Exception as e:
+        print(f"tiktoken encoding {encoding!r} is not available ({type(e).__name__}), counting approximate tokens")
+        pattern = re.compile(r"\w+|[^\w\s]")
+        return lambda text: len(pattern.findall(text)), False
+
+
+def recorded_answers(items: list[dict]) -> dict[str, list[str]]:
+    return {
+        "json": [json.dumps(item["target_graph"], ensure_ascii=False) for item in items],
+        "compact": [to_compact(item["target_graph"], item["dialog"]) for item in items],
+    }
+
+
+class FakeEndpoint:
+    """OpenAI chat completions endpoint answering queued answers with a simulated decoding time; counts the tokens it sees."""
+
+    def __init__(self, count_tokens: Callable[[str], int], ttft: float, per_token: float):
+        self.answers = deque()
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        endpoint = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                request = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+                endpoint.prompt_tokens += sum(count_tokens(message["content"]) for message in request["messages"])
+                answer = endpoint.answers.popleft()
+                tokens = count_tokens(answer)
+                endpoint.completion_tokens += tokens
+                time.sleep(ttft + tokens * per_token)
+                body = json.dumps(
+                    {
+                        "id": "fake",
+                        "object": "chat.completion",
+                        "created": int(time.time()),
+                        "model": "fake",
+                        "choices": [{"index": 0, "message": {"role": "assistant", "content": answer}, "finish_reason": "stop"}],
+                        "usage": {"prompt_tokens": 0, "completion_tokens": tokens, "total_tokens": tokens},
+                    }
+                ).encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = HTTPServer(("127.0.0.1", 0), Handler)
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.server.server_port}/v1"
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def run(items: list[dict], encoding: str, ttft: float, per_token: float) -> dict:
+    from langchain_openai import ChatOpenAI
+
+    count_tokens, exact = token_counter(encoding)
+    answers = recorded_answers(items)
+    endpoint = FakeEndpoint(count_tokens, ttft, per_token)
+    model = ChatOpenAI(model="fake", api_key="fake", base_url=endpoint.url, max_retries=0)
+    dialog_model = DialogModel()
+    results = {"exact_tokens": exact}
+    graphs = {}
+    try:
+        for output_format in FORMATS:
+            latencies, graphs[output_format] = [], []
+            for item, answer in zip(items, answers[output_format]):
+                endpoint.answers.append(answer)
+                start = time.perf_counter()
+                graph = dialog_model.create_graph(item["dialog"], model, output_format=output_format)
+                latencies.append(time.perf_counter() - start)
+                graphs[output_format].append(json.loads(graph))
+            tokens = [count_tokens(answer) for answer in answers[output_format]]
+            results[output_format] = {
+                "completion_tokens": sum(tokens),
+                "tokens_per_graph": statistics.mean(tokens),
+                "seconds_per_graph": statistics.mean(latencies),
+                "p90_seconds": statistics.quantiles(latencies, n=10)[-1] if len(latencies) > 1 else latencies[0],
+            }
+    finally:
+        endpoint.close()
+    same = sum(_same_graph(json_graph, compact_graph) for json_graph, compact_graph in zip(graphs["json"], graphs["compact"]))
+    results["same_graphs"] = same
+    results["token_ratio"] = results["json"]["completion_tokens"] / results["compact"]["completion_tokens"]
+    return results
+
+
+def _same_graph(json_graph: dict, compact_graph: dict) -> bool:
+    def entries(graph):
+        nodes = [(node["id"], bool(node.get("is_start")), node["utterances"]) for node in graph["nodes"]]
+        edges = [(edge["source"], edge["target"], edge["utterances"]) for edge in graph["edges"]]
+        return nodes, edges
+
+    return entries(json_graph) == entries(compact_graph)
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--input", default="data/data.json", help="JSON list of items with 'dialog' and 'target_graph' keys")
+    parser.add_argument("--limit", type=int)
+    parser.add_argument("--encoding", default="o200k_base", help="tiktoken encoding of the token counts")
+    parser.add_argument("--ttft-ms", type=float, default=300.0, help="simulated time to the first token")
+    parser.add_argument("--ms-per-token", type=float, default=5.0, help="simulated decoding time per completion token")
+    parser.add_argument("--output", help="save results as JSON")
+    args = parser.parse_args(argv)
+
+    with open(args.input) as f:
+        items = json.load(f)[: args.limit]
+    results = run(items, args.encoding, args.ttft_ms / 1000, args.ms_per_token / 1000)
+    unit = "tokens" if results["exact_tokens"] else "tokens (approx.)"
+    for output_format in FORMATS:
+        result = results[output_format]
+        print(f"{output_format:<8} {result['tokens_per_graph']:8.0f} {unit}/graph {result['seconds_per_graph'] * 1000:8.0f} ms/graph")
+    print(f"{results['token_ratio']:.1f}x fewer completion tokens, {results['same_graphs']} of {len(items)} graphs parse identically")
+
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, "w") as f:
+            json.dump({"args": vars(args), "results": results}, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
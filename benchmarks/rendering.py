@@ -0,0 +1,90 @@
+"""
+Time and output size of rendering target/predicted graph pairs: matplotlib PNGs against SVG pages.
+
+`--pairs` pairs of synthetic graphs (a graph and its `perturb`ed copy) of `--nodes` nodes are rendered
+
+- with `evaluate.save_graph_comparison`, one PNG per pair;
+- with `render.render_pairs`, one HTML page per pair, cold and then again with the layout cache filled.
+
+    python benchmarks/rendering.py
+    python benchmarks/rendering.py --pairs 200 --nodes 50 --workers 8 --output results/rendering.json
+"""
+
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+from typing import Optional
+
+from synthetic import make_graph, perturb
+
+from chatsky_llm_autoconfig.render import render_pairs
+
+
+def directory_size(directory: str) -> int:
+    return sum(os.path.getsize(os.path.join(directory, name)) for name in os.listdir(directory))
+
+
+def render_png(pairs: list[tuple], directory: str):
+    import matplotlib
+
+    matplotlib.use("Agg")
+    from chatsky_llm_autoconfig.evaluate import save_graph_comparison
+
+    for idx, (target, predicted) in enumerate(pairs):
+        save_graph_comparison(target, predicted, os.path.join(directory, f"graph_comparison_{idx}.png"))
+
+
+def run(pairs: int, nodes: int, workers: Optional[int], png_pairs: int) -> dict:
+    graphs = [make_graph(nodes, "branching", 1.5, seed=seed) for seed in range(pairs)]
+    items = [(graph, perturb(graph, seed=seed)) for seed, graph in enumerate(graphs)]
+    root = tempfile.mkdtemp(prefix="chatsky_render_")
+    cache_dir = os.path.join(root, "layouts")
+    cases = {
+        "png": lambda directory: render_png(items[:png_pairs], directory),
+        "html_cold": lambda directory: render_pairs(items, directory, workers=workers, cache_dir=cache_dir),
+        "html_cached": lambda directory: render_pairs(items, directory, workers=workers, cache_dir=cache_dir),
+    }
+    results = {}
+    try:
+        for name, render in cases.items():
+            directory = os.path.join(root, name)
+            os.makedirs(directory)
+            start = time.perf_counter()
+            render(directory)
+            rendered = png_pairs if name == "png" else pairs
+            results[name] = {
+                "pairs": rendered,
+                "seconds_per_pair": (time.perf_counter() - start) / rendered,
+                "bytes_per_pair": directory_size(directory) / rendered,
+            }
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+    return results
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pairs", type=int, default=100)
+    parser.add_argument("--nodes", type=int, default=30)
+    parser.add_argument("--workers", type=int, help="render processes, all CPUs by default")
+    parser.add_argument("--png-pairs", type=int, default=5, help="pairs rendered as PNG, which is much slower")
+    parser.add_argument("--output", help="save results as JSON")
+    args = parser.parse_args(argv)
+
+    results = run(args.pairs, args.nodes, args.workers, min(args.png_pairs, args.pairs))
+    for name, result in results.items():
+        print(f"{name:<12} {result['seconds_per_pair'] * 1000:10.1f} ms/pair {result['bytes_per_pair'] / 1024:10.1f} KiB/pair")
+
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, "w") as f:
+            json.dump({"args": vars(args), "results": results}, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,167 @@
+"""
+Tokens, model calls and latency per valid graph: full regeneration against targeted repair.
+
+Every target graph of `--input` is damaged the way generated graphs fail (a node left out together
+with its edges, an edge to a node that does not exist, a lost start node and user turn) and the
+damaged graph is the model's first answer. Then the graph is fixed
+
+- by regenerating it with the full generation prompt until it passes the checks of `repair.find_problems`,
+  as the retry loops of the experiment scripts do; the second answer is the target graph;
+- with `repair.repair_graph`, which answers locally what it can and re-prompts only the failing part;
+  the answer is the part of the target graph the damaged graph lacks.
+
+The model is the local fake OpenAI endpoint of `output_format.py`, which counts prompt and
+completion tokens and answers after `--ttft-ms` plus `--ms-per-token` per completion token.
+
+    python benchmarks/repair.py
+    python benchmarks/repair.py --ms-per-token 20 --output results/repair.json
+"""
+
+import argparse
+import copy
+import json
+import os
+import random
+import sys
+import time
+from typing import Optional
+
+from output_format import FakeEndpoint, token_counter
+
+from chatsky_llm_autoconfig.model import DialogModel
+from chatsky_llm_autoconfig.repair import find_problems, repair_graph
+
+MODES = ("regenerate", "repair")
+DAMAGES = ("drop_node", "dangling_edge", "drop_start_and_edge")
+
+
+def damage(graph: dict, kind: str, seed: int) -> dict:
+    """A copy of `graph` broken in one of the `DAMAGES` ways, the start flag is dropped when the graph is too small."""
+    rng = random.Random(seed)
+    broken = copy.deepcopy(graph)
+    nodes = [node for node in broken["nodes"] if not node.get("is_start")]
+    if kind == "drop_node" and nodes:
+        dropped = rng.choice(nodes)["id"]
+        broken["nodes"] = [node for node in broken["nodes"] if node["id"] != dropped]
+        broken["edges"] = [edge for edge in broken["edges"] if dropped not in (edge["source"], edge["target"])]
+    elif kind == "dangling_edge" and broken["edges"]:
+        rng.choice(broken["edges"])["target"] = max(node["id"] for node in broken["nodes"]) + 5
+    else:
+        for node in broken["nodes"]:
+            node["is_start"] = False
+        if len(broken["edges"]) > 1:
+            broken["edges"].pop(rng.randrange(len(broken["edges"])))
+    return broken
+
+
+def missing_part(target: dict, broken: dict) -> dict:
+    """The nodes and edges of `target` that `broken` lacks or holds differently, i.e. a perfect repair answer."""
+    present = [json.dumps(entry, sort_keys=True) for entry in broken["nodes"] + broken["edges"]]
+    return {
+        "nodes": [node for node in target["nodes"] if json.dumps(node, sort_keys=True) not in present],
+        "edges": [edge for edge in target["edges"] if json.dumps(edge, sort_keys=True) not in present],
+    }
+
+
+def run(items: list[dict], encoding: str, ttft: float, per_token: float, retries: int) -> dict:
+    from langchain_openai import ChatOpenAI
+
+    count_tokens, exact = token_counter(encoding)
+    endpoint = FakeEndpoint(count_tokens, ttft, per_token)
+    model = ChatOpenAI(model="fake", api_key="fake", base_url=endpoint.url, max_retries=0)
+    dialog_model = DialogModel()
+    cases = []
+    for idx, item in enumerate(items):
+        broken = damage(item["target_graph"], DAMAGES[idx % len(DAMAGES)], seed=idx)
+        cases.append((item, broken, missing_part(item["target_graph"], broken)))
+
+    results = {"exact_tokens": exact}
+    try:
+        for mode in MODES:
+            totals = {"valid_graphs": 0, "llm_calls": 0, "prompt_tokens": 0, "completion_tokens": 0, "seconds": 0.0}
+            fix = {"llm_calls": 0, "prompt_tokens": 0, "completion_tokens": 0, "seconds": 0.0}
+            for item, broken, patch in cases:
+                endpoint.answers.clear()
+                endpoint.answers.append(json.dumps(broken, ensure_ascii=False))
+                fixed = item["target_graph"] if mode == "regenerate" else patch
+                endpoint.answers.extend([json.dumps(fixed, ensure_ascii=False)] * retries)
+                endpoint.prompt_tokens = endpoint.completion_tokens = 0
+
+                start = time.perf_counter()
+                raw_graph = dialog_model.create_graph(item["dialog"], model)
+                first = {
+                    "seconds": time.perf_counter() - start,
+                    "prompt_tokens": endpoint.prompt_tokens,
+                    "completion_tokens": endpoint.completion_tokens,
+                }
+                calls = 1
+                if mode == "regenerate":
+                    graph = json.loads(raw_graph)
+                    while not find_problems(graph, item["dialog"]).ok and calls <= retries:
+                        graph = json.loads(dialog_model.create_graph(item["dialog"], model))
+                        calls += 1
+                    valid = find_problems(graph, item["dialog"]).ok
+                else:
+                    result = repair_graph(raw_graph, item["dialog"], model, max_rounds=retries)
+                    calls += result.stats["llm_calls"]
+                    valid = result.valid
+                seconds = time.perf_counter() - start
+
+                totals["valid_graphs"] += valid
+                totals["llm_calls"] += calls
+                totals["prompt_tokens"] += endpoint.prompt_tokens
+                totals["completion_tokens"] += endpoint.completion_tokens
+                totals["seconds"] += seconds
+                fix["llm_calls"] += calls - 1
+                fix["prompt_tokens"] += endpoint.prompt_tokens - first["prompt_tokens"]
+                fix["completion_tokens"] += endpoint.completion_tokens - first["completion_tokens"]
+                fix["seconds"] += seconds - first["seconds"]
+
+            valid = max(totals["valid_graphs"], 1)
+            results[mode] = {
+                **totals,
+                "tokens_per_valid_graph": (totals["prompt_tokens"] + totals["completion_tokens"]) / valid,
+                "seconds_per_valid_graph": totals["seconds"] / valid,
+                "fix_tokens_per_graph": (fix["prompt_tokens"] + fix["completion_tokens"]) / len(cases),
+                "fix_seconds_per_graph": fix["seconds"] / len(cases),
+                "fix_llm_calls": fix["llm_calls"],
+            }
+    finally:
+        endpoint.close()
+    results["fix_token_ratio"] = results["regenerate"]["fix_tokens_per_graph"] / max(results["repair"]["fix_tokens_per_graph"], 1)
+    return results
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--input", default="data/data.json", help="JSON list of items with 'dialog' and 'target_graph' keys")
+    parser.add_argument("--limit", type=int)
+    parser.add_argument("--retries", type=int, default=2, help="regenerations or repair rounds after the first answer")
+    parser.add_argument("--encoding", default="o200k_base", help="tiktoken encoding of the token counts")
+    parser.add_argument("--ttft-ms", type=float, default=300.0, help="simulated time to the first token")
+    parser.add_argument("--ms-per-token", type=float, default=5.0, help="simulated decoding time per completion token")
+    parser.add_argument("--output", help="save results as JSON")
+    args = parser.parse_args(argv)
+
+    with open(args.input) as f:
+        items = json.load(f)[: args.limit]
+    results = run(items, args.encoding, args.ttft_ms / 1000, args.ms_per_token / 1000, args.retries)
+    unit = "tokens" if results["exact_tokens"] else "tokens (approx.)"
+    for mode in MODES:
+        result = results[mode]
+        print(
+            f"{mode:<10} {result['valid_graphs']:3d}/{len(items)} valid {result['tokens_per_valid_graph']:8.0f} {unit}/valid graph "
+            f"{result['seconds_per_valid_graph'] * 1000:8.0f} ms/valid graph, fixing: {result['fix_llm_calls']:3d} calls "
+            f"{result['fix_tokens_per_graph']:8.0f} {unit}/graph {result['fix_seconds_per_graph'] * 1000:8.0f} ms/graph"
+        )
+    print(f"{results['fix_token_ratio']:.1f}x fewer tokens spent on fixing graphs")
+
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, "w") as f:
+            json.dump({"args": vars(args), "results": results}, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,293 @@
+"""
+Scaling benchmarks of the core modules on synthetic graphs.
+
+Every case runs over a grid of graph sizes, cycle structures (see `synthetic.SHAPES`) and
+multiedge densities. Time is the median of `--repeat` runs, memory the tracemalloc peak of one
+extra run. Results are saved as JSON with `--output`; `--baseline` compares the run with an earlier
+result file and exits with code 1 if a case got slower or bigger than `--threshold` times.
+
+    python benchmarks/run.py --quick
+    python benchmarks/run.py --output benchmarks/baselines/local.json
+    python benchmarks/run.py --quick --baseline benchmarks/baselines/quick.json --threshold 1.5
+    python benchmarks/run.py --cases jaccard_nodes triplet_match --sizes 100 1000 --shapes branching
+"""
+
+import argparse
+import atexit
+import contextlib
+import io
+import itertools
+import json
+import os
+import platform
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Callable, Optional
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from synthetic import SHAPES, make_dialogue, make_graph, perturb  # noqa: E402
+
+from chatsky_llm_autoconfig.consensus import ConsensusGraph  # noqa: E402
+from chatsky_llm_autoconfig.evaluate import evaluate_generation  # noqa: E402
+from chatsky_llm_autoconfig.graph import TYPES_OF_GRAPH, Graph  # noqa: E402
+from chatsky_llm_autoconfig.graph_diff import diff_graphs  # noqa: E402
+from chatsky_llm_autoconfig.metrics.fuzzy import fuzzy_edges  # noqa: E402
+from chatsky_llm_autoconfig.metrics.jaccard import jaccard_edges, jaccard_nodes  # noqa: E402
+from chatsky_llm_autoconfig.metrics.sparse_jaccard import sparse_jaccard_edges, sparse_jaccard_nodes  # noqa: E402
+from chatsky_llm_autoconfig.metrics.triplet_matching import triplet_match  # noqa: E402
+from chatsky_llm_autoconfig.router import IntentRouter  # noqa: E402
+from chatsky_llm_autoconfig.sample_dialogue import dialogues_from_graph, sample_dialogue  # noqa: E402
+
+CASES: dict[str, tuple[Callable, int]] = {}
+
+
+def case(name: str, max_nodes: int = 10_000):
+    """Register `setup(n_nodes, shape, density)`, which returns the function to time or None to skip the combination."""
+
+    def register(setup):
+        CASES[name] = (setup, max_nodes)
+        return setup
+
+    return register
+
+
+def _pair(n_nodes, shape, density):
+    target = make_graph(n_nodes, shape, density)
+    return Graph(target, TYPES_OF_GRAPH.MULTI), Graph(perturb(target), TYPES_OF_GRAPH.MULTI)
+
+
+@case("load_graph")
+def setup_load_graph(n_nodes, shape, density):
+    graph_dict = make_graph(n_nodes, shape, density)
+    return lambda: Graph(graph_dict, TYPES_OF_GRAPH.MULTI)
+
+
+@case("jaccard_edges", max_nodes=1000)
+def setup_jaccard_edges(n_nodes, shape, density):
+    target, generated = _pair(n_nodes, shape, density)
+    return lambda: jaccard_edges(target.nx_graph.edges(data=True), generated.nx_graph.edges(data=True), return_matrix=True)
+
+
+@case("jaccard_nodes", max_nodes=1000)
+def setup_jaccard_nodes(n_nodes, shape, density):
+    target, generated = _pair(n_nodes, shape, density)
+    return lambda: jaccard_nodes(target.nx_graph.nodes(data=True), generated.nx_graph.nodes(data=True), return_matrix=True)
+
+
+@case("sparse_jaccard_edges")
+def setup_sparse_jaccard_edges(n_nodes, shape, density):
+    target, generated = _pair(n_nodes, shape, density)
+    return lambda: sparse_jaccard_edges(target.nx_graph.edges(data=True), generated.nx_graph.edges(data=True), top_k=5)
+
+
+@case("sparse_jaccard_nodes")
+def setup_sparse_jaccard_nodes(n_nodes, shape, density):
+    target, generated = _pair(n_nodes, shape, density)
+    return lambda: sparse_jaccard_nodes(target.nx_graph.nodes(data=True), generated.nx_graph.nodes(data=True), top_k=5)
+
+
+@case("fuzzy_edges", max_nodes=1000)
+def setup_fuzzy_edges(n_nodes, shape, density):
+    target, generated = _pair(n_nodes, shape, density)
+    return lambda: fuzzy_edges(target.nx_graph.edges(data=True), generated.nx_graph.edges(data=True))
+
+
+# the VF2 isomorphism check does not finish in 10 minutes on 1000-node branching graphs
+@case("triplet_match", max_nodes=500)
+def setup_triplet_match(n_nodes, shape, density):
+    target, generated = _pair(n_nodes, shape, density)
+    return lambda: triplet_match(target, generated)
+
+
+@case("triplet_match_sparse", max_nodes=1000)
+def setup_triplet_match_sparse(n_nodes, shape, density):
+    if shape == "branching" and n_nodes > 500:
+        return None
+    target, generated = _pair(n_nodes, shape, density)
+    return lambda: triplet_match(target, generated, sparse=True)
+
+
+@case("diff_graphs")
+def setup_diff_graphs(n_nodes, shape, density):
+    target = make_graph(n_nodes, shape, density)
+    generated = perturb(target)
+    return lambda: diff_graphs(target, generated)
+
+
+@case("consensus")
+def setup_consensus(n_nodes, shape, density):
+    target = make_graph(n_nodes, shape, density)
+    generated = [perturb(target, seed=seed) for seed in range(10)]
+    return lambda: ConsensusGraph().extend(generated).graph(min_support=0.5)
+
+
+@case("sample_dialogue")
+def setup_sample_dialogue(n_nodes, shape, density):
+    # the walk ends only at a dead end or back at the start node, which other cycles can prevent
+    if shape == "branching":
+        return None
+    nx_graph = Graph(make_graph(n_nodes, shape, density), TYPES_OF_GRAPH.DI).nx_graph
+
+    def run():
+        random.seed(0)
+        return sample_dialogue(nx_graph, start_node=1)
+
+    return run
+
+
+@case("dialogues_from_graph")
+def setup_dialogues_from_graph(n_nodes, shape, density):
+    graph_dict = make_graph(n_nodes, shape, density)
+
+    def run():
+        random.seed(0)
+        return dialogues_from_graph(graph_dict)
+
+    return run
+
+
+def _router_turns(graph_dict: dict, turns: int = 1000):
+    """Router with `turns` sessions at random nodes, and a function giving rephrased inputs not seen by earlier runs."""
+    rng = random.Random(0)
+    edges = rng.choices(graph_dict["edges"], k=turns)
+    runs = itertools.count()
+
+    def texts():
+        # a new suffix every run, so the query vector cache does not hide the vectorization cost
+        run = next(runs)
+        return [f"{edge['utterances'][0]} please {run}" for edge in edges]
+
+    return IntentRouter(graph_dict), [edge["source"] for edge in edges], texts
+
+
+@case("route")
+def setup_route(n_nodes, shape, density):
+    router, nodes, texts = _router_turns(make_graph(n_nodes, shape, density))
+
+    def run():
+        return [router.route(node, text) for node, text in zip(nodes, texts())]
+
+    return run
+
+
+@case("route_batch")
+def setup_route_batch(n_nodes, shape, density):
+    router, nodes, texts = _router_turns(make_graph(n_nodes, shape, density))
+    return lambda: router.route_batch(nodes, texts())
+
+
+@case("evaluate_generation")
+def setup_evaluate_generation(n_nodes, shape, density):
+    directory = tempfile.mkdtemp(prefix="chatsky_bench_")
+    atexit.register(shutil.rmtree, directory, ignore_errors=True)
+    input_path = os.path.join(directory, "pairs.json")
+    pairs = []
+    for seed in range(max(1, 2000 // n_nodes)):
+        graph = make_graph(n_nodes, shape, density, seed=seed)
+        pairs.append({"dialog": make_dialogue(graph), "graph": graph})
+    with open(input_path, "w") as f:
+        json.dump(pairs, f)
+    return lambda: evaluate_generation(input_path, directory)
+
+
+def measure(fn: Callable, repeat: int) -> dict:
+    # the metric functions print a lot, which would dominate the timings
+    with contextlib.redirect_stdout(io.StringIO()):
+        times = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            fn()
+            times.append(time.perf_counter() - start)
+
+        tracemalloc.start()
+        baseline = tracemalloc.get_traced_memory()[0]
+        fn()
+        peak = tracemalloc.get_traced_memory()[1] - baseline
+        tracemalloc.stop()
+    return {"seconds": statistics.median(times), "min_seconds": min(times), "peak_bytes": peak}
+
+
+def run(cases: list[str], sizes: list[int], shapes: list[str], densities: list[float], repeat: int, max_nodes: Optional[int]) -> dict:
+    results = {}
+    for name in cases:
+        setup, case_max_nodes = CASES[name]
+        for n_nodes in sizes:
+            if n_nodes > (max_nodes or case_max_nodes):
+                continue
+            for shape in shapes:
+                for density in densities:
+                    fn = setup(n_nodes, shape, density)
+                    if fn is None:
+                        continue
+                    key = f"{name}[n={n_nodes},shape={shape},density={density:g}]"
+                    results[key] = measure(fn, repeat)
+                    result = results[key]
+                    print(f"{key:<60} {result['seconds'] * 1e3:>10.2f} ms {result['peak_bytes'] / 2**20:>9.2f} MiB", flush=True)
+    return results
+
+
+def metadata() -> dict:
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True).stdout.strip()
+    except OSError:
+        commit = ""
+    return {"python": platform.python_version(), "platform": platform.platform(), "machine": platform.machine(), "commit": commit}
+
+
+def compare(results: dict, baseline: dict, threshold: float, min_seconds: float = 1e-3) -> list[str]:
+    """Cases slower or using more memory than `threshold` times the baseline; tiny absolute differences are ignored."""
+    regressions = []
+    for key, result in results.items():
+        old = baseline.get(key)
+        if old is None:
+            continue
+        if result["seconds"] > old["seconds"] * threshold and result["seconds"] - old["seconds"] > min_seconds:
+            regressions.append(f"{key}: time {old['seconds'] * 1e3:.2f} ms -> {result['seconds'] * 1e3:.2f} ms")
+        if result["peak_bytes"] > old["peak_bytes"] * threshold and result["peak_bytes"] - old["peak_bytes"] > 2**16:
+            regressions.append(f"{key}: memory {old['peak_bytes'] / 2**20:.2f} MiB -> {result['peak_bytes'] / 2**20:.2f} MiB")
+    return regressions
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--cases", nargs="+", choices=sorted(CASES), default=list(CASES))
+    parser.add_argument("--sizes", nargs="+", type=int, default=[10, 100, 500, 1000, 10_000])
+    parser.add_argument("--shapes", nargs="+", choices=SHAPES, default=["ring", "branching"])
+    parser.add_argument("--densities", nargs="+", type=float, default=[1.0, 2.0])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--max-nodes", type=int, help="override the per-case size limits (quadratic cases stop at 1000 nodes, triplet_match at 500)")
+    parser.add_argument("--quick", action="store_true", help="sizes 10 and 100 with 3 repeats, for CI and pre-commit checks")
+    parser.add_argument("--output", help="save results as JSON")
+    parser.add_argument("--baseline", help="results JSON of an earlier run to compare with")
+    parser.add_argument("--threshold", type=float, default=1.3, help="allowed slowdown or memory growth against the baseline")
+    args = parser.parse_args(argv)
+
+    if args.quick:
+        args.sizes, args.repeat = [10, 100], 3
+    results = run(args.cases, args.sizes, args.shapes, args.densities, args.repeat, args.max_nodes)
+
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, "w") as f:
+            json.dump({"meta": metadata(), "results": results}, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)["results"]
+        regressions = compare(results, baseline, args.threshold)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        print(f"{len(regressions)} regressions against {args.baseline} (threshold {args.threshold:g}x)")
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
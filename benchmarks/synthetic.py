@@ -0,0 +1,63 @@
+"""Synthetic dialogue graphs of arbitrary size for the benchmarks."""
+
+import copy
+import random
+
+SHAPES = ("chain", "ring", "branching")
+
+
+def make_graph(n_nodes: int, shape: str = "ring", multiedge_density: float = 1.0, utterances_per_node: int = 2, seed: int = 0) -> dict:
+    """
+    Graph dict with `n_nodes` nodes in the `nodes`/`edges` format.
+
+    `shape` is the cycle structure: "chain" (1 -> 2 -> ... -> n), "ring" (a chain closed back into
+    the start node) or "branching" (a ring plus random forward and backward edges, i.e. many cycles).
+    `multiedge_density` is the mean number of edges between connected node pairs, so 2.0 doubles
+    every transition with a parallel edge carrying other utterances.
+    """
+    if shape not in SHAPES:
+        raise ValueError(f"shape must be one of {SHAPES}, got {shape!r}")
+    rng = random.Random(seed)
+    nodes = [
+        {"id": i, "label": f"node_{i}", "is_start": i == 1, "utterances": [f"assistant utterance {i}.{k}" for k in range(utterances_per_node)]}
+        for i in range(1, n_nodes + 1)
+    ]
+
+    pairs = [(i, i + 1) for i in range(1, n_nodes)]
+    if shape in ("ring", "branching") and n_nodes > 1:
+        pairs.append((n_nodes, 1))
+    if shape == "branching":
+        pairs += [(rng.randint(1, n_nodes), rng.randint(1, n_nodes)) for _ in range(n_nodes // 2)]
+
+    edges = []
+    for source, target in pairs:
+        parallel = max(1, int(multiedge_density) + (rng.random() < multiedge_density % 1))
+        for copy_idx in range(parallel):
+            edges.append({"source": source, "target": target, "utterances": [f"user utterance {source}-{target}.{copy_idx}.{len(edges)}"]})
+    return {"nodes": nodes, "edges": edges}
+
+
+def perturb(graph: dict, drop_share: float = 0.1, seed: int = 1) -> dict:
+    """A "generated" copy of `graph`: a share of node and edge utterances replaced by new ones."""
+    rng = random.Random(seed)
+    result = copy.deepcopy(graph)
+    for entry in result["nodes"] + result["edges"]:
+        entry["utterances"] = [u if rng.random() >= drop_share else f"{u} (rephrased)" for u in entry["utterances"]]
+    return result
+
+
+def make_dialogue(graph: dict, max_turns: int = 40) -> list[dict]:
+    """Dialogue walking the first out-edge from the start node, used as the `dialog` of synthetic pairs."""
+    out_edges = {}
+    for edge in graph["edges"]:
+        out_edges.setdefault(edge["source"], edge)
+    nodes = {node["id"]: node for node in graph["nodes"]}
+    dialogue, current = [], 1
+    while current in nodes and len(dialogue) < max_turns:
+        dialogue.append({"text": nodes[current]["utterances"][0], "participant": "assistant"})
+        edge = out_edges.get(current)
+        if edge is None:
+            break
+        dialogue.append({"text": edge["utterances"][0], "participant": "user"})
+        current = edge["target"]
+    return dialogue
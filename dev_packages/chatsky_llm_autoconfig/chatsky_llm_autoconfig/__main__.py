@@ -0,0 +1,5 @@
+import sys
+
+from chatsky_llm_autoconfig.cli import main
+
+sys.exit(main())
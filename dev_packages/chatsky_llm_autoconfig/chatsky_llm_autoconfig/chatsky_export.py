@@ -0,0 +1,166 @@
+"""
+Export of a dialogue graph as a Chatsky script with constant-time transition dispatch.
+
+Graph nodes are assistant turns and edges are user turns. Writing every edge as its own
+`cnd.exact_match` condition makes Chatsky evaluate all conditions of a node on every turn, so the
+cost of a turn grows with the out-degree of the node. Here the graph is compiled once instead:
+
+- every node gets a table normalized user utterance -> target node, looked up by a single
+  callable transition label;
+- responses are built as `Message` objects at compile time, not on every turn;
+- text matching no edge of the current node goes to a fallback node, which dispatches on the
+  utterances of all edges so the dialogue can resume.
+
+`CompiledGraph` is plain Python and can drive dialogues without Chatsky, e.g. to check that a
+generated graph accepts its dialogues; `to_chatsky_script` and `build_pipeline` import Chatsky lazily.
+
+Examples
+--------
+    pipeline = build_pipeline(graph)
+    ctx = pipeline(Message(text="Hi"), ctx_id=0)
+    ctx.last_response.text
+
+    pipeline = build_pipeline(graph, router=IntentRouter(graph))  # also accepts rephrased input
+
+    compiled = compile_graph(graph)
+    node = compiled.step(compiled.start, "I want a pizza")
+"""
+
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Hashable, Optional
+
+from chatsky_llm_autoconfig.instrumentation import traced
+from chatsky_llm_autoconfig.utils import get_utterances, normalize_utterance
+
+if TYPE_CHECKING:
+    from chatsky_llm_autoconfig.router import IntentRouter
+
+FLOW = "graph"
+START_NODE = "start"
+FALLBACK_NODE = "fallback"
+FALLBACK_RESPONSE = "Sorry, I didn't get that. Could you rephrase?"
+
+
+@dataclass
+class CompiledGraph:
+    """
+    Transition tables and responses of a graph dict.
+
+    `dispatch` maps a node id to {normalized user utterance: target node id}. When several edges of a
+    node share an utterance, the first one in the graph wins. `fallback_dispatch` holds the utterances
+    of all edges, with the same rule. `responses` holds the utterances of every node; the first one is
+    what the bot says.
+    """
+
+    start: Hashable
+    responses: dict = field(default_factory=dict)
+    dispatch: dict = field(default_factory=dict)
+    fallback_dispatch: dict = field(default_factory=dict)
+
+    def step(self, node: Optional[Hashable], text: str) -> Optional[Hashable]:
+        """Node reached from `node` on the user utterance `text`, None when no edge matches; `node=None` means the fallback."""
+        table = self.fallback_dispatch if node is None else self.dispatch.get(node, {})
+        return table.get(normalize_utterance(text))
+
+    def response(self, node: Hashable) -> str:
+        utterances = self.responses.get(node)
+        return utterances[0] if utterances else ""
+
+    def accepts(self, user_utterances: list[str]) -> bool:
+        """Whether the user turns of a dialogue follow edges of the graph from the start node."""
+        node = self.start
+        for text in user_utterances:
+            node = self.step(node, text)
+            if node is None:
+                return False
+        return True
+
+
+@traced("export.compile")
+def compile_graph(graph: dict) -> CompiledGraph:
+    """Build the transition tables of a graph dict with "nodes" and "edges"; raises ValueError without a start node."""
+    nodes = graph.get("nodes", [])
+    start = next((node["id"] for node in nodes if node.get("is_start")), None)
+    if start is None:
+        raise ValueError("No starting node found in the graph.")
+    compiled = CompiledGraph(start=start)
+    for node in nodes:
+        compiled.responses[node["id"]] = tuple(get_utterances(node))
+        compiled.dispatch[node["id"]] = {}
+    for edge in graph.get("edges", []):
+        compiled.responses.setdefault(edge["target"], ())
+        table = compiled.dispatch.setdefault(edge["source"], {})
+        for utterance in get_utterances(edge):
+            key = normalize_utterance(utterance)
+            table.setdefault(key, edge["target"])
+            compiled.fallback_dispatch.setdefault(key, edge["target"])
+    return compiled
+
+
+def node_label(node_id: Hashable) -> str:
+    """Name of the Chatsky node of a graph node."""
+    return f"node_{node_id}"
+
+
+def _dispatcher(table: dict, node: Optional[Hashable] = None, router: Optional["IntentRouter"] = None, labels: Optional[dict] = None):
+    def dispatch(ctx, pipeline):
+        request = ctx.last_request
+        if request is None:
+            return None
+        text = request.text or ""
+        label = table.get(normalize_utterance(text))
+        if label is None and router is not None:
+            label = labels.get(router.route(node, text).target)
+        # None lets Chatsky go to the fallback node
+        return label
+
+    return dispatch
+
+
+def _import_chatsky():
+    import chatsky
+    from chatsky.script import Context, Node
+
+    # chatsky 0.8 rebuilds Script and Context but not Node, which newer pydantic versions need before the first turn
+    Node.model_rebuild(_types_namespace={"Context": Context, "Pipeline": chatsky.Pipeline})
+    return chatsky
+
+
+def to_chatsky_script(graph: dict, flow: str = FLOW, router: Optional["IntentRouter"] = None) -> tuple[dict, tuple[str, str], tuple[str, str]]:
+    """
+    Chatsky script of a graph dict, with its start and fallback labels.
+
+    The Chatsky start node has no response and moves to the start node of the graph on any first
+    message, since in Chatsky the user speaks first. Every node keeps its graph id and all its
+    utterances in MISC. With a `router`, built from the same graph, input matching no edge exactly
+    is routed by similarity before falling back.
+    """
+    _import_chatsky()
+    from chatsky.script import MISC, RESPONSE, TRANSITIONS, Message
+    import chatsky.script.conditions as cnd
+
+    compiled = compile_graph(graph)
+    labels = {node: (flow, node_label(node)) for node in compiled.responses}
+    always = cnd.true()
+
+    nodes = {
+        START_NODE: {RESPONSE: Message(), TRANSITIONS: {labels[compiled.start]: always}},
+        FALLBACK_NODE: {
+            RESPONSE: Message(text=FALLBACK_RESPONSE),
+            TRANSITIONS: {_dispatcher({key: labels[target] for key, target in compiled.fallback_dispatch.items()}): always},
+        },
+    }
+    for node, utterances in compiled.responses.items():
+        table = {key: labels[target] for key, target in compiled.dispatch.get(node, {}).items()}
+        nodes[node_label(node)] = {
+            RESPONSE: Message(text=utterances[0] if utterances else ""),
+            TRANSITIONS: {_dispatcher(table, node, router, labels): always},
+            MISC: {"graph_node": node, "utterances": list(utterances)},
+        }
+    return {flow: nodes}, (flow, START_NODE), (flow, FALLBACK_NODE)
+
+
+def build_pipeline(graph: dict, flow: str = FLOW, router: Optional["IntentRouter"] = None, **kwargs):
+    """Chatsky `Pipeline` running the script of `to_chatsky_script`; `kwargs` go to `Pipeline.from_script`."""
+    script, start_label, fallback_label = to_chatsky_script(graph, flow, router)
+    return _import_chatsky().Pipeline.from_script(script, start_label=start_label, fallback_label=fallback_label, **kwargs)
@@ -0,0 +1,435 @@
+"""
+`chatsky-autoconfig` command line interface.
+
+    chatsky-autoconfig generate data/data.json generated.json --model gpt-4o-mini
+    chatsky-autoconfig evaluate data/data.json experiments/results/gpt-4o-mini --model gpt-4o-mini --timings
+    chatsky-autoconfig evaluate-generation generated_data/dialogue_graph_pairs.json results --memory
+    chatsky-autoconfig sample data/data.json dialogues.json --count 10 --seed 0
+    chatsky-autoconfig render data/data.json plots --profile
+    chatsky-autoconfig render data/data.json plots --format html --generated experiments/results/gpt-4o-mini/generated_graphs.json
+    chatsky-autoconfig diff data/data.json diffs --generated experiments/results/gpt-4o-mini/generated_graphs.json
+    chatsky-autoconfig consensus generated.json consensus_graph.json --min-support 0.5
+
+`--timings` prints wall time and throughput per stage, `--memory` the tracemalloc peak per stage
+and `--profile` the cProfile statistics of the whole run (`--profile-output FILE` saves them instead).
+`--spans`, `--trace-file` and `--otlp-endpoint` turn on the `instrumentation` spans of graph loading,
+metrics, sampling, plotting and LLM calls; with `--spans` the latency summary is also saved as
+`latency_summary.json` next to the outputs.
+"""
+
+import argparse
+import cProfile
+import io
+import json
+import os
+import pstats
+import random
+import sys
+import time
+import tracemalloc
+from contextlib import contextmanager
+from typing import Optional
+
+from chatsky_llm_autoconfig.evaluate import (
+    calculate_mean_metrics,
+    evaluate_generation,
+    evaluate_pair,
+    generate_graph,
+    load_dialogues,
+    save_graph_comparison,
+    save_mean_metrics,
+    save_metrics,
+)
+from chatsky_llm_autoconfig.instrumentation import InMemorySink, JsonlSink, OtlpHttpSink, instrumented
+from chatsky_llm_autoconfig.validation import is_valid_graph
+
+
+class StageRecorder:
+    """Wall time, processed items and optionally the tracemalloc peak of named stages of one run."""
+
+    def __init__(self, memory: bool = False):
+        self.memory = memory
+        self.stages = {}
+
+    @contextmanager
+    def stage(self, name: str, items: Optional[int] = None):
+        if self.memory:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+            tracemalloc.reset_peak()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            record = self.stages.setdefault(name, {"seconds": 0.0, "items": 0, "calls": 0, "peak_bytes": 0})
+            record["seconds"] += time.perf_counter() - start
+            record["items"] += items if items is not None else 1
+            record["calls"] += 1
+            if self.memory:
+                record["peak_bytes"] = max(record["peak_bytes"], tracemalloc.get_traced_memory()[1])
+
+    def report(self, timings: bool = True) -> str:
+        lines = []
+        header = f"{'stage':<20}"
+        if timings:
+            header += f" {'calls':>7} {'items':>7} {'seconds':>10} {'items/s':>10}"
+        if self.memory:
+            header += f" {'peak MiB':>10}"
+        lines.append(header)
+        for name, record in self.stages.items():
+            line = f"{name:<20}"
+            if timings:
+                throughput = record["items"] / record["seconds"] if record["seconds"] > 0 else float("inf")
+                line += f" {record['calls']:>7} {record['items']:>7} {record['seconds']:>10.3f} {throughput:>10.1f}"
+            if self.memory:
+                line += f" {record['peak_bytes'] / 2**20:>10.2f}"
+            lines.append(line)
+        return "\n".join(lines)
+
+
+def _limit(items: list, limit: Optional[int]) -> list:
+    return items[:limit] if limit is not None else items
+
+
+def _write_json(data, path: str):
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(path, "w") as f:
+        json.dump(data, f, indent=2, ensure_ascii=False)
+
+
+def _graph_of(item: dict, key: Optional[str]) -> Optional[dict]:
+    if key is not None:
+        return item.get(key)
+    for candidate in ("graph", "target_graph"):
+        if candidate in item:
+            return item[candidate]
+    return item if "nodes" in item and "edges" in item else None
+
+
+def cmd_generate(args, recorder: StageRecorder):
+    with recorder.stage("load"):
+        dialogues = _limit(load_dialogues(args.input), args.limit)
+
+    results = []
+    for item in dialogues:
+        with recorder.stage("generate"):
+            graph = generate_graph(item["dialog"], args.model, retries=args.retries, output_format=args.output_format, repair=args.repair)
+        results.append({"dialog": item["dialog"], "graph": graph})
+
+    with recorder.stage("write", items=len(results)):
+        _write_json(results, args.output)
+    print(f"Generated {sum(result['graph'] is not None for result in results)} of {len(results)} graphs, saved to {args.output}")
+
+
+def cmd_evaluate(args, recorder: StageRecorder):
+    cache = None
+    if args.metric_cache:
+        from chatsky_llm_autoconfig.metric_cache import MetricCache
+
+        cache = MetricCache(args.metric_cache)
+    if args.vector_store:
+        from chatsky_llm_autoconfig.metrics.fuzzy import VectorStore, set_vector_store
+
+        set_vector_store(VectorStore(args.vector_store))
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    with recorder.stage("load"):
+        dialogues = _limit(load_dialogues(args.input), args.limit)
+
+    all_metrics, generated_graphs = {}, {}
+    for idx, item in enumerate(dialogues):
+        with recorder.stage("generate"):
+            generated_graph = generate_graph(item["dialog"], args.model, retries=args.retries, output_format=args.output_format, repair=args.repair)
+        generated_graphs[idx] = generated_graph
+        with recorder.stage("metrics"):
+            all_metrics[idx] = evaluate_pair(generated_graph, item["target_graph"], idx, cache)
+        if args.plots and generated_graph is not None and is_valid_graph(generated_graph, require_start=False, check_reachability=False):
+            with recorder.stage("render"):
+                save_graph_comparison(item["target_graph"], generated_graph, f"{args.output_dir}/graph_comparison_{idx}.png")
+
+    with recorder.stage("write", items=len(dialogues)):
+        save_metrics(all_metrics, f"{args.output_dir}/all_metrics.json")
+        save_metrics(generated_graphs, f"{args.output_dir}/generated_graphs.json")
+        save_mean_metrics(calculate_mean_metrics(all_metrics), f"{args.output_dir}/mean_metrics.txt")
+    print(f"Evaluation complete. Report saved to: {args.output_dir}/mean_metrics.txt")
+
+
+def cmd_evaluate_generation(args, recorder: StageRecorder):
+    with recorder.stage("evaluate-generation"):
+        metrics = evaluate_generation(args.input, args.output_dir)
+    recorder.stages["evaluate-generation"]["items"] = metrics["total_graphs"]
+    print(f"Evaluation complete. Report saved to: {os.path.join(args.output_dir, 'generation_metrics.json')}")
+
+
+def cmd_sample(args, recorder: StageRecorder):
+    from chatsky_llm_autoconfig.sample_dialogue import dialogues_from_graph
+
+    if args.seed is not None:
+        random.seed(args.seed)
+    with recorder.stage("load"):
+        data = load_dialogues(args.input)
+    items = data if isinstance(data, list) else [data]
+    graphs = [graph for graph in (_graph_of(item, args.graph_key) for item in _limit(items, args.limit)) if graph is not None]
+
+    samples = []
+    with recorder.stage("sample", items=len(graphs) * args.count):
+        for graph in graphs:
+            for _ in range(args.count):
+                utterances = dialogues_from_graph(graph)
+                dialog = [{"text": text, "participant": "assistant" if idx % 2 == 0 else "user"} for idx, text in enumerate(utterances)]
+                samples.append({"dialog": dialog, "graph": graph})
+
+    with recorder.stage("write", items=len(samples)):
+        _write_json(samples, args.output)
+    print(f"Sampled {len(samples)} dialogues from {len(graphs)} graphs, saved to {args.output}")
+
+
+def cmd_render(args, recorder: StageRecorder):
+    from chatsky_llm_autoconfig.evaluate import visualize_graph
+
+    with recorder.stage("load"):
+        data = load_dialogues(args.input)
+        generated = load_dialogues(args.generated) if args.generated else None
+    items = _limit(data if isinstance(data, list) else [data], args.limit)
+    os.makedirs(args.output_dir, exist_ok=True)
+
+    if args.format == "html":
+        from chatsky_llm_autoconfig.render import render_pairs
+
+        pairs = []
+        for idx, item in enumerate(items):
+            predicted = generated.get(str(idx)) if generated is not None else item.get(args.compare_key) if args.compare_key else None
+            pairs.append((item["target_graph"] if isinstance(predicted, dict) else _graph_of(item, args.graph_key), predicted))
+        with recorder.stage("render", items=len(pairs)):
+            names = render_pairs(pairs, args.output_dir, workers=args.workers, cache_dir=args.layout_cache)
+        print(f"Rendered {len(names)} graphs to {args.output_dir}/index.html")
+        return
+
+    rendered = 0
+    for idx, item in enumerate(items):
+        predicted = item.get(args.compare_key) if args.compare_key else None
+        with recorder.stage("render"):
+            if isinstance(predicted, dict) and "target_graph" in item:
+                save_graph_comparison(item["target_graph"], predicted, f"{args.output_dir}/graph_comparison_{idx}.png")
+            else:
+                import matplotlib.pyplot as plt
+
+                graph = _graph_of(item, args.graph_key)
+                if graph is None:
+                    continue
+                plt.figure(figsize=(10, 10))
+                visualize_graph(graph, f"Graph {idx}")
+                plt.savefig(f"{args.output_dir}/graph_{idx}.png")
+                plt.close()
+        rendered += 1
+    print(f"Rendered {rendered} graphs to {args.output_dir}")
+
+
+def _triplet_node_mapping(target: dict, predicted: dict) -> dict:
+    """`triplet_match` node mapping between the original node ids of both graphs."""
+    from chatsky_llm_autoconfig.graph import TYPES_OF_GRAPH, Graph
+    from chatsky_llm_autoconfig.metrics.triplet_matching import triplet_match
+
+    target_graph, predicted_graph = Graph(target, TYPES_OF_GRAPH.MULTI), Graph(predicted, TYPES_OF_GRAPH.MULTI)
+    node_mapping, _ = triplet_match(target_graph, predicted_graph)
+    # both sides of the mapping are ids of the renumbered nx graphs
+    target_ids = {v: k for k, v in target_graph.node_mapping.items()}
+    predicted_ids = {v: k for k, v in predicted_graph.node_mapping.items()}
+    return {
+        target_ids.get(node, node): predicted_ids.get(match, match) if match is not None else None
+        for node, match in node_mapping.items()
+        if node in target_graph.nx_graph.nodes
+    }
+
+
+def cmd_diff(args, recorder: StageRecorder):
+    from chatsky_llm_autoconfig.graph_diff import aggregate_diffs, diff_graphs
+
+    with recorder.stage("load"):
+        items = _limit(load_dialogues(args.input), args.limit)
+        generated = load_dialogues(args.generated) if args.generated else None
+    os.makedirs(args.output_dir, exist_ok=True)
+
+    diffs = []
+    with open(os.path.join(args.output_dir, "graph_diffs.jsonl"), "w") as f:
+        for idx, item in enumerate(items):
+            predicted = generated.get(str(idx)) if generated is not None else item.get(args.compare_key)
+            if not isinstance(predicted, dict):
+                continue
+            with recorder.stage("diff"):
+                node_mapping = _triplet_node_mapping(item["target_graph"], predicted) if args.triplet_mapping else None
+                diff = diff_graphs(item["target_graph"], predicted, node_mapping)
+            diffs.append(diff)
+            f.write(json.dumps({"idx": idx, **diff.as_dict()}, ensure_ascii=False) + "\n")
+
+    summary = aggregate_diffs(diffs)
+    _write_json(summary, os.path.join(args.output_dir, "diff_summary.json"))
+    print(f"Diffed {summary['pairs']} pairs, {summary['exact']} exact")
+    for name, pairs in summary["pairs_with_error"].items():
+        print(f"{name:<15} {pairs:>7} pairs {summary['totals'][name]:>8} total")
+
+
+def _support(value: str):
+    return float(value) if "." in value else int(value)
+
+
+def cmd_consensus(args, recorder: StageRecorder):
+    from chatsky_llm_autoconfig.consensus import ConsensusGraph
+
+    with recorder.stage("load"):
+        data = load_dialogues(args.input)
+    items = _limit(data if isinstance(data, list) else [data], args.limit)
+
+    consensus = ConsensusGraph(min_overlap=args.min_overlap)
+    with recorder.stage("aggregate", items=len(items)):
+        consensus.extend(_graph_of(item, args.graph_key) for item in items)
+    graph = consensus.graph(args.min_support, args.min_utterance_support)
+    _write_json(graph, args.output)
+    print(f"Aggregated {consensus.graphs} graphs into {len(graph['nodes'])} nodes and {len(graph['edges'])} edges, saved to {args.output}")
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="chatsky-autoconfig", description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--profile", action="store_true", help="profile the run with cProfile and print the top functions")
+    parser.add_argument("--profile-output", metavar="FILE", help="save cProfile stats to FILE instead of printing them")
+    parser.add_argument("--timings", action="store_true", help="print wall time and throughput per stage")
+    parser.add_argument("--memory", action="store_true", help="print tracemalloc peak memory per stage")
+    parser.add_argument("--spans", action="store_true", help="print and save latency percentiles of instrumented functions")
+    parser.add_argument("--trace-file", metavar="FILE", help="append instrumentation spans and counters to a JSONL file")
+    parser.add_argument("--otlp-endpoint", metavar="URL", help="export spans to an OTLP/HTTP collector, e.g. http://localhost:4318/v1/traces")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    generate = subparsers.add_parser("generate", help="generate graphs for dialogues with an LLM")
+    generate.add_argument("input", help="JSON list of items with a 'dialog' key")
+    generate.add_argument("output", help="JSON file for the dialogue-graph pairs")
+    generate.add_argument("--model", default="gpt-4o-mini")
+    generate.add_argument("--retries", type=int, default=2)
+    generate.add_argument("--output-format", choices=["json", "compact"], default="json", help="graph format the model answers in")
+    generate.add_argument("--repair", action="store_true", help="re-prompt only the failing part of invalid graphs instead of regenerating them")
+    generate.add_argument("--limit", type=int)
+    generate.set_defaults(handler=cmd_generate)
+
+    evaluate = subparsers.add_parser("evaluate", help="generate graphs and compare them with the target graphs")
+    evaluate.add_argument("input", help="JSON list of items with 'dialog' and 'target_graph' keys")
+    evaluate.add_argument("output_dir")
+    evaluate.add_argument("--model", default="gpt-4o-mini")
+    evaluate.add_argument("--retries", type=int, default=2)
+    evaluate.add_argument("--output-format", choices=["json", "compact"], default="json", help="graph format the model answers in")
+    evaluate.add_argument("--repair", action="store_true", help="re-prompt only the failing part of invalid graphs instead of regenerating them")
+    evaluate.add_argument("--limit", type=int)
+    evaluate.add_argument("--plots", action="store_true", help="save target/generated comparison plots")
+    evaluate.add_argument("--metric-cache", help="SQLite file of the metric cache")
+    evaluate.add_argument("--vector-store", help="path prefix of the utterance vector cache of the fuzzy metrics")
+    evaluate.set_defaults(handler=cmd_evaluate)
+
+    evaluate_gen = subparsers.add_parser("evaluate-generation", help="statistics of generated dialogue-graph pairs")
+    evaluate_gen.add_argument("input", help="JSON list of items with 'dialog' and 'graph' keys")
+    evaluate_gen.add_argument("output_dir")
+    evaluate_gen.set_defaults(handler=cmd_evaluate_generation)
+
+    sample = subparsers.add_parser("sample", help="sample dialogues by random walks over graphs")
+    sample.add_argument("input", help="a graph JSON or a JSON list of items holding graphs")
+    sample.add_argument("output")
+    sample.add_argument("--graph-key", help="item key of the graph, 'graph' or 'target_graph' by default")
+    sample.add_argument("--count", type=int, default=1, help="dialogues per graph")
+    sample.add_argument("--seed", type=int)
+    sample.add_argument("--limit", type=int)
+    sample.set_defaults(handler=cmd_sample)
+
+    render = subparsers.add_parser("render", help="plot graphs to PNG files")
+    render.add_argument("input", help="a graph JSON or a JSON list of items holding graphs")
+    render.add_argument("output_dir")
+    render.add_argument("--graph-key", help="item key of the graph, 'graph' or 'target_graph' by default")
+    render.add_argument("--compare-key", help="item key of a generated graph to plot next to 'target_graph', e.g. predicted_graph")
+    render.add_argument("--format", choices=["png", "html"], default="png", help="matplotlib PNG files or SVG pages with an index.html")
+    render.add_argument("--generated", help="generated_graphs.json of an evaluation run to compare with 'target_graph' (html only)")
+    render.add_argument("--workers", type=int, help="render processes for html, all CPUs by default")
+    render.add_argument("--layout-cache", help="directory of cached graph layouts for html, shared between runs")
+    render.add_argument("--limit", type=int)
+    render.set_defaults(handler=cmd_render)
+
+    diff = subparsers.add_parser("diff", help="missing, extra, split and merged nodes and edges of predicted graphs")
+    diff.add_argument("input", help="JSON list of items with a 'target_graph' key")
+    diff.add_argument("output_dir", help="directory for graph_diffs.jsonl and diff_summary.json")
+    diff.add_argument("--generated", help="generated_graphs.json of an evaluation run; by default graphs are taken from the items")
+    diff.add_argument("--compare-key", default="predicted_graph", help="item key of the predicted graph when --generated is not given")
+    diff.add_argument("--triplet-mapping", action="store_true", help="map nodes with triplet_match instead of shared utterances")
+    diff.add_argument("--limit", type=int)
+    diff.set_defaults(handler=cmd_diff)
+
+    consensus = subparsers.add_parser("consensus", help="weighted consensus graph of many generated graphs")
+    consensus.add_argument("input", help="a JSON list of graphs or of items holding graphs")
+    consensus.add_argument("output", help="JSON file for the consensus graph")
+    consensus.add_argument("--graph-key", help="item key of the graph, 'graph' or 'target_graph' by default")
+    consensus.add_argument("--min-support", type=_support, default=1, help="graphs containing a node or edge, or a share of graphs such as 0.5")
+    consensus.add_argument(
+        "--min-utterance-support", type=_support, default=1, help="the same for utterances, a share being relative to their node or edge"
+    )
+    consensus.add_argument("--min-overlap", type=float, default=0.0, help="share of shared utterances needed to align a node with the consensus")
+    consensus.add_argument("--limit", type=int)
+    consensus.set_defaults(handler=cmd_consensus)
+    return parser
+
+
+def run(argv: Optional[list[str]] = None) -> StageRecorder:
+    """Run the command line `argv` and return the recorder of its stages."""
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if args.command == "render" and args.format != "html":
+        html_only = [
+            flag
+            for flag, value in (("--generated", args.generated), ("--workers", args.workers), ("--layout-cache", args.layout_cache))
+            if value is not None
+        ]
+        if html_only:
+            parser.error(f"{', '.join(html_only)} only apply with --format html")
+    recorder = StageRecorder(memory=args.memory)
+    profiler = cProfile.Profile() if args.profile or args.profile_output else None
+
+    span_summary = InMemorySink() if args.spans else None
+    sinks = [span_summary] if span_summary is not None else []
+    if args.trace_file:
+        sinks.append(JsonlSink(args.trace_file))
+    if args.otlp_endpoint:
+        sinks.append(OtlpHttpSink(args.otlp_endpoint))
+
+    if profiler is not None:
+        profiler.enable()
+    try:
+        with instrumented(*sinks):
+            args.handler(args, recorder)
+    finally:
+        if profiler is not None:
+            profiler.disable()
+        if args.memory and tracemalloc.is_tracing():
+            tracemalloc.stop()
+
+    if span_summary is not None:
+        print(span_summary.report(), file=sys.stderr)
+        output_dir = getattr(args, "output_dir", None)
+        if output_dir:
+            _write_json(span_summary.summary(), os.path.join(output_dir, "latency_summary.json"))
+
+    if args.timings or args.memory:
+        print(recorder.report(timings=args.timings), file=sys.stderr)
+    if profiler is not None:
+        if args.profile_output:
+            profiler.dump_stats(args.profile_output)
+            print(f"Profile saved to {args.profile_output}, view it with `python -m pstats {args.profile_output}` or snakeviz", file=sys.stderr)
+        else:
+            stream = io.StringIO()
+            pstats.Stats(profiler, stream=stream).sort_stats("cumulative").print_stats(25)
+            print(stream.getvalue(), file=sys.stderr)
+    return recorder
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    """Entry point of the `chatsky-autoconfig` console script."""
+    run(argv)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
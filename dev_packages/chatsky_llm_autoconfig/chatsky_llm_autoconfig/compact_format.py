@@ -0,0 +1,155 @@
+"""
+Compact line format of generated graphs, to cut completion tokens.
+
+In the JSON graph format the model spells out "source", "target", "utterances" and "is_start" for
+every node and edge and copies every utterance from the dialogue. In the compact format the
+dialogue is shown with numbered turns (`format_dialogue`) and the model answers with one line per
+node or edge, referring to utterances by turn number:
+
+    N1* greeting 0 8
+    N2 ask_item 2
+    E1>2 1
+    E2>1 3 5
+
+`N<id>` starts a node line, `*` marking a start node, followed by a one-word label and the numbers of
+the assistant turns the node holds. `E<source>><target>` starts an edge line, followed by the numbers
+of the user turns that trigger it; every line is one edge, so parallel edges are separate lines.
+Turns repeated with the same text, as in loops, give one utterance. An utterance that is not a turn
+of the dialogue can be written as a JSON string instead of a number, e.g. `E2>1 3 "No, thanks"`.
+
+`parse_compact_graph` turns an answer into the graph dict `Graph` consumes and rejects anything
+else with a `CompactFormatError` naming the line, so broken answers are retried like broken JSON.
+
+Examples
+--------
+    prompt = prompts.compact_graph_generation_prompt.format(dialog=format_dialogue(dialogue))
+    graph_dict = parse_compact_graph(call_llm_api(prompt, model), dialogue)
+"""
+
+import json
+import re
+
+from chatsky_llm_autoconfig.utils import get_utterances
+
+NODE_PARTICIPANT = "assistant"
+EDGE_PARTICIPANT = "user"
+
+# a turn number, a JSON string or anything else, which is an error
+_UTTERANCE_RE = re.compile(r'(\d+)(?=\s|$)|("(?:[^"\\]|\\.)*")(?=\s|$)|(\S+)')
+
+
+class CompactFormatError(ValueError):
+    """An answer that is not a valid compact graph; `line` is its 1-based line number, 0 for the whole answer."""
+
+    def __init__(self, line: int, message: str):
+        super().__init__(f"line {line}: {message}" if line else message)
+        self.line = line
+
+
+def format_dialogue(dialogue: list[dict]) -> str:
+    """The dialogue as numbered "N participant: text" lines, the turn numbers being those of the compact format."""
+    return "\n".join(f"{idx} {turn['participant']}: {turn['text']}" for idx, turn in enumerate(dialogue))
+
+
+def _int(token: str, line: int, what: str) -> int:
+    if not token.isdigit():
+        raise CompactFormatError(line, f"{what} must be a non-negative integer, got {token!r}")
+    return int(token)
+
+
+def _utterances(rest: str, dialogue: list[dict], participant: str, line: int) -> list[str]:
+    utterances, seen = [], set()
+    for number, literal, other in _UTTERANCE_RE.findall(rest):
+        if other:
+            raise CompactFormatError(line, f"expected a turn number or a JSON string, got {other!r}")
+        if literal:
+            try:
+                text = json.loads(literal)
+            except ValueError:
+                raise CompactFormatError(line, f"invalid JSON string {literal}") from None
+        else:
+            idx = int(number)
+            if idx >= len(dialogue):
+                raise CompactFormatError(line, f"turn {idx} is out of the dialogue of {len(dialogue)} turns")
+            turn = dialogue[idx]
+            if turn["participant"] != participant:
+                raise CompactFormatError(line, f"turn {idx} is a {turn['participant']} turn, expected a {participant} turn")
+            text = turn["text"]
+        if text not in seen:
+            seen.add(text)
+            utterances.append(text)
+    if not utterances:
+        raise CompactFormatError(line, "no utterances")
+    return utterances
+
+
+def parse_compact_graph(text: str, dialogue: list[dict]) -> dict:
+    """
+    Graph dict of a compact-format answer about `dialogue`, see the module docstring.
+
+    Blank lines and code fence lines are skipped, anything else must be a node or an edge line.
+    Raises `CompactFormatError` on malformed lines, turn numbers outside the dialogue or of the wrong
+    participant, duplicate node ids, edges between unknown nodes and an answer without nodes.
+    """
+    nodes, edges, edge_lines = [], [], []
+    node_ids = set()
+    for line_no, line in enumerate(text.splitlines(), start=1):
+        head, *rest = line.split(None, 1) or [""]
+        rest = rest[0] if rest else ""
+        if not head or head.startswith("```"):
+            continue
+        if head[0] == "N":
+            start = head.endswith("*")
+            node_id = _int(head[1 : len(head) - start], line_no, "node id")  # noqa: E203
+            if node_id in node_ids:
+                raise CompactFormatError(line_no, f"node {node_id} is defined twice")
+            label, *rest = rest.split(None, 1) or [""]
+            rest = rest[0] if rest else ""
+            if not label or label.isdigit() or label[0] == '"':
+                raise CompactFormatError(line_no, "a node line needs a one-word label before the utterances")
+            node_ids.add(node_id)
+            utterances = _utterances(rest, dialogue, NODE_PARTICIPANT, line_no)
+            nodes.append({"id": node_id, "label": label, "is_start": start, "utterances": utterances})
+        elif head[0] == "E" and ">" in head:
+            source, _, target = head[1:].partition(">")
+            edge = {"source": _int(source, line_no, "edge source"), "target": _int(target, line_no, "edge target")}
+            edge["utterances"] = _utterances(rest, dialogue, EDGE_PARTICIPANT, line_no)
+            edges.append(edge)
+            edge_lines.append(line_no)
+        else:
+            raise CompactFormatError(line_no, f"expected a node (N<id>) or an edge (E<source>><target>) line, got {head!r}")
+
+    if not nodes:
+        raise CompactFormatError(0, "the answer has no node lines")
+    for edge, line_no in zip(edges, edge_lines):
+        for end in ("source", "target"):
+            if edge[end] not in node_ids:
+                raise CompactFormatError(line_no, f"edge {end} {edge[end]} is not a node")
+    return {"nodes": nodes, "edges": edges}
+
+
+def to_compact(graph_dict: dict, dialogue: list[dict]) -> str:
+    """
+    Compact form of `graph_dict` about `dialogue`, e.g. for few-shot examples or recorded answers.
+
+    Every utterance is written as the number of its first turn in the dialogue of the right participant
+    or, when there is none, as a JSON string.
+    """
+    first_turn = {}
+    for idx, turn in enumerate(dialogue):
+        first_turn.setdefault((turn["participant"], turn["text"]), idx)
+
+    def utterances(entry: dict, participant: str) -> str:
+        tokens = []
+        for utterance in get_utterances(entry):
+            idx = first_turn.get((participant, utterance))
+            tokens.append(str(idx) if idx is not None else json.dumps(utterance, ensure_ascii=False))
+        return " ".join(tokens)
+
+    lines = []
+    for node in graph_dict["nodes"]:
+        label = "_".join(str(node.get("label") or f"node_{node['id']}").split())
+        lines.append(f"N{node['id']}{'*' if node.get('is_start') else ''} {label} {utterances(node, NODE_PARTICIPANT)}")
+    for edge in graph_dict["edges"]:
+        lines.append(f"E{edge['source']}>{edge['target']} {utterances(edge, EDGE_PARTICIPANT)}")
+    return "\n".join(lines)
@@ -0,0 +1,208 @@
+"""
+Consensus of many graphs generated for the same dialogue or domain.
+
+`ConsensusGraph` folds graphs in one at a time. Every node of an incoming graph is aligned with the
+consensus node sharing most of its normalized utterances (see `utils.normalize_utterance`) and
+becomes a new consensus node when it shares none. The consensus keeps counts only: for every node
+and every directed edge the number of graphs that contain it (its support), and per utterance and
+label the number of graphs that used it. Adding a graph therefore costs time linear in its size,
+whatever the number of graphs already added, and `graph` thresholds the counts into a graph dict
+at any point.
+
+Consensus nodes are never merged or renumbered afterwards: an incoming node bridging two consensus
+nodes is aligned with the better one and its utterances owned by the other stay there.
+
+Examples
+--------
+    consensus = ConsensusGraph()
+    for graph in generated_graphs:
+        consensus.add(graph)
+    consensus.graph(min_support=0.5)   # nodes and edges present in at least half of the graphs
+"""
+
+import functools
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Hashable, Iterable, Optional, Union
+
+from chatsky_llm_autoconfig.graph import Graph
+from chatsky_llm_autoconfig.instrumentation import traced
+from chatsky_llm_autoconfig.utils import get_utterances, normalize_utterance
+
+
+@dataclass
+class _Counts:
+    support: int = 0
+    utterances: Counter = field(default_factory=Counter)  # normalized utterance -> graphs using it
+    texts: dict = field(default_factory=dict)  # normalized utterance -> first surface form seen
+
+
+@dataclass
+class _NodeCounts(_Counts):
+    starts: int = 0
+    labels: Counter = field(default_factory=Counter)
+
+
+def _count(counts: _Counts, utterances: dict):
+    counts.support += 1
+    counts.utterances.update(utterances.keys())
+    for key, text in utterances.items():
+        counts.texts.setdefault(key, text)
+
+
+# generated graphs of one dialogue repeat most of their utterances
+_normalize = functools.lru_cache(maxsize=1 << 16)(normalize_utterance)
+
+
+def _keyed(utterances: list[str]) -> dict:
+    keyed = {}
+    for utterance in utterances:
+        keyed.setdefault(_normalize(utterance), utterance)
+    return keyed
+
+
+class ConsensusGraph:
+    """
+    Weighted consensus of the graphs added so far, see the module docstring.
+
+    Parameters
+    ----------
+    min_overlap : float
+        Minimal share of the utterances of an incoming node that must belong to a consensus node for
+        the two to be aligned. With the default 0 a single shared utterance is enough.
+    """
+
+    def __init__(self, min_overlap: float = 0.0):
+        self.min_overlap = min_overlap
+        self.graphs = 0
+        self.nodes: dict[int, _NodeCounts] = {}
+        self.edges: dict[tuple[int, int], _Counts] = {}
+        self._owners: dict[str, int] = {}  # normalized node utterance -> consensus node
+
+    def __len__(self) -> int:
+        return len(self.nodes)
+
+    def _align(self, keys: dict) -> Optional[int]:
+        votes = {}
+        for key in keys:
+            owner = self._owners.get(key)
+            if owner is not None:
+                votes[owner] = votes.get(owner, 0) + 1
+        if not votes:
+            return None
+        # ties go to the node supported by more graphs, then to the oldest one
+        best, shared = max(votes.items(), key=lambda item: (item[1], self.nodes[item[0]].support, -item[0]))
+        return best if shared >= self.min_overlap * len(keys) else None
+
+    def add(self, graph: Union[Graph, dict]) -> dict[Hashable, int]:
+        """Fold `graph` into the consensus; returns its node ids mapped to consensus node ids."""
+        graph_dict = graph.graph_dict if isinstance(graph, Graph) else graph
+        self.graphs += 1
+
+        mapping, node_utterances, node_entries = {}, {}, {}
+        for node in graph_dict.get("nodes", []):
+            keys = _keyed(get_utterances(node))
+            target = self._align(keys)
+            if target is None:
+                target = len(self.nodes) + 1
+                self.nodes[target] = _NodeCounts()
+            mapping[node["id"]] = target
+            # a graph splitting one consensus node in two still supports it once
+            merged = node_utterances.setdefault(target, {})
+            for key, text in keys.items():
+                merged.setdefault(key, text)
+            node_entries.setdefault(target, []).append(node)
+
+        for target, keys in node_utterances.items():
+            counts = self.nodes[target]
+            _count(counts, keys)
+            entries = node_entries[target]
+            counts.starts += any(node.get("is_start") for node in entries)
+            counts.labels.update({node["label"] for node in entries if node.get("label")})
+            for key in keys:
+                self._owners.setdefault(key, target)
+
+        edge_utterances = {}
+        for edge in graph_dict.get("edges", []):
+            if edge["source"] not in mapping or edge["target"] not in mapping:
+                continue
+            pair = (mapping[edge["source"]], mapping[edge["target"]])
+            keys = edge_utterances.setdefault(pair, {})
+            for key, text in _keyed(get_utterances(edge)).items():
+                keys.setdefault(key, text)
+        for pair, keys in edge_utterances.items():
+            _count(self.edges.setdefault(pair, _Counts()), keys)
+        return mapping
+
+    def extend(self, graphs: Iterable[Optional[Union[Graph, dict]]]) -> "ConsensusGraph":
+        """Fold every graph of `graphs` in order, skipping missing (None) ones, e.g. failed generations."""
+        for graph in graphs:
+            if graph is not None:
+                self.add(graph)
+        return self
+
+    @staticmethod
+    def _threshold(min_support: Union[int, float], total: int) -> float:
+        if isinstance(min_support, float):
+            if not 0 <= min_support <= 1:
+                raise ValueError(f"A float support threshold is a share in [0, 1], got {min_support}")
+            return min_support * total
+        return min_support
+
+    def graph(self, min_support: Union[int, float] = 1, min_utterance_support: Union[int, float] = 1) -> dict:
+        """
+        Graph dict of the consensus.
+
+        Parameters
+        ----------
+        min_support : int or float
+            Minimal number of graphs containing a node or an edge for it to be kept, or a share of
+            all graphs added when given as a float.
+        min_utterance_support : int or float
+            The same for the utterances of the kept nodes and edges, a float being a share of the
+            graphs containing the node or edge. Every entry keeps at least its most common utterance.
+
+        Returns
+        -------
+        dict
+            Graph dict with nodes and edges ordered by first appearance and utterances by support.
+            Every node and edge has its `support` count and `weight`, the share of graphs containing
+            it. A node is a start node when most graphs containing it start there or, if no node
+            qualifies, when it is the node most graphs start at.
+        """
+        node_threshold = self._threshold(min_support, self.graphs)
+        weight = 1 / self.graphs if self.graphs else 0.0
+
+        def entry(counts: _Counts) -> dict:
+            ranked = counts.utterances.most_common()
+            threshold = self._threshold(min_utterance_support, counts.support)
+            kept = [counts.texts[key] for key, support in ranked if support >= threshold]
+            if not kept and ranked:
+                kept = [counts.texts[ranked[0][0]]]
+            return {"utterances": kept, "support": counts.support, "weight": counts.support * weight}
+
+        nodes = []
+        for node_id, counts in self.nodes.items():
+            if counts.support >= node_threshold:
+                label = counts.labels.most_common(1)[0][0] if counts.labels else ""
+                nodes.append({"id": node_id, "label": label, "is_start": 2 * counts.starts > counts.support, **entry(counts)})
+        if nodes and not any(node["is_start"] for node in nodes):
+            best = max(nodes, key=lambda node: self.nodes[node["id"]].starts)
+            best["is_start"] = self.nodes[best["id"]].starts > 0
+
+        kept = {node["id"] for node in nodes}
+        edges = [
+            {"source": source, "target": target, **entry(counts)}
+            for (source, target), counts in self.edges.items()
+            if counts.support >= node_threshold and source in kept and target in kept
+        ]
+        return {"nodes": nodes, "edges": edges}
+
+    def to_graph(self, min_support: Union[int, float] = 1, min_utterance_support: Union[int, float] = 1, **kwargs) -> Graph:
+        return Graph(self.graph(min_support, min_utterance_support), **kwargs)
+
+
+@traced("consensus.aggregate")
+def aggregate_graphs(graphs: Iterable[Optional[Union[Graph, dict]]], min_support: Union[int, float] = 1, min_overlap: float = 0.0) -> dict:
+    """Consensus graph dict of `graphs`, see `ConsensusGraph`."""
+    return ConsensusGraph(min_overlap).extend(graphs).graph(min_support)
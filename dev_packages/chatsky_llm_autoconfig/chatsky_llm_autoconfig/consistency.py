@@ -0,0 +1,155 @@
+import json
+from dataclasses import dataclass, field
+from typing import Optional, Union
+
+from chatsky_llm_autoconfig.utils import get_utterances, normalize_utterance
+
+
+class GraphIndex:
+    """
+    Normalized-utterance lookup tables for a graph dict.
+
+    `nodes[text]` is the set of node ids whose utterances contain `text`,
+    `edges[text]` is the set of (source, target) pairs of edges that contain it.
+    """
+
+    def __init__(self, graph_dict: dict):
+        self.nodes: dict[str, set] = {}
+        self.edges: dict[str, set[tuple]] = {}
+        self.start_nodes = {node["id"] for node in graph_dict["nodes"] if node.get("is_start")}
+        for node in graph_dict["nodes"]:
+            for utterance in get_utterances(node):
+                self.nodes.setdefault(normalize_utterance(utterance), set()).add(node["id"])
+        for edge in graph_dict["edges"]:
+            for utterance in get_utterances(edge):
+                self.edges.setdefault(normalize_utterance(utterance), set()).add((edge["source"], edge["target"]))
+
+
+@dataclass
+class ConsistencyReport:
+    """
+    Result of replaying a dialogue against a graph.
+
+    Attributes
+    ----------
+    matches : list of dict
+        For every turn: its index, text, participant and the node ids or edges it matched (empty if none).
+    missing_utterances : list of dict
+        Turns whose text is found neither in nodes (assistant turns) nor in edges (user turns).
+    illegal_transitions : list of dict
+        Turns that are present in the graph but cannot be reached from the previous turn.
+    coverage : float
+        Share of turns found in the graph.
+    """
+
+    matches: list[dict] = field(default_factory=list)
+    missing_utterances: list[dict] = field(default_factory=list)
+    illegal_transitions: list[dict] = field(default_factory=list)
+    coverage: float = 0.0
+
+    @property
+    def all_utterances_present(self) -> bool:
+        return not self.missing_utterances
+
+    @property
+    def valid(self) -> bool:
+        return not self.missing_utterances and not self.illegal_transitions
+
+    @property
+    def decided(self) -> bool:
+        """
+        Exact matching is conclusive only when every turn was found: a missing utterance
+        may still be a paraphrase of a graph utterance, which only an LLM can judge.
+        """
+        return self.all_utterances_present
+
+    def as_dict(self) -> dict:
+        return {
+            "missing_utterances": self.missing_utterances,
+            "illegal_transitions": self.illegal_transitions,
+            "coverage": self.coverage,
+            "valid": self.valid,
+            "decided": self.decided,
+        }
+
+    def utterances_summary(self) -> str:
+        lines = []
+        for match in self.matches:
+            if not match["found"]:
+                lines.append(f"{match['text']} - not found")
+            elif match["participant"] == "user":
+                lines.append(f"{match['text']} - edge " + ", ".join(f"{s}->{t}" for s, t in sorted(match["found"])))
+            else:
+                lines.append(f"{match['text']} - node " + ", ".join(map(str, sorted(match["found"]))))
+        return "\n".join(lines)
+
+
+def _turns(dialogue) -> list[dict]:
+    if isinstance(dialogue, str):
+        dialogue = json.loads(dialogue)
+    return list(getattr(dialogue, "dialogue", dialogue))
+
+
+def _graph_dict(graph) -> dict:
+    if isinstance(graph, str):
+        return json.loads(graph)
+    return getattr(graph, "graph_dict", graph)
+
+
+def check_dialogue(dialogue, graph: Union[dict, str, object], index: Optional[GraphIndex] = None) -> ConsistencyReport:
+    """
+    Replay `dialogue` (turn dicts with "text" and "participant") over `graph`.
+
+    Assistant turns are matched to nodes and user turns to edges by normalized text.
+    The walk keeps the set of nodes the dialogue can currently be in, so ambiguous
+    utterances do not cause false alarms. After a missing or illegal turn the walk
+    re-synchronizes on the next turn that is found in the graph. The dialogue has to begin
+    on a start node, if the graph marks any; a first turn elsewhere is an illegal transition.
+    """
+    index = index or GraphIndex(_graph_dict(graph))
+    report = ConsistencyReport()
+    # None means "anywhere": after a turn we could not place, or at the start of a graph without start nodes
+    current: Optional[set] = set(index.start_nodes) or None
+    turns = _turns(dialogue)
+
+    for turn_idx, turn in enumerate(turns):
+        text = turn["text"]
+        participant = turn.get("participant", "")
+        key = normalize_utterance(text)
+        record = {"turn": turn_idx, "text": text, "participant": participant}
+
+        if participant == "user":
+            found = index.edges.get(key, set())
+            report.matches.append({**record, "found": found})
+            if not found:
+                report.missing_utterances.append(record)
+                current = None
+                continue
+            reachable = found if current is None else {edge for edge in found if edge[0] in current}
+            if not reachable:
+                report.illegal_transitions.append({**record, "from": sorted(current), "expected": sorted(found)})
+                reachable = found
+            current = {target for _, target in reachable}
+        else:
+            found = index.nodes.get(key, set())
+            report.matches.append({**record, "found": found})
+            if not found:
+                report.missing_utterances.append(record)
+                current = None
+                continue
+            reachable = found if current is None else found & current
+            if not reachable:
+                report.illegal_transitions.append({**record, "from": sorted(current), "expected": sorted(found)})
+                reachable = found
+            current = reachable
+
+    report.coverage = 1 - len(report.missing_utterances) / len(turns) if turns else 0.0
+    return report
+
+
+def try_check_dialogue(dialogue, graph) -> Optional[ConsistencyReport]:
+    """Like `check_dialogue`, but returns None when the dialogue or graph cannot be parsed."""
+    try:
+        return check_dialogue(dialogue, graph)
+    except (ValueError, TypeError, KeyError, AttributeError):
+        return None
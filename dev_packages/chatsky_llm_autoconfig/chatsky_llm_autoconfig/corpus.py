@@ -0,0 +1,465 @@
+"""
+Compact storage of large dialogue corpora.
+
+A `Dialogue` keeps every turn as a dict with two strings, which costs about a kilobyte per turn
+and makes loading a big corpus mostly a matter of allocating Python objects. A `DialogueCorpus`
+stores all turns of all dialogues in three arrays instead: the participant code of every turn
+(int8), the id of its text in a shared `Vocabulary` (int32, each distinct text is stored once) and
+the offset of every dialogue. `corpus[i]` is a `CompactDialogue` view, which builds the
+{"text", "participant"} dicts only when asked, e.g. for a prompt.
+
+`load_corpus` reads TSV and JSONL files through `mmap` in chunks and interns the raw bytes of every
+text, so each distinct text is decoded once. With `cache_dir` the parsed arrays are saved next to
+the corpus and later loads memory-map them, so opening a corpus costs nearly nothing however big it is:
+
+- TSV: one `participant<TAB>text` line per turn, dialogues separated by empty lines (the format
+  of `Dialogue.parse_string`);
+- JSONL: one dialogue per line, a list of turn dicts or an object with a "dialog" or "dialogue" list.
+
+    corpus = load_corpus("data/dialogues.tsv", cache_dir="data/dialogues.corpus")
+    len(corpus), corpus.turns
+    corpus[0].dialogue     # [{"text": ..., "participant": "assistant"}, ...]
+    str(corpus[0])         # "assistant: ...\\nuser: ..."
+"""
+
+import functools
+import json
+import mmap
+import operator
+import os
+import sys
+from array import array
+from typing import Iterable, Iterator, Optional, Union
+
+import numpy as np
+
+from chatsky_llm_autoconfig.dialogue import Dialogue
+from chatsky_llm_autoconfig.instrumentation import traced
+
+# the two participants of every dataset get fixed codes, others are numbered per corpus after them
+PARTICIPANTS = ("assistant", "user")
+CHUNK_SIZE = 1 << 24
+CORPUS_VERSION = 1
+
+
+class _MappedTexts:
+    """Read-only texts stored as one UTF-8 blob and the end offset of every text, decoded on access."""
+
+    def __init__(self, blob, ends: np.ndarray, cache_size: int = 1 << 16):
+        self.blob = blob
+        self.ends = ends
+        # most turns reuse a few frequent texts, which are then decoded once
+        self._get = functools.lru_cache(maxsize=cache_size)(self._decode)
+
+    def __len__(self) -> int:
+        return len(self.ends)
+
+    def _decode(self, text_id: int) -> str:
+        start = int(self.ends[text_id - 1]) if text_id > 0 else 0
+        return self.blob[start : int(self.ends[text_id])].decode("utf-8")  # noqa: E203
+
+    def __getitem__(self, text_id: int) -> str:
+        return self._get(text_id)
+
+    def __iter__(self) -> Iterator[str]:
+        return (self[text_id] for text_id in range(len(self)))
+
+    def nbytes(self) -> int:
+        return len(self.blob) + self.ends.nbytes
+
+
+class Vocabulary:
+    """
+    Interned texts: every distinct text gets an int id, in order of first occurrence.
+
+    A vocabulary loaded with `DialogueCorpus.load` reads its texts from the memory-mapped file and
+    builds the text -> id index only when new texts are interned into it.
+    """
+
+    def __init__(self, texts: Optional[_MappedTexts] = None):
+        self._texts = [] if texts is None else texts
+        self._ids = {} if texts is None else None
+
+    def __len__(self) -> int:
+        return len(self._texts)
+
+    def __getitem__(self, text_id: int) -> str:
+        return self._texts[text_id]
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._texts)
+
+    def texts(self, text_ids: Iterable[int]) -> list[str]:
+        return list(map(self._texts.__getitem__, text_ids))
+
+    def nbytes(self) -> int:
+        if isinstance(self._texts, _MappedTexts):
+            return self._texts.nbytes()
+        return sum(sys.getsizeof(text) for text in self._texts)
+
+    def _index(self) -> dict:
+        if self._ids is None:
+            self._texts = list(self._texts)
+            self._ids = {text: text_id for text_id, text in enumerate(self._texts)}
+        return self._ids
+
+    def intern(self, text: str) -> int:
+        ids = self._index()
+        text_id = ids.get(text)
+        if text_id is None:
+            text_id = ids[text] = len(self._texts)
+            self._texts.append(text)
+        return text_id
+
+    def intern_many(self, texts: list) -> list[int]:
+        """Ids of many texts; UTF-8 bytes are decoded once, the first time they are seen."""
+        ids = self._index()
+        for text in dict.fromkeys(texts):
+            if text not in ids:
+                ids[text] = self.intern(text.decode("utf-8") if isinstance(text, bytes) else text)
+        return list(map(ids.__getitem__, texts))
+
+
+class CompactDialogue:
+    """One dialogue of a `DialogueCorpus`: a view of its arrays with the read API of `Dialogue`."""
+
+    __slots__ = ("corpus", "index")
+
+    def __init__(self, corpus: "DialogueCorpus", index: int):
+        self.corpus = corpus
+        self.index = index
+
+    @property
+    def _span(self) -> slice:
+        return slice(int(self.corpus.offsets[self.index]), int(self.corpus.offsets[self.index + 1]))
+
+    @property
+    def participant_codes(self) -> np.ndarray:
+        return self.corpus.participant_codes[self._span]
+
+    @property
+    def text_ids(self) -> np.ndarray:
+        return self.corpus.text_ids[self._span]
+
+    def __len__(self) -> int:
+        return int(self.corpus.offsets[self.index + 1] - self.corpus.offsets[self.index])
+
+    def __iter__(self) -> Iterator[dict]:
+        span, names = self._span, self.corpus.participants
+        texts = self.corpus.vocabulary.texts(self.corpus.text_ids[span].tolist())
+        for code, text in zip(self.corpus.participant_codes[span].tolist(), texts):
+            yield {"text": text, "participant": names[code]}
+
+    def __getitem__(self, turn: int) -> dict:
+        code, text_id = self.participant_codes[turn], self.text_ids[turn]
+        return {"text": self.corpus.vocabulary[int(text_id)], "participant": self.corpus.participants[int(code)]}
+
+    @property
+    def dialogue(self) -> list[dict]:
+        """The turns as {"text", "participant"} dicts, like `Dialogue.dialogue`; built on every access."""
+        return list(self)
+
+    def to_dialogue(self) -> Dialogue:
+        return Dialogue(dialogue=self.dialogue)
+
+    def __str__(self):
+        return "\n".join(f"{turn['participant']}: {turn['text']}" for turn in self).strip()
+
+    def __repr__(self):
+        return f"CompactDialogue(index={self.index}, turns={len(self)})"
+
+
+class DialogueCorpus:
+    """
+    Dialogues stored as arrays, see the module docstring.
+
+    Attributes
+    ----------
+    participant_codes : np.ndarray
+        int8 participant code of every turn, an index into `participants`.
+    text_ids : np.ndarray
+        int32 id of the text of every turn in `vocabulary`.
+    offsets : np.ndarray
+        int64 index of the first turn of every dialogue, followed by the number of turns.
+    """
+
+    def __init__(self, participant_codes, text_ids, offsets, vocabulary: Vocabulary, participants: list[str]):
+        self.participant_codes = np.asanyarray(participant_codes, dtype=np.int8)
+        self.text_ids = np.asanyarray(text_ids, dtype=np.int32)
+        self.offsets = np.asanyarray(offsets, dtype=np.int64)
+        self.vocabulary = vocabulary
+        self.participants = participants
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def __getitem__(self, index: int) -> CompactDialogue:
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError(f"dialogue index {index} out of range for {len(self)} dialogues")
+        return CompactDialogue(self, index)
+
+    def __iter__(self) -> Iterator[CompactDialogue]:
+        return (CompactDialogue(self, index) for index in range(len(self)))
+
+    @property
+    def turns(self) -> int:
+        return len(self.text_ids)
+
+    def nbytes(self) -> int:
+        """Approximate memory of the corpus: the arrays plus the distinct texts."""
+        return self.participant_codes.nbytes + self.text_ids.nbytes + self.offsets.nbytes + self.vocabulary.nbytes()
+
+    def save(self, directory: str, source: Optional[dict] = None):
+        """
+        Save the corpus as `.npy` arrays and a UTF-8 text blob that `DialogueCorpus.load` maps back.
+
+        `source` describes the file the corpus was read from; `load_corpus` uses it to tell whether the saved corpus is still current.
+        """
+        os.makedirs(directory, exist_ok=True)
+        meta_path = os.path.join(directory, "corpus.json")
+        if os.path.exists(meta_path):
+            # an interrupted save must not leave the old metadata next to new arrays
+            os.remove(meta_path)
+        for name in ("participant_codes", "text_ids", "offsets"):
+            np.save(os.path.join(directory, f"{name}.npy"), getattr(self, name))
+        encoded = [text.encode("utf-8") for text in self.vocabulary]
+        with open(os.path.join(directory, "texts.bin"), "wb") as f:
+            f.write(b"".join(encoded))
+        np.save(os.path.join(directory, "text_ends.npy"), np.cumsum([len(text) for text in encoded], dtype=np.int64))
+        with open(meta_path, "w") as f:
+            json.dump({"version": CORPUS_VERSION, "participants": self.participants, "source": source}, f)
+
+    @classmethod
+    def load(cls, directory: str) -> "DialogueCorpus":
+        """Corpus saved with `save`, its arrays and texts memory-mapped rather than read."""
+        with open(os.path.join(directory, "corpus.json")) as f:
+            meta = json.load(f)
+        if meta.get("version") != CORPUS_VERSION:
+            raise ValueError(f"{directory} holds a corpus of version {meta.get('version')}, expected {CORPUS_VERSION}")
+        arrays = {
+            name: np.load(os.path.join(directory, f"{name}.npy"), mmap_mode="r") for name in ("participant_codes", "text_ids", "offsets", "text_ends")
+        }
+        blob_path = os.path.join(directory, "texts.bin")
+        blob = b""
+        if os.path.getsize(blob_path):
+            with open(blob_path, "rb") as f:
+                blob = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        vocabulary = Vocabulary(_MappedTexts(blob, arrays["text_ends"]))
+        return cls(arrays["participant_codes"], arrays["text_ids"], arrays["offsets"], vocabulary, meta["participants"])
+
+    @classmethod
+    def from_dialogues(cls, dialogues: Iterable, vocabulary: Optional[Vocabulary] = None) -> "DialogueCorpus":
+        """Corpus of `Dialogue` objects or lists of turn dicts, one dialogue each, even if empty."""
+        builder = _CorpusBuilder(vocabulary)
+        _add_dialogues(builder, [list(getattr(dialogue, "dialogue", dialogue)) for dialogue in dialogues])
+        return builder.build()
+
+
+class _CorpusBuilder:
+    def __init__(self, vocabulary: Optional[Vocabulary] = None):
+        self.vocabulary = vocabulary if vocabulary is not None else Vocabulary()
+        self.participants = list(PARTICIPANTS)
+        self._codes = {name: code for code, name in enumerate(PARTICIPANTS)}
+        self.participant_codes = array("b")
+        self.text_ids = array("i")
+        self.offsets = array("q", [0])
+
+    def _participant_code(self, name: Union[str, bytes]) -> int:
+        code = self._codes.get(name)
+        if code is None:
+            if len(self.participants) >= 127:
+                raise ValueError("A corpus supports at most 127 distinct participants")
+            decoded = name.decode("utf-8") if isinstance(name, bytes) else name
+            code = self._codes.get(decoded)
+            if code is None:
+                code = self._codes[decoded] = len(self.participants)
+                self.participants.append(decoded)
+            self._codes[name] = code
+        return code
+
+    def add_turns(self, participants: list, texts: list):
+        """Append turns given as parallel lists of participants and texts, str or UTF-8 bytes."""
+        codes = list(map(self._codes.get, participants))
+        if None in codes:
+            for name in dict.fromkeys(participants):
+                self._participant_code(name)
+            codes = list(map(self._codes.__getitem__, participants))
+        self.participant_codes.extend(codes)
+        self.text_ids.extend(self.vocabulary.intern_many(texts))
+
+    def end_dialogues(self, ends: Iterable[int], keep_empty: bool = False):
+        """Close dialogues after the given turn counts; without `keep_empty` repeated ends are dropped."""
+        for end in ends:
+            if keep_empty or end > self.offsets[-1]:
+                self.offsets.append(end)
+
+    def build(self) -> DialogueCorpus:
+        return DialogueCorpus(
+            np.frombuffer(self.participant_codes, dtype=np.int8) if self.participant_codes else np.zeros(0, dtype=np.int8),
+            np.frombuffer(self.text_ids, dtype=np.int32) if self.text_ids else np.zeros(0, dtype=np.int32),
+            np.frombuffer(self.offsets, dtype=np.int64),
+            self.vocabulary,
+            self.participants,
+        )
+
+
+_get_participant = operator.methodcaller("get", "participant", "")
+_get_text = operator.methodcaller("get", "text", "")
+
+
+def _add_dialogues(builder: _CorpusBuilder, dialogues: list[list[dict]]):
+    participants, texts, ends = [], [], []
+    total = len(builder.text_ids)
+    for turns in dialogues:
+        participants.extend(map(_get_participant, turns))
+        texts.extend(map(_get_text, turns))
+        total += len(turns)
+        ends.append(total)
+    builder.add_turns(participants, texts)
+    builder.end_dialogues(ends, keep_empty=True)
+
+
+def _chunks(path: str, chunk_size: int) -> Iterator[bytes]:
+    """Whole lines of a file read through mmap, about `chunk_size` bytes at a time, without the newline ending each chunk."""
+    if os.path.getsize(path) == 0:
+        return
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        start, size = 0, len(mm)
+        while start < size:
+            if start + chunk_size >= size:
+                end = size
+            else:
+                end = mm.rfind(b"\n", start, start + chunk_size)
+                if end < 0:
+                    # a line longer than a chunk is read whole
+                    end = mm.find(b"\n", start + chunk_size)
+                    end = size if end < 0 else end
+            yield mm[start:end]
+            start = end + 1
+
+
+def _load_tsv(path: str, builder: _CorpusBuilder, chunk_size: int):
+    for chunk in _chunks(path, chunk_size):
+        if b"\r" in chunk:
+            chunk = chunk.replace(b"\r\n", b"\n")
+        lines = chunk.split(b"\n")
+        turns = [line for line in lines if line]
+        # with exactly one tab per line, joining the lines gives participant, text, participant, text...
+        # (as many tabs as lines with a tab in every line means exactly one in each)
+        fields = b"\t".join(turns).split(b"\t")
+        if len(fields) != 2 * len(turns) or not all(b"\t" in line for line in turns):
+            fields = []
+            for line in turns:
+                participant, tab, text = line.partition(b"\t")
+                if not tab:
+                    raise ValueError(f"{path}: expected 'participant<TAB>text', got {line[:80]!r}")
+                fields += (participant, text)
+        # an empty line ends the dialogue of the turns before it
+        is_turn = np.fromiter(map(len, lines), dtype=np.int64, count=len(lines)) > 0
+        ends = len(builder.text_ids) + np.cumsum(is_turn)[~is_turn]
+        builder.add_turns(fields[0::2], fields[1::2])
+        builder.end_dialogues(ends.tolist())
+    builder.end_dialogues([len(builder.text_ids)])
+
+
+def _dialogue_turns(item, path: str) -> list[dict]:
+    turns = item.get("dialog", item.get("dialogue")) if isinstance(item, dict) else item
+    if not isinstance(turns, list):
+        raise ValueError(f"{path}: expected a list of turns or an object with a 'dialog' list, got {str(item)[:80]!r}")
+    return turns
+
+
+def _load_jsonl(path: str, builder: _CorpusBuilder, chunk_size: int):
+    for chunk in _chunks(path, chunk_size):
+        lines = [line for line in chunk.split(b"\n") if line.strip()]
+        # one parser call per chunk; a line holding several values or invalid JSON is found line by line
+        try:
+            items = json.loads(b"[" + b",".join(lines) + b"]")
+        except json.JSONDecodeError:
+            items = None
+        if items is None or len(items) != len(lines):
+            items = []
+            for line in lines:
+                try:
+                    items.append(json.loads(line))
+                except json.JSONDecodeError as e:
+                    raise ValueError(f"{path}: {e} in {line[:80]!r}") from e
+        _add_dialogues(builder, [_dialogue_turns(item, path) for item in items])
+
+
+def _source(path: str, format: str) -> dict:
+    stat = os.stat(path)
+    return {"path": os.path.abspath(path), "format": format, "size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+
+def _cached(cache_dir: str, source: dict) -> Optional[DialogueCorpus]:
+    try:
+        with open(os.path.join(cache_dir, "corpus.json")) as f:
+            meta = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if meta.get("version") != CORPUS_VERSION or meta.get("source") != source:
+        return None
+    return DialogueCorpus.load(cache_dir)
+
+
+@traced("corpus.load")
+def load_corpus(
+    path: str,
+    format: Optional[str] = None,
+    vocabulary: Optional[Vocabulary] = None,
+    chunk_size: int = CHUNK_SIZE,
+    cache_dir: Optional[str] = None,
+) -> DialogueCorpus:
+    """
+    Load a TSV or JSONL dialogue corpus, see the module docstring.
+
+    Parameters
+    ----------
+    path : str
+        The corpus file.
+    format : {"tsv", "jsonl"}, optional
+        By default taken from the file extension, ".tsv" or ".jsonl".
+    vocabulary : Vocabulary, optional
+        Vocabulary to intern the texts into, e.g. to share it between corpora.
+    chunk_size : int
+        Bytes of the memory-mapped file split into lines at once.
+    cache_dir : str, optional
+        Directory for the parsed corpus. If it holds the corpus of the current version of the file,
+        the corpus is memory-mapped from there instead of parsed; otherwise it is saved there.
+        Ignored with a shared `vocabulary`, whose ids depend on the other corpora.
+    """
+    format = format or os.path.splitext(path)[1].lstrip(".").lower()
+    loaders = {"tsv": _load_tsv, "jsonl": _load_jsonl}
+    if format not in loaders:
+        raise ValueError(f"Unknown corpus format {format!r}, expected one of {sorted(loaders)}")
+    use_cache = cache_dir is not None and vocabulary is None
+    if use_cache:
+        source = _source(path, format)
+        corpus = _cached(cache_dir, source)
+        if corpus is not None:
+            return corpus
+    builder = _CorpusBuilder(vocabulary)
+    loaders[format](path, builder, chunk_size)
+    corpus = builder.build()
+    if use_cache:
+        corpus.save(cache_dir, source)
+    return corpus
+
+
+def save_corpus(corpus: Union[DialogueCorpus, Iterable], path: str, format: Optional[str] = None):
+    """Write dialogues in the format `load_corpus` reads; tabs and newlines in TSV texts become spaces."""
+    format = format or os.path.splitext(path)[1].lstrip(".").lower()
+    dialogues = corpus if isinstance(corpus, DialogueCorpus) else DialogueCorpus.from_dialogues(corpus)
+    with open(path, "w", encoding="utf-8") as f:
+        for dialogue in dialogues:
+            if format == "jsonl":
+                f.write(json.dumps(dialogue.dialogue, ensure_ascii=False) + "\n")
+            elif format == "tsv":
+                for turn in dialogue:
+                    f.write(f"{turn['participant']}\t{' '.join(turn['text'].split())}\n")
+                f.write("\n")
+            else:
+                raise ValueError(f"Unknown corpus format {format!r}, expected 'jsonl' or 'tsv'")
@@ -0,0 +1,237 @@
+import hashlib
+import zlib
+from collections import OrderedDict
+from typing import Any, Callable, Iterable, Iterator, Optional
+
+import numpy as np
+
+from chatsky_llm_autoconfig.utils import get_utterances, normalize_utterance
+
+_MERSENNE_PRIME = (1 << 31) - 1
+
+
+def _digest(*parts: str) -> str:
+    h = hashlib.blake2b(digest_size=16)
+    for part in parts:
+        h.update(part.encode("utf-8"))
+        h.update(b"\x1f")
+    return h.hexdigest()
+
+
+def _dialogue_turns(dialogue) -> list[tuple[str, str]]:
+    """Turn a Dialogue, a list of turn dicts or a list of plain utterances into (participant, text) pairs."""
+    turns = getattr(dialogue, "dialogue", dialogue)
+    result = []
+    for turn in turns:
+        if isinstance(turn, dict):
+            result.append((str(turn.get("participant", "")), str(turn.get("text", ""))))
+        else:
+            result.append(("", str(turn)))
+    return result
+
+
+def dialogue_hash(dialogue) -> str:
+    """Exact hash of the dialogue turn sequence (participants and texts, in order)."""
+    return _digest(*(f"{participant}\x1e{text}" for participant, text in _dialogue_turns(dialogue)))
+
+
+def graph_hash(graph_dict: dict, iterations: int = 3) -> str:
+    """
+    Canonical hash of a graph dict in the `nodes`/`edges` format.
+
+    Weisfeiler-Lehman relabeling over normalized utterances: node ids, the order of nodes,
+    edges and utterances do not affect the result, so renumbered copies of the same graph collide.
+    """
+    labels = {}
+    for node in graph_dict["nodes"]:
+        utterances = sorted(normalize_utterance(u) for u in get_utterances(node))
+        labels[node["id"]] = _digest(str(bool(node.get("is_start", False))), *utterances)
+
+    edges = []
+    for edge in graph_dict["edges"]:
+        edge_label = _digest(*sorted(normalize_utterance(u) for u in get_utterances(edge)))
+        edges.append((edge["source"], edge["target"], edge_label))
+
+    for _ in range(iterations):
+        neighbourhoods = {node_id: [] for node_id in labels}
+        for source, target, edge_label in edges:
+            if source in neighbourhoods:
+                neighbourhoods[source].append(f">{edge_label}{labels.get(target, '')}")
+            if target in neighbourhoods:
+                neighbourhoods[target].append(f"<{edge_label}{labels.get(source, '')}")
+        labels = {node_id: _digest(labels[node_id], *sorted(neighbourhood)) for node_id, neighbourhood in neighbourhoods.items()}
+
+    triplets = sorted(f"{labels.get(source, '')}{edge_label}{labels.get(target, '')}" for source, target, edge_label in edges)
+    return _digest(*sorted(labels.values()), "|", *triplets)
+
+
+def dialogue_shingles(dialogue, size: int = 3) -> set[str]:
+    shingles = set()
+    for participant, text in _dialogue_turns(dialogue):
+        shingles.update(_word_shingles(f"{participant} {normalize_utterance(text)}", size))
+    return shingles
+
+
+def graph_shingles(graph_dict: dict, size: int = 3) -> set[str]:
+    shingles = set()
+    for node in graph_dict["nodes"]:
+        for utterance in get_utterances(node):
+            shingles.update(_word_shingles("n " + normalize_utterance(utterance), size))
+    for edge in graph_dict["edges"]:
+        for utterance in get_utterances(edge):
+            shingles.update(_word_shingles("e " + normalize_utterance(utterance), size))
+    return shingles
+
+
+def _word_shingles(text: str, size: int) -> list[str]:
+    words = text.split()
+    if len(words) <= size:
+        return [" ".join(words)]
+    return [" ".join(words[start:stop]) for start, stop in zip(range(len(words) - size + 1), range(size, len(words) + 1))]
+
+
+class MinHasher:
+    """
+    MinHash signatures with LSH banding for near-duplicate lookup.
+
+    Parameters
+    ----------
+    threshold : float
+        Estimated Jaccard similarity of shingle sets above which two items are near duplicates.
+    num_perm : int
+        Signature length. It is split into bands of rows so that the LSH S-curve is centred near `threshold`.
+    """
+
+    def __init__(self, threshold: float = 0.8, num_perm: int = 64, seed: int = 1):
+        if not 0 < threshold <= 1:
+            raise ValueError(f"threshold must be in (0, 1], got {threshold}")
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.bands, self.rows = self._optimal_bands(threshold, num_perm)
+        rng = np.random.default_rng(seed)
+        self._a = rng.integers(1, _MERSENNE_PRIME, size=num_perm, dtype=np.uint64)
+        self._b = rng.integers(0, _MERSENNE_PRIME, size=num_perm, dtype=np.uint64)
+
+    @staticmethod
+    def _optimal_bands(threshold: float, num_perm: int) -> tuple[int, int]:
+        best, best_error = (num_perm, 1), float("inf")
+        for rows in range(1, num_perm + 1):
+            if num_perm % rows:
+                continue
+            bands = num_perm // rows
+            error = abs((1 / bands) ** (1 / rows) - threshold)
+            if error < best_error:
+                best, best_error = (bands, rows), error
+        return best
+
+    def signature(self, shingles: Iterable[str]) -> np.ndarray:
+        hashes = np.fromiter((zlib.crc32(s.encode("utf-8")) & _MERSENNE_PRIME for s in shingles), dtype=np.uint64)
+        if hashes.size == 0:
+            return np.full(self.num_perm, _MERSENNE_PRIME, dtype=np.uint64)
+        permuted = (np.outer(hashes, self._a) + self._b) % _MERSENNE_PRIME
+        return permuted.min(axis=0)
+
+    def band_keys(self, signature: np.ndarray) -> list[bytes]:
+        rows = signature.reshape(self.bands, self.rows)
+        return [band.to_bytes(2, "little") + rows[band].tobytes() for band in range(self.bands)]
+
+    @staticmethod
+    def similarity(signature1: np.ndarray, signature2: np.ndarray) -> float:
+        return float(np.mean(signature1 == signature2))
+
+
+class Deduplicator:
+    """
+    Streaming deduplication stage for dialogues or graphs.
+
+    Exact duplicates are detected by `hash_fn` and, if `near_duplicate_threshold` is set,
+    near duplicates are detected with MinHash over `shingle_fn`. At most `max_entries` items
+    are remembered (oldest are forgotten first), so memory stays bounded on endless streams.
+
+    Examples
+    --------
+        dedup = Deduplicator.for_graphs(near_duplicate_threshold=0.9)
+        unique_graphs = list(dedup.filter(generated_graphs))
+    """
+
+    def __init__(
+        self,
+        hash_fn: Callable[[Any], str],
+        shingle_fn: Optional[Callable[[Any], set[str]]] = None,
+        near_duplicate_threshold: Optional[float] = None,
+        max_entries: Optional[int] = 100_000,
+        num_perm: int = 64,
+    ):
+        if near_duplicate_threshold is not None and shingle_fn is None:
+            raise ValueError("shingle_fn is required for near-duplicate detection")
+        self.hash_fn = hash_fn
+        self.shingle_fn = shingle_fn
+        self.max_entries = max_entries
+        self.minhasher = MinHasher(near_duplicate_threshold, num_perm) if near_duplicate_threshold is not None else None
+        self._seen: OrderedDict[str, Optional[np.ndarray]] = OrderedDict()
+        self._buckets: dict[bytes, set[str]] = {}
+        self.stats = {"seen": 0, "unique": 0, "exact_duplicates": 0, "near_duplicates": 0}
+
+    @classmethod
+    def for_dialogues(cls, **kwargs) -> "Deduplicator":
+        return cls(dialogue_hash, dialogue_shingles, **kwargs)
+
+    @classmethod
+    def for_graphs(cls, **kwargs) -> "Deduplicator":
+        return cls(graph_hash, graph_shingles, **kwargs)
+
+    def is_duplicate(self, item) -> bool:
+        """Check the item against everything remembered so far and remember it if it is new."""
+        self.stats["seen"] += 1
+        key = self.hash_fn(item)
+        if key in self._seen:
+            self._seen.move_to_end(key)
+            self.stats["exact_duplicates"] += 1
+            return True
+
+        signature = None
+        if self.minhasher is not None:
+            signature = self.minhasher.signature(self.shingle_fn(item))
+            candidates = set()
+            for band_key in self.minhasher.band_keys(signature):
+                candidates.update(self._buckets.get(band_key, ()))
+            for candidate in candidates:
+                if self.minhasher.similarity(signature, self._seen[candidate]) >= self.minhasher.threshold:
+                    self.stats["near_duplicates"] += 1
+                    return True
+
+        self._remember(key, signature)
+        self.stats["unique"] += 1
+        return False
+
+    def filter(self, items: Iterable) -> Iterator:
+        """Lazily yield only the items that are not duplicates of earlier ones."""
+        for item in items:
+            if not self.is_duplicate(item):
+                yield item
+
+    def _remember(self, key: str, signature: Optional[np.ndarray]):
+        self._seen[key] = signature
+        if signature is not None:
+            for band_key in self.minhasher.band_keys(signature):
+                self._buckets.setdefault(band_key, set()).add(key)
+        if self.max_entries is not None and len(self._seen) > self.max_entries:
+            self._forget(*self._seen.popitem(last=False))
+
+    def _forget(self, key: str, signature: Optional[np.ndarray]):
+        if signature is None:
+            return
+        for band_key in self.minhasher.band_keys(signature):
+            bucket = self._buckets.get(band_key)
+            if bucket is not None:
+                bucket.discard(key)
+                if not bucket:
+                    del self._buckets[band_key]
+
+
+def deduplicate_dialogues(dialogues: Iterable, near_duplicate_threshold: Optional[float] = None, **kwargs) -> Iterator:
+    return Deduplicator.for_dialogues(near_duplicate_threshold=near_duplicate_threshold, **kwargs).filter(dialogues)
+
+
+def deduplicate_graphs(graphs: Iterable[dict], near_duplicate_threshold: Optional[float] = None, **kwargs) -> Iterator[dict]:
+    return Deduplicator.for_graphs(near_duplicate_threshold=near_duplicate_threshold, **kwargs).filter(graphs)
@@ -1,7 +1,6 @@
 from pydantic import BaseModel
 from typing import Optional, Any, Union
 import json
-import matplotlib.pyplot as plt
 import abc
 import logging
 logger = logging.getLogger(__name__)
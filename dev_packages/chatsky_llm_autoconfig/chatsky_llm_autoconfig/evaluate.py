@@ -1,19 +1,31 @@
 import json
 import os
 import numpy as np
-import matplotlib.pyplot as plt
 import networkx as nx
-from langchain.chat_models import ChatOpenAI
-from dotenv import load_dotenv
-from chatsky_llm_autoconfig.model import DialogModel
 from chatsky_llm_autoconfig.graph import Graph, TYPES_OF_GRAPH
+from chatsky_llm_autoconfig.graph_stats import CorpusStats
+from chatsky_llm_autoconfig.instrumentation import traced
+from chatsky_llm_autoconfig.metrics.fuzzy import fuzzy_edges, fuzzy_nodes
 from chatsky_llm_autoconfig.metrics.jaccard import jaccard_edges, jaccard_nodes
 from chatsky_llm_autoconfig.metrics.triplet_matching import triplet_match
+from chatsky_llm_autoconfig.render import layout
+from chatsky_llm_autoconfig.utils import load_env
+from chatsky_llm_autoconfig.validation import is_valid_graph, validate_graph
 
-load_dotenv()
+# bump whenever calculate_metrics or the metric functions change, cached results of older versions are ignored
+METRICS_VERSION = 2
 
-# Initialize DialogModel
-dialog_model = DialogModel()
+_dialog_model = None
+
+
+def get_dialog_model():
+    """The shared `DialogModel`, created on first use so that importing this module stays cheap."""
+    global _dialog_model
+    if _dialog_model is None:
+        from chatsky_llm_autoconfig.model import DialogModel
+
+        _dialog_model = DialogModel()
+    return _dialog_model
 
 
 def load_dialogues(file_path):
@@ -21,14 +33,42 @@ def load_dialogues(file_path):
         return json.load(f)
 
 
-def generate_graph(dialogue, model_name):
-    return json.loads(
-        dialog_model.create_graph(
-            dialogue, model=ChatOpenAI(model=model_name, api_key=os.getenv("OPENAI_API_KEY"), base_url=os.getenv("OPENAI_BASE_URL"), temperature=0)
-        )
-    )
-
-
+@traced("llm.generate_graph")
+def generate_graph(dialogue, model_name, retries=2, output_format="json", repair=False):
+    """
+    Generate a graph for `dialogue`, retrying invalid answers up to `retries` times.
+
+    By default every retry regenerates the whole graph. With `repair`, the first answer that parses is
+    checked against the structure rules and the dialogue and only its failing part is re-prompted,
+    for at most `retries` rounds (see `repair.repair_graph`).
+    """
+    from langchain_openai import ChatOpenAI
+
+    load_env()
+    model = ChatOpenAI(model=model_name, api_key=os.getenv("OPENAI_API_KEY"), base_url=os.getenv("OPENAI_BASE_URL"), temperature=0)
+    graph = None
+    for attempt in range(retries + 1):
+        raw_graph = get_dialog_model().create_graph(dialogue, model=model, output_format=output_format)
+        if raw_graph is None:
+            continue
+        # reject broken outputs right away instead of finding out in calculate_metrics
+        errors = validate_graph(raw_graph)
+        if repair and (not errors or errors[0].code != "json") and isinstance(json.loads(raw_graph), dict):
+            from chatsky_llm_autoconfig.repair import repair_graph
+
+            result = repair_graph(raw_graph, dialogue, model, max_rounds=retries - attempt)
+            if not result.valid:
+                print(f"Graph still has problems after {result.stats['llm_calls']} repair rounds: {result.problems.as_dict()}")
+            return result.graph_dict
+        if not errors:
+            return json.loads(raw_graph)
+        print(f"Invalid graph on attempt {attempt + 1}: {errors[0].code}: {errors[0].message}")
+        if errors[0].code != "json":
+            graph = json.loads(raw_graph)
+    return graph
+
+
+@traced("metrics.calculate")
 def calculate_metrics(generated_graph, target_graph):
     true_graph = Graph(target_graph, TYPES_OF_GRAPH.MULTI)
     gen_graph = Graph(generated_graph, TYPES_OF_GRAPH.MULTI)
@@ -37,6 +77,10 @@ def calculate_metrics(generated_graph, target_graph):
     edge_similarity, _ = jaccard_edges(true_graph.nx_graph.edges(data=True), gen_graph.nx_graph.edges(data=True))
     node_similarity, _ = jaccard_nodes(true_graph.nx_graph.nodes(data=True), gen_graph.nx_graph.nodes(data=True))
 
+    # Soft similarity, tolerant to typography and rephrasing (uses the vector store set with metrics.fuzzy.set_vector_store)
+    fuzzy_edge_similarity, _ = fuzzy_edges(true_graph.nx_graph.edges(data=True), gen_graph.nx_graph.edges(data=True))
+    fuzzy_node_similarity, _ = fuzzy_nodes(true_graph.nx_graph.nodes(data=True), gen_graph.nx_graph.nodes(data=True))
+
     # Calculate Triplet Match Accuracy
     node_mapping, edge_mapping = triplet_match(true_graph, gen_graph)
 
@@ -55,12 +99,34 @@ def calculate_metrics(generated_graph, target_graph):
     return {
         "Jaccard Edge Similarity": edge_similarity,
         "Jaccard Node Similarity": node_similarity,
+        "Fuzzy Edge Similarity": fuzzy_edge_similarity,
+        "Fuzzy Node Similarity": fuzzy_node_similarity,
         "Triplet Match Accuracy": triplet_match_accuracy,
         "Node Accuracy": node_accuracy,
         "Edge Accuracy": edge_accuracy,
     }
 
 
+def evaluate_pair(generated_graph, target_graph, idx=None, cache=None):
+    """
+    Metrics for one generated graph, zero metrics if it is missing or invalid.
+
+    With a `metric_cache.MetricCache` passed as `cache`, metrics of pairs seen before are not recomputed.
+    """
+    errors = validate_graph(generated_graph, require_start=False, check_reachability=False) if generated_graph is not None else []
+    if generated_graph is None or errors:
+        print(f"Invalid graph for dialogue {idx}: {errors}")
+        return {"Triplet Match Accuracy": 0, "Node Accuracy": 0, "Edge Accuracy": 0}
+    try:
+        if cache is not None:
+            return cache.get_or_compute(generated_graph, target_graph, calculate_metrics)
+        return calculate_metrics(generated_graph, target_graph)
+    except Exception as e:
+        print(f"Invalid graph for dialogue {idx}")
+        print(e)
+        return {"Triplet Match Accuracy": 0, "Node Accuracy": 0, "Edge Accuracy": 0}
+
+
 def has_cycle(graph):
     try:
         nx.find_cycle(graph)
@@ -70,13 +136,18 @@ def has_cycle(graph):
 
 
 def visualize_graph(graph, title):
+    import matplotlib.pyplot as plt
+
     G = nx.DiGraph()
     for node in graph["nodes"]:
         G.add_node(node["id"], label=node["label"])
     for edge in graph["edges"]:
         G.add_edge(edge["source"], edge["target"], label=edge["utterances"])
 
-    pos = nx.kamada_kawai_layout(G)
+    pos = layout(graph)
+    if len(pos) < len(G):
+        # edges to nodes missing from the node list, which the layout leaves out
+        pos = nx.kamada_kawai_layout(G)
     nx.draw(G, pos, with_labels=False, node_color="lightblue", node_size=500, font_size=8, arrows=True)
     edge_labels = nx.get_edge_attributes(G, "label")
     node_labels = nx.get_node_attributes(G, "label")
@@ -87,7 +158,10 @@ def visualize_graph(graph, title):
     plt.axis("off")
 
 
+@traced("plot.comparison")
 def save_graph_comparison(target_graph, generated_graph, output_path):
+    import matplotlib.pyplot as plt
+
     plt.figure(figsize=(20, 10))
     plt.subplot(121)
     visualize_graph(target_graph, "Target Graph")
@@ -121,26 +195,21 @@ def evaluate_model(input_json_path, output_directory, model_name):
     os.makedirs(output_directory, exist_ok=True)
 
     dialogues = load_dialogues(input_json_path)
-    all_metrics = {}
+    all_metrics, generated_graphs = {}, {}
 
     for idx, dialogue in enumerate(dialogues):
         sample_dialogue = dialogue["dialog"]
         target_graph = dialogue["target_graph"]
 
-        generated_graph = generate_graph(sample_dialogue)
-
-        try:
-            metrics = calculate_metrics(generated_graph, target_graph)
-        except Exception as e:
-            metrics = {"Triplet Match Accuracy": 0, "Node Accuracy": 0, "Edge Accuracy": 0}
-            print(f"Invalid graph for dialogue {idx}")
-            print(e)
+        generated_graph = generate_graph(sample_dialogue, model_name)
+        generated_graphs[idx] = generated_graph
+        all_metrics[idx] = evaluate_pair(generated_graph, target_graph, idx)
 
-        all_metrics[idx] = metrics
-
-        save_graph_comparison(target_graph, generated_graph, f"{output_directory}/graph_comparison_{idx}.png")
+        if generated_graph is not None and is_valid_graph(generated_graph, require_start=False, check_reachability=False):
+            save_graph_comparison(target_graph, generated_graph, f"{output_directory}/graph_comparison_{idx}.png")
 
     save_metrics(all_metrics, f"{output_directory}/all_metrics.json")
+    save_metrics(generated_graphs, f"{output_directory}/generated_graphs.json")
 
     mean_metrics = calculate_mean_metrics(all_metrics)
     save_mean_metrics(mean_metrics, f"{output_directory}/mean_metrics.txt")
@@ -148,6 +217,25 @@ def evaluate_model(input_json_path, output_directory, model_name):
     return f"{output_directory}/mean_metrics.txt"
 
 
+def rescore(input_json_path, results_directory, cache=None):
+    """
+    Recompute `all_metrics.json` and `mean_metrics.txt` from the `generated_graphs.json` of a finished run.
+
+    Together with a `MetricCache` this makes rescoring old sweeps cheap when the metric code did not change.
+    """
+    dialogues = load_dialogues(input_json_path)
+    with open(f"{results_directory}/generated_graphs.json", "r") as f:
+        generated_graphs = json.load(f)
+
+    all_metrics = {}
+    for idx, dialogue in enumerate(dialogues):
+        all_metrics[idx] = evaluate_pair(generated_graphs.get(str(idx)), dialogue["target_graph"], idx, cache)
+
+    save_metrics(all_metrics, f"{results_directory}/all_metrics.json")
+    save_mean_metrics(calculate_mean_metrics(all_metrics), f"{results_directory}/mean_metrics.txt")
+    return all_metrics
+
+
 def calculate_text_to_utterance_percentage(dialogue_graph_pair):
     dialogue = dialogue_graph_pair["dialog"]
     graph = dialogue_graph_pair["graph"]
@@ -173,52 +261,15 @@ def calculate_text_to_utterance_percentage(dialogue_graph_pair):
 
 
 def evaluate_generation(input_json_path, output_directory):
+    """
+    Corpus statistics of generated dialogue-graph pairs, saved to `generation_metrics.json`.
+
+    Besides graph sizes, cycles and dialogue coverage the report has strongly connected components,
+    reachability from start nodes, dead ends, branching factor and degree histograms, see `graph_stats`.
+    """
     os.makedirs(output_directory, exist_ok=True)
     data = load_dialogues(input_json_path)
-    all_metrics = {
-        "with_cycles": 0,
-        "average_edges_amount": 0,
-        "average_nodes_amount": 0,
-        "total_graphs": 0,
-        "total_edges": 0,
-        "total_nodes": 0,
-        "text_to_utterance_percentage": 0,
-    }
-
-    for _, dialogue in enumerate(data):
-        gen_graph = dialogue["graph"]
-
-        # Convert to NetworkX graph for analysis
-        nx_graph = Graph(gen_graph, TYPES_OF_GRAPH.MULTI).nx_graph
-
-        # Check for cycles
-        cycle = has_cycle(nx_graph)
-        if cycle:
-            all_metrics["with_cycles"] += 1
-
-        # Count edges and nodes
-        num_edges = nx_graph.number_of_edges()
-        num_nodes = nx_graph.number_of_nodes()
-
-        all_metrics["total_edges"] += num_edges
-        all_metrics["total_nodes"] += num_nodes
-        all_metrics["total_graphs"] += 1
-
-        # Calculate text to utterance percentage
-        percentage = calculate_text_to_utterance_percentage(dialogue)
-        all_metrics["text_to_utterance_percentage"] += percentage
-
-    # Calculate averages
-    if all_metrics["total_graphs"] > 0:
-        all_metrics["average_edges_amount"] = all_metrics["total_edges"] / all_metrics["total_graphs"]
-        all_metrics["average_nodes_amount"] = all_metrics["total_nodes"] / all_metrics["total_graphs"]
-
-    # Add percentage of graphs with cycles
-    all_metrics["percentage_with_cycles"] = (all_metrics["with_cycles"] / all_metrics["total_graphs"]) * 100 if all_metrics["total_graphs"] > 0 else 0
-
-    # Calculate average text to utterance percentage
-    if all_metrics["total_graphs"] > 0:
-        all_metrics["text_to_utterance_percentage"] = all_metrics["text_to_utterance_percentage"] / all_metrics["total_graphs"]
+    all_metrics = CorpusStats.from_items(data).summary()
 
     # Save metrics to file
     with open(os.path.join(output_directory, "generation_metrics.json"), "w") as f:
@@ -0,0 +1,281 @@
+import asyncio
+import json
+import logging
+import os
+import time
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Iterable, Iterator, Optional
+
+from chatsky_llm_autoconfig.dedup import Deduplicator
+from chatsky_llm_autoconfig.sample_dialogue import dialogues_from_graph
+from chatsky_llm_autoconfig.validation import GraphValidationError, ensure_valid_graph
+
+logger = logging.getLogger(__name__)
+
+_DONE = object()
+
+StageFn = Callable[[Any], Awaitable[Optional[Iterable[Any]]]]
+
+
+@dataclass
+class StageStats:
+    name: str
+    received: int = 0
+    emitted: int = 0
+    failed: int = 0
+    busy_seconds: float = 0.0
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+
+    @property
+    def throughput(self) -> float:
+        """Items received per second of stage wall time."""
+        if self.started_at is None:
+            return 0.0
+        elapsed = (self.finished_at or time.perf_counter()) - self.started_at
+        return self.received / elapsed if elapsed > 0 else 0.0
+
+    def as_dict(self) -> dict:
+        return {
+            "received": self.received,
+            "emitted": self.emitted,
+            "failed": self.failed,
+            "busy_seconds": round(self.busy_seconds, 3),
+            "throughput": round(self.throughput, 3),
+        }
+
+
+@dataclass
+class Stage:
+    """
+    One step of a `Pipeline`.
+
+    `fn` is awaited once per input item and returns an iterable of output items
+    (empty or None drops the item, several items fan out). Up to `concurrency`
+    items are processed at once.
+    """
+
+    name: str
+    fn: StageFn
+    concurrency: int = 1
+    stats: StageStats = field(init=False)
+
+    def __post_init__(self):
+        self.stats = StageStats(self.name)
+
+
+class Pipeline:
+    """
+    Stages connected by bounded asyncio queues.
+
+    A full queue blocks the upstream workers (backpressure), so slow stages never
+    accumulate unbounded work, and each stage overlaps its own I/O latency up to its
+    `concurrency`. A failing item is logged and counted, the rest of the run goes on.
+    """
+
+    def __init__(self, stages: list[Stage], queue_size: int = 16):
+        if not stages:
+            raise ValueError("Pipeline needs at least one stage")
+        self.stages = stages
+        self.queue_size = queue_size
+
+    @property
+    def stats(self) -> dict[str, dict]:
+        return {stage.name: stage.stats.as_dict() for stage in self.stages}
+
+    async def run(self, items: Iterable[Any]) -> dict[str, dict]:
+        queues = [asyncio.Queue(maxsize=self.queue_size) for _ in self.stages]
+        workers = []
+        for idx, stage in enumerate(self.stages):
+            output = queues[idx + 1] if idx + 1 < len(queues) else None
+            workers.append(asyncio.gather(*(self._worker(stage, queues[idx], output) for _ in range(stage.concurrency))))
+
+        async def feed():
+            for item in items:
+                await queues[0].put(item)
+            for _ in range(self.stages[0].concurrency):
+                await queues[0].put(_DONE)
+
+        async def close(idx: int):
+            await workers[idx]
+            self.stages[idx].stats.finished_at = time.perf_counter()
+            if idx + 1 < len(self.stages):
+                for _ in range(self.stages[idx + 1].concurrency):
+                    await queues[idx + 1].put(_DONE)
+
+        await asyncio.gather(feed(), *(close(idx) for idx in range(len(self.stages))))
+        return self.stats
+
+    async def _worker(self, stage: Stage, input_queue: asyncio.Queue, output_queue: Optional[asyncio.Queue]):
+        stats = stage.stats
+        while True:
+            item = await input_queue.get()
+            if item is _DONE:
+                return
+            if stats.started_at is None:
+                stats.started_at = time.perf_counter()
+            stats.received += 1
+            start = time.perf_counter()
+            try:
+                results = await stage.fn(item) or []
+            except Exception as e:
+                stats.failed += 1
+                logger.warning(f"Stage {stage.name} failed on an item: {e!r}")
+                continue
+            finally:
+                stats.busy_seconds += time.perf_counter() - start
+            for result in results:
+                stats.emitted += 1
+                if output_queue is not None:
+                    await output_queue.put(result)
+
+
+class JsonlWriter:
+    """Appends records to a JSONL file one by one, so an interrupted run keeps everything written so far."""
+
+    def __init__(self, path: str):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def records(self) -> Iterator[dict]:
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    yield json.loads(line)
+                except json.JSONDecodeError:
+                    # a line cut short by an interrupted run
+                    continue
+
+    def completed_keys(self, key_fields: tuple[str, ...]) -> set[tuple]:
+        return {tuple(record.get(key) for key in key_fields) for record in self.records()}
+
+    def write(self, record: dict):
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+
+def make_graph_templates(template_data: list[dict]) -> list[dict]:
+    """Take the first target graph of every `samping_method` and pair it with an empty copy of itself."""
+    templates = {}
+    for item in template_data:
+        graph_type = item["samping_method"]
+        if graph_type in templates:
+            continue
+        target = item["target_graph"]
+        empty = {
+            "nodes": [{**node, "utterances": [], "label": ""} for node in target["nodes"]],
+            "edges": [{**edge, "utterances": []} for edge in target["edges"]],
+        }
+        templates[graph_type] = {"graph_type": graph_type, "target": target, "empty": empty}
+    return list(templates.values())
+
+
+async def ainvoke_json(model, prompt, retries: int) -> dict:
+    """Call `model.ainvoke` until the response parses as JSON."""
+    for attempt in range(retries + 1):
+        result = await model.ainvoke(prompt)
+        try:
+            return json.loads(result.content)
+        except json.JSONDecodeError:
+            logger.info(f"Invalid JSON response, attempt {attempt + 1} of {retries + 1}")
+    raise ValueError(f"No valid JSON after {retries + 1} attempts")
+
+
+def build_generation_pipeline(
+    model,
+    generation_prompt,
+    augmentation_prompt,
+    output_path: str,
+    themes: Iterable[str],
+    variants_per_theme: int = 5,
+    dialogues_per_graph: int = 1,
+    retries: int = 5,
+    llm_concurrency: int = 8,
+    near_duplicate_threshold: Optional[float] = 0.9,
+    queue_size: int = 16,
+    resume: bool = True,
+) -> Pipeline:
+    """
+    Build the template -> generate -> augment -> validate -> sample -> write pipeline.
+
+    `model` is anything with langchain's `ainvoke`, the prompts are templates with
+    `SCHEMA`/`TARGET` and `THEME`/`graph` variables respectively. Every sampled dialogue
+    is appended to `output_path` as a JSONL record as soon as it is ready. Jobs dropped as
+    invalid graphs or duplicates are recorded with their reason in `<output_path>.skipped.jsonl`.
+    With `resume` the (graph_type, theme, variant) combinations found in either file are not
+    generated again, and the deduplicators start from the graphs and dialogues already written.
+    Jobs that failed for other reasons (e.g. no valid JSON from the model) are retried.
+    """
+    themes = sorted(themes)
+    key_fields = ("graph_type", "theme", "variant")
+    writer = JsonlWriter(output_path)
+    skipped = JsonlWriter(output_path + ".skipped.jsonl")
+    graph_dedup = Deduplicator.for_graphs(near_duplicate_threshold=near_duplicate_threshold)
+    dialogue_dedup = Deduplicator.for_dialogues()
+    completed = set()
+    if resume:
+        completed = skipped.completed_keys(key_fields)
+        for record in writer.records():
+            completed.add(tuple(record.get(key) for key in key_fields))
+            graph_dedup.is_duplicate(record["graph"])
+            dialogue_dedup.is_duplicate(record["dialogue_list"])
+
+    def skip(job: dict, reason: str):
+        skipped.write({**{key: job[key] for key in key_fields}, "reason": reason})
+
+    def pending_jobs(graph_type: str) -> list[tuple[str, int]]:
+        return [(t, v) for t in themes for v in range(variants_per_theme) if (graph_type, t, v) not in completed]
+
+    async def select_template(template: dict):
+        if not pending_jobs(template["graph_type"]):
+            return []
+        return [template]
+
+    async def generate(template: dict):
+        prompt = generation_prompt.format(SCHEMA=template["empty"], TARGET=template["target"])
+        graph = await ainvoke_json(model, prompt, retries)
+        graph_type = template["graph_type"]
+        return [{"graph_type": graph_type, "theme": t, "variant": v, "graph": graph} for t, v in pending_jobs(graph_type)]
+
+    async def augment(job: dict):
+        graph = await ainvoke_json(model, augmentation_prompt.format(THEME=job["theme"], graph=job["graph"]), retries)
+        return [{**job, "graph": graph}]
+
+    async def validate(job: dict):
+        try:
+            ensure_valid_graph(job["graph"])
+        except GraphValidationError:
+            skip(job, "invalid_graph")
+            raise
+        if graph_dedup.is_duplicate(job["graph"]):
+            skip(job, "duplicate_graph")
+            return []
+        return [job]
+
+    async def sample(job: dict):
+        records = []
+        for _ in range(dialogues_per_graph):
+            dialogue_str, dialogue_list = dialogues_from_graph(job["graph"], include_readable=True)
+            if not dialogue_dedup.is_duplicate(dialogue_list):
+                records.append({**job, "dialogue_str": dialogue_str, "dialogue_list": dialogue_list})
+        if not records:
+            skip(job, "duplicate_dialogue")
+        return records
+
+    async def write(record: dict):
+        writer.write(record)
+        return [record]
+
+    stages = [
+        Stage("template", select_template),
+        Stage("generate", generate, concurrency=llm_concurrency),
+        Stage("augment", augment, concurrency=llm_concurrency),
+        Stage("validate", validate),
+        Stage("sample", sample),
+        Stage("write", write),
+    ]
+    return Pipeline(stages, queue_size=queue_size)
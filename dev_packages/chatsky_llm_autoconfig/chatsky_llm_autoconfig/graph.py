@@ -2,12 +2,14 @@ from enum import Enum
 import networkx as nx
 from pydantic import BaseModel
 from typing import Optional, Any, Union
-import json
-import matplotlib.pyplot as plt
 import abc
 import logging
+
+from chatsky_llm_autoconfig.instrumentation import traced
+
 logger = logging.getLogger(__name__)
 
+
 class TYPES_OF_GRAPH(Enum):
     DI = 1  # if we do not allow multiedges
     MULTI = 2  # if we allow multiedges
@@ -16,7 +18,7 @@ class TYPES_OF_GRAPH(Enum):
 class BaseGraph(BaseModel, abc.ABC):
     graph_dict: dict
     graph: Optional[nx.Graph] = None
-    graph_type: Union[1, 2] = 1
+    graph_type: Union[TYPES_OF_GRAPH, int] = 1
     node_mapping: Optional[dict] = None
 
     class Config:
@@ -30,12 +32,20 @@ class BaseGraph(BaseModel, abc.ABC):
     def visualise(self, *args, **kwargs):
         raise NotImplementedError
 
+
 class Graph(BaseGraph):
 
-    def __init__(self, graph_dict: dict, **kwargs: Any):
+    def __init__(self, graph_dict: dict, graph_type: Optional[TYPES_OF_GRAPH] = None, **kwargs: Any):
+        if graph_type is not None:
+            kwargs["graph_type"] = graph_type
         super().__init__(graph_dict=graph_dict, **kwargs)  # Pass graph_dict to the parent class
         self.load_graph()
 
+    @property
+    def nx_graph(self):
+        return self.graph
+
+    @traced("graph.load")
     def load_graph(self):
         self.graph = nx.MultiDiGraph() if self.graph_type == TYPES_OF_GRAPH.MULTI else nx.DiGraph()
         nodes = sorted([v["id"] for v in self.graph_dict["nodes"]])
@@ -47,7 +57,6 @@ class Graph(BaseGraph):
             self.node_mapping = {node_id: idx + 1 for idx, node_id in enumerate(nodes)}
         logging.debug(f"Renumber flag: {renumber_flg}")
 
-
         for node in self.graph_dict["nodes"]:
             cur_node_id = node["id"]
             if renumber_flg:
@@ -64,8 +73,11 @@ class Graph(BaseGraph):
             source = self.node_mapping.get(link["source"], link["source"])
             target = self.node_mapping.get(link["target"], link["target"])
             self.graph.add_edges_from([(source, target, {"theme": link.get("theme"), "utterances": link["utterances"]})])
-        
+
+    @traced("plot.graph")
     def visualise(self, *args, **kwargs):
+        import matplotlib.pyplot as plt
+
         pos = nx.kamada_kawai_layout(self.graph)
         nx.draw(self.graph, pos, with_labels=False, node_color="lightblue", node_size=500, font_size=8, arrows=True)
         edge_labels = nx.get_edge_attributes(self.graph, "label")
@@ -76,9 +88,3 @@ class Graph(BaseGraph):
         plt.title(__name__)
         plt.axis("off")
         plt.show()
-
-if __name__=="__main__":
-    with open('/home/askatasuna/Документы/DeepPavlov/chatsky-llm-autoconfig/data/data.json') as f:
-        d = json.load(f)
-    g = Graph(d[0]["target_graph"])
-    # g.visualise()
\ No newline at end of file
@@ -0,0 +1,284 @@
+"""
+Structural diff of a predicted graph against its target graph.
+
+Given a node mapping (target node id -> predicted node id or None), e.g. the one of `triplet_match`,
+the diff lists what the prediction got wrong, with the utterances involved:
+
+- missing / extra nodes and edges: target entries without a counterpart and predicted entries nothing maps to;
+- split nodes and edges: target entries whose utterances are spread over several predicted entries;
+- merged nodes and edges: predicted entries holding the utterances of several target entries;
+- changed nodes and edges: mapped pairs whose utterance sets differ.
+
+Utterances are compared after `utils.normalize_utterance`. Everything is computed through
+inverted utterance indexes, so the cost is linear in the size of both graphs. When no mapping is
+given, each target node is mapped to the predicted node sharing most of its utterances.
+
+Examples
+--------
+    diff = diff_graphs(target_graph, predicted_graph)
+    diff.counts()   # {"missing_nodes": 0, "split_nodes": 1, ...}
+    json.dump(diff.as_dict(), f)
+    aggregate_diffs(diffs)["pairs_with_error"]["split_nodes"]
+"""
+
+from collections import Counter
+from dataclasses import dataclass, field, fields
+from typing import Iterable, Optional, Union
+
+from chatsky_llm_autoconfig.instrumentation import traced
+from chatsky_llm_autoconfig.utils import get_utterances, normalize_utterance
+
+ERROR_TYPES = (
+    "missing_nodes",
+    "extra_nodes",
+    "split_nodes",
+    "merged_nodes",
+    "changed_nodes",
+    "missing_edges",
+    "extra_edges",
+    "split_edges",
+    "merged_edges",
+    "changed_edges",
+)
+
+
+@dataclass
+class GraphDiff:
+    """
+    Differences between a predicted graph and the target graph, see the module docstring.
+
+    Every error list holds JSON-ready dicts. Node ids are the ids of the graph dicts, edges are
+    "source->target" keys with the utterances of all parallel edges between the two nodes.
+    """
+
+    node_mapping: dict
+    missing_nodes: list = field(default_factory=list)
+    extra_nodes: list = field(default_factory=list)
+    split_nodes: list = field(default_factory=list)
+    merged_nodes: list = field(default_factory=list)
+    changed_nodes: list = field(default_factory=list)
+    missing_edges: list = field(default_factory=list)
+    extra_edges: list = field(default_factory=list)
+    split_edges: list = field(default_factory=list)
+    merged_edges: list = field(default_factory=list)
+    changed_edges: list = field(default_factory=list)
+
+    def counts(self) -> dict:
+        return {name: len(getattr(self, name)) for name in ERROR_TYPES}
+
+    @property
+    def is_exact(self) -> bool:
+        return not any(getattr(self, name) for name in ERROR_TYPES)
+
+    def as_dict(self) -> dict:
+        result = {f.name: getattr(self, f.name) for f in fields(self)}
+        result["node_mapping"] = {str(k): v for k, v in self.node_mapping.items()}
+        result["counts"] = self.counts()
+        return result
+
+
+def _edge_key(source, target) -> str:
+    return f"{source}->{target}"
+
+
+def _nodes(graph: dict) -> dict:
+    """Node id -> {normalized utterance: original utterance}, including nodes only mentioned by edges."""
+    nodes = {}
+    for node in graph.get("nodes", []):
+        entry = nodes.setdefault(node["id"], {})
+        for utterance in get_utterances(node):
+            entry.setdefault(normalize_utterance(utterance), utterance)
+    for edge in graph.get("edges", []):
+        nodes.setdefault(edge["source"], {})
+        nodes.setdefault(edge["target"], {})
+    return nodes
+
+
+def _edges(graph: dict) -> dict:
+    """(source, target) -> {normalized utterance: original utterance}, parallel edges collapsed."""
+    edges = {}
+    for edge in graph.get("edges", []):
+        entry = edges.setdefault((edge["source"], edge["target"]), {})
+        for utterance in get_utterances(edge):
+            entry.setdefault(normalize_utterance(utterance), utterance)
+    return edges
+
+
+def _overlaps(left: dict, right: dict, unique_only: bool = False) -> tuple[dict, dict]:
+    """
+    For every left entry the right entries sharing utterances with it and the number shared, and the other way round.
+
+    With `unique_only` only utterances occurring in a single entry of each graph count: an utterance
+    repeated on purpose, like "No, that's all" leaving several nodes, says nothing about splits or merges.
+    """
+    index = {}
+    for key, utterances in right.items():
+        for utterance in utterances:
+            index.setdefault(utterance, []).append(key)
+    if unique_only:
+        left_counts = Counter(utterance for utterances in left.values() for utterance in utterances)
+        index = {utterance: keys for utterance, keys in index.items() if len(keys) == 1 and left_counts[utterance] == 1}
+    left_to_right, right_to_left = {}, {}
+    for key, utterances in left.items():
+        counter = Counter(other for utterance in utterances for other in index.get(utterance, ()))
+        left_to_right[key] = counter
+        for other, shared in counter.items():
+            right_to_left.setdefault(other, Counter())[key] = shared
+    return left_to_right, right_to_left
+
+
+def _best(counter: Counter, order: dict):
+    # most shared utterances, then the entry that comes first in its graph
+    return min(counter, key=lambda key: (-counter[key], order[key])) if counter else None
+
+
+def _shared(left: dict, right: dict) -> list:
+    return [left[utterance] for utterance in left if utterance in right]
+
+
+def _changes(target_utterances: dict, predicted_utterances: dict) -> Optional[dict]:
+    missing = [u for key, u in target_utterances.items() if key not in predicted_utterances]
+    extra = [u for key, u in predicted_utterances.items() if key not in target_utterances]
+    if not missing and not extra:
+        return None
+    return {"missing_utterances": missing, "extra_utterances": extra}
+
+
+def map_nodes(target_graph: dict, predicted_graph: dict) -> dict:
+    """Target node id -> id of the predicted node sharing most utterances with it, None if none does."""
+    target_nodes, predicted_nodes = _nodes(target_graph), _nodes(predicted_graph)
+    order = {key: i for i, key in enumerate(predicted_nodes)}
+    node_overlap, _ = _overlaps(target_nodes, predicted_nodes)
+    return {node: _best(node_overlap[node], order) for node in target_nodes}
+
+
+def _splits(overlap: dict, left: dict, right: dict, order: dict, name) -> list:
+    splits = []
+    for key, counter in overlap.items():
+        if len(counter) > 1:
+            parts = sorted(counter, key=lambda part: (-counter[part], order[part]))
+            splits.append(
+                {
+                    "target": name(key),
+                    "predicted": [name(p) for p in parts],
+                    "utterances": {str(name(p)): _shared(left[key], right[p]) for p in parts},
+                }
+            )
+    return splits
+
+
+def _merges(reverse_overlap: dict, left: dict, right: dict, order: dict, name) -> list:
+    merges = []
+    for key in right:
+        counter = reverse_overlap.get(key, ())
+        if len(counter) > 1:
+            parts = sorted(counter, key=order.get)
+            merges.append(
+                {
+                    "predicted": name(key),
+                    "target": [name(t) for t in parts],
+                    "utterances": {str(name(t)): _shared(left[t], right[key]) for t in parts},
+                }
+            )
+    return merges
+
+
+@traced("diff.graphs")
+def diff_graphs(target_graph: dict, predicted_graph: dict, node_mapping: Optional[dict] = None) -> GraphDiff:
+    """
+    Diff of `predicted_graph` against `target_graph`.
+
+    Parameters
+    ----------
+    target_graph, predicted_graph : dict
+        Graph dicts with "nodes" and "edges".
+    node_mapping : dict, optional
+        Target node id -> predicted node id or None, e.g. the node mapping of `triplet_match`; ids
+        that are not target nodes are ignored. By default nodes are mapped by shared utterances.
+    """
+    target_nodes, predicted_nodes = _nodes(target_graph), _nodes(predicted_graph)
+    target_edges, predicted_edges = _edges(target_graph), _edges(predicted_graph)
+    node_order = {key: i for i, key in enumerate(predicted_nodes)}
+    edge_order = {key: i for i, key in enumerate(predicted_edges)}
+
+    node_overlap, reverse_node_overlap = _overlaps(target_nodes, predicted_nodes)
+    if node_mapping is None:
+        mapping = {node: _best(node_overlap[node], node_order) for node in target_nodes}
+    else:
+        mapping = {node: node_mapping.get(node) for node in target_nodes}
+        mapping = {node: mapped if mapped in predicted_nodes else None for node, mapped in mapping.items()}
+    diff = GraphDiff(node_mapping=mapping)
+
+    for node, utterances in target_nodes.items():
+        mapped = mapping[node]
+        if mapped is None:
+            diff.missing_nodes.append({"id": node, "utterances": list(utterances.values())})
+            continue
+        changes = _changes(utterances, predicted_nodes[mapped])
+        if changes is not None:
+            diff.changed_nodes.append({"target": node, "predicted": mapped, **changes})
+    mapped_nodes = set(mapping.values())
+    for node, utterances in predicted_nodes.items():
+        if node not in mapped_nodes and node not in reverse_node_overlap:
+            diff.extra_nodes.append({"id": node, "utterances": list(utterances.values())})
+
+    unique_overlap, reverse_unique_overlap = _overlaps(target_nodes, predicted_nodes, unique_only=True)
+    # several target nodes mapped onto one predicted node are a merge even without unique utterances
+    for node, mapped in mapping.items():
+        if mapped is not None:
+            reverse_unique_overlap.setdefault(mapped, Counter()).setdefault(node, 0)
+    target_node_order = {key: i for i, key in enumerate(target_nodes)}
+    diff.split_nodes = _splits(unique_overlap, target_nodes, predicted_nodes, node_order, lambda node: node)
+    diff.merged_nodes = _merges(reverse_unique_overlap, target_nodes, predicted_nodes, target_node_order, lambda node: node)
+
+    edge_overlap, reverse_edge_overlap = _overlaps(target_edges, predicted_edges)
+    matched_edges = set()
+    for (source, target), utterances in target_edges.items():
+        key = _edge_key(source, target)
+        mapped = (mapping.get(source), mapping.get(target))
+        if mapped in predicted_edges:
+            matched_edges.add(mapped)
+            changes = _changes(utterances, predicted_edges[mapped])
+            if changes is not None:
+                diff.changed_edges.append({"target": key, "predicted": _edge_key(*mapped), **changes})
+        else:
+            # where the utterances went instead, e.g. a transition routed to a wrong node
+            found_in = [_edge_key(*edge) for edge in sorted(edge_overlap[(source, target)], key=edge_order.get)]
+            mapped_key = _edge_key(*mapped) if None not in mapped else None
+            diff.missing_edges.append({"edge": key, "mapped": mapped_key, "utterances": list(utterances.values()), "found_in": found_in})
+
+    target_edge_order = {key: i for i, key in enumerate(target_edges)}
+    for edge, utterances in predicted_edges.items():
+        if edge not in matched_edges:
+            found_in = [_edge_key(*t) for t in sorted(reverse_edge_overlap.get(edge, ()), key=target_edge_order.get)]
+            diff.extra_edges.append({"edge": _edge_key(*edge), "utterances": list(utterances.values()), "found_in": found_in})
+
+    unique_overlap, reverse_unique_overlap = _overlaps(target_edges, predicted_edges, unique_only=True)
+    diff.split_edges = _splits(unique_overlap, target_edges, predicted_edges, edge_order, lambda edge: _edge_key(*edge))
+    diff.merged_edges = _merges(reverse_unique_overlap, target_edges, predicted_edges, target_edge_order, lambda edge: _edge_key(*edge))
+    return diff
+
+
+def aggregate_diffs(diffs: Iterable[Union[GraphDiff, dict]]) -> dict:
+    """
+    Error statistics over many diffs, given as `GraphDiff` objects or their `as_dict()`.
+
+    Returns the number of pairs, of exact pairs, the total count of every error type, the number of
+    pairs with at least one error of each type and the share of such pairs.
+    """
+    pairs, exact = 0, 0
+    totals, pairs_with_error = Counter(), Counter()
+    for diff in diffs:
+        counts = diff.counts() if isinstance(diff, GraphDiff) else diff["counts"]
+        pairs += 1
+        exact += not any(counts.values())
+        for name in ERROR_TYPES:
+            totals[name] += counts.get(name, 0)
+            pairs_with_error[name] += counts.get(name, 0) > 0
+    return {
+        "pairs": pairs,
+        "exact": exact,
+        "totals": {name: totals[name] for name in ERROR_TYPES},
+        "pairs_with_error": {name: pairs_with_error[name] for name in ERROR_TYPES},
+        "error_rate": {name: pairs_with_error[name] / pairs if pairs else 0.0 for name in ERROR_TYPES},
+    }
@@ -0,0 +1,242 @@
+from dataclasses import dataclass, field
+from typing import Iterable, Optional
+
+import numpy as np
+
+from chatsky_llm_autoconfig.instrumentation import traced
+from chatsky_llm_autoconfig.utils import get_utterances
+
+
+@dataclass
+class GraphStats:
+    """
+    Structural statistics of one graph dict.
+
+    Attributes
+    ----------
+    nodes, edges : int
+        Number of distinct nodes (including ones only mentioned by edges) and of edges, parallel edges counted.
+    has_cycle : bool
+        Whether there is a directed cycle, self-loops included.
+    scc_count : int
+        Number of strongly connected components.
+    start_nodes, reachable_nodes : int
+        Number of start nodes and of nodes reachable from them (start nodes included).
+    dead_ends : int
+        Nodes without outgoing edges.
+    branching_factor : float
+        Mean out-degree of the nodes that have outgoing edges.
+    utterance_coverage : float
+        Share of distinct lowercased dialogue texts found among the graph utterances, NaN without a dialogue.
+    out_degrees, in_degrees : np.ndarray
+        Per-node degrees, in the order of node first appearance.
+    """
+
+    nodes: int
+    edges: int
+    has_cycle: bool
+    scc_count: int
+    start_nodes: int
+    reachable_nodes: int
+    dead_ends: int
+    branching_factor: float
+    utterance_coverage: float
+    out_degrees: np.ndarray = field(repr=False)
+    in_degrees: np.ndarray = field(repr=False)
+
+    def degree_histogram(self, direction: str = "out") -> np.ndarray:
+        """Number of nodes per degree value, index is the degree."""
+        return np.bincount(self.out_degrees if direction == "out" else self.in_degrees)
+
+
+def _strongly_connected_components(adjacency: list[list[int]]) -> tuple[int, bool]:
+    """Iterative Tarjan, returns the number of components and whether any of them holds a cycle."""
+    n = len(adjacency)
+    index = [-1] * n
+    low = [0] * n
+    on_stack = [False] * n
+    stack = []
+    count, cyclic, counter = 0, False, 0
+
+    for root in range(n):
+        if index[root] != -1:
+            continue
+        work = [(root, 0)]
+        index[root] = low[root] = counter
+        counter += 1
+        stack.append(root)
+        on_stack[root] = True
+        while work:
+            node, child = work[-1]
+            neighbours = adjacency[node]
+            if child < len(neighbours):
+                work[-1] = (node, child + 1)
+                nxt = neighbours[child]
+                if nxt == node:
+                    cyclic = True
+                if index[nxt] == -1:
+                    index[nxt] = low[nxt] = counter
+                    counter += 1
+                    stack.append(nxt)
+                    on_stack[nxt] = True
+                    work.append((nxt, 0))
+                elif on_stack[nxt] and index[nxt] < low[node]:
+                    low[node] = index[nxt]
+                continue
+            work.pop()
+            if work and low[node] < low[work[-1][0]]:
+                low[work[-1][0]] = low[node]
+            if low[node] == index[node]:
+                size = 0
+                while True:
+                    member = stack.pop()
+                    on_stack[member] = False
+                    size += 1
+                    if member == node:
+                        break
+                count += 1
+                cyclic = cyclic or size > 1
+    return count, cyclic
+
+
+@traced("stats.graph")
+def compute_graph_stats(graph_dict: dict, dialogue: Optional[list] = None) -> GraphStats:
+    """
+    Statistics of a graph dict in one pass over its nodes and edges.
+
+    Node ids are mapped to consecutive integers and edges to adjacency lists, everything else
+    (components, reachability, degrees) works on that compact form.
+    """
+    ids, starts, utterances = {}, [], set()
+    with_coverage = dialogue is not None
+    for node in graph_dict["nodes"]:
+        position = ids.setdefault(node["id"], len(ids))
+        if node.get("is_start"):
+            starts.append(position)
+        if with_coverage:
+            utterances.update(u.lower() for u in get_utterances(node))
+
+    edges = []
+    for edge in graph_dict["edges"]:
+        source = ids.setdefault(edge["source"], len(ids))
+        target = ids.setdefault(edge["target"], len(ids))
+        edges.append((source, target))
+        if with_coverage:
+            utterances.update(u.lower() for u in get_utterances(edge))
+
+    n = len(ids)
+    adjacency = [[] for _ in range(n)]
+    in_degrees = [0] * n
+    for source, target in edges:
+        adjacency[source].append(target)
+        in_degrees[target] += 1
+    out_degrees = [len(neighbours) for neighbours in adjacency]
+
+    scc_count, cyclic = _strongly_connected_components(adjacency)
+
+    seen = [False] * n
+    frontier = []
+    for start in starts:
+        if not seen[start]:
+            seen[start] = True
+            frontier.append(start)
+    reachable = len(frontier)
+    while frontier:
+        for nxt in adjacency[frontier.pop()]:
+            if not seen[nxt]:
+                seen[nxt] = True
+                reachable += 1
+                frontier.append(nxt)
+
+    branching = [degree for degree in out_degrees if degree]
+    coverage = float("nan")
+    if with_coverage:
+        texts = {turn["text"].lower() for turn in dialogue}
+        coverage = sum(text in utterances for text in texts) / len(texts) if texts else 0.0
+
+    return GraphStats(
+        nodes=n,
+        edges=len(edges),
+        has_cycle=cyclic,
+        scc_count=scc_count,
+        start_nodes=len(starts),
+        reachable_nodes=reachable,
+        dead_ends=len(out_degrees) - len(branching),
+        branching_factor=sum(branching) / len(branching) if branching else 0.0,
+        utterance_coverage=coverage,
+        out_degrees=np.array(out_degrees, dtype=np.int32),
+        in_degrees=np.array(in_degrees, dtype=np.int32),
+    )
+
+
+_SCALAR_FIELDS = ["nodes", "edges", "has_cycle", "scc_count", "start_nodes", "reachable_nodes", "dead_ends", "branching_factor", "utterance_coverage"]
+
+
+class CorpusStats:
+    """
+    Statistics of many graphs: one row per graph in `frame` (a pandas DataFrame) and the
+    concatenated per-node degrees of all graphs for corpus-level histograms.
+
+    Examples
+    --------
+        stats = CorpusStats.from_items(load_dialogues("generated_data/dialogue_graph_pairs.json"))
+        stats.summary()
+    """
+
+    def __init__(self, frame, out_degrees: np.ndarray, in_degrees: np.ndarray):
+        self.frame = frame
+        self.out_degrees = out_degrees
+        self.in_degrees = in_degrees
+
+    @classmethod
+    def from_stats(cls, stats: Iterable[GraphStats]) -> "CorpusStats":
+        import pandas as pd
+
+        columns = {name: [] for name in _SCALAR_FIELDS}
+        out_degrees, in_degrees = [], []
+        for item in stats:
+            for name in _SCALAR_FIELDS:
+                columns[name].append(getattr(item, name))
+            out_degrees.append(item.out_degrees)
+            in_degrees.append(item.in_degrees)
+        frame = pd.DataFrame(columns)
+        empty = np.zeros(0, dtype=np.int32)
+        return cls(frame, np.concatenate(out_degrees) if out_degrees else empty, np.concatenate(in_degrees) if in_degrees else empty)
+
+    @classmethod
+    def from_items(cls, items: Iterable[dict], graph_key: str = "graph", dialogue_key: Optional[str] = "dialog") -> "CorpusStats":
+        return cls.from_stats(compute_graph_stats(item[graph_key], item.get(dialogue_key) if dialogue_key else None) for item in items)
+
+    def summary(self) -> dict:
+        """Corpus-level aggregates as plain Python numbers, ready for `json.dump`."""
+        frame = self.frame
+        total = len(frame)
+        if total == 0:
+            keys = ["total_nodes", "total_edges", "with_cycles", "percentage_with_cycles", "average_nodes_amount", "average_edges_amount"]
+            keys += ["average_scc_count", "percentage_fully_reachable", "average_reachable_share", "average_dead_ends", "average_branching_factor"]
+            return {
+                "total_graphs": 0,
+                **dict.fromkeys(keys, 0),
+                "text_to_utterance_percentage": 0,
+                "out_degree_histogram": [],
+                "in_degree_histogram": [],
+            }
+        nodes = frame["nodes"].to_numpy()
+        fully_reachable = (frame["reachable_nodes"].to_numpy() == nodes) & (frame["start_nodes"].to_numpy() > 0)
+        return {
+            "total_graphs": total,
+            "total_nodes": int(nodes.sum()),
+            "total_edges": int(frame["edges"].sum()),
+            "with_cycles": int(frame["has_cycle"].sum()),
+            "percentage_with_cycles": float(frame["has_cycle"].mean() * 100),
+            "average_nodes_amount": float(nodes.mean()),
+            "average_edges_amount": float(frame["edges"].mean()),
+            "average_scc_count": float(frame["scc_count"].mean()),
+            "percentage_fully_reachable": float(fully_reachable.mean() * 100),
+            "average_reachable_share": float(np.mean(np.divide(frame["reachable_nodes"].to_numpy(), np.maximum(nodes, 1)))),
+            "average_dead_ends": float(frame["dead_ends"].mean()),
+            "average_branching_factor": float(frame["branching_factor"].mean()),
+            "text_to_utterance_percentage": float(np.nan_to_num(frame["utterance_coverage"].mean()) * 100),
+            "out_degree_histogram": np.bincount(self.out_degrees).tolist(),
+            "in_degree_histogram": np.bincount(self.in_degrees).tolist(),
+        }
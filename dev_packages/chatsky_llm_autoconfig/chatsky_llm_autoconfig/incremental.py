@@ -0,0 +1,251 @@
+import copy
+import json
+import logging
+from typing import Optional
+
+from pydantic import ValidationError
+
+from chatsky_llm_autoconfig.consistency import GraphIndex
+from chatsky_llm_autoconfig.graph import Graph
+from chatsky_llm_autoconfig import prompts
+from chatsky_llm_autoconfig.utils import call_llm_api, get_utterances, normalize_utterance
+from chatsky_llm_autoconfig.validation import EdgeSchema, NodeSchema, validate_graph
+
+logger = logging.getLogger(__name__)
+
+
+def merge_delta(graph_dict: dict, delta: dict) -> dict:
+    """
+    Merge a partial graph into `graph_dict` in place.
+
+    Nodes with an existing id get the new utterances appended, other nodes are added.
+    Edges are merged by (source, target) the same way. Utterances already present are skipped.
+    Returns counts of added nodes and edges. Raises `pydantic.ValidationError` for entries that do
+    not match the graph schema and `ValueError` for edges to nodes that are neither in the graph nor
+    in the delta, in both cases before changing anything.
+    """
+    delta_nodes = [NodeSchema.model_validate(node).model_dump(exclude_none=True) for node in delta.get("nodes", [])]
+    delta_edges = [EdgeSchema.model_validate(edge).model_dump() for edge in delta.get("edges", [])]
+    nodes = {node["id"]: node for node in graph_dict["nodes"]}
+    dangling = dangling_edges(nodes.keys() | {node["id"] for node in delta_nodes}, delta_edges)
+    if dangling:
+        raise ValueError(f"Delta edges point to unknown nodes: {dangling}")
+    edges = {(edge["source"], edge["target"]): edge for edge in graph_dict["edges"]}
+    added = {"nodes": 0, "edges": 0}
+
+    for node in delta_nodes:
+        if node["id"] in nodes:
+            _extend_utterances(nodes[node["id"]], node["utterances"])
+        else:
+            node.setdefault("label", "")
+            graph_dict["nodes"].append(node)
+            nodes[node["id"]] = node
+            added["nodes"] += 1
+
+    for edge in delta_edges:
+        key = (edge["source"], edge["target"])
+        if key in edges:
+            _extend_utterances(edges[key], edge["utterances"])
+        else:
+            graph_dict["edges"].append(edge)
+            edges[key] = edge
+            added["edges"] += 1
+    return added
+
+
+def dangling_edges(node_ids, edges: list[dict]) -> list[tuple]:
+    """(source, target) of every edge with an endpoint not in `node_ids`."""
+    return [(edge["source"], edge["target"]) for edge in edges if edge["source"] not in node_ids or edge["target"] not in node_ids]
+
+
+def _extend_utterances(entry: dict, utterances: list[str]):
+    existing = get_utterances(entry)
+    known = {normalize_utterance(u) for u in existing}
+    for utterance in utterances:
+        if normalize_utterance(utterance) not in known:
+            existing.append(utterance)
+            known.add(normalize_utterance(utterance))
+    entry["utterances"] = existing
+
+
+class IncrementalGraphBuilder:
+    """
+    Grows one graph from a stream of dialogues of the same domain.
+
+    Every turn of a new dialogue is first looked up in the working graph by normalized text.
+    User turns between two placed assistant turns become edges locally. Only fragments
+    with assistant utterances that are not in the graph yet are sent to the LLM, with the
+    small `graph_delta_prompt` instead of the whole dialogue, and the answer is merged in.
+    Without a model, unknown assistant utterances simply become new nodes.
+
+    Examples
+    --------
+        builder = IncrementalGraphBuilder(model=ChatOpenAI(model="gpt-4o-mini"))
+        for dialogue in dialogues:
+            builder.add_dialogue(dialogue)
+        graph = builder.to_graph()
+    """
+
+    def __init__(self, graph_dict: Optional[dict] = None, model=None, temp: float = 0.3):
+        self.graph_dict = copy.deepcopy(graph_dict) if graph_dict is not None else {"nodes": [], "edges": []}
+        self.model = model
+        self.temp = temp
+        self.stats = {"dialogues": 0, "turns": 0, "matched_turns": 0, "llm_calls": 0, "prompt_chars": 0, "completion_chars": 0}
+        self._index = GraphIndex(self.graph_dict)
+
+    def to_graph(self, **kwargs) -> Graph:
+        return Graph(self.graph_dict, **kwargs)
+
+    def add_dialogue(self, dialogue) -> dict:
+        turns = list(getattr(dialogue, "dialogue", dialogue))
+        self.stats["dialogues"] += 1
+        self.stats["turns"] += len(turns)
+        summary = {"matched_turns": 0, "llm_calls": 0, "new_nodes": 0, "new_edges": 0}
+
+        if not self.graph_dict["nodes"] and self.model is not None and self._bootstrap(turns):
+            summary["llm_calls"] = 1
+            summary["new_nodes"] = len(self.graph_dict["nodes"])
+            summary["new_edges"] = len(self.graph_dict["edges"])
+
+        positions = self._resolve(turns)
+        summary["matched_turns"] = self._count_matched(turns, positions)
+        self.stats["matched_turns"] += summary["matched_turns"]
+
+        for fragment in self._fragments(turns, positions):
+            delta = self._ask_delta(turns, positions, fragment) if self.model is not None else None
+            if delta is not None:
+                summary["llm_calls"] += 1
+            added = merge_delta(self.graph_dict, delta or {})
+            self._index = GraphIndex(self.graph_dict)
+            positions = self._resolve(turns)
+            # whatever the LLM left out still has to end up in the graph
+            leftovers = [idx for idx in fragment if positions[idx] is None]
+            if leftovers:
+                added_locally = merge_delta(self.graph_dict, self._local_delta(turns, leftovers))
+                added["nodes"] += added_locally["nodes"]
+                self._index = GraphIndex(self.graph_dict)
+                positions = self._resolve(turns)
+            summary["new_nodes"] += added["nodes"]
+            summary["new_edges"] += added["edges"]
+
+        summary["new_edges"] += merge_delta(self.graph_dict, self._local_edges(turns, positions))["edges"]
+        self._index = GraphIndex(self.graph_dict)
+        return summary
+
+    def _bootstrap(self, turns: list[dict]) -> bool:
+        graph = self._call(prompts.cycle_graph_generation_prompt.format(dialog=turns))
+        if graph is None or validate_graph(graph, require_start=False, check_reachability=False):
+            return False
+        self.graph_dict = graph
+        self._index = GraphIndex(self.graph_dict)
+        return True
+
+    def _resolve(self, turns: list[dict]) -> list:
+        """Node id for every assistant turn found in the graph, None for the rest and for user turns."""
+        positions = [None] * len(turns)
+        previous = None
+        for idx, turn in enumerate(turns):
+            if turn.get("participant") == "user":
+                continue
+            candidates = self._index.nodes.get(normalize_utterance(turn["text"]))
+            if not candidates:
+                previous = None
+                continue
+            chosen = None
+            if previous is not None and idx > 0 and turns[idx - 1].get("participant") == "user":
+                via_edge = self._index.edges.get(normalize_utterance(turns[idx - 1]["text"]), set())
+                chosen = min((target for source, target in via_edge if source == previous and target in candidates), default=None)
+            positions[idx] = chosen if chosen is not None else min(candidates)
+            previous = positions[idx]
+        return positions
+
+    def _count_matched(self, turns: list[dict], positions: list) -> int:
+        matched = 0
+        for idx, turn in enumerate(turns):
+            if turn.get("participant") == "user":
+                matched += normalize_utterance(turn["text"]) in self._index.edges
+            else:
+                matched += positions[idx] is not None
+        return matched
+
+    @staticmethod
+    def _fragments(turns: list[dict], positions: list) -> list[list[int]]:
+        """Groups of unplaced assistant turns that are not separated by a placed one."""
+        fragments, current = [], []
+        for idx, turn in enumerate(turns):
+            if turn.get("participant") == "user":
+                continue
+            if positions[idx] is None:
+                current.append(idx)
+            elif current:
+                fragments.append(current)
+                current = []
+        if current:
+            fragments.append(current)
+        return fragments
+
+    def _next_id(self) -> int:
+        return max((node["id"] for node in self.graph_dict["nodes"]), default=0) + 1
+
+    def _ask_delta(self, turns: list[dict], positions: list, fragment: list[int]) -> Optional[dict]:
+        start = max(fragment[0] - 2, 0)
+        stop = min(fragment[-1] + 3, len(turns))
+        lines = []
+        for idx in range(start, stop):
+            marker = f" [node {positions[idx]}]" if positions[idx] is not None else ""
+            lines.append(f"{turns[idx].get('participant')}: {turns[idx]['text']}{marker}")
+        nodes = "\n".join(
+            f"{node['id']}: {node.get('label', '')}: {get_utterances(node)[0] if get_utterances(node) else ''}" for node in self.graph_dict["nodes"]
+        )
+        delta = self._call(prompts.graph_delta_prompt.format(nodes=nodes, fragment="\n".join(lines), next_id=self._next_id()))
+        if not isinstance(delta, dict):
+            return None
+        try:
+            for node in delta.get("nodes", []):
+                NodeSchema.model_validate(node)
+            for edge in delta.get("edges", []):
+                EdgeSchema.model_validate(edge)
+        except ValidationError:
+            logger.info("Delta response does not match the graph schema, falling back to local merge")
+            return None
+        node_ids = {node["id"] for node in self.graph_dict["nodes"]} | {node["id"] for node in delta.get("nodes", [])}
+        dangling = dangling_edges(node_ids, delta.get("edges", []))
+        if dangling:
+            logger.info(f"Dropping delta edges to unknown nodes: {dangling}")
+            delta["edges"] = [edge for edge in delta.get("edges", []) if (edge["source"], edge["target"]) not in dangling]
+        return delta
+
+    def _call(self, prompt: str) -> Optional[dict]:
+        self.stats["llm_calls"] += 1
+        self.stats["prompt_chars"] += len(prompt)
+        response = call_llm_api(prompt, self.model, temp=self.temp)
+        if response is None:
+            return None
+        self.stats["completion_chars"] += len(response)
+        try:
+            return json.loads(response)
+        except json.JSONDecodeError:
+            logger.info("Delta response is not a valid JSON, falling back to local merge")
+            return None
+
+    def _local_delta(self, turns: list[dict], fragment: list[int]) -> dict:
+        next_id = self._next_id()
+        # a loop repeats an utterance within the fragment, its repeats go to the same new node
+        nodes = {}
+        for idx in fragment:
+            key = normalize_utterance(turns[idx]["text"])
+            if key not in nodes:
+                is_start = not self.graph_dict["nodes"] and idx == 0
+                nodes[key] = {"id": next_id + len(nodes), "label": "", "is_start": is_start, "utterances": [turns[idx]["text"]]}
+        return {"nodes": list(nodes.values()), "edges": []}
+
+    @staticmethod
+    def _local_edges(turns: list[dict], positions: list) -> dict:
+        edges = []
+        for idx in range(1, len(turns) - 1):
+            if turns[idx].get("participant") != "user":
+                continue
+            source, target = positions[idx - 1], positions[idx + 1]
+            if source is not None and target is not None:
+                edges.append({"source": source, "target": target, "utterances": [turns[idx]["text"]]})
+        return {"nodes": [], "edges": edges}
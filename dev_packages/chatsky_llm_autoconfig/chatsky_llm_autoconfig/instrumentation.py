@@ -0,0 +1,335 @@
+"""
+Timing spans and counters for the hot paths (graph loading, metrics, sampling, plotting, LLM calls).
+
+Everything here is a no-op until `enable` is called with at least one sink, so the decorated
+functions only pay for one check of a module-level list. Available sinks:
+
+- `InMemorySink` keeps every duration and prints a latency summary per span name;
+- `JsonlSink` appends one JSON line per finished span or counter update;
+- `OtlpHttpSink` posts spans as OTLP/HTTP JSON, e.g. to a local OpenTelemetry collector on port 4318.
+
+Examples
+--------
+    sink = InMemorySink()
+    with instrumented(sink, JsonlSink("trace.jsonl")):
+        evaluate_model("data/data.json", "results", "gpt-4o-mini")
+    print(sink.report())
+"""
+
+import contextvars
+import functools
+import inspect
+import json
+import logging
+import os
+import threading
+import time
+import urllib.request
+from contextlib import contextmanager
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+_sinks: list = []
+_current_span: contextvars.ContextVar = contextvars.ContextVar("chatsky_llm_autoconfig_span", default=None)
+
+
+class SpanRecord:
+    __slots__ = ("name", "trace_id", "span_id", "parent_id", "start_ns", "end_ns", "attributes")
+
+    def __init__(self, name: str, trace_id: str, span_id: str, parent_id: Optional[str], start_ns: int, attributes: dict):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = span_id
+        self.parent_id = parent_id
+        self.start_ns = start_ns
+        self.end_ns = start_ns
+        self.attributes = attributes
+
+    @property
+    def duration(self) -> float:
+        return (self.end_ns - self.start_ns) / 1e9
+
+    def as_dict(self) -> dict:
+        return {
+            "type": "span",
+            "name": self.name,
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "start_ns": self.start_ns,
+            "duration": self.duration,
+            "attributes": self.attributes,
+        }
+
+
+def is_enabled() -> bool:
+    return bool(_sinks)
+
+
+def enable(*sinks):
+    _sinks.extend(sinks)
+
+
+def disable():
+    """Flush and detach all sinks."""
+    flush()
+    _sinks.clear()
+
+
+def flush():
+    for sink in _sinks:
+        sink.flush()
+
+
+@contextmanager
+def instrumented(*sinks):
+    enable(*sinks)
+    try:
+        yield
+    finally:
+        for sink in sinks:
+            sink.flush()
+            _sinks.remove(sink)
+
+
+class _NoopSpan:
+    def __enter__(self):
+        return None
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NOOP_SPAN = _NoopSpan()
+
+
+@contextmanager
+def _recording_span(name: str, attributes: dict):
+    parent = _current_span.get()
+    record = SpanRecord(
+        name=name,
+        trace_id=parent.trace_id if parent is not None else os.urandom(16).hex(),
+        span_id=os.urandom(8).hex(),
+        parent_id=parent.span_id if parent is not None else None,
+        start_ns=time.time_ns(),
+        attributes=attributes,
+    )
+    token = _current_span.set(record)
+    start = time.perf_counter_ns()
+    try:
+        yield record
+    except BaseException as e:
+        record.attributes["error"] = type(e).__name__
+        raise
+    finally:
+        record.end_ns = record.start_ns + time.perf_counter_ns() - start
+        _current_span.reset(token)
+        for sink in _sinks:
+            sink.on_span(record)
+
+
+def span(name: str, **attributes):
+    """Context manager timing the block under `name`; returns a shared no-op when nothing is enabled."""
+    if not _sinks:
+        return _NOOP_SPAN
+    return _recording_span(name, attributes)
+
+
+def count(name: str, value: float = 1, **attributes):
+    if not _sinks:
+        return
+    for sink in _sinks:
+        sink.on_count(name, value, attributes)
+
+
+def traced(name: str):
+    """Decorator wrapping every call of a function (sync or async) in `span(name)`."""
+
+    def decorator(fn):
+        if inspect.iscoroutinefunction(fn):
+
+            @functools.wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                if not _sinks:
+                    return await fn(*args, **kwargs)
+                with _recording_span(name, {}):
+                    return await fn(*args, **kwargs)
+
+            return async_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not _sinks:
+                return fn(*args, **kwargs)
+            with _recording_span(name, {}):
+                return fn(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+class InMemorySink:
+    """Keeps span durations and counter totals in memory for a summary at the end of a run."""
+
+    def __init__(self):
+        self.durations: dict[str, list[float]] = {}
+        self.counters: dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def on_span(self, record: SpanRecord):
+        with self._lock:
+            self.durations.setdefault(record.name, []).append(record.duration)
+
+    def on_count(self, name: str, value: float, attributes: dict):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def flush(self):
+        pass
+
+    def summary(self) -> dict:
+        """Count, total and latency percentiles in seconds per span name, and counter totals."""
+        import numpy as np
+
+        spans = {}
+        for name, durations in self.durations.items():
+            values = np.asarray(durations)
+            p50, p90, p99 = np.percentile(values, [50, 90, 99])
+            spans[name] = {
+                "count": int(values.size),
+                "total": float(values.sum()),
+                "mean": float(values.mean()),
+                "p50": float(p50),
+                "p90": float(p90),
+                "p99": float(p99),
+                "max": float(values.max()),
+            }
+        return {"spans": spans, "counters": dict(self.counters)}
+
+    def report(self) -> str:
+        summary = self.summary()
+        lines = [f"{'span':<28} {'count':>7} {'total s':>9} {'mean ms':>9} {'p50 ms':>9} {'p90 ms':>9} {'p99 ms':>9} {'max ms':>9}"]
+        for name, stats in sorted(summary["spans"].items(), key=lambda item: -item[1]["total"]):
+            lines.append(
+                f"{name:<28} {stats['count']:>7} {stats['total']:>9.3f} {stats['mean'] * 1e3:>9.2f} "
+                f"{stats['p50'] * 1e3:>9.2f} {stats['p90'] * 1e3:>9.2f} {stats['p99'] * 1e3:>9.2f} {stats['max'] * 1e3:>9.2f}"
+            )
+        for name, value in sorted(summary["counters"].items()):
+            lines.append(f"{name:<28} {value:>7g}")
+        return "\n".join(lines)
+
+
+class JsonlSink:
+    """Appends every finished span and counter update to a JSON Lines file."""
+
+    def __init__(self, path: str, buffer_size: int = 256):
+        self.path = path
+        self.buffer_size = buffer_size
+        self._buffer = []
+        self._lock = threading.Lock()
+
+    def _add(self, entry: dict):
+        with self._lock:
+            self._buffer.append(json.dumps(entry, default=str))
+            if len(self._buffer) >= self.buffer_size:
+                self._write()
+
+    def on_span(self, record: SpanRecord):
+        self._add(record.as_dict())
+
+    def on_count(self, name: str, value: float, attributes: dict):
+        self._add({"type": "counter", "name": name, "value": value, "time_ns": time.time_ns(), "attributes": attributes})
+
+    def _write(self):
+        if self._buffer:
+            with open(self.path, "a") as f:
+                f.write("\n".join(self._buffer) + "\n")
+            self._buffer = []
+
+    def flush(self):
+        with self._lock:
+            self._write()
+
+
+def _otlp_value(value) -> dict:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+class OtlpHttpSink:
+    """
+    Exports spans to an OpenTelemetry collector with the OTLP/HTTP JSON protocol, using only the standard library.
+
+    Spans are sent in batches of `batch_size` and on `flush`. Export errors are logged and the batch is dropped.
+    Counters are not exported, use `InMemorySink` or `JsonlSink` for them.
+    """
+
+    def __init__(
+        self,
+        endpoint: str = "http://localhost:4318/v1/traces",
+        service_name: str = "chatsky-llm-autoconfig",
+        batch_size: int = 512,
+        timeout: float = 5.0,
+    ):
+        self.endpoint = endpoint
+        self.service_name = service_name
+        self.batch_size = batch_size
+        self.timeout = timeout
+        self._batch = []
+        self._lock = threading.Lock()
+
+    def on_span(self, record: SpanRecord):
+        span = {
+            "traceId": record.trace_id,
+            "spanId": record.span_id,
+            "name": record.name,
+            "kind": 1,
+            "startTimeUnixNano": str(record.start_ns),
+            "endTimeUnixNano": str(record.end_ns),
+            "attributes": [{"key": key, "value": _otlp_value(value)} for key, value in record.attributes.items()],
+        }
+        if record.parent_id is not None:
+            span["parentSpanId"] = record.parent_id
+        with self._lock:
+            self._batch.append(span)
+            batch = self._take() if len(self._batch) >= self.batch_size else None
+        if batch:
+            self._export(batch)
+
+    def on_count(self, name: str, value: float, attributes: dict):
+        pass
+
+    def _take(self) -> list:
+        batch, self._batch = self._batch, []
+        return batch
+
+    def _export(self, spans: list):
+        payload = {
+            "resourceSpans": [
+                {
+                    "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": self.service_name}}]},
+                    "scopeSpans": [{"scope": {"name": "chatsky_llm_autoconfig"}, "spans": spans}],
+                }
+            ]
+        }
+        request = urllib.request.Request(
+            self.endpoint, data=json.dumps(payload).encode("utf-8"), headers={"Content-Type": "application/json"}, method="POST"
+        )
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                response.read()
+        except Exception as e:
+            logger.warning(f"Could not export {len(spans)} spans to {self.endpoint}: {e}")
+
+    def flush(self):
+        with self._lock:
+            batch = self._take()
+        if batch:
+            self._export(batch)
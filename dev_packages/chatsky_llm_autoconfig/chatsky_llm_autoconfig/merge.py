@@ -0,0 +1,78 @@
+from chatsky_llm_autoconfig.utils import get_utterances, normalize_utterance
+
+
+def split_dialogue(turns: list, window: int, overlap: int) -> list[list]:
+    """Overlapping windows of `window` turns, neighbouring windows share `overlap` turns."""
+    if overlap < 2 or overlap >= window:
+        raise ValueError(f"overlap must be in [2, window), got overlap={overlap}, window={window}")
+    if len(turns) <= window:
+        return [list(turns)]
+    step = window - overlap
+    windows = []
+    for start in range(0, len(turns) - overlap, step):
+        stop = start + window
+        windows.append(list(turns[start:stop]))
+    return windows
+
+
+def _add_utterances(target: list[str], known: set[str], utterances: list[str]):
+    for utterance in utterances:
+        key = normalize_utterance(utterance)
+        if key not in known:
+            known.add(key)
+            target.append(utterance)
+
+
+def merge_partial_graphs(partials: list[dict]) -> dict:
+    """
+    Merge graphs generated for overlapping windows of one dialogue into a single graph dict.
+
+    Nodes of different partial graphs that share a normalized utterance (the turns in the
+    overlaps) are unified, nodes are renumbered from 1 in order of first appearance and
+    edges between the same pair of merged nodes are collapsed into one edge. Only the
+    first partial graph decides which nodes are start nodes.
+    """
+    parent = {}
+
+    def find(key):
+        while parent[key] != key:
+            parent[key] = parent[parent[key]]
+            key = parent[key]
+        return key
+
+    owner_of_utterance = {}
+    for part_idx, partial in enumerate(partials):
+        for node in partial["nodes"]:
+            key = (part_idx, node["id"])
+            parent.setdefault(key, key)
+            for utterance in get_utterances(node):
+                other = owner_of_utterance.setdefault(normalize_utterance(utterance), key)
+                if other != key:
+                    parent[find(key)] = find(other)
+
+    new_ids, nodes, node_utterances = {}, {}, {}
+    for part_idx, partial in enumerate(partials):
+        for node in partial["nodes"]:
+            root = find((part_idx, node["id"]))
+            if root not in new_ids:
+                new_ids[root] = len(new_ids) + 1
+                nodes[root] = {"id": new_ids[root], "label": node.get("label") or "", "is_start": False, "utterances": []}
+                node_utterances[root] = set()
+            merged = nodes[root]
+            merged["label"] = merged["label"] or node.get("label") or ""
+            merged["is_start"] = merged["is_start"] or (part_idx == 0 and bool(node.get("is_start")))
+            _add_utterances(merged["utterances"], node_utterances[root], get_utterances(node))
+
+    edges, edge_utterances = {}, {}
+    for part_idx, partial in enumerate(partials):
+        known_ids = {node["id"] for node in partial["nodes"]}
+        for edge in partial["edges"]:
+            if edge["source"] not in known_ids or edge["target"] not in known_ids:
+                continue
+            key = (new_ids[find((part_idx, edge["source"]))], new_ids[find((part_idx, edge["target"]))])
+            if key not in edges:
+                edges[key] = {"source": key[0], "target": key[1], "utterances": []}
+                edge_utterances[key] = set()
+            _add_utterances(edges[key]["utterances"], edge_utterances[key], get_utterances(edge))
+
+    return {"nodes": list(nodes.values()), "edges": list(edges.values())}
@@ -0,0 +1,123 @@
+import hashlib
+import json
+import sqlite3
+import time
+from typing import Callable, Optional
+
+# journal modes safe for a file shared by processes; WAL only if they all run on one host
+JOURNAL_MODES = ("DELETE", "TRUNCATE", "WAL")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS metrics (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL,
+    last_used REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS metrics_last_used ON metrics (last_used);
+"""
+
+
+def canonical_graph_json(graph_dict: dict) -> str:
+    """
+    JSON of a graph dict that does not depend on key order or formatting.
+
+    The order of nodes, edges and utterances is kept: the per-node and per-edge metric lists follow it.
+    """
+    return json.dumps(graph_dict, sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+
+
+def metric_key(generated_graph: dict, target_graph: dict, version) -> str:
+    h = hashlib.blake2b(digest_size=20)
+    for part in (str(version), canonical_graph_json(generated_graph), canonical_graph_json(target_graph)):
+        h.update(part.encode("utf-8"))
+        h.update(b"\x1f")
+    return h.hexdigest()
+
+
+class MetricCache:
+    """
+    On-disk cache of metric results keyed by the hashes of both graphs and the metric version.
+
+    The cache is an SQLite file, so several processes of one sweep or of different sweeps can
+    share it, also across hosts on a shared filesystem with the default rollback journal
+    (`journal_mode="DELETE"`). `journal_mode="WAL"` is faster under concurrent use but needs memory
+    shared by all processes: use it only when they all run on one host, never on NFS or SMB.
+    The cache keeps at most `max_entries` results and evicts the least recently used ones;
+    eviction runs every `evict_every` writes.
+
+    Examples
+    --------
+        cache = MetricCache("metric_cache.sqlite")
+        metrics = cache.get_or_compute(generated_graph, target_graph, calculate_metrics)
+    """
+
+    def __init__(self, path: str, version=None, max_entries: int = 200_000, evict_every: int = 1000, journal_mode: str = "DELETE"):
+        if journal_mode not in JOURNAL_MODES:
+            raise ValueError(f"journal_mode must be one of {JOURNAL_MODES}, got {journal_mode!r}")
+        if version is None:
+            from chatsky_llm_autoconfig.evaluate import METRICS_VERSION
+
+            version = METRICS_VERSION
+        self.path = path
+        self.version = version
+        self.max_entries = max_entries
+        self.evict_every = evict_every
+        self.journal_mode = journal_mode
+        self.stats = {"hits": 0, "misses": 0, "evicted": 0}
+        self._writes = 0
+        self._connection = sqlite3.connect(path, timeout=60, isolation_level=None, check_same_thread=False)
+        self._connection.execute("PRAGMA busy_timeout=60000")
+        self._connection.execute(f"PRAGMA journal_mode={journal_mode}")
+        self._connection.executescript(_SCHEMA)
+
+    def __getstate__(self):
+        # processes of a pool reopen the file instead of sharing a connection
+        return {
+            "path": self.path,
+            "version": self.version,
+            "max_entries": self.max_entries,
+            "evict_every": self.evict_every,
+            "journal_mode": self.journal_mode,
+        }
+
+    def __setstate__(self, state):
+        self.__init__(**state)
+
+    def close(self):
+        self._connection.close()
+
+    def __len__(self) -> int:
+        return self._connection.execute("SELECT COUNT(*) FROM metrics").fetchone()[0]
+
+    def get(self, generated_graph: dict, target_graph: dict) -> Optional[dict]:
+        key = metric_key(generated_graph, target_graph, self.version)
+        row = self._connection.execute("SELECT value FROM metrics WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            self.stats["misses"] += 1
+            return None
+        self.stats["hits"] += 1
+        self._connection.execute("UPDATE metrics SET last_used = ? WHERE key = ?", (time.time(), key))
+        return json.loads(row[0])
+
+    def put(self, generated_graph: dict, target_graph: dict, metrics: dict):
+        key = metric_key(generated_graph, target_graph, self.version)
+        self._connection.execute(
+            "INSERT OR REPLACE INTO metrics (key, value, last_used) VALUES (?, ?, ?)", (key, json.dumps(metrics, default=float), time.time())
+        )
+        self._writes += 1
+        if self._writes % self.evict_every == 0:
+            self.evict()
+
+    def get_or_compute(self, generated_graph: dict, target_graph: dict, compute: Callable[[dict, dict], dict]) -> dict:
+        metrics = self.get(generated_graph, target_graph)
+        if metrics is None:
+            metrics = compute(generated_graph, target_graph)
+            self.put(generated_graph, target_graph, metrics)
+        return metrics
+
+    def evict(self) -> int:
+        cursor = self._connection.execute(
+            "DELETE FROM metrics WHERE key IN (SELECT key FROM metrics ORDER BY last_used DESC LIMIT -1 OFFSET ?)", (self.max_entries,)
+        )
+        self.stats["evicted"] += cursor.rowcount
+        return cursor.rowcount
@@ -0,0 +1,251 @@
+"""
+Soft utterance matching for nodes and edges, robust to typography and slight rephrasing.
+
+The Jaccard metrics compare exact strings, so "No, that's all" and "No, that’s all" do not match.
+Here every utterance is normalized with `utils.normalize_utterance` (NFKC, straight quotes and dashes,
+lowercase, single spaces) and
+turned into a signed hashed vector of its character n-grams with sublinear term frequencies. No
+model, network or GPU is needed and the vectors do not depend on the corpus, so they can be cached.
+
+The similarity of two utterance sets is the mean over the utterances of both sets of the cosine
+similarity to the best match in the other set: 1.0 for equal sets, 0.0 for sets without common
+n-grams. All pairs of a graph are scored with a few matrix products.
+
+Vectors can be cached across runs and processes in a memory-mapped `VectorStore`:
+
+    set_vector_store(VectorStore("results/utterance_vectors"))
+    values, indices = fuzzy_nodes(g1.nodes(data=True), g2.nodes(data=True))
+"""
+
+import functools
+import hashlib
+import json
+import os
+import threading
+import zlib
+from typing import Optional
+
+import numpy as np
+
+from chatsky_llm_autoconfig.instrumentation import traced
+from chatsky_llm_autoconfig.metrics.jaccard import collapse_multiedges, collapse_multinodes
+from chatsky_llm_autoconfig.utils import normalize_utterance
+
+try:
+    import fcntl
+except ImportError:  # Windows: the store is then safe for one process only
+    fcntl = None
+
+DEFAULT_DIM = 1024
+DEFAULT_NGRAM_RANGE = (3, 5)
+
+
+def utterance_id(text: str) -> str:
+    """Id of an utterance in a `VectorStore`: the hash of its normalized text."""
+    return hashlib.blake2b(normalize_utterance(text).encode("utf-8"), digest_size=16).hexdigest()
+
+
+def hashed_vector(text: str, dim: int = DEFAULT_DIM, ngram_range: tuple[int, int] = DEFAULT_NGRAM_RANGE) -> np.ndarray:
+    """L2-normalized float32 vector of the character n-grams of the normalized text; zeros for an empty text."""
+    vector = np.zeros(dim, dtype=np.float32)
+    text = normalize_utterance(text)
+    if not text:
+        return vector
+    padded = f" {text} "
+    hashes = [
+        zlib.crc32(padded[i : i + n].encode("utf-8"))  # noqa: E203
+        for n in range(ngram_range[0], ngram_range[1] + 1)
+        for i in range(max(len(padded) - n + 1, 0))
+    ]
+    if not hashes:
+        hashes = [zlib.crc32(padded.encode("utf-8"))]
+    hashes, counts = np.unique(np.asarray(hashes, dtype=np.uint32), return_counts=True)
+    signs = np.where(hashes & 0x80000000, -1.0, 1.0)
+    np.add.at(vector, hashes % dim, signs * (1.0 + np.log(counts)))
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm > 0 else vector
+
+
+class VectorStore:
+    """
+    Append-only memory-mapped cache of utterance vectors keyed by `utterance_id`.
+
+    The store is three files: `<path>.f32` with the vectors as float32 rows, `<path>.keys` with one
+    utterance id per row and `<path>.json` with the vector parameters. Rows are only ever appended,
+    so readers map the file without loading it; appends take a file lock, so processes of one sweep
+    can share a store.
+    """
+
+    def __init__(self, path: str, dim: int = DEFAULT_DIM, ngram_range: tuple[int, int] = DEFAULT_NGRAM_RANGE):
+        self.path = path
+        self.dim = dim
+        self.ngram_range = tuple(ngram_range)
+        self.stats = {"hits": 0, "misses": 0}
+        self._lock = threading.Lock()
+        self._index = {}
+        self._keys_offset = 0
+        self._vectors = np.zeros((0, dim), dtype=np.float32)
+
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        meta = {"dim": dim, "ngram_range": list(self.ngram_range)}
+        if os.path.exists(f"{path}.json"):
+            with open(f"{path}.json") as f:
+                stored = json.load(f)
+            if stored != meta:
+                raise ValueError(f"Vector store {path} was built with {stored}, not {meta}")
+        else:
+            with open(f"{path}.json", "w") as f:
+                json.dump(meta, f)
+        for suffix in (".f32", ".keys"):
+            open(f"{path}{suffix}", "ab").close()
+        self._refresh()
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    def _refresh(self):
+        # rows are written before their keys, so every key read here has its vector on disk
+        with open(f"{self.path}.keys", "rb") as f:
+            f.seek(self._keys_offset)
+            data = f.read()
+        complete = data[: data.rfind(b"\n") + 1]
+        for key in complete.decode("ascii").split():
+            self._index.setdefault(key, len(self._index))
+        self._keys_offset += len(complete)
+        if len(self._index) > self._vectors.shape[0]:
+            self._vectors = np.memmap(f"{self.path}.f32", dtype=np.float32, mode="r", shape=(len(self._index), self.dim))
+
+    def _append(self, keys: list[str], texts: list[str]):
+        with open(f"{self.path}.keys", "ab") as keys_file:
+            if fcntl is not None:
+                fcntl.flock(keys_file, fcntl.LOCK_EX)
+            try:
+                # another process may have added some of them in the meantime
+                self._refresh()
+                new = [(key, text) for key, text in zip(keys, texts) if key not in self._index]
+                if new:
+                    vectors = np.stack([hashed_vector(text, self.dim, self.ngram_range) for _, text in new])
+                    with open(f"{self.path}.f32", "r+b") as f:
+                        f.seek(len(self._index) * self.dim * 4)
+                        f.write(vectors.astype(np.float32).tobytes())
+                    keys_file.write("".join(f"{key}\n" for key, _ in new).encode("ascii"))
+                    keys_file.flush()
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(keys_file, fcntl.LOCK_UN)
+        self._refresh()
+
+    def get(self, utterances: list[str]) -> np.ndarray:
+        """Vectors of `utterances` as a `(len(utterances), dim)` array, computing and storing the missing ones."""
+        keys = [utterance_id(text) for text in utterances]
+        with self._lock:
+            missing = {key: text for key, text in zip(keys, utterances) if key not in self._index}
+            self.stats["misses"] += len(missing)
+            self.stats["hits"] += len(keys) - len(missing)
+            if missing:
+                self._append(list(missing), list(missing.values()))
+            rows = [self._index[key] for key in keys]
+            return np.asarray(self._vectors[rows], dtype=np.float32).reshape(len(keys), self.dim)
+
+
+_vector_store: Optional[VectorStore] = None
+
+
+@functools.lru_cache(maxsize=8192)
+def _cached_vector(text: str) -> np.ndarray:
+    # target graphs repeat across a sweep, so most utterances are seen many times even without a store
+    vector = hashed_vector(text)
+    vector.setflags(write=False)
+    return vector
+
+
+def set_vector_store(store: Optional[VectorStore]):
+    """Store used by the fuzzy metrics when none is passed explicitly, e.g. by `calculate_metrics`."""
+    global _vector_store
+    _vector_store = store
+
+
+def get_vector_store() -> Optional[VectorStore]:
+    return _vector_store
+
+
+def _vectors(utterances: list[str], store: Optional[VectorStore]) -> np.ndarray:
+    if store is not None:
+        return store.get(utterances)
+    if not utterances:
+        return np.zeros((0, DEFAULT_DIM), dtype=np.float32)
+    return np.stack([_cached_vector(text) for text in utterances])
+
+
+def _flatten(groups: list) -> tuple[list[str], np.ndarray]:
+    utterances, offsets = [], []
+    for group in groups:
+        if isinstance(group, str):
+            group = [group]
+        offsets.append(len(utterances))
+        # an empty group becomes a single empty utterance, whose zero vector matches nothing
+        utterances.extend(dict.fromkeys(group) or [""])
+    return utterances, np.asarray(offsets, dtype=np.int64)
+
+
+def fuzzy_similarity_matrix(left: dict, right: dict, store: Optional[VectorStore] = None, block_size: int = 256) -> np.ndarray:
+    """
+    Soft similarity of every pair of utterance sets in `left` and `right` as a float32 matrix.
+
+    Parameters
+    ----------
+    left, right : dict
+        Keys to lists of utterances, as returned by `collapse_multinodes`/`collapse_multiedges`.
+    store : VectorStore, optional
+        Cache of utterance vectors; defaults to the store set with `set_vector_store`.
+    block_size : int
+        Number of `left` sets scored at once, which bounds the size of the utterance similarity tile.
+    """
+    store = store if store is not None else _vector_store
+    left_groups, right_groups = list(left.values()), list(right.values())
+    result = np.zeros((len(left_groups), len(right_groups)), dtype=np.float32)
+    if not left_groups or not right_groups:
+        return result
+
+    right_utterances, right_offsets = _flatten(right_groups)
+    right_vectors = _vectors(right_utterances, store)
+    right_sizes = np.diff(np.append(right_offsets, len(right_utterances)))
+    for start in range(0, len(left_groups), block_size):
+        left_utterances, left_offsets = _flatten(left_groups[start : start + block_size])  # noqa: E203
+        left_sizes = np.diff(np.append(left_offsets, len(left_utterances)))
+        cosine = _vectors(left_utterances, store) @ right_vectors.T
+        # best match of every left utterance in each right set, summed per left set, and the other way round
+        left_best = np.add.reduceat(np.maximum.reduceat(cosine, right_offsets, axis=1), left_offsets, axis=0)
+        right_best = np.add.reduceat(np.maximum.reduceat(cosine, left_offsets, axis=0), right_offsets, axis=1)
+        similarity = (left_best + right_best) / (left_sizes[:, None] + right_sizes[None, :])
+        result[start : start + len(left_offsets)] = np.clip(np.round(similarity, 6), 0.0, 1.0)  # noqa: E203
+    return result
+
+
+def _best(matrix: np.ndarray, return_matrix: bool):
+    if matrix.shape[1] == 0:
+        values, indices = np.zeros(matrix.shape[0], dtype=np.float32), np.zeros(matrix.shape[0], dtype=int)
+    else:
+        values, indices = np.max(matrix, axis=1), np.argmax(matrix, axis=1)
+    if return_matrix:
+        return values, indices, matrix
+    return values.tolist(), indices.tolist()
+
+
+@traced("metrics.fuzzy_edges")
+def fuzzy_edges(true_graph_edges, generated_graph_edges, store: Optional[VectorStore] = None, return_matrix=False):
+    """
+    Soft counterpart of `jaccard_edges`: best similarity per true edge and the index of the generated edge it is reached at.
+
+    Edges are collapsed by "src->trg" like in `jaccard_edges`, so the results are aligned with it.
+    """
+    matrix = fuzzy_similarity_matrix(collapse_multiedges(list(true_graph_edges)), collapse_multiedges(list(generated_graph_edges)), store)
+    return _best(matrix, return_matrix)
+
+
+@traced("metrics.fuzzy_nodes")
+def fuzzy_nodes(true_graph_nodes, generated_graph_nodes, store: Optional[VectorStore] = None, return_matrix=False):
+    """Soft counterpart of `jaccard_nodes`; rows and columns follow the node order of the graphs."""
+    matrix = fuzzy_similarity_matrix(collapse_multinodes(list(true_graph_nodes)), collapse_multinodes(list(generated_graph_nodes)), store)
+    return _best(matrix, return_matrix)
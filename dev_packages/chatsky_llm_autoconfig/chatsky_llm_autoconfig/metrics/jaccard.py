@@ -1,5 +1,7 @@
 import numpy as np
 
+from chatsky_llm_autoconfig.instrumentation import traced
+
 
 def collapse_multiedges(edges):
     collapsed_edges = {}
@@ -14,6 +16,7 @@ def collapse_multiedges(edges):
     return collapsed_edges
 
 
+@traced("metrics.jaccard_edges")
 def jaccard_edges(true_graph_edges, generated_graph_edges, verbose=False, return_matrix=False):
     """
     true_graph_edges:Graph.edges - ребра истинного графа
@@ -65,6 +68,7 @@ def collapse_multinodes(nodes):
     return collapsed_nodes
 
 
+@traced("metrics.jaccard_nodes")
 def jaccard_nodes(true_graph_nodes, generated_graph_nodes, verbose=False, return_matrix=False):
     """
     true_graph_nodes: Graph.nodes - вершины истинного графа
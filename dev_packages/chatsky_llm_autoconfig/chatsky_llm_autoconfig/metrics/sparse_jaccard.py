@@ -0,0 +1,146 @@
+"""
+Blockwise sparse Jaccard similarity of node and edge utterances for large graphs.
+
+`jaccard_nodes` and `jaccard_edges` fill a dense float64 matrix pair by pair. Here the utterance
+sets are encoded as binary incidence matrices, intersections are computed tile by tile with sparse
+matrix products and only the nonzero similarities (or the `top_k` best per row) are kept, in float32.
+Apart from the result, peak memory is bounded by one `block_size` x `block_size` tile.
+
+Examples
+--------
+    edges = sparse_jaccard_edges(g1.edges(data=True), g2.edges(data=True), top_k=5)
+    edges.get("1->2", "1->3")
+    values, indices = edges.best()
+"""
+
+from dataclasses import dataclass, field
+from typing import Hashable, Iterator, Optional
+
+import numpy as np
+from scipy import sparse
+
+from chatsky_llm_autoconfig.instrumentation import traced
+from chatsky_llm_autoconfig.metrics.jaccard import collapse_multiedges, collapse_multinodes
+
+DEFAULT_BLOCK_SIZE = 1024
+
+
+@dataclass
+class SparseSimilarity:
+    """Similarities as a float32 CSR matrix with the node ids or "src->trg" edge keys of its rows and columns."""
+
+    matrix: sparse.csr_matrix
+    row_keys: list
+    col_keys: list
+    row_index: dict = field(init=False, repr=False)
+    col_index: dict = field(init=False, repr=False)
+
+    def __post_init__(self):
+        self.row_index = {key: i for i, key in enumerate(self.row_keys)}
+        self.col_index = {key: j for j, key in enumerate(self.col_keys)}
+
+    def get(self, row_key: Hashable, col_key: Hashable) -> float:
+        i, j = self.row_index.get(row_key), self.col_index.get(col_key)
+        if i is None or j is None:
+            return 0.0
+        start, end = self.matrix.indptr[i], self.matrix.indptr[i + 1]
+        position = start + np.searchsorted(self.matrix.indices[start:end], j)
+        if position < end and self.matrix.indices[position] == j:
+            return float(self.matrix.data[position])
+        return 0.0
+
+    def row(self, i: int) -> Iterator[tuple[int, float]]:
+        """Column indices and values of the stored similarities in row `i`, in column order."""
+        start, end = self.matrix.indptr[i], self.matrix.indptr[i + 1]
+        return zip(self.matrix.indices[start:end].tolist(), self.matrix.data[start:end].tolist())
+
+    def best(self) -> tuple[np.ndarray, np.ndarray]:
+        """Best similarity per row and its column index, like the max/argmax of the dense functions."""
+        if self.matrix.shape[1] == 0:
+            return np.zeros(self.matrix.shape[0], dtype=np.float32), np.zeros(self.matrix.shape[0], dtype=int)
+        values = self.matrix.max(axis=1).toarray().ravel()
+        indices = np.asarray(self.matrix.argmax(axis=1)).ravel()
+        return values, indices
+
+    def to_dense(self) -> np.ndarray:
+        return self.matrix.toarray()
+
+
+def _incidence(utterance_lists: list, vocabulary: dict) -> tuple[np.ndarray, np.ndarray]:
+    rows, cols = [], []
+    for i, utterances in enumerate(utterance_lists):
+        if isinstance(utterances, str):
+            utterances = [utterances]
+        for utterance in set(utterances):
+            rows.append(i)
+            cols.append(vocabulary.setdefault(utterance, len(vocabulary)))
+    return np.asarray(rows, dtype=np.int64), np.asarray(cols, dtype=np.int64)
+
+
+def _top_k_per_row(rows: np.ndarray, cols: np.ndarray, values: np.ndarray, k: int):
+    # best values first within each row, lower column first on ties like np.argmax
+    order = np.lexsort((cols, -values, rows))
+    rows, cols, values = rows[order], cols[order], values[order]
+    rank = np.arange(rows.size) - np.searchsorted(rows, rows, side="left")
+    keep = rank < k
+    return rows[keep], cols[keep], values[keep]
+
+
+@traced("metrics.blockwise_jaccard")
+def blockwise_jaccard(left: dict, right: dict, top_k: Optional[int] = None, block_size: int = DEFAULT_BLOCK_SIZE) -> SparseSimilarity:
+    """
+    Jaccard similarity of every pair of utterance sets in `left` and `right`, computed in tiles.
+
+    Parameters
+    ----------
+    left, right : dict
+        Keys (node ids or edge keys) to lists of utterances, as returned by `collapse_multinodes`/`collapse_multiedges`.
+    top_k : int, optional
+        Keep only the `top_k` most similar columns per row; by default every nonzero similarity is kept.
+    block_size : int
+        Rows and columns per tile.
+    """
+    vocabulary = {}
+    left_rows, left_cols = _incidence(list(left.values()), vocabulary)
+    right_rows, right_cols = _incidence(list(right.values()), vocabulary)
+    n, m = len(left), len(right)
+    a = sparse.csr_matrix((np.ones(left_rows.size, dtype=np.float32), (left_rows, left_cols)), shape=(n, len(vocabulary)))
+    b = sparse.csr_matrix((np.ones(right_rows.size, dtype=np.float32), (right_rows, right_cols)), shape=(m, len(vocabulary)))
+    left_sizes = np.diff(a.indptr).astype(np.float32)
+    right_sizes = np.diff(b.indptr).astype(np.float32)
+
+    empty = (np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32))
+    parts = [empty]
+    for r0 in range(0, n, block_size):
+        block = a[r0 : r0 + block_size]  # noqa: E203
+        block_parts = []
+        for c0 in range(0, m, block_size):
+            intersection = (block @ b[c0 : c0 + block_size].T).tocoo()  # noqa: E203
+            if intersection.nnz == 0:
+                continue
+            rows = intersection.row.astype(np.int64) + r0
+            cols = intersection.col.astype(np.int64) + c0
+            union = left_sizes[rows] + right_sizes[cols] - intersection.data
+            block_parts.append((rows, cols, (intersection.data / union).astype(np.float32)))
+            if top_k is not None:
+                block_parts = [_top_k_per_row(*map(np.concatenate, zip(*block_parts)), top_k)]
+        parts.extend(block_parts)
+
+    rows, cols, values = map(np.concatenate, zip(*parts))
+    matrix = sparse.csr_matrix((values, (rows, cols)), shape=(n, m), dtype=np.float32)
+    matrix.sort_indices()
+    return SparseSimilarity(matrix, list(left.keys()), list(right.keys()))
+
+
+def sparse_jaccard_edges(
+    true_graph_edges, generated_graph_edges, top_k: Optional[int] = None, block_size: int = DEFAULT_BLOCK_SIZE
+) -> SparseSimilarity:
+    """Sparse counterpart of `jaccard_edges(..., return_matrix=True)`; rows and columns are "src->trg" keys of the collapsed multiedges."""
+    return blockwise_jaccard(collapse_multiedges(list(true_graph_edges)), collapse_multiedges(list(generated_graph_edges)), top_k, block_size)
+
+
+def sparse_jaccard_nodes(
+    true_graph_nodes, generated_graph_nodes, top_k: Optional[int] = None, block_size: int = DEFAULT_BLOCK_SIZE
+) -> SparseSimilarity:
+    """Sparse counterpart of `jaccard_nodes(..., return_matrix=True)`; rows and columns are node ids."""
+    return blockwise_jaccard(collapse_multinodes(list(true_graph_nodes)), collapse_multinodes(list(generated_graph_nodes)), top_k, block_size)
@@ -124,8 +124,9 @@ def test_complex_graph():
     assert np.array_equal(matrix, m)
 
 
-test_single_nodes()
-test_chain_with_equal_number_of_nodes()
-test_cycle_with_missing_edge()
-test_split_node()
-test_complex_graph()
+if __name__ == "__main__":
+    test_single_nodes()
+    test_chain_with_equal_number_of_nodes()
+    test_cycle_with_missing_edge()
+    test_split_node()
+    test_complex_graph()
@@ -1,4 +1,5 @@
 import networkx as nx
+from chatsky_llm_autoconfig.instrumentation import traced
 from chatsky_llm_autoconfig.metrics.jaccard import jaccard_edges, jaccard_nodes, collapse_multiedges
 
 
@@ -17,7 +18,15 @@ def parse_edge(edge):
     return src - 1, trg - 1
 
 
-def triplet_match(G1, G2, change_to_original_ids=False):
+@traced("metrics.triplet_match")
+def triplet_match(G1, G2, change_to_original_ids=False, sparse=False, top_k=None, block_size=1024):
+    """
+    Maps nodes and edges of G1 to the nodes and edges of G2 with the most similar utterances.
+
+    With `sparse=True` the similarities are computed blockwise (see `metrics.sparse_jaccard`) and only
+    the edge pairs with shared utterances are visited, so memory stays bounded on large graphs.
+    `top_k` additionally keeps only the k most similar edges and nodes of G2 per edge or node of G1.
+    """
     g1 = G1.nx_graph
     g2 = G2.nx_graph
     node_mapping = {node: None for node in g1.nodes}
@@ -35,44 +44,65 @@ def triplet_match(G1, G2, change_to_original_ids=False):
     edge_mapping = {}
     mapping_jaccard_values = {}
 
-    edges1 = list(collapse_multiedges(g1.edges(data=True)).keys())
-    edges2 = list(collapse_multiedges(g2.edges(data=True)).keys())
+    if sparse:
+        # scipy is only needed here, keep it out of the imports of evaluate, cli and sweep
+        from chatsky_llm_autoconfig.metrics.sparse_jaccard import sparse_jaccard_edges, sparse_jaccard_nodes
+
+        edge_similarity = sparse_jaccard_edges(g1.edges(data=True), g2.edges(data=True), top_k, block_size)
+        node_similarity = sparse_jaccard_nodes(g1.nodes(data=True), g2.nodes(data=True), top_k, block_size)
+        edges1, edges2 = edge_similarity.row_keys, edge_similarity.col_keys
+
+        def edge_pairs(i):
+            return edge_similarity.row(i)
 
-    _, _, matrix_edges = jaccard_edges(g1.edges(data=True), g2.edges(data=True), verbose=False, return_matrix=True)
+        def node_value(src, trg):
+            return node_similarity.get(src + 1, trg + 1)
+
+    else:
+        edges1 = list(collapse_multiedges(g1.edges(data=True)).keys())
+        edges2 = list(collapse_multiedges(g2.edges(data=True)).keys())
 
-    _, _, matrix_nodes = jaccard_nodes(g1.nodes(data=True), g2.nodes(data=True), verbose=False, return_matrix=True)
+        _, _, matrix_edges = jaccard_edges(g1.edges(data=True), g2.edges(data=True), verbose=False, return_matrix=True)
+
+        _, _, matrix_nodes = jaccard_nodes(g1.nodes(data=True), g2.nodes(data=True), verbose=False, return_matrix=True)
+
+        def edge_pairs(i):
+            return ((j, matrix_edges[i][j]) for j in range(len(edges2)) if matrix_edges[i][j] > 0)
+
+        def node_value(src, trg):
+            return matrix_nodes[src][trg]
 
     for i, edge1 in enumerate(edges1):
         edge_mapping[edge1] = None
         mapping_jaccard_values[edge1] = 0
-        for j, edge2 in enumerate(edges2):
-            if matrix_edges[i][j] > 0:
-                node1_src, node1_trg = parse_edge(edge1)
-                node2_src, node2_trg = parse_edge(edge2)
-                if matrix_nodes[node1_src][node2_src] == 0.0 and matrix_nodes[node1_trg][node2_trg] == 0.0:
-                    continue
-                elif matrix_nodes[node1_src][node2_src] > 0 and matrix_nodes[node1_trg][node2_trg] > 0:
-                    if matrix_edges[i][j] > mapping_jaccard_values[edge1]:
-                        mapping_jaccard_values[edge1] = matrix_edges[i][j]
-                        edge_mapping[edge1] = edge2
-                        node_mapping[node1_src + 1] = node2_src + 1
-                        node_mapping[node1_trg + 1] = node2_trg + 1
-                else:
-                    node1_src_nx = g1.nodes[node1_src + 1]
-                    node2_src_nx = g2.nodes[node2_src + 1]
-                    if node1_src_nx == node2_src_nx:
-                        node_mapping[node1_src + 1] = node2_src + 1
-
-                    node1_trg_nx = g1.nodes[node1_trg + 1]
-                    node2_trg_nx = g2.nodes[node2_trg + 1]
-                    if node1_trg_nx == node2_trg_nx:
-                        node_mapping[node1_trg + 1] = node2_trg + 1
-                    print(
-                        f'The nodes of edges {edges1[i]} and {edges2[j]} has something in common, but not complete match: Sources: {node1_src_nx["utterances"]}, {node2_src_nx["utterances"]}'
-                    )
-                    print(
-                        f'The nodes of edges {edges1[i]} and {edges2[j]} has something in common, but not complete match: Targets: {node1_trg_nx["utterances"]}, {node2_trg_nx["utterances"]}'
-                    )
+        for j, edge_value in edge_pairs(i):
+            edge2 = edges2[j]
+            node1_src, node1_trg = parse_edge(edge1)
+            node2_src, node2_trg = parse_edge(edge2)
+            if node_value(node1_src, node2_src) == 0.0 and node_value(node1_trg, node2_trg) == 0.0:
+                continue
+            elif node_value(node1_src, node2_src) > 0 and node_value(node1_trg, node2_trg) > 0:
+                if edge_value > mapping_jaccard_values[edge1]:
+                    mapping_jaccard_values[edge1] = edge_value
+                    edge_mapping[edge1] = edge2
+                    node_mapping[node1_src + 1] = node2_src + 1
+                    node_mapping[node1_trg + 1] = node2_trg + 1
+            else:
+                node1_src_nx = g1.nodes[node1_src + 1]
+                node2_src_nx = g2.nodes[node2_src + 1]
+                if node1_src_nx == node2_src_nx:
+                    node_mapping[node1_src + 1] = node2_src + 1
+
+                node1_trg_nx = g1.nodes[node1_trg + 1]
+                node2_trg_nx = g2.nodes[node2_trg + 1]
+                if node1_trg_nx == node2_trg_nx:
+                    node_mapping[node1_trg + 1] = node2_trg + 1
+                print(
+                    f'The nodes of edges {edges1[i]} and {edges2[j]} has something in common, but not complete match: Sources: {node1_src_nx["utterances"]}, {node2_src_nx["utterances"]}'
+                )
+                print(
+                    f'The nodes of edges {edges1[i]} and {edges2[j]} has something in common, but not complete match: Targets: {node1_trg_nx["utterances"]}, {node2_trg_nx["utterances"]}'
+                )
 
     if G1.node_mapping != {} and change_to_original_ids:
         new_node_mapping = {}
@@ -1,23 +1,123 @@
-from chatsky_llm_autoconfig.utils import call_llm_api
-from chatsky_llm_autoconfig.prompts import (
-    check_graph_utterances_prompt,
-    check_graph_validity_prompt,
-    cycle_graph_generation_prompt,
-)
+import asyncio
+import json
+import logging
+
+from chatsky_llm_autoconfig import prompts
+from chatsky_llm_autoconfig.compact_format import CompactFormatError, format_dialogue, parse_compact_graph
+from chatsky_llm_autoconfig.utils import acall_llm_api, call_llm_api
+from chatsky_llm_autoconfig.consistency import try_check_dialogue
+from chatsky_llm_autoconfig.merge import merge_partial_graphs, split_dialogue
+from chatsky_llm_autoconfig.scoring import GraphScore, best_candidate, score_graph
+from chatsky_llm_autoconfig.validation import validate_graph
+
+logger = logging.getLogger(__name__)
+
+
+OUTPUT_FORMATS = ("json", "compact")
+
+
+def _graph_prompt(dialog, output_format: str) -> str:
+    if output_format == "compact":
+        return prompts.compact_graph_generation_prompt.format(dialog=format_dialogue(list(dialog)))
+    if output_format != "json":
+        raise ValueError(f"output_format must be one of {OUTPUT_FORMATS}, got {output_format!r}")
+    return prompts.cycle_graph_generation_prompt.format(dialog=dialog)
+
+
+def _graph_json(response, dialog, output_format: str):
+    """The answer as a JSON graph string; compact answers are parsed, None if that fails."""
+    if response is None or output_format != "compact":
+        return response
+    try:
+        return json.dumps(parse_compact_graph(response, list(dialog)), ensure_ascii=False)
+    except CompactFormatError as e:
+        logger.warning(f"Invalid compact graph: {e}")
+        return None
 
 
 class DialogModel:
     def __init__(self):
         pass
 
-    def create_graph(self, dialog, model, temp=0.3):
-        graph = call_llm_api(cycle_graph_generation_prompt.format(dialog=dialog), model, temp)
-        return graph
+    def create_graph(self, dialog, model, temp=0.3, chunk_size=None, overlap=4, output_format="json"):
+        """
+        Generate a graph for the dialogue and return it as a JSON string.
+
+        With `chunk_size` set, dialogues longer than `chunk_size` turns are split into windows
+        that share `overlap` turns, the windows are sent concurrently and the partial graphs are
+        merged locally by the utterances they share (see `acreate_graph` inside a running event loop).
+        With `output_format="compact"` the model answers in the line format of `compact_format`,
+        which takes several times fewer completion tokens, and the answer is converted to JSON here.
+        """
+        if chunk_size is not None and len(dialog) > chunk_size:
+            return asyncio.run(self.acreate_graph(dialog, model, temp, chunk_size, overlap, output_format))
+        graph = call_llm_api(_graph_prompt(dialog, output_format), model, temp)
+        return _graph_json(graph, dialog, output_format)
+
+    async def acreate_graph(self, dialog, model, temp=0.3, chunk_size=None, overlap=4, output_format="json"):
+        windows = split_dialogue(list(dialog), chunk_size, overlap) if chunk_size is not None else [list(dialog)]
+        responses = await asyncio.gather(*(acall_llm_api(_graph_prompt(window, output_format), model, temp) for window in windows))
+        responses = [_graph_json(response, window, output_format) for response, window in zip(responses, windows)]
+        if len(windows) == 1:
+            return responses[0]
+
+        partials = []
+        for idx, response in enumerate(responses):
+            if response is None or validate_graph(response, require_start=False, check_reachability=False):
+                logger.warning(f"Dropping invalid partial graph for window {idx} of {len(windows)}")
+                continue
+            partials.append(json.loads(response))
+        if not partials:
+            return None
+        return json.dumps(merge_partial_graphs(partials), ensure_ascii=False)
+
+    def create_graph_best_of_n(self, dialog, models, n=4, temps=None, threshold=0.95):
+        return asyncio.run(self.acreate_graph_best_of_n(dialog, models, n, temps, threshold))
+
+    async def acreate_graph_best_of_n(self, dialog, models, n=4, temps=None, threshold=0.95) -> tuple[str | None, GraphScore]:
+        """
+        Generate `n` candidate graphs concurrently and return the best one with its local score.
+
+        Candidates cycle through `models` (one model or a list) and `temps`; a temperature is bound
+        to the model with langchain's `bind`. Every finished candidate is scored with
+        `scoring.score_graph` and once one reaches `threshold` the rest are cancelled.
+        """
+        models = models if isinstance(models, (list, tuple)) else [models]
+        prompt = prompts.cycle_graph_generation_prompt.format(dialog=dialog)
+        tasks = []
+        for idx in range(n):
+            model = models[idx % len(models)]
+            if temps:
+                model = model.bind(temperature=temps[idx % len(temps)])
+            tasks.append(asyncio.ensure_future(acall_llm_api(prompt, model)))
+
+        candidates = []
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                graph = await next_done
+                score = score_graph(graph, dialog)
+                candidates.append((graph, score))
+                if score.total >= threshold:
+                    break
+        finally:
+            for task in tasks:
+                task.cancel()
+        logger.info(f"Best-of-{n}: scored {len(candidates)} candidates, scores {[round(score.total, 3) for _, score in candidates]}")
+        return best_candidate(candidates)
 
-    def check_graph_utterances(self, dialog, graph, model, temp=0.3):
-        utterances = call_llm_api(check_graph_utterances_prompt.format(dialog=dialog, graph=graph), model, temp)
+    def check_graph_utterances(self, dialog, graph, model, temp=0.3, local_first=True):
+        # the local replay is exact, so the LLM is asked only when some utterance was not found verbatim
+        if local_first:
+            report = try_check_dialogue(dialog, graph)
+            if report is not None and report.decided:
+                return report.utterances_summary()
+        utterances = call_llm_api(prompts.check_graph_utterances_prompt.format(dialog=dialog, graph=graph), model, temp)
         return utterances
 
-    def check_graph_validity(self, dialog, rules, model, temp=0.3):
-        valid = call_llm_api(check_graph_validity_prompt.format(dialog=dialog, rules=rules), model, temp)
+    def check_graph_validity(self, dialog, rules, model, temp=0.3, local_first=True):
+        if local_first:
+            report = try_check_dialogue(dialog, rules)
+            if report is not None and report.decided:
+                return "YES" if report.valid else "NO"
+        valid = call_llm_api(prompts.check_graph_validity_prompt.format(dialog=dialog, rules=rules), model, temp)
         return valid
@@ -1,7 +1,8 @@
-from langchain.prompts import PromptTemplate
+# Template strings by prompt name. The PromptTemplate objects are built on first attribute access
+# (see `__getattr__` at the bottom), so importing this module does not import langchain.
+_TEMPLATES = {}
 
-
-create_graph_prompt = PromptTemplate.from_template(
+_TEMPLATES["create_graph_prompt"] = (
     "You have an example of dialogue from customer chatbot system. You also have an "
     "example of set of rules how chatbot system works should be looking - it is "
     "a set of nodes when chatbot system respons and a set of transitions that are "
@@ -75,7 +76,7 @@ create_graph_prompt = PromptTemplate.from_template(
     "Dialogue: {dialog}"
 )
 
-check_graph_utterances_prompt = PromptTemplate.from_template(
+_TEMPLATES["check_graph_utterances_prompt"] = (
     "You have a dialogue and a structure of graph built on this dialogue it is a "
     "set of nodes when chatbot system responses and a set of transitions that are triggered by user requests.\n"
     "Please say if for every utterance in the dialogue there exist either a utteranse in node or in some edge. "
@@ -85,7 +86,7 @@ check_graph_utterances_prompt = PromptTemplate.from_template(
     "just print the list of utteance and whether there exsit a valid edge of node contating it, if contains print the node or edge"
 )
 
-check_graph_validity_prompt = PromptTemplate.from_template(
+_TEMPLATES["check_graph_validity_prompt"] = (
     "1. You have an example of dialogue from customer chatbot system.\n"
     "2. You also have a set of rules how chatbot system works - a set of "
     "nodes when chatbot system respons and a set of transitions that are triggered by user requests.\n"
@@ -95,7 +96,7 @@ check_graph_validity_prompt = PromptTemplate.from_template(
     "could'nt happen because it contradicts the rules print NO.\nDialogue: {dialog}.\nSet of rules: {rules}"
 )
 
-cycle_graph_generation_prompt = PromptTemplate.from_template(
+_TEMPLATES["cycle_graph_generation_prompt"] = (
     "You have an example of dialogue from customer chatbot system. You also have an "
     "example of set of rules how chatbot system works should be looking - it is "
     "a set of nodes when chatbot system respons and a set of transitions that are "
@@ -283,3 +284,85 @@ cycle_graph_generation_prompt = PromptTemplate.from_template(
     "IMPORTANT: all the dialogues you've prompted are cyclic. Before answering you must check where the dialog can loop or cycle and make the first node of a cycle a target node for the last node of the cycle. Brackets must be changed back into curly braces to create a valid JSON string. Return ONLY JSON string in plain text (no code blocks) without any additional commentaries."
     "Dialogue: {dialog}"
 )
+
+# same task as cycle_graph_generation_prompt, answered in the line format of `compact_format`;
+# {dialog} is the output of `compact_format.format_dialogue`
+_TEMPLATES["compact_graph_generation_prompt"] = (
+    "You are building the dialogue graph of a customer chatbot system from a dialogue. Nodes hold assistant utterances, "
+    "edges hold the user utterances that trigger transitions between nodes.\n"
+    "The turns of the dialogue are numbered. Answer with one line per node and one line per edge, referring to utterances by turn number:\n"
+    "N<id> <label> <turn numbers> - a node with a one-word snake_case label and the assistant turns it holds; write N<id>* for the start node.\n"
+    "E<source>><target> <turn numbers> - an edge from node <source> to node <target> with the user turns that trigger it.\n"
+    "Put assistant turns that say the same thing into one node and user turns that mean the same answer into one edge. "
+    "Every turn of the dialogue must be in a node or an edge. Do not forget ending nodes with goodbyes. "
+    "The dialogue can go through a loop several times: reuse the nodes of the loop and make the first node of the cycle "
+    "the target of the edge that closes it.\n"
+    "Example dialogue:\n"
+    "0 assistant: How can I help?\n"
+    "1 user: Do you have apples?\n"
+    "2 assistant: Yes, add it to your cart?\n"
+    "3 user: No\n"
+    "4 assistant: Okay. Anything else?\n"
+    "5 user: I need a pack of chips\n"
+    "6 assistant: Yes, add it to your cart?\n"
+    "7 user: Yes\n"
+    "8 assistant: Done. Anything else?\n"
+    "9 user: No, that’s all\n"
+    "10 assistant: Thank you, goodbye!\n"
+    "Answer:\n"
+    "N1* start 0\n"
+    "N2 ask_to_add 2\n"
+    "N3 anything_else 4 8\n"
+    "N4 goodbye 10\n"
+    "E1>2 1\n"
+    "E2>3 3 7\n"
+    "E3>2 5\n"
+    "E3>4 9\n"
+    "This is the end of the example. Return ONLY the node and edge lines in plain text (no code blocks) without any additional commentaries.\n"
+    "Dialogue:\n{dialog}"
+)
+
+_TEMPLATES["graph_delta_prompt"] = (
+    "You are extending an existing dialogue graph of a customer chatbot system. Nodes hold assistant utterances, "
+    "edges hold user utterances that trigger transitions between nodes.\n"
+    "Existing nodes (id: label: example utterance):\n{nodes}\n"
+    "Here is a fragment of a new dialogue. Turns marked with [node N] are already placed in node N, "
+    "unmarked assistant turns are not in the graph yet:\n{fragment}\n"
+    "Place every unmarked assistant utterance either into an existing node (if it means the same as that node) "
+    "or into a new node with an id starting from {next_id}. Connect the fragment with edges carrying the user utterances. "
+    "Do not repeat utterances that are already in the graph and do not make up new ones. "
+    'Return ONLY a JSON object {{"nodes": [{{"id": ..., "label": ..., "utterances": [...]}}], '
+    '"edges": [{{"source": ..., "target": ..., "utterances": [...]}}]}} in plain text (no code blocks) '
+    "with only the new or extended nodes and edges."
+)
+
+_TEMPLATES["graph_repair_prompt"] = (
+    "You are fixing a dialogue graph of a customer chatbot system. Nodes hold assistant utterances, "
+    "edges hold user utterances that trigger transitions between nodes.\n"
+    "All nodes of the graph (id: label: example utterance):\n{nodes}\n"
+    "Problems found in the graph:\n{problems}\n"
+    "Entries with problems:\n{entries}\n"
+    "Dialogue turns missing from the graph, marked [missing], with their context "
+    "(turns marked [node N] or [edge S->T] are already in the graph):\n{turns}\n"
+    "Fix only these problems. Put every missing assistant turn into an existing node (if it means the same as that node) "
+    "or into a new node with an id starting from {next_id}, and every missing user turn into an edge between "
+    "the nodes of its neighbouring assistant turns. Copy utterances exactly from the dialogue. "
+    'Return ONLY a JSON object {{"nodes": [{{"id": ..., "label": ..., "is_start": ..., "utterances": [...]}}], '
+    '"edges": [{{"source": ..., "target": ..., "utterances": [...]}}]}} in plain text (no code blocks) '
+    "with the corrected versions of the listed entries and the new or extended nodes and edges. "
+    "A listed edge you leave out is deleted, all other entries stay as they are."
+)
+
+
+def __getattr__(name):
+    if name not in _TEMPLATES:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    from langchain.prompts import PromptTemplate
+
+    prompt = PromptTemplate.from_template(_TEMPLATES[name])
+    globals()[name] = prompt
+    return prompt
+
+
+def __dir__():
+    return sorted(list(globals()) + list(_TEMPLATES))
@@ -0,0 +1,396 @@
+"""
+Static SVG and HTML rendering of graphs and of target/predicted graph pairs.
+
+The matplotlib plots of `evaluate.save_graph_comparison` compute a Kamada-Kawai layout and rasterize
+a PNG on every call. Here the layout of a graph is computed once per graph structure and cached by
+its hash, in memory and optionally in a directory shared by all processes of a batch, and graphs are
+written as SVG, whose size grows with the graph rather than with the picture. Utterances are shown as
+tooltips (SVG `<title>`) instead of labels drawn over the picture.
+
+Graphs of up to `EXACT_LAYOUT_NODES` nodes get the Kamada-Kawai layout of the matplotlib plots. Larger
+graphs get a layered layout, linear in the size of the graph: nodes are placed in columns by their
+BFS depth from the start node and ordered within a column by the mean row of their predecessors.
+
+`comparison_html` shows a target and a predicted graph side by side, with nodes and edges colored
+as matched, missing (target only) or extra (predicted only) according to a node mapping,
+`graph_diff.map_nodes` by default. `render_pairs` renders many pairs in a process pool and writes an
+`index.html` linking them.
+
+Examples
+--------
+    with open("graph_comparison_0.html", "w") as f:
+        f.write(comparison_html(target_graph, predicted_graph))
+    render_pairs([(item["target_graph"], item["predicted_graph"]) for item in data], "plots", cache_dir="layout_cache")
+"""
+
+import hashlib
+import html
+import json
+import math
+import os
+import tempfile
+from collections import OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Hashable, Optional
+
+import networkx as nx
+
+from chatsky_llm_autoconfig.instrumentation import traced
+from chatsky_llm_autoconfig.utils import get_utterances
+
+# bump whenever the layout functions change, cached layouts of older versions are ignored
+LAYOUT_VERSION = 1
+EXACT_LAYOUT_NODES = 100
+
+NODE_RADIUS = 18
+COLUMN_GAP = 140
+ROW_GAP = 70
+MARGIN = 40
+LABEL_LENGTH = 18
+
+_STYLE = """
+body { font-family: sans-serif; margin: 16px; }
+.pair { display: flex; gap: 16px; }
+.pair figure { flex: 1; margin: 0; border: 1px solid #ddd; }
+figcaption { padding: 4px 8px; background: #f5f5f5; }
+svg.graph { width: 100%; height: auto; max-height: 85vh; }
+.edge path { fill: none; stroke: #888; stroke-width: 1.5; }
+.edge:hover path { stroke-width: 4; }
+.node circle { fill: #add8e6; stroke: #555; stroke-width: 1; }
+.node.start circle { stroke-width: 3; }
+.node text { font-size: 11px; text-anchor: middle; pointer-events: none; }
+.matched circle { fill: #b7e4b0; } .edge.matched path { stroke: #3c9a35; }
+.missing circle { fill: #f4b6b6; } .edge.missing path { stroke: #d43c3c; stroke-dasharray: 5 3; }
+.extra circle { fill: #ffd59a; } .edge.extra path { stroke: #e08a00; stroke-dasharray: 2 3; }
+.legend span { margin-right: 12px; padding: 0 6px; }
+"""
+
+_LEGEND = '<p class="legend"><span style="background:#b7e4b0">matched</span><span style="background:#f4b6b6">missing</span><span style="background:#ffd59a">extra</span></p>'
+
+
+def _structure(graph_dict: dict) -> tuple[list, list, list]:
+    ids = [node["id"] for node in graph_dict["nodes"]]
+    known = set(ids)
+    pairs = sorted(
+        {(edge["source"], edge["target"]) for edge in graph_dict["edges"] if edge["source"] in known and edge["target"] in known}, key=repr
+    )
+    starts = [node["id"] for node in graph_dict["nodes"] if node.get("is_start")]
+    return ids, pairs, starts
+
+
+def layout_key(graph_dict: dict) -> str:
+    """Hash of what the layout depends on: node ids in order, start nodes and the connected node pairs."""
+    ids, pairs, starts = _structure(graph_dict)
+    payload = json.dumps([LAYOUT_VERSION, ids, starts, pairs], default=repr, separators=(",", ":"))
+    return hashlib.blake2b(payload.encode("utf-8"), digest_size=16).hexdigest()
+
+
+def _exact_layout(ids: list, pairs: list) -> dict:
+    graph = nx.DiGraph()
+    graph.add_nodes_from(ids)
+    graph.add_edges_from(pairs)
+    side = max(2 * COLUMN_GAP, COLUMN_GAP * math.sqrt(len(ids)))
+    positions = nx.kamada_kawai_layout(graph) if len(ids) > 1 else {node: (0.0, 0.0) for node in ids}
+    return {node: ((x + 1) / 2 * side, (y + 1) / 2 * side) for node, (x, y) in positions.items()}
+
+
+def _layered_layout(ids: list, pairs: list, starts: list) -> dict:
+    successors = {node: [] for node in ids}
+    predecessors = {node: [] for node in ids}
+    for source, target in pairs:
+        successors[source].append(target)
+        predecessors[target].append(source)
+
+    depth = {}
+    for root in starts + ids:
+        # unreachable parts of the graph continue in the columns after the reachable ones
+        if root in depth:
+            continue
+        depth[root] = max(depth.values(), default=-1) + 1
+        queue = deque([root])
+        while queue:
+            node = queue.popleft()
+            for target in successors[node]:
+                if target not in depth:
+                    depth[target] = depth[node] + 1
+                    queue.append(target)
+
+    columns = {}
+    for node in ids:
+        columns.setdefault(depth[node], []).append(node)
+    rows, order = {}, {node: i for i, node in enumerate(ids)}
+    for column in sorted(columns):
+        placed = []
+        for node in columns[column]:
+            known = [rows[source] for source in predecessors[node] if source in rows]
+            placed.append((sum(known) / len(known) if known else math.inf, order[node], node))
+        for row, (_, _, node) in enumerate(sorted(placed)):
+            rows[node] = row
+    return {node: (depth[node] * COLUMN_GAP, rows[node] * ROW_GAP) for node in ids}
+
+
+@traced("plot.layout")
+def compute_layout(graph_dict: dict) -> dict:
+    """Node id -> (x, y) position in SVG units, see the module docstring."""
+    ids, pairs, starts = _structure(graph_dict)
+    if len(ids) <= EXACT_LAYOUT_NODES:
+        return _exact_layout(ids, pairs)
+    return _layered_layout(ids, pairs, starts)
+
+
+class LayoutCache:
+    """
+    Layouts by `layout_key`: the last `max_entries` in memory and, with `directory`, every layout as a JSON file.
+
+    The directory can be shared by the processes of a pool and by later runs; files are written
+    atomically, so a reader never sees a partial layout.
+    """
+
+    def __init__(self, directory: Optional[str] = None, max_entries: int = 1024):
+        self.directory = directory
+        self.max_entries = max_entries
+        self.stats = {"hits": 0, "misses": 0}
+        self._memory: OrderedDict = OrderedDict()
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def __getstate__(self):
+        # processes of a pool share the directory, not the memory
+        return {"directory": self.directory, "max_entries": self.max_entries}
+
+    def __setstate__(self, state):
+        self.__init__(**state)
+
+    def _remember(self, key: str, positions: dict):
+        self._memory[key] = positions
+        self._memory.move_to_end(key)
+        if len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def _load(self, key: str) -> Optional[dict]:
+        if not self.directory:
+            return None
+        try:
+            with open(os.path.join(self.directory, f"{key}.json")) as f:
+                return {node: tuple(position) for node, position in json.load(f)}
+        except (OSError, ValueError):
+            return None
+
+    def _save(self, key: str, positions: dict):
+        if not self.directory:
+            return
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        with os.fdopen(fd, "w") as f:
+            json.dump([[node, [round(x, 2), round(y, 2)]] for node, (x, y) in positions.items()], f, separators=(",", ":"))
+        os.replace(tmp_path, os.path.join(self.directory, f"{key}.json"))
+
+    def layout(self, graph_dict: dict) -> dict:
+        """Cached `compute_layout` of `graph_dict`."""
+        key = layout_key(graph_dict)
+        positions = self._memory.get(key)
+        if positions is None:
+            positions = self._load(key)
+        if positions is None:
+            self.stats["misses"] += 1
+            positions = compute_layout(graph_dict)
+            self._save(key, positions)
+        else:
+            self.stats["hits"] += 1
+        self._remember(key, positions)
+        return positions
+
+
+_default_cache = LayoutCache()
+
+
+def layout(graph_dict: dict, cache: Optional[LayoutCache] = None) -> dict:
+    """Node id -> (x, y) of `graph_dict`, from `cache` or the in-memory cache of the process."""
+    return (cache or _default_cache).layout(graph_dict)
+
+
+def _short(text: str) -> str:
+    return text if len(text) <= LABEL_LENGTH else text[: LABEL_LENGTH - 1] + "…"
+
+
+def _edge_path(start: tuple, end: tuple, bend: float) -> str:
+    (x1, y1), (x2, y2) = start, end
+    if (x1, y1) == (x2, y2):
+        r = NODE_RADIUS
+        return f"M{x1 - r / 2:.1f},{y1 - r:.1f} C{x1 - 2 * r:.1f},{y1 - 3 * r:.1f} {x1 + 2 * r:.1f},{y1 - 3 * r:.1f} {x1 + r / 2:.1f},{y1 - r:.1f}"
+    dx, dy = x2 - x1, y2 - y1
+    length = math.hypot(dx, dy)
+    # bend every edge to its left, so the edges of a pair of opposite transitions do not overlap
+    cx, cy = (x1 + x2) / 2 - dy * bend, (y1 + y2) / 2 + dx * bend
+    ex, ey = x2 - cx, y2 - cy
+    shorten = NODE_RADIUS / (math.hypot(ex, ey) or length)
+    return f"M{x1:.1f},{y1:.1f} Q{cx:.1f},{cy:.1f} {x2 - ex * shorten:.1f},{y2 - ey * shorten:.1f}"
+
+
+def graph_svg(
+    graph_dict: dict,
+    positions: Optional[dict] = None,
+    node_classes: Optional[dict] = None,
+    edge_classes: Optional[dict] = None,
+    cache: Optional[LayoutCache] = None,
+) -> str:
+    """
+    SVG of a graph dict.
+
+    Parameters
+    ----------
+    graph_dict : dict
+        The graph; parallel edges are drawn as one edge with the utterances of all of them.
+    positions : dict, optional
+        Node id -> (x, y); the cached `layout` of the graph by default.
+    node_classes, edge_classes : dict, optional
+        CSS class of a node id or of a (source, target) pair, e.g. "matched".
+    cache : LayoutCache, optional
+        Cache used when `positions` is not given.
+    """
+    positions = positions if positions is not None else layout(graph_dict, cache)
+    node_classes, edge_classes = node_classes or {}, edge_classes or {}
+    if positions:
+        xs, ys = [x for x, _ in positions.values()], [y for _, y in positions.values()]
+        left, top = min(xs) - MARGIN, min(ys) - MARGIN - NODE_RADIUS
+        width, height = max(xs) - min(xs) + 2 * MARGIN, max(ys) - min(ys) + 2 * MARGIN + NODE_RADIUS
+    else:
+        left, top, width, height = 0, 0, 2 * MARGIN, 2 * MARGIN
+
+    parts = [
+        f'<svg class="graph" xmlns="http://www.w3.org/2000/svg" viewBox="{left:.0f} {top:.0f} {width:.0f} {height:.0f}">',
+        '<defs><marker id="arrow" viewBox="0 0 10 10" refX="10" refY="5" markerWidth="6" markerHeight="6" orient="auto-start-reverse">'
+        '<path d="M0,0L10,5L0,10z" fill="#666"/></marker></defs>',
+    ]
+
+    pairs = {}
+    for edge in graph_dict["edges"]:
+        if edge["source"] in positions and edge["target"] in positions:
+            pairs.setdefault((edge["source"], edge["target"]), []).extend(get_utterances(edge))
+    for (source, target), utterances in pairs.items():
+        path = _edge_path(positions[source], positions[target], 0.15)
+        tooltip = html.escape(f"{source} → {target}\n" + "\n".join(utterances))
+        css = " ".join(filter(None, ["edge", edge_classes.get((source, target))]))
+        parts.append(f'<g class="{css}"><title>{tooltip}</title><path d="{path}" marker-end="url(#arrow)"/></g>')
+
+    for node in graph_dict["nodes"]:
+        x, y = positions[node["id"]]
+        label = str(node.get("label") or node["id"])
+        tooltip = html.escape(f"{node['id']}: {label}\n" + "\n".join(get_utterances(node)))
+        css = " ".join(filter(None, ["node", "start" if node.get("is_start") else "", node_classes.get(node["id"])]))
+        parts.append(
+            f'<g class="{css}"><title>{tooltip}</title><circle cx="{x:.1f}" cy="{y:.1f}" r="{NODE_RADIUS}"/>'
+            f'<text x="{x:.1f}" y="{y - NODE_RADIUS - 4:.1f}">{html.escape(_short(label))}</text></g>'
+        )
+    parts.append("</svg>")
+    return "\n".join(parts)
+
+
+def _page(title: str, body: str) -> str:
+    return (
+        f'<!DOCTYPE html>\n<html><head><meta charset="utf-8"><title>{html.escape(title)}</title>'
+        f"<style>{_STYLE}</style></head>\n<body>\n<h3>{html.escape(title)}</h3>\n{body}\n</body></html>\n"
+    )
+
+
+def graph_html(graph_dict: dict, title: str = "Graph", cache: Optional[LayoutCache] = None) -> str:
+    """Standalone HTML page with the SVG of one graph."""
+    return _page(title, graph_svg(graph_dict, cache=cache))
+
+
+def match_classes(target_graph: dict, predicted_graph: dict, node_mapping: Optional[dict] = None) -> tuple[dict, dict]:
+    """
+    CSS classes of the nodes and edges of both graphs: "matched", "missing" (target only) or "extra" (predicted only).
+
+    `node_mapping` maps target node ids to predicted node ids or None, `graph_diff.map_nodes` by default.
+    Returns the (node_classes, edge_classes) pairs of the target and of the predicted graph.
+    """
+    if node_mapping is None:
+        from chatsky_llm_autoconfig.graph_diff import map_nodes
+
+        node_mapping = map_nodes(target_graph, predicted_graph)
+    target_pairs = {(edge["source"], edge["target"]) for edge in target_graph["edges"]}
+    predicted_pairs = {(edge["source"], edge["target"]) for edge in predicted_graph["edges"]}
+    mapped_pairs = {(node_mapping.get(source), node_mapping.get(target)) for source, target in target_pairs}
+    matched_nodes = set(node_mapping.values())
+
+    target_nodes = {node["id"]: "matched" if node_mapping.get(node["id"]) is not None else "missing" for node in target_graph["nodes"]}
+    target_edges = {
+        (source, target): "matched" if (node_mapping.get(source), node_mapping.get(target)) in predicted_pairs else "missing"
+        for source, target in target_pairs
+    }
+    predicted_nodes = {node["id"]: "matched" if node["id"] in matched_nodes else "extra" for node in predicted_graph["nodes"]}
+    predicted_edges = {pair: "matched" if pair in mapped_pairs else "extra" for pair in predicted_pairs}
+    return (target_nodes, target_edges), (predicted_nodes, predicted_edges)
+
+
+def _summary(classes: dict) -> str:
+    counts = {}
+    for css in classes.values():
+        counts[css] = counts.get(css, 0) + 1
+    return ", ".join(f"{count} {css}" for css, count in sorted(counts.items()))
+
+
+def comparison_html(
+    target_graph: dict,
+    predicted_graph: dict,
+    title: str = "Graph comparison",
+    node_mapping: Optional[dict[Hashable, Optional[Hashable]]] = None,
+    cache: Optional[LayoutCache] = None,
+) -> str:
+    """Standalone HTML page with the target and the predicted graph side by side, see `match_classes`."""
+    (target_nodes, target_edges), (predicted_nodes, predicted_edges) = match_classes(target_graph, predicted_graph, node_mapping)
+    figures = []
+    for caption, graph_dict, nodes, edges in (
+        ("Target graph", target_graph, target_nodes, target_edges),
+        ("Predicted graph", predicted_graph, predicted_nodes, predicted_edges),
+    ):
+        figures.append(
+            f"<figure><figcaption>{caption}: nodes {_summary(nodes)}; edges {_summary(edges)}</figcaption>\n"
+            f"{graph_svg(graph_dict, node_classes=nodes, edge_classes=edges, cache=cache)}</figure>"
+        )
+    return _page(title, _LEGEND + '\n<div class="pair">\n' + "\n".join(figures) + "\n</div>")
+
+
+_worker_caches: dict = {}
+
+
+def _render_task(task: tuple) -> Optional[str]:
+    idx, target_graph, predicted_graph, output_directory, cache_dir = task
+    # one cache per process, so the pages of one worker share the layouts in memory too
+    cache = _worker_caches.get(cache_dir)
+    if cache is None:
+        cache = _worker_caches[cache_dir] = LayoutCache(cache_dir)
+    if isinstance(predicted_graph, dict):
+        name, page = f"graph_comparison_{idx}.html", comparison_html(target_graph, predicted_graph, f"Graph comparison {idx}", cache=cache)
+    elif isinstance(target_graph, dict):
+        name, page = f"graph_{idx}.html", graph_html(target_graph, f"Graph {idx}", cache=cache)
+    else:
+        return None
+    with open(os.path.join(output_directory, name), "w", encoding="utf-8") as f:
+        f.write(page)
+    return name
+
+
+@traced("plot.batch")
+def render_pairs(pairs: list[tuple], output_directory: str, workers: Optional[int] = None, cache_dir: Optional[str] = None) -> list[str]:
+    """
+    Render (target_graph, predicted_graph) pairs as HTML pages in `output_directory`.
+
+    A pair whose predicted graph is None (a failed generation) is rendered as the target graph alone,
+    pairs without any graph are skipped. Pages are rendered in a pool of `workers` processes (all
+    CPUs by default, in this process with 1) that share the layout cache directory `cache_dir`.
+    Writes an `index.html` linking every page and returns the page file names.
+    """
+    os.makedirs(output_directory, exist_ok=True)
+    tasks = [(idx, target, predicted, output_directory, cache_dir) for idx, (target, predicted) in enumerate(pairs)]
+    workers = workers or os.cpu_count() or 1
+    if workers == 1 or len(tasks) < 2:
+        names = list(map(_render_task, tasks))
+    else:
+        with ProcessPoolExecutor(max_workers=min(workers, len(tasks))) as executor:
+            names = list(executor.map(_render_task, tasks, chunksize=max(1, len(tasks) // (4 * workers))))
+    names = [name for name in names if name is not None]
+    links = "\n".join(f'<li><a href="{html.escape(name)}">{html.escape(name)}</a></li>' for name in names)
+    with open(os.path.join(output_directory, "index.html"), "w", encoding="utf-8") as f:
+        f.write(_page(f"{len(names)} graphs", f"<ul>\n{links}\n</ul>"))
+    return names
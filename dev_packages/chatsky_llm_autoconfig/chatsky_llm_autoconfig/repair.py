@@ -0,0 +1,314 @@
+"""
+Targeted repair of generated graphs: re-prompt only the failing part instead of regenerating it.
+
+`find_problems` runs the local checks, `validation.validate_graph` for the structure and
+`consistency.check_dialogue` for the coverage of the dialogue. Problems with an obvious answer are
+fixed without a model by `fix_locally`: a missing start node becomes the node of the first assistant
+turn and a missing user turn between two placed assistant turns becomes an edge. For the rest,
+`repair_prompt` shows the model only the offending nodes and edges, the missing turns with a few
+turns of context and a one-line summary of every node, and `apply_patch` merges the answer into the
+graph. `repair_graph` repeats this for at most `max_rounds` model calls.
+
+Examples
+--------
+    result = repair_graph(json.loads(raw_graph), dialogue, model, max_rounds=2)
+    if result.valid:
+        graph_dict = result.graph_dict
+"""
+
+import copy
+import json
+import logging
+from dataclasses import dataclass, field
+from typing import Optional
+
+from pydantic import ValidationError
+
+from chatsky_llm_autoconfig import prompts
+from chatsky_llm_autoconfig.consistency import ConsistencyReport, try_check_dialogue
+from chatsky_llm_autoconfig.incremental import dangling_edges, merge_delta
+from chatsky_llm_autoconfig.instrumentation import traced
+from chatsky_llm_autoconfig.utils import call_llm_api, get_utterances
+from chatsky_llm_autoconfig.validation import EdgeSchema, GraphError, NodeSchema, validate_graph
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class GraphProblems:
+    """
+    Result of the local checks of a graph against its dialogue.
+
+    Attributes
+    ----------
+    errors : list of GraphError
+        Structural problems found by `validate_graph`.
+    report : ConsistencyReport or None
+        Replay of the dialogue over the graph, None when the graph is too broken to replay it.
+    check_transitions : bool
+        Whether turns that cannot follow the previous turn count as problems.
+    """
+
+    errors: list[GraphError] = field(default_factory=list)
+    report: Optional[ConsistencyReport] = None
+    check_transitions: bool = False
+
+    @property
+    def missing_turns(self) -> list[int]:
+        return [record["turn"] for record in self.report.missing_utterances] if self.report is not None else []
+
+    @property
+    def transitions(self) -> list[dict]:
+        return self.report.illegal_transitions if self.report is not None and self.check_transitions else []
+
+    @property
+    def ok(self) -> bool:
+        return not self.errors and self.report is not None and not self.missing_turns and not self.transitions
+
+    def as_dict(self) -> dict:
+        return {
+            "errors": [error.model_dump() for error in self.errors],
+            "missing_turns": self.missing_turns,
+            "illegal_transitions": [record["turn"] for record in self.transitions],
+            "ok": self.ok,
+        }
+
+
+@dataclass
+class RepairResult:
+    """The repaired graph dict, the problems left in it and the cost of the repair."""
+
+    graph_dict: dict
+    problems: Optional[GraphProblems] = None
+    stats: dict = field(default_factory=lambda: {"llm_calls": 0, "prompt_chars": 0, "completion_chars": 0, "local_fixes": 0})
+
+    @property
+    def valid(self) -> bool:
+        return self.problems is not None and self.problems.ok
+
+
+def _turns(dialogue) -> list[dict]:
+    if isinstance(dialogue, str):
+        dialogue = json.loads(dialogue)
+    return list(getattr(dialogue, "dialogue", dialogue))
+
+
+def find_problems(
+    graph_dict: dict, dialogue, require_start: bool = True, check_reachability: bool = True, check_transitions: bool = False
+) -> GraphProblems:
+    """Structural errors of `graph_dict` and, when its schema is valid, the replay of `dialogue` over it."""
+    errors = validate_graph(graph_dict, require_start=require_start, check_reachability=check_reachability)
+    report = None if any(error.code == "schema" for error in errors) else try_check_dialogue(dialogue, graph_dict)
+    return GraphProblems(errors=errors, report=report, check_transitions=check_transitions)
+
+
+def fix_locally(graph_dict: dict, problems: GraphProblems) -> int:
+    """
+    Fix in place the problems that need no model and return how many fixes were made.
+
+    A missing start node is set to the node of the first placed assistant turn, or the first node.
+    A missing user turn between two placed assistant turns is added to the edge between their nodes.
+    """
+    fixes = 0
+    matches = problems.report.matches if problems.report is not None else []
+    if graph_dict["nodes"] and any(error.code == "no_start_node" for error in problems.errors):
+        first = next((match for match in matches if match["participant"] != "user" and match["found"]), None)
+        start_id = min(first["found"]) if first is not None else graph_dict["nodes"][0]["id"]
+        next(node for node in graph_dict["nodes"] if node["id"] == start_id)["is_start"] = True
+        fixes += 1
+
+    edges = []
+    for idx in range(1, len(matches) - 1):
+        before, match, after = matches[idx - 1], matches[idx], matches[idx + 1]
+        if match["participant"] != "user" or match["found"]:
+            continue
+        if before["participant"] != "user" and after["participant"] != "user" and before["found"] and after["found"]:
+            edges.append({"source": min(before["found"]), "target": min(after["found"]), "utterances": [match["text"]]})
+    if edges:
+        merge_delta(graph_dict, {"nodes": [], "edges": edges})
+        fixes += len(edges)
+    return fixes
+
+
+def _marker(match: dict) -> str:
+    if not match["found"]:
+        return " [missing]"
+    if match["participant"] == "user":
+        return " [edge " + ", ".join(f"{source}->{target}" for source, target in sorted(match["found"])) + "]"
+    return " [node " + ", ".join(map(str, sorted(match["found"]))) + "]"
+
+
+def _windows(turns: list[int], size: int, context: int) -> list[range]:
+    windows = []
+    for turn in sorted(turns):
+        start, stop = max(turn - context, 0), min(turn + context + 1, size)
+        if windows and start <= windows[-1].stop:
+            windows[-1] = range(windows[-1].start, max(stop, windows[-1].stop))
+        else:
+            windows.append(range(start, stop))
+    return windows
+
+
+def repair_prompt(graph_dict: dict, dialogue, problems: GraphProblems, context: int = 2) -> tuple[Optional[str], dict]:
+    """
+    The repair prompt for `problems` and the entries it shows, as {"nodes": indices, "edges": indices}.
+
+    Shown are the nodes and edges named by the structural errors (with every node sharing an id with
+    them) and by illegal transitions, and the missing or illegal turns with `context` turns around
+    them. The prompt is None when there is nothing the model could fix.
+    """
+    turns = _turns(dialogue)
+    nodes, edges = graph_dict["nodes"], graph_dict["edges"]
+    focus = {"nodes": set(), "edges": set()}
+    lines = []
+    for error in problems.errors:
+        location = error.location
+        if len(location) > 1 and location[0] in focus and isinstance(location[1], int):
+            focus[location[0]].add(location[1])
+        where = f" at {'.'.join(map(str, location))}" if location else ""
+        lines.append(f"- {error.code}{where}: {error.message}")
+
+    for record in problems.transitions:
+        lines.append(f"- illegal_transition at turn {record['turn']}: {record['participant']} turn cannot follow the previous turn")
+        if record["participant"] == "user":
+            expected = {tuple(pair) for pair in record["expected"]}
+            focus["edges"].update(idx for idx, edge in enumerate(edges) if (edge.get("source"), edge.get("target")) in expected)
+        else:
+            expected = set(record["expected"]) | set(record["from"])
+            focus["nodes"].update(idx for idx, node in enumerate(nodes) if node.get("id") in expected)
+
+    shown_ids = {nodes[idx].get("id") for idx in focus["nodes"] if idx < len(nodes) and isinstance(nodes[idx], dict)}
+    focus["nodes"].update(idx for idx, node in enumerate(nodes) if isinstance(node, dict) and node.get("id") in shown_ids)
+
+    marked = set(problems.missing_turns) | {record["turn"] for record in problems.transitions}
+    if not lines and not marked:
+        return None, focus
+    turn_lines = []
+    for window in _windows(marked, len(turns), context):
+        if turn_lines:
+            turn_lines.append("...")
+        for idx in window:
+            match = problems.report.matches[idx]
+            illegal = " [illegal transition]" if idx in marked and match["found"] else ""
+            turn_lines.append(f"{idx} {turns[idx].get('participant')}: {turns[idx]['text']}{_marker(match)}{illegal}")
+
+    entries = [f"node {json.dumps(nodes[idx], ensure_ascii=False)}" for idx in sorted(focus["nodes"]) if idx < len(nodes)]
+    entries += [f"edge {json.dumps(edges[idx], ensure_ascii=False)}" for idx in sorted(focus["edges"]) if idx < len(edges)]
+    summary = []
+    for node in nodes:
+        if isinstance(node, dict):
+            utterances = get_utterances(node)
+            summary.append(f"{node.get('id')}: {node.get('label', '')}: {utterances[0] if utterances else ''}")
+    ids = [node["id"] for node in nodes if isinstance(node, dict) and isinstance(node.get("id"), int)]
+    prompt = prompts.graph_repair_prompt.format(
+        nodes="\n".join(summary) or "none",
+        problems="\n".join(lines) or "none",
+        entries="\n".join(entries) or "none",
+        turns="\n".join(turn_lines) or "none",
+        next_id=max(ids, default=0) + 1,
+    )
+    return prompt, focus
+
+
+def apply_patch(graph_dict: dict, patch: dict, focus: dict) -> dict:
+    """
+    Merge a repair answer into `graph_dict` in place.
+
+    Shown nodes are replaced by the returned nodes with the same id (shown nodes without a valid id are
+    dropped), shown edges are replaced by the returned edges, everything else is merged with
+    `incremental.merge_delta`. Raises `pydantic.ValidationError` before changing anything if an entry
+    of the patch does not match the graph schema, and `ValueError` if a returned edge points to a node
+    that is not in the patched graph.
+    """
+    patch_nodes = [NodeSchema.model_validate(node).model_dump(exclude_none=True) for node in patch.get("nodes", [])]
+    patch_edges = [EdgeSchema.model_validate(edge).model_dump() for edge in patch.get("edges", [])]
+    returned_ids = {node["id"] for node in patch_nodes}
+
+    def replaced(idx: int, node) -> bool:
+        if idx not in focus["nodes"]:
+            return False
+        return not isinstance(node, dict) or not isinstance(node.get("id"), int) or node["id"] in returned_ids
+
+    nodes = [node for idx, node in enumerate(graph_dict["nodes"]) if not replaced(idx, node)]
+    edges = [edge for idx, edge in enumerate(graph_dict["edges"]) if idx not in focus["edges"]]
+    dangling = dangling_edges({node.get("id") for node in nodes if isinstance(node, dict)} | returned_ids, patch_edges)
+    if dangling:
+        raise ValueError(f"Patch edges point to unknown nodes: {dangling}")
+    changes = {"removed_nodes": len(graph_dict["nodes"]) - len(nodes), "removed_edges": len(graph_dict["edges"]) - len(edges)}
+    graph_dict["nodes"], graph_dict["edges"] = nodes, edges
+    changes.update(merge_delta(graph_dict, {"nodes": patch_nodes, "edges": patch_edges}))
+    return changes
+
+
+@traced("llm.repair_graph")
+def repair_graph(
+    graph,
+    dialogue,
+    model=None,
+    max_rounds: int = 2,
+    temp: float = 0.0,
+    require_start: bool = True,
+    check_reachability: bool = True,
+    check_transitions: bool = False,
+) -> RepairResult:
+    """
+    Repair a generated graph (a dict, a JSON string or a `Graph`) against its dialogue.
+
+    Local fixes are tried before every model call, and the model is called at most `max_rounds`
+    times; without a model only the local fixes are made. The input is not modified.
+
+    Returns
+    -------
+    RepairResult
+        With the repaired graph dict, the problems left in it and the number of model calls,
+        prompt and completion characters and local fixes.
+    """
+    graph_dict = copy.deepcopy(json.loads(graph) if isinstance(graph, str) else getattr(graph, "graph_dict", graph))
+    graph_dict.setdefault("nodes", [])
+    graph_dict.setdefault("edges", [])
+    turns = _turns(dialogue)
+    checks = {"require_start": require_start, "check_reachability": check_reachability, "check_transitions": check_transitions}
+    result = RepairResult(graph_dict=graph_dict)
+
+    problems = find_problems(graph_dict, turns, **checks)
+    while not problems.ok:
+        fixes = fix_locally(graph_dict, problems)
+        if fixes:
+            result.stats["local_fixes"] += fixes
+            problems = find_problems(graph_dict, turns, **checks)
+            if problems.ok:
+                break
+        if model is None or result.stats["llm_calls"] >= max_rounds:
+            break
+        prompt, focus = repair_prompt(graph_dict, turns, problems)
+        if prompt is None:
+            break
+        patch = _call(prompt, model, temp, result.stats)
+        if not isinstance(patch, dict):
+            continue
+        try:
+            apply_patch(graph_dict, patch, focus)
+        except ValidationError:
+            logger.info("Repair response does not match the graph schema, ignoring it")
+            continue
+        except ValueError as e:
+            logger.info(f"Ignoring the repair response: {e}")
+            continue
+        problems = find_problems(graph_dict, turns, **checks)
+
+    result.problems = problems
+    return result
+
+
+def _call(prompt: str, model, temp: float, stats: dict) -> Optional[dict]:
+    stats["llm_calls"] += 1
+    stats["prompt_chars"] += len(prompt)
+    response = call_llm_api(prompt, model, temp=temp)
+    if response is None:
+        return None
+    stats["completion_chars"] += len(response)
+    try:
+        return json.loads(response)
+    except json.JSONDecodeError:
+        logger.info("Repair response is not a valid JSON")
+        return None
@@ -0,0 +1,148 @@
+"""
+Routing of free-form user input to the outgoing edges of a graph node.
+
+Exact matching on edge utterances fails on any rephrasing and an LLM call per turn is far too slow,
+so `IntentRouter` matches on character n-grams instead. The edge utterances of every node are
+turned once into a matrix of the hashed n-gram vectors of `metrics.fuzzy`, reweighted by the
+inverse document frequency of their n-gram buckets over all edge utterances of the graph, so the
+n-grams shared by most utterances ("i want", "yes, ") count less than the distinctive ones. A turn
+is one vector and one matrix-vector product; the best edge wins if its cosine similarity reaches
+the threshold, otherwise the router falls back.
+
+`route_batch` routes the turns of many sessions at once with one matrix product per distinct node.
+
+    router = IntentRouter(graph, threshold=0.35)
+    route = router.route(node_id, "i'd like to order a book please")
+    route.target, route.score
+"""
+
+import functools
+from dataclasses import dataclass
+from typing import Hashable, Optional, Union
+
+import numpy as np
+
+from chatsky_llm_autoconfig.graph import Graph
+from chatsky_llm_autoconfig.instrumentation import count, traced
+from chatsky_llm_autoconfig.metrics.fuzzy import DEFAULT_DIM, hashed_vector
+from chatsky_llm_autoconfig.utils import get_utterances, normalize_utterance
+
+DEFAULT_THRESHOLD = 0.3
+
+
+@dataclass(frozen=True)
+class Route:
+    """Outcome of routing one turn: the target node (the router fallback below the threshold), the best score and edge."""
+
+    target: Optional[Hashable]
+    score: float
+    edge: Optional[int] = None
+    exact: bool = False
+
+    @property
+    def matched(self) -> bool:
+        return self.edge is not None
+
+
+@dataclass
+class _NodeRoutes:
+    matrix: np.ndarray  # edge utterance vectors of the node, one row each
+    edges: np.ndarray  # index of the graph edge of every row
+    exact: dict  # normalized utterance -> graph edge index
+
+
+@functools.lru_cache(maxsize=16384)
+def _query_vector(text: str) -> np.ndarray:
+    # users repeat the same short answers ("yes", "no, that's all") across sessions
+    vector = hashed_vector(text)
+    vector.setflags(write=False)
+    return vector
+
+
+class IntentRouter:
+    """
+    Edge router of a graph, built once and then queried per turn.
+
+    Parameters
+    ----------
+    graph : Graph or dict
+        The graph; node ids are those of its graph dict.
+    threshold : float
+        Minimal cosine similarity for a match.
+    fallback : hashable, optional
+        Target returned when nothing matches, e.g. the node a bot re-asks from. None by default.
+    """
+
+    def __init__(self, graph: Union[Graph, dict], threshold: float = DEFAULT_THRESHOLD, fallback: Optional[Hashable] = None):
+        graph_dict = graph.graph_dict if isinstance(graph, Graph) else graph
+        self.threshold = threshold
+        self.fallback = fallback
+        self.targets = [edge["target"] for edge in graph_dict.get("edges", [])]
+
+        rows = {}
+        for idx, edge in enumerate(graph_dict.get("edges", [])):
+            for utterance in get_utterances(edge):
+                rows.setdefault(edge["source"], {}).setdefault(normalize_utterance(utterance), (utterance, idx))
+        texts = [utterance for node_rows in rows.values() for utterance, _ in node_rows.values()]
+        vectors = np.stack([hashed_vector(text) for text in texts]) if texts else np.zeros((0, DEFAULT_DIM), dtype=np.float32)
+        document_frequency = np.count_nonzero(vectors, axis=0)
+        self.idf = (np.log((1 + len(texts)) / (1 + document_frequency)) + 1).astype(np.float32)
+
+        self._nodes = {}
+        offset = 0
+        for node, node_rows in rows.items():
+            matrix = self._weigh(vectors[offset : offset + len(node_rows)])  # noqa: E203
+            offset += len(node_rows)
+            edges = np.asarray([idx for _, idx in node_rows.values()], dtype=np.int64)
+            self._nodes[node] = _NodeRoutes(matrix, edges, {key: idx for key, (_, idx) in node_rows.items()})
+
+    def _weigh(self, vectors: np.ndarray) -> np.ndarray:
+        weighted = vectors * self.idf
+        norms = np.linalg.norm(weighted, axis=-1, keepdims=True)
+        return np.divide(weighted, norms, out=np.zeros_like(weighted), where=norms > 0)
+
+    def _fallback(self, score: float = 0.0) -> Route:
+        count("router.fallback")
+        return Route(self.fallback, score)
+
+    def _result(self, edge: int, score: float, exact: bool = False) -> Route:
+        if score < self.threshold:
+            return self._fallback(score)
+        return Route(self.targets[edge], score, edge, exact)
+
+    def route(self, node: Hashable, text: str) -> Route:
+        """Route the user input `text` from `node`."""
+        routes = self._nodes.get(node)
+        if routes is None:
+            return self._fallback()
+        edge = routes.exact.get(normalize_utterance(text))
+        if edge is not None:
+            return self._result(edge, 1.0, exact=True)
+        scores = routes.matrix @ self._weigh(_query_vector(text))
+        best = int(np.argmax(scores))
+        return self._result(int(routes.edges[best]), float(scores[best]))
+
+    @traced("router.batch")
+    def route_batch(self, nodes: list[Hashable], texts: list[str]) -> list[Route]:
+        """Route the turns of many sessions, `texts[i]` being the input of the session at `nodes[i]`."""
+        if len(nodes) != len(texts):
+            raise ValueError(f"Got {len(nodes)} nodes for {len(texts)} texts")
+        results = [None] * len(texts)
+        pending = {}
+        for i, (node, text) in enumerate(zip(nodes, texts)):
+            routes = self._nodes.get(node)
+            edge = routes.exact.get(normalize_utterance(text)) if routes is not None else None
+            if routes is None:
+                results[i] = self._fallback()
+            elif edge is not None:
+                results[i] = self._result(edge, 1.0, exact=True)
+            else:
+                pending.setdefault(node, []).append(i)
+        for node, positions in pending.items():
+            routes = self._nodes[node]
+            queries = self._weigh(np.stack([_query_vector(texts[i]) for i in positions]))
+            scores = queries @ routes.matrix.T
+            best = np.argmax(scores, axis=1)
+            for row, i in enumerate(positions):
+                results[i] = self._result(int(routes.edges[best[row]]), float(scores[row, best[row]]))
+        return results
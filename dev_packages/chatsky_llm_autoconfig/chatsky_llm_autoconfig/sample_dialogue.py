@@ -1,8 +1,10 @@
 import random
-import json
-from chatsky_llm_autoconfig.graph import Graph, TYPES_OF_GRAPH
+import networkx as nx
+from chatsky_llm_autoconfig.instrumentation import traced
+from chatsky_llm_autoconfig.utils import get_utterances
 
 
+@traced("sample.walk")
 def sample_dialogue(graph_obj, start_node, end_node=None, topic=None):
     nodes = graph_obj.nodes(data=True)
     edges = graph_obj.edges(data=True)
@@ -30,9 +32,10 @@ def sample_dialogue(graph_obj, start_node, end_node=None, topic=None):
             break
 
         if topic is not None:
-            chosen_edge = random.choice(possible_edges)
-            while graph_obj.edges[chosen_edge[0], chosen_edge[1]]["theme"] != topic:
-                chosen_edge = random.choice(possible_edges)
+            possible_edges = [edge for edge in possible_edges if edge[2].get("theme") == topic]
+            if not possible_edges:
+                break
+        chosen_edge = random.choice(possible_edges)
 
         if isinstance(chosen_edge[2]["utterances"], list):
             edge_utterance = random.choice(chosen_edge[2]["utterances"])
@@ -62,18 +65,36 @@ def sample_dialogue(graph_obj, start_node, end_node=None, topic=None):
     return dialogue, graph
 
 
-path_prefix = "~/Документы/DeepPavlov/dff-llm-integration/"
-with open(f"{path_prefix}/dataset/theme_graph.json", "r") as f:
-    content = json.load(f)
-graph = Graph(content, TYPES_OF_GRAPH.DI)
-sampled_dialogue, sampled_base_graph = sample_dialogue(graph.nx_graph, start_node=1, end_node=9, topic="videogames")
+@traced("sample.dialogues")
+def dialogues_from_graph(graph: dict, include_readable: bool = False):
+    """Random walk over a graph dict from one of its start nodes, stopping before a node would be revisited."""
+    G = nx.DiGraph()
+    for node in graph["nodes"]:
+        G.add_node(node["id"], label=node.get("label"), utterances=get_utterances(node), is_start=node.get("is_start", False))
+    for edge in graph["edges"]:
+        G.add_edge(edge["source"], edge["target"], utterances=get_utterances(edge))
 
-with open(f"{path_prefix}/dataset/theme_sampled_graph.json", "r") as g:
-    exisint_graph = json.load(g)
+    start_nodes = [node for node in G.nodes if G.nodes[node].get("is_start")]
+    if not start_nodes:
+        raise ValueError("No starting node found in the graph.")
 
-dialogues = exisint_graph
-dict_to_dump = {"dialog_id": len(dialogues) + 1, "proposed_dialog": sampled_dialogue, "base_graph": sampled_base_graph}
-dialogues.append(dict_to_dump)
+    current_node = random.choice(start_nodes)
+    dialogue = []
+    visited_nodes = set()
+    while True:
+        dialogue.append(random.choice(G.nodes[current_node]["utterances"]))
+        visited_nodes.add(current_node)
 
-with open(f"{path_prefix}/dataset/theme_sampled_graph.json", "w") as g:
-    json.dump(dialogues, g, indent=4)
+        next_nodes = [node for node in G.successors(current_node) if node not in visited_nodes]
+        if not next_nodes:
+            break
+        next_node = random.choice(next_nodes)
+        dialogue.append(random.choice(G[current_node][next_node]["utterances"]))
+        current_node = next_node
+
+    if include_readable:
+        out = ""
+        for i in range(len(dialogue)):
+            out += f"ASSISTANT: {dialogue[i]}\n" if i % 2 == 0 else f"USER: {dialogue[i]}\n"
+        return (out, dialogue)
+    return dialogue
@@ -0,0 +1,55 @@
+import json
+from typing import Optional, Union
+
+from pydantic import BaseModel
+
+from chatsky_llm_autoconfig.consistency import check_dialogue
+from chatsky_llm_autoconfig.validation import validate_graph
+
+_FATAL_ERRORS = {"json", "schema"}
+
+
+class GraphScore(BaseModel):
+    """
+    Local quality estimate of a generated graph for a dialogue, every component is in [0, 1].
+
+    Attributes
+    ----------
+    structure : float
+        1 minus the share of nodes and edges with structural errors (dangling edges, unreachable nodes, ...).
+    coverage : float
+        Share of dialogue turns found in the graph.
+    transitions : float
+        Share of dialogue turns that are reachable from the previous turn.
+    total : float
+        Weighted sum of the above, 0 for graphs that are not valid JSON in the graph schema.
+    """
+
+    structure: float = 0.0
+    coverage: float = 0.0
+    transitions: float = 0.0
+    total: float = 0.0
+    errors: list[str] = []
+
+
+def score_graph(graph: Union[dict, str, None], dialogue, weights: tuple[float, float, float] = (0.2, 0.5, 0.3)) -> GraphScore:
+    if graph is None:
+        return GraphScore(errors=["no response"])
+    errors = validate_graph(graph, require_start=False)
+    codes = [error.code for error in errors]
+    if _FATAL_ERRORS.intersection(codes):
+        return GraphScore(errors=codes)
+
+    graph = json.loads(graph) if isinstance(graph, str) else graph
+    size = max(len(graph["nodes"]) + len(graph["edges"]), 1)
+    structure = 1 - min(len(errors) / size, 1.0)
+
+    report = check_dialogue(dialogue, graph)
+    turns = max(len(report.matches), 1)
+    transitions = 1 - len(report.illegal_transitions) / turns
+    total = weights[0] * structure + weights[1] * report.coverage + weights[2] * transitions
+    return GraphScore(structure=structure, coverage=report.coverage, transitions=transitions, total=total, errors=codes)
+
+
+def best_candidate(candidates: list[tuple[Optional[str], GraphScore]]) -> tuple[Optional[str], GraphScore]:
+    return max(candidates, key=lambda candidate: candidate[1].total, default=(None, GraphScore()))
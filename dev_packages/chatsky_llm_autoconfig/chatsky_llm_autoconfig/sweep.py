@@ -0,0 +1,172 @@
+import asyncio
+import itertools
+import json
+import logging
+import os
+from dataclasses import dataclass
+from typing import Callable, Optional
+
+from chatsky_llm_autoconfig import prompts
+from chatsky_llm_autoconfig.evaluate import calculate_mean_metrics, evaluate_pair, load_dialogues, save_mean_metrics, save_metrics
+from chatsky_llm_autoconfig.utils import acall_llm_api, load_env
+
+logger = logging.getLogger(__name__)
+
+# names of templates in `prompts`, looked up when a sweep starts
+PROMPTS = {
+    "prompted": "create_graph_prompt",
+    "cycles": "cycle_graph_generation_prompt",
+}
+
+
+@dataclass(frozen=True)
+class SweepConfig:
+    """
+    One point of a sweep grid.
+
+    `model` may be prefixed with a provider, e.g. "openai:gpt-4o", to put it under that
+    provider's concurrency cap; unprefixed models belong to "openai".
+    """
+
+    model: str
+    temperature: float
+    prompt: str
+
+    @property
+    def provider(self) -> str:
+        return self.model.split(":", 1)[0] if ":" in self.model else "openai"
+
+    @property
+    def model_name(self) -> str:
+        return self.model.split(":", 1)[-1]
+
+    @property
+    def name(self) -> str:
+        return f"{self.model_name}-{self.prompt}_temp{self.temperature:g}"
+
+
+def expand_grid(spec: dict) -> list[SweepConfig]:
+    """
+    Expand a grid spec into configs.
+
+    Examples
+    --------
+        expand_grid({"models": ["gpt-4o", "gpt-4o-mini"], "temperatures": [0, 0.5, 1], "prompts": ["prompted", "cycles"]})
+    """
+    return [
+        SweepConfig(m, float(t), p) for m, t, p in itertools.product(spec["models"], spec.get("temperatures", [0]), spec.get("prompts", ["cycles"]))
+    ]
+
+
+def _parse_response(response: Optional[str]) -> Optional[dict]:
+    if response is None:
+        return None
+    try:
+        return json.loads(response)
+    except json.JSONDecodeError:
+        return None
+
+
+def default_model_factory(config: SweepConfig):
+    from langchain_openai import ChatOpenAI
+
+    load_env()
+    return ChatOpenAI(
+        model=config.model_name, api_key=os.getenv("OPENAI_API_KEY"), base_url=os.getenv("OPENAI_BASE_URL"), temperature=config.temperature
+    )
+
+
+class SweepRunner:
+    """
+    Runs every config of a sweep over one dataset concurrently.
+
+    All (config, dialogue) generations share one pool of `max_workers` slots and, on top of it,
+    per-provider caps from `provider_limits`. The dataset is parsed once, and identical requests
+    at temperature 0 (same model, prompt text) are sent once and shared between configs.
+    Each config gets `all_metrics.json`, `mean_metrics.txt` and `generated_graphs.json`
+    in `output_root/<config.name>`, the same layout as `evaluate.evaluate_model`.
+    Pass a `metric_cache.MetricCache` to score repeated (generated, target) pairs once.
+    """
+
+    def __init__(
+        self,
+        input_json_path: str,
+        output_root: str,
+        model_factory: Callable[[SweepConfig], object] = default_model_factory,
+        max_workers: int = 16,
+        provider_limits: Optional[dict[str, int]] = None,
+        prompt_templates: Optional[dict] = None,
+        metric_cache=None,
+    ):
+        self.dataset = load_dialogues(input_json_path)
+        self.output_root = output_root
+        self.model_factory = model_factory
+        self.max_workers = max_workers
+        self.provider_limits = provider_limits or {}
+        self.prompt_templates = prompt_templates or PROMPTS
+        self.metric_cache = metric_cache
+        self.stats = {"requests": 0, "shared_responses": 0}
+
+    def run(self, configs: list[SweepConfig]) -> dict[str, dict]:
+        return asyncio.run(self.arun(configs))
+
+    async def arun(self, configs: list[SweepConfig]) -> dict[str, dict]:
+        pool = asyncio.Semaphore(self.max_workers)
+        provider_slots = {provider: asyncio.Semaphore(limit) for provider, limit in self.provider_limits.items()}
+        shared: dict[tuple, asyncio.Task] = {}
+        models = {config: self.model_factory(config) for config in configs}
+        prompts_cache = {}
+        # scoring runs in a worker thread so that it does not block the requests in flight,
+        # one config at a time since the metric cache and the vector store are shared
+        scoring = asyncio.Lock()
+
+        async def generate(config: SweepConfig, dialogue) -> Optional[str]:
+            prompt_key = (config.prompt, json.dumps(dialogue, sort_keys=True))
+            if prompt_key not in prompts_cache:
+                template = self.prompt_templates[config.prompt]
+                template = getattr(prompts, template) if isinstance(template, str) else template
+                prompts_cache[prompt_key] = template.format(dialog=dialogue)
+            prompt = prompts_cache[prompt_key]
+
+            async def call():
+                # the provider slot is taken first, so requests waiting on a capped provider do not hold pool slots
+                slot = provider_slots.get(config.provider)
+                if slot is None:
+                    async with pool:
+                        self.stats["requests"] += 1
+                        return await acall_llm_api(prompt, models[config])
+                async with slot, pool:
+                    self.stats["requests"] += 1
+                    return await acall_llm_api(prompt, models[config])
+
+            if config.temperature != 0:
+                return await call()
+            key = (config.model, prompt)
+            if key in shared:
+                self.stats["shared_responses"] += 1
+            else:
+                shared[key] = asyncio.ensure_future(call())
+            return await shared[key]
+
+        async def run_config(config: SweepConfig) -> dict:
+            responses = await asyncio.gather(*(generate(config, item["dialog"]) for item in self.dataset))
+            output_directory = os.path.join(self.output_root, config.name)
+            os.makedirs(output_directory, exist_ok=True)
+
+            generated = {idx: _parse_response(response) for idx, response in enumerate(responses)}
+
+            def score() -> dict:
+                return {idx: evaluate_pair(generated[idx], item["target_graph"], idx, self.metric_cache) for idx, item in enumerate(self.dataset)}
+
+            async with scoring:
+                all_metrics = await asyncio.to_thread(score)
+
+            save_metrics(all_metrics, os.path.join(output_directory, "all_metrics.json"))
+            save_metrics(generated, os.path.join(output_directory, "generated_graphs.json"))
+            mean_metrics = calculate_mean_metrics(all_metrics)
+            save_mean_metrics(mean_metrics, os.path.join(output_directory, "mean_metrics.txt"))
+            logger.info(f"Finished sweep config {config.name}")
+            return mean_metrics
+
+        results = await asyncio.gather(*(run_config(config) for config in configs))
+        return {config.name: {metric: float(value) for metric, value in result.items()} for config, result in zip(configs, results)}
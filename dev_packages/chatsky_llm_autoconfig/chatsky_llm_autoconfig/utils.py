@@ -1,12 +1,64 @@
-import networkx as nx
-import random
 import json
-from chatsky_llm_autoconfig.graph import Graph
-from langchain.schema import HumanMessage
+import unicodedata
+from typing import TYPE_CHECKING
+
+from chatsky_llm_autoconfig.instrumentation import count, traced
+
+if TYPE_CHECKING:
+    from chatsky_llm_autoconfig.graph import Graph
+
+_TYPOGRAPHY = str.maketrans(
+    {
+        "‘": "'",
+        "’": "'",
+        "‚": "'",
+        "‛": "'",
+        "′": "'",
+        "`": "'",
+        "“": '"',
+        "”": '"',
+        "„": '"',
+        "«": '"',
+        "»": '"',
+        "‐": "-",
+        "‑": "-",
+        "‒": "-",
+        "–": "-",
+        "—": "-",
+        "−": "-",
+    }
+)
+
+
+def normalize_utterance(text: str) -> str:
+    """Apply NFKC, unify typographic quotes and dashes, lowercase the utterance and collapse whitespace."""
+    text = unicodedata.normalize("NFKC", str(text)).translate(_TYPOGRAPHY).lower()
+    return " ".join(text.split())
+
+
+_env_loaded = False
+
+
+def load_env():
+    """Load variables from `.env` once. Called where LLM clients are created, never at import."""
+    global _env_loaded
+    if not _env_loaded:
+        from dotenv import load_dotenv
+
+        load_dotenv()
+        _env_loaded = True
+
+
+def get_utterances(entry: dict) -> list[str]:
+    """Return utterances of a node or an edge dict as a list (they are sometimes stored as a plain string)."""
+    utterances = entry.get("utterances", [])
+    if isinstance(utterances, str):
+        return [utterances]
+    return list(utterances)
 
 
 # all func are currently unused
-def check_if_nodes_identical(graph_1: Graph, graph_2: Graph):
+def check_if_nodes_identical(graph_1: "Graph", graph_2: "Graph"):
     # check if we have the same amount of nodes:
     if len(graph_1.nodes) != len(graph_2.nodes):
         return False
@@ -14,7 +66,7 @@ def check_if_nodes_identical(graph_1: Graph, graph_2: Graph):
     return set(graph_1.nodes) == set(graph_2.nodes)
 
 
-def check_if_links_identical(graph_1: Graph, graph_2: Graph):
+def check_if_links_identical(graph_1: "Graph", graph_2: "Graph"):
     unmatched_first = []
     unmatched_second = []
     node_cnt = len(graph_1.nodes)
@@ -55,79 +107,14 @@ def check_graph_isomorphism(graph1, graph2):
     print("_______")
 
 
-def find_split_nodes(g1, g2):
-    # Create dictionaries to map edges based on 'requests' attribute
-    def map_edges_by_request(graph):
-        requests_map = {}
-        edges_map = {}
-        for u, v, data in graph.edges(data=True):
-            request = data.get("requests")
-            if request not in requests_map:
-                requests_map[request] = []
-            requests_map[request].append((u, v))
-            key = f"{u}->{v}"
-            if key not in edges_map:
-                edges_map[key] = []
-            edges_map[key].append(*data.values())
-        return requests_map, edges_map
-
-    def find_splits(graph_edges, other_graph_edges, requests_map, graph_split, other_requests_map):
-        for edge, data in graph_edges.items():
-            if len(data) > 1 and len(other_graph_edges.get(edge, [])) < len(data):
-                node = int(edge.split("->")[1])
-                end_nodes = [other_requests_map[request][0][1] for request in data]
-                graph_split[node] = end_nodes
-
-    g1_requests, g1_edges = map_edges_by_request(g1)
-    g2_requests, g2_edges = map_edges_by_request(g2)
-
-    g1_split = {}
-    g2_split = {}
-    find_splits(g1_edges, g2_edges, g1_requests, g1_split, g2_requests)
-    find_splits(g2_edges, g1_edges, g2_requests, g2_split, g1_requests)
-
-    for node, split_nodes in g1_split.items():
-        print(f"In g1, node {node} is split into {split_nodes} in g2")
-    for node, split_nodes in g2_split.items():
-        print(f"In g2, node {node} is split into {split_nodes} in g1")
-
-    return g1_split, g2_split
-
-
-def do_mapping(g1, g2):
-    if isinstance(g1, nx.MultiDiGraph):
-        GM = nx.isomorphism.DiGraphMatcher(g1, g2, edge_match=lambda x, y: set(x["requests"]).intersection(set(y["requests"])) is not None)
-    else:
-        GM = nx.isomorphism.MultiDiGraphMatcher(
-            g1,
-            g2,
-            edge_match=lambda x, y: set([elem["requests"] for elem in list(x.values())]).intersection(
-                set([elem["requests"] for elem in list(y.values())])
-            )
-            is not None,
-        )
-
-    if GM.is_isomorphic():
-        print("Graphs are isomorphic and correct")
-        mapping = nx.vf2pp_isomorphism(g1, g2, node_label=None)
-        return mapping
-
-    mapping = {i: i for i in range(1, len(g1.nodes))}
-    g1_unmatched_nodes, g2_unmatched_nodes = find_split_nodes(g1, g2)
-    print(g1_unmatched_nodes)
-    print(g2_unmatched_nodes)
-    for k, v in g1_unmatched_nodes.items():
-        elem = random.choice(v)
-        mapping[k] = elem
-        for node in v:
-            if node != elem:
-                mapping[node] = None
-    print(mapping)
-
-
+@traced("llm.call")
 def call_llm_api(query: str, llm, client=None, temp: float = 0.05, langchain_model=True) -> str | None:
+    count("llm.calls")
+    count("llm.prompt_chars", len(query))
     try:
         if langchain_model:
+            from langchain.schema import HumanMessage
+
             messages = [HumanMessage(content=query)]
             response = llm.invoke(messages)
             return response.content
@@ -149,6 +136,22 @@ def call_llm_api(query: str, llm, client=None, temp: float = 0.05, langchain_mod
         return None
 
 
+@traced("llm.call")
+async def acall_llm_api(query: str, llm, temp: float = 0.05) -> str | None:
+    """Async counterpart of `call_llm_api` for langchain models, so several prompts can be in flight at once."""
+    from langchain.schema import HumanMessage
+
+    count("llm.calls")
+    count("llm.prompt_chars", len(query))
+    try:
+        response = await llm.ainvoke([HumanMessage(content=query)])
+        return response.content
+    except Exception as e:
+        print(e)
+        print("Timeout error, retrying...")
+        return None
+
+
 def save_json(data: dict, filename: str) -> None:
     with open(filename, "w", encoding="utf-8") as file:
         json.dump(data, file, indent=4, ensure_ascii=False)
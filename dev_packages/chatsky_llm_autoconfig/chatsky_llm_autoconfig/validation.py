@@ -0,0 +1,140 @@
+import json
+from collections import deque
+from typing import Optional, Union
+
+from pydantic import BaseModel, ConfigDict, StrictBool, StrictInt, ValidationError, field_validator
+
+
+class NodeSchema(BaseModel):
+    model_config = ConfigDict(extra="allow")
+
+    # strict: "1" or "yes" would pass here and then break `Graph`, which sorts and compares the ids
+    id: StrictInt
+    label: Optional[str] = None
+    is_start: StrictBool = False
+    utterances: list[str]
+
+    @field_validator("utterances", mode="before")
+    @classmethod
+    def _wrap_single_utterance(cls, value):
+        return [value] if isinstance(value, str) else value
+
+
+class EdgeSchema(BaseModel):
+    model_config = ConfigDict(extra="allow")
+
+    source: StrictInt
+    target: StrictInt
+    utterances: list[str]
+
+    @field_validator("utterances", mode="before")
+    @classmethod
+    def _wrap_single_utterance(cls, value):
+        return [value] if isinstance(value, str) else value
+
+
+class GraphSchema(BaseModel):
+    model_config = ConfigDict(extra="allow")
+
+    nodes: list[NodeSchema]
+    edges: list[EdgeSchema]
+
+
+class GraphError(BaseModel):
+    """
+    One problem found in a graph.
+
+    Attributes
+    ----------
+    code : str
+        Machine-readable kind of the problem: "json", "schema", "duplicate_node_id", "dangling_edge",
+        "no_start_node", "empty_utterances" or "unreachable_node".
+    message : str
+        Human-readable description.
+    location : tuple
+        Path to the offending element, e.g. ("edges", 3, "target").
+    """
+
+    model_config = ConfigDict(frozen=True)
+
+    code: str
+    message: str
+    location: tuple = ()
+
+
+class GraphValidationError(ValueError):
+    def __init__(self, errors: list[GraphError]):
+        self.errors = errors
+        super().__init__("; ".join(f"{error.code} at {'.'.join(map(str, error.location))}: {error.message}" for error in errors))
+
+
+def validate_graph(graph: Union[dict, str], require_start: bool = True, check_reachability: bool = True) -> list[GraphError]:
+    """
+    Check a graph in the `nodes`/`edges` format (a dict or raw LLM output) without building a `Graph`.
+
+    Returns an empty list for a valid graph. Structural checks run only when the schema is valid.
+    """
+    if isinstance(graph, str):
+        try:
+            graph = json.loads(graph)
+        except json.JSONDecodeError as e:
+            return [GraphError(code="json", message=str(e))]
+
+    try:
+        parsed = GraphSchema.model_validate(graph)
+    except ValidationError as e:
+        return [GraphError(code="schema", message=error["msg"], location=tuple(error["loc"])) for error in e.errors()]
+
+    errors = []
+    node_ids = set()
+    for idx, node in enumerate(parsed.nodes):
+        if node.id in node_ids:
+            errors.append(GraphError(code="duplicate_node_id", message=f"node id {node.id} is used more than once", location=("nodes", idx, "id")))
+        node_ids.add(node.id)
+        if not node.utterances:
+            errors.append(GraphError(code="empty_utterances", message=f"node {node.id} has no utterances", location=("nodes", idx, "utterances")))
+
+    adjacency = {node_id: [] for node_id in node_ids}
+    for idx, edge in enumerate(parsed.edges):
+        for end in ("source", "target"):
+            if getattr(edge, end) not in node_ids:
+                errors.append(
+                    GraphError(code="dangling_edge", message=f"edge {end} {getattr(edge, end)} is not a node", location=("edges", idx, end))
+                )
+        if not edge.utterances:
+            errors.append(
+                GraphError(
+                    code="empty_utterances", message=f"edge {edge.source}->{edge.target} has no utterances", location=("edges", idx, "utterances")
+                )
+            )
+        if edge.source in adjacency:
+            adjacency[edge.source].append(edge.target)
+
+    start_nodes = [node.id for node in parsed.nodes if node.is_start]
+    if require_start and not start_nodes:
+        errors.append(GraphError(code="no_start_node", message="no node has is_start set", location=("nodes",)))
+
+    if check_reachability and start_nodes:
+        reached = set(start_nodes)
+        queue = deque(start_nodes)
+        while queue:
+            for next_node in adjacency.get(queue.popleft(), ()):
+                if next_node not in reached:
+                    reached.add(next_node)
+                    queue.append(next_node)
+        for idx, node in enumerate(parsed.nodes):
+            if node.id not in reached:
+                errors.append(GraphError(code="unreachable_node", message=f"node {node.id} is unreachable from start nodes", location=("nodes", idx)))
+    return errors
+
+
+def is_valid_graph(graph: Union[dict, str], **kwargs) -> bool:
+    return not validate_graph(graph, **kwargs)
+
+
+def ensure_valid_graph(graph: Union[dict, str], **kwargs) -> dict:
+    """Return the graph as a dict or raise `GraphValidationError` listing all problems."""
+    errors = validate_graph(graph, **kwargs)
+    if errors:
+        raise GraphValidationError(errors)
+    return json.loads(graph) if isinstance(graph, str) else graph
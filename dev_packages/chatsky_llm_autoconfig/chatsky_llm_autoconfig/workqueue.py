@@ -0,0 +1,276 @@
+import json
+import logging
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Callable, Optional
+
+from chatsky_llm_autoconfig.evaluate import calculate_mean_metrics, evaluate_pair, load_dialogues, save_mean_metrics, save_metrics
+from chatsky_llm_autoconfig.metric_cache import JOURNAL_MODES, MetricCache
+
+logger = logging.getLogger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS tasks (
+    job TEXT NOT NULL,
+    idx INTEGER NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    worker TEXT,
+    lease_expires REAL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    metrics TEXT,
+    graph TEXT,
+    PRIMARY KEY (job, idx)
+);
+CREATE INDEX IF NOT EXISTS tasks_status ON tasks (job, status, lease_expires);
+"""
+
+
+class WorkQueue:
+    """
+    Work queue of dialogue indices in one SQLite file, e.g. on a filesystem shared by several hosts.
+
+    Workers claim indices with a lease of `lease_seconds`, renew it with `heartbeat` while they
+    work and store the result with `complete`. Indices whose lease expired are handed out again,
+    at most `max_attempts` times in total. Every call opens its own connection, so one
+    `WorkQueue` object can be used from several threads and processes.
+
+    The file uses SQLite's rollback journal (`journal_mode="DELETE"`), which relies only on file
+    locks. `journal_mode="WAL"` lets readers and a writer work at the same time, but it needs
+    memory shared by all processes, so use it only when every worker runs on the host that holds
+    the file, never on NFS or SMB.
+
+    Examples
+    --------
+        queue = WorkQueue("eval_queue.sqlite")
+        queue.submit("gpt-4o-mini", size=len(load_dialogues("data/data.json")))
+        # on every host
+        run_worker("eval_queue.sqlite", "gpt-4o-mini", "data/data.json", model_name="gpt-4o-mini")
+        # once everything is done
+        queue.merge("gpt-4o-mini", "experiments/results/gpt-4o-mini")
+    """
+
+    def __init__(self, path: str, lease_seconds: float = 300.0, max_attempts: int = 3, journal_mode: str = "DELETE"):
+        if journal_mode not in JOURNAL_MODES:
+            raise ValueError(f"journal_mode must be one of {JOURNAL_MODES}, got {journal_mode!r}")
+        self.path = path
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        connection = self._connect()
+        try:
+            connection.execute(f"PRAGMA journal_mode={journal_mode}")
+            connection.executescript(_SCHEMA)
+        finally:
+            connection.close()
+
+    def _connect(self) -> sqlite3.Connection:
+        connection = sqlite3.connect(self.path, timeout=60, isolation_level=None)
+        connection.execute("PRAGMA busy_timeout=60000")
+        return connection
+
+    def submit(self, job: str, size: int) -> int:
+        """Add indices 0..size-1 of `job`, already known indices are kept as they are. Returns the number added."""
+        connection = self._connect()
+        try:
+            before = connection.total_changes
+            connection.executemany("INSERT OR IGNORE INTO tasks (job, idx) VALUES (?, ?)", ((job, idx) for idx in range(size)))
+            return connection.total_changes - before
+        finally:
+            connection.close()
+
+    def claim(self, job: str, worker: str, limit: int = 1) -> list[int]:
+        """Lease up to `limit` pending or expired indices to `worker`."""
+        now = time.time()
+        connection = self._connect()
+        try:
+            connection.execute("BEGIN IMMEDIATE")
+            # leases that ran out on the last allowed attempt are not coming back
+            connection.execute(
+                "UPDATE tasks SET status = 'failed', worker = NULL WHERE job = ? AND status = 'leased' AND lease_expires < ? AND attempts >= ?",
+                (job, now, self.max_attempts),
+            )
+            rows = connection.execute(
+                "SELECT idx FROM tasks WHERE job = ? AND attempts < ? AND (status = 'pending' OR (status = 'leased' AND lease_expires < ?)) "
+                "ORDER BY idx LIMIT ?",
+                (job, self.max_attempts, now, limit),
+            ).fetchall()
+            indices = [row[0] for row in rows]
+            connection.executemany(
+                "UPDATE tasks SET status = 'leased', worker = ?, lease_expires = ?, attempts = attempts + 1 WHERE job = ? AND idx = ?",
+                ((worker, now + self.lease_seconds, job, idx) for idx in indices),
+            )
+            connection.execute("COMMIT")
+            return indices
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+        finally:
+            connection.close()
+
+    def heartbeat(self, job: str, worker: str, indices: list[int]) -> list[int]:
+        """Extend the leases of `indices`, returns the ones `worker` still holds."""
+        connection = self._connect()
+        try:
+            held = []
+            for idx in indices:
+                cursor = connection.execute(
+                    "UPDATE tasks SET lease_expires = ? WHERE job = ? AND idx = ? AND worker = ? AND status = 'leased'",
+                    (time.time() + self.lease_seconds, job, idx, worker),
+                )
+                if cursor.rowcount:
+                    held.append(idx)
+            return held
+        finally:
+            connection.close()
+
+    def complete(self, job: str, worker: str, idx: int, metrics: dict, graph: Optional[dict] = None) -> bool:
+        """Store the result of `idx`. Returns False if the lease was lost to another worker meanwhile."""
+        connection = self._connect()
+        try:
+            cursor = connection.execute(
+                "UPDATE tasks SET status = 'done', lease_expires = NULL, metrics = ?, graph = ? WHERE job = ? AND idx = ? AND worker = ? AND status = 'leased'",
+                (json.dumps(metrics), json.dumps(graph), job, idx, worker),
+            )
+            return cursor.rowcount == 1
+        finally:
+            connection.close()
+
+    def release(self, job: str, worker: str, idx: int) -> bool:
+        """Give `idx` back right away instead of waiting for the lease to expire, e.g. after an error."""
+        connection = self._connect()
+        try:
+            cursor = connection.execute(
+                "UPDATE tasks SET lease_expires = 0 WHERE job = ? AND idx = ? AND worker = ? AND status = 'leased'", (job, idx, worker)
+            )
+            return cursor.rowcount == 1
+        finally:
+            connection.close()
+
+    def progress(self, job: str) -> dict[str, int]:
+        connection = self._connect()
+        try:
+            rows = connection.execute("SELECT status, COUNT(*) FROM tasks WHERE job = ? GROUP BY status", (job,)).fetchall()
+        finally:
+            connection.close()
+        counts = {"pending": 0, "leased": 0, "done": 0, "failed": 0}
+        counts.update(dict(rows))
+        return counts
+
+    def is_finished(self, job: str) -> bool:
+        counts = self.progress(job)
+        return counts["pending"] == 0 and counts["leased"] == 0
+
+    def merge(self, job: str, output_directory: str) -> str:
+        """
+        Write `all_metrics.json`, `generated_graphs.json` and `mean_metrics.txt` for `job`, as `evaluate_model` does.
+
+        Indices without a result count with zero metrics.
+        """
+        connection = self._connect()
+        try:
+            rows = connection.execute("SELECT idx, status, metrics, graph FROM tasks WHERE job = ? ORDER BY idx", (job,)).fetchall()
+        finally:
+            connection.close()
+
+        os.makedirs(output_directory, exist_ok=True)
+        all_metrics, generated = {}, {}
+        for idx, status, metrics, graph in rows:
+            if status != "done":
+                logger.warning(f"No result for dialogue {idx} of job {job} ({status})")
+                all_metrics[idx] = {"Triplet Match Accuracy": 0, "Node Accuracy": 0, "Edge Accuracy": 0}
+                generated[idx] = None
+                continue
+            all_metrics[idx] = json.loads(metrics)
+            generated[idx] = json.loads(graph)
+
+        save_metrics(all_metrics, f"{output_directory}/all_metrics.json")
+        save_metrics(generated, f"{output_directory}/generated_graphs.json")
+        save_mean_metrics(calculate_mean_metrics(all_metrics), f"{output_directory}/mean_metrics.txt")
+        return f"{output_directory}/mean_metrics.txt"
+
+
+class _Heartbeat(threading.Thread):
+    def __init__(self, queue: WorkQueue, job: str, worker: str, indices: list[int]):
+        super().__init__(daemon=True)
+        self.queue = queue
+        self.job = job
+        self.worker = worker
+        self.indices = indices
+        self.stopped = threading.Event()
+
+    def run(self):
+        while not self.stopped.wait(self.queue.lease_seconds / 3):
+            self.indices = self.queue.heartbeat(self.job, self.worker, self.indices)
+
+    def stop(self):
+        self.stopped.set()
+        self.join()
+
+
+def run_worker(
+    queue_path: str,
+    job: str,
+    input_json_path: str,
+    model_name: Optional[str] = None,
+    generate_fn: Optional[Callable] = None,
+    worker_id: Optional[str] = None,
+    batch_size: int = 1,
+    lease_seconds: float = 300.0,
+    max_attempts: int = 3,
+    metric_cache_path: Optional[str] = None,
+    vector_store_path: Optional[str] = None,
+    journal_mode: str = "DELETE",
+) -> int:
+    """
+    Claim and evaluate dialogues of `job` until none are left, returns the number completed.
+
+    Graphs are produced by `generate_fn(dialogue)` or, by default, by `evaluate.generate_graph`
+    with `model_name`. Leases are renewed in the background while a batch is being processed.
+    Workers can share one metric cache file with `metric_cache_path` and one utterance vector
+    store of the fuzzy metrics with `vector_store_path`. `journal_mode` applies to the queue and the
+    metric cache, see `WorkQueue` before switching to "WAL".
+    """
+    if generate_fn is None:
+        from chatsky_llm_autoconfig.evaluate import generate_graph
+
+        def generate_fn(dialogue):
+            return generate_graph(dialogue, model_name)
+
+    queue = WorkQueue(queue_path, lease_seconds=lease_seconds, max_attempts=max_attempts, journal_mode=journal_mode)
+    worker = worker_id or f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+    dialogues = load_dialogues(input_json_path)
+    cache = MetricCache(metric_cache_path, journal_mode=journal_mode) if metric_cache_path is not None else None
+    if vector_store_path is not None:
+        from chatsky_llm_autoconfig.metrics.fuzzy import VectorStore, set_vector_store
+
+        set_vector_store(VectorStore(vector_store_path))
+    completed = 0
+
+    while True:
+        indices = queue.claim(job, worker, batch_size)
+        if not indices:
+            break
+        heartbeat = _Heartbeat(queue, job, worker, indices)
+        heartbeat.start()
+        try:
+            for idx in indices:
+                item = dialogues[idx]
+                try:
+                    generated_graph = generate_fn(item["dialog"])
+                except Exception as e:
+                    logger.warning(f"Worker {worker} failed on dialogue {idx}: {e}")
+                    queue.release(job, worker, idx)
+                    continue
+                metrics = evaluate_pair(generated_graph, item["target_graph"], idx, cache)
+                if queue.complete(job, worker, idx, metrics, generated_graph):
+                    completed += 1
+                else:
+                    logger.info(f"Lease for dialogue {idx} was lost, result of {worker} dropped")
+        finally:
+            heartbeat.stop()
+
+    logger.info(f"Worker {worker} finished {completed} dialogues of job {job}")
+    return completed
@@ -0,0 +1,22 @@
+"""Helpers shared by the test modules."""
+
+
+def turns(*texts):
+    """Dialogue turns alternating between the assistant, who speaks first, and the user."""
+    return [{"text": text, "participant": "assistant" if i % 2 == 0 else "user"} for i, text in enumerate(texts)]
+
+
+class ScriptedModel:
+    """Chat model stub answering `invoke` calls with `responses` in order and recording the prompts."""
+
+    def __init__(self, responses):
+        self.responses = list(responses)
+        self.prompts = []
+
+    def invoke(self, messages):
+        self.prompts.append(messages[0].content)
+
+        class Response:
+            content = self.responses.pop(0)
+
+        return Response()
@@ -0,0 +1,61 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "benchmarks"))
+
+from run import compare, main  # noqa: E402
+from synthetic import SHAPES, make_dialogue, make_graph, perturb  # noqa: E402
+
+from chatsky_llm_autoconfig.graph import TYPES_OF_GRAPH, Graph  # noqa: E402
+from chatsky_llm_autoconfig.graph_stats import compute_graph_stats  # noqa: E402
+
+
+@pytest.mark.parametrize("shape", SHAPES)
+def test_make_graph_shapes(shape):
+    graph = make_graph(50, shape)
+    stats = compute_graph_stats(graph)
+    assert stats.nodes == 50
+    assert stats.reachable_nodes == 50
+    assert stats.has_cycle == (shape != "chain")
+    assert len(Graph(graph, TYPES_OF_GRAPH.MULTI).nx_graph.nodes) == 50
+
+
+def test_multiedge_density():
+    assert len(make_graph(100, "ring", 1.0)["edges"]) == 100
+    assert len(make_graph(100, "ring", 2.0)["edges"]) == 200
+    assert 100 < len(make_graph(100, "ring", 1.5)["edges"]) < 200
+    assert make_graph(30, "branching", seed=3) == make_graph(30, "branching", seed=3)
+
+
+def test_perturb_and_dialogue():
+    graph = make_graph(20, "ring")
+    generated = perturb(graph, drop_share=0.5)
+    assert [node["id"] for node in generated["nodes"]] == [node["id"] for node in graph["nodes"]]
+    assert generated != graph
+    assert graph["nodes"][0]["utterances"][0] == "assistant utterance 1.0"
+
+    dialogue = make_dialogue(graph, max_turns=10)
+    assert len(dialogue) == 10
+    assert [turn["participant"] for turn in dialogue[:2]] == ["assistant", "user"]
+
+
+def test_compare_flags_regressions_above_threshold():
+    baseline = {"a": {"seconds": 0.1, "peak_bytes": 10**6}, "b": {"seconds": 0.1, "peak_bytes": 10**6}, "c": {"seconds": 1e-5, "peak_bytes": 10}}
+    results = {
+        "a": {"seconds": 0.12, "peak_bytes": 10**6},
+        "b": {"seconds": 0.2, "peak_bytes": 3 * 10**6},
+        "c": {"seconds": 1e-4, "peak_bytes": 100},
+        "new": {"seconds": 5.0, "peak_bytes": 10**9},
+    }
+    regressions = compare(results, baseline, threshold=1.3)
+    assert len(regressions) == 2
+    assert all(regression.startswith("b:") for regression in regressions)
+
+
+def test_main_writes_results_and_compares(tmp_path):
+    output = tmp_path / "results.json"
+    args = ["--cases", "load_graph", "sample_dialogue", "--sizes", "10", "--shapes", "ring", "branching", "--repeat", "1"]
+    assert main(args + ["--output", str(output)]) == 0
+    assert main(args + ["--baseline", str(output), "--threshold", "1000"]) == 0
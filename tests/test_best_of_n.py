@@ -0,0 +1,57 @@
+import asyncio
+import json
+
+from chatsky_llm_autoconfig.model import DialogModel
+from chatsky_llm_autoconfig.scoring import score_graph
+
+DIALOGUE = [
+    {"text": "How can I help?", "participant": "assistant"},
+    {"text": "I need to make an order", "participant": "user"},
+    {"text": "Which books would you like to order?", "participant": "assistant"},
+]
+GOOD = {
+    "nodes": [
+        {"id": 1, "label": "start", "is_start": True, "utterances": ["How can I help?"]},
+        {"id": 2, "label": "ask_item", "utterances": ["Which books would you like to order?"]},
+    ],
+    "edges": [{"source": 1, "target": 2, "utterances": ["I need to make an order"]}],
+}
+PARTIAL = {"nodes": GOOD["nodes"], "edges": []}
+
+
+class DelayedModel:
+    def __init__(self, content, delay):
+        self.content = content
+        self.delay = delay
+        self.finished = False
+
+    async def ainvoke(self, messages):
+        await asyncio.sleep(self.delay)
+        self.finished = True
+
+        class Response:
+            content = self.content
+
+        return Response()
+
+
+def test_score_graph_orders_candidates():
+    good, partial, broken = score_graph(GOOD, DIALOGUE), score_graph(PARTIAL, DIALOGUE), score_graph("{not json", DIALOGUE)
+    assert good.total == 1.0
+    assert 0 < partial.total < good.total
+    assert broken.total == 0 and broken.errors == ["json"]
+
+
+def test_best_of_n_picks_best_and_cancels_slow_candidates():
+    models = [DelayedModel("{not json", 0.01), DelayedModel(json.dumps(GOOD), 0.02), DelayedModel(json.dumps(PARTIAL), 5)]
+    graph, score = DialogModel().create_graph_best_of_n(DIALOGUE, models, n=3, threshold=0.9)
+    assert json.loads(graph) == GOOD
+    assert score.total == 1.0
+    assert not models[2].finished
+
+
+def test_best_of_n_without_early_stop_returns_highest_score():
+    models = [DelayedModel(json.dumps(PARTIAL), 0.01), DelayedModel("{not json", 0.02)]
+    graph, score = DialogModel().create_graph_best_of_n(DIALOGUE, models, n=2, threshold=1.1)
+    assert json.loads(graph) == PARTIAL
+    assert score.coverage < 1
@@ -0,0 +1,101 @@
+import json
+import os
+import sys
+
+import pytest
+from chatsky.script import Message
+
+from chatsky_llm_autoconfig.chatsky_export import FALLBACK_RESPONSE, build_pipeline, compile_graph, to_chatsky_script
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "benchmarks"))
+
+from chatsky_dispatch import condition_pipeline, main, simulate  # noqa: E402
+from synthetic import make_dialogue, make_graph  # noqa: E402
+
+with open("data/data.json") as f:
+    DATA = json.load(f)
+
+GRAPH = {
+    "nodes": [
+        {"id": 1, "label": "start", "is_start": True, "utterances": ["Hi, how can I help?"]},
+        {"id": 2, "label": "size", "is_start": False, "utterances": ["Which size?", "What size do you need?"]},
+        {"id": 3, "label": "done", "is_start": False, "utterances": ["Anything else?"]},
+    ],
+    "edges": [
+        {"source": 1, "target": 2, "utterances": ["I want a pizza"]},
+        {"source": 2, "target": 3, "utterances": ["Large", "Small"]},
+        {"source": 3, "target": 2, "utterances": ["Another one, that’s all"]},
+        {"source": 3, "target": 1, "utterances": ["Large"]},
+    ],
+}
+
+
+def test_compiled_dispatch():
+    compiled = compile_graph(GRAPH)
+    assert compiled.start == 1
+    assert compiled.step(1, "  I WANT a pizza ") == 2
+    assert compiled.step(2, "large") == 3
+    assert compiled.step(3, "large") == 1
+    assert compiled.step(3, "Another one, that's all") == 2
+    assert compiled.step(1, "Large") is None
+    # the fallback dispatches on all edges, the first edge with an utterance wins
+    assert compiled.step(None, "Large") == 3
+    assert compiled.response(2) == "Which size?"
+    assert compiled.accepts(["I want a pizza", "Small", "Large"])
+    assert not compiled.accepts(["Small"])
+    with pytest.raises(ValueError):
+        compile_graph({"nodes": [], "edges": []})
+
+
+def test_script_structure():
+    script, start_label, fallback_label = to_chatsky_script(GRAPH)
+    nodes = script[start_label[0]]
+    assert set(nodes) == {start_label[1], fallback_label[1], "node_1", "node_2", "node_3"}
+    # one transition per node however many edges and utterances leave it
+    assert all(len(node["transitions"]) == 1 for node in nodes.values())
+    assert nodes["node_2"]["misc"] == {"graph_node": 2, "utterances": ["Which size?", "What size do you need?"]}
+
+
+def test_pipeline_dialogue():
+    pipeline = build_pipeline(GRAPH)
+    turns = [("hello", "Hi, how can I help?"), ("I want a pizza", "Which size?"), ("what?", FALLBACK_RESPONSE), ("small", "Anything else?")]
+    for text, response in turns:
+        assert pipeline(Message(text=text), "user").last_response.text == response
+    assert pipeline(Message(text="Large"), "user").last_label == ("graph", "node_1")
+
+
+def test_pipeline_follows_dataset_dialogues():
+    checked = 0
+    for item in DATA:
+        graph = item["target_graph"]
+        compiled = compile_graph(graph)
+        user_turns = [turn["text"] for turn in item["dialog"] if turn["participant"] == "user"]
+        if not compiled.accepts(user_turns):
+            continue
+        checked += 1
+        pipeline = build_pipeline(graph)
+        pipeline(Message(text="hi"), 0)
+        node = compiled.start
+        for text in user_turns:
+            node = compiled.step(node, text)
+            assert pipeline(Message(text=text), 0).last_response.text == compiled.response(node)
+    assert checked >= 5
+
+
+def test_condition_baseline_matches():
+    graph = make_graph(30, "branching", 3.0)
+    dialogues = simulate(graph, 5, 10, noise=0.2)
+    compiled, conditions = build_pipeline(graph), condition_pipeline(graph)
+    for ctx_id, user_turns in enumerate(dialogues):
+        for text in ["hi"] + user_turns:
+            assert compiled(Message(text=text), ctx_id).last_label == conditions(Message(text=text), ctx_id).last_label
+    assert compile_graph(graph).accepts([turn["text"] for turn in make_dialogue(graph) if turn["participant"] == "user"])
+
+
+def test_benchmark_main(tmp_path, capsys):
+    output = tmp_path / "dispatch.json"
+    assert main(["--dialogues", "5", "--nodes", "20", "--output", str(output)]) == 0
+    results = json.loads(output.read_text())["results"]
+    assert set(results) == {"compiled", "pipeline", "conditions"}
+    assert all(result["turns"] > 0 and result["p99_us"] >= result["p50_us"] for result in results.values())
+    assert "turns/s" in capsys.readouterr().out
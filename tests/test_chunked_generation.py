@@ -0,0 +1,78 @@
+import asyncio
+import json
+import re
+
+import pytest
+
+from chatsky_llm_autoconfig.merge import merge_partial_graphs, split_dialogue
+from chatsky_llm_autoconfig.model import DialogModel
+from chatsky_llm_autoconfig.validation import validate_graph
+
+
+def long_dialogue(n_pairs):
+    dialogue = []
+    for i in range(n_pairs):
+        dialogue.append({"text": f"Question {i}?", "participant": "assistant"})
+        dialogue.append({"text": f"Answer {i}", "participant": "user"})
+    dialogue.append({"text": "Bye", "participant": "assistant"})
+    return dialogue
+
+
+class ChainModel:
+    """Builds a chain graph for whatever window it gets, with window-local ids."""
+
+    def __init__(self):
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def ainvoke(self, messages):
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        await asyncio.sleep(0.01)
+        self.in_flight -= 1
+        texts = re.findall(r"'text': '([^']*)', 'participant': '(\w+)'", messages[0].content.split("Dialogue:")[-1])
+        nodes, edges = [], []
+        for text, participant in texts:
+            if participant == "assistant":
+                nodes.append({"id": len(nodes) + 10, "label": "", "is_start": not nodes, "utterances": [text]})
+            elif nodes:
+                edges.append({"source": nodes[-1]["id"], "target": nodes[-1]["id"] + 1, "utterances": [text]})
+        edges = [edge for edge in edges if edge["target"] < len(nodes) + 10]
+
+        class Response:
+            content = json.dumps({"nodes": nodes, "edges": edges})
+
+        return Response()
+
+
+def test_split_dialogue_windows_overlap():
+    windows = split_dialogue(list(range(10)), window=4, overlap=2)
+    assert windows == [[0, 1, 2, 3], [2, 3, 4, 5], [4, 5, 6, 7], [6, 7, 8, 9]]
+    assert split_dialogue([1, 2], window=4, overlap=2) == [[1, 2]]
+    with pytest.raises(ValueError):
+        split_dialogue(list(range(10)), window=4, overlap=1)
+
+
+def test_merge_partial_graphs_unifies_shared_utterances():
+    first = {
+        "nodes": [{"id": 1, "is_start": True, "utterances": ["A"]}, {"id": 2, "utterances": ["B"]}],
+        "edges": [{"source": 1, "target": 2, "utterances": ["x"]}],
+    }
+    second = {
+        "nodes": [{"id": 1, "is_start": True, "utterances": ["b"]}, {"id": 2, "utterances": ["C"]}],
+        "edges": [{"source": 1, "target": 2, "utterances": ["y"]}],
+    }
+    merged = merge_partial_graphs([first, second])
+    assert [node["utterances"] for node in merged["nodes"]] == [["A"], ["B"], ["C"]]
+    assert [node["is_start"] for node in merged["nodes"]] == [True, False, False]
+    assert [(e["source"], e["target"], e["utterances"]) for e in merged["edges"]] == [(1, 2, ["x"]), (2, 3, ["y"])]
+
+
+def test_create_graph_chunked_mode():
+    model = ChainModel()
+    dialogue = long_dialogue(30)
+    graph = json.loads(DialogModel().create_graph(dialogue, model, chunk_size=12, overlap=4))
+    assert model.max_in_flight > 1
+    assert len(graph["nodes"]) == 31
+    assert len(graph["edges"]) == 30
+    assert validate_graph(graph) == []
@@ -0,0 +1,57 @@
+import json
+
+import pytest
+
+from chatsky_llm_autoconfig import cli
+from chatsky_llm_autoconfig.sample_dialogue import sample_dialogue
+from chatsky_llm_autoconfig.graph import TYPES_OF_GRAPH, Graph
+
+with open("data/data.json") as f:
+    DATA = json.load(f)
+
+
+def test_evaluate_with_timings_and_memory(tmp_path, monkeypatch, capsys):
+    monkeypatch.setattr(cli, "generate_graph", lambda dialogue, model, retries=2, output_format="json", repair=False: DATA[0]["target_graph"])
+    recorder = cli.run(
+        ["--timings", "--memory", "evaluate", "data/data.json", str(tmp_path), "--limit", "2", "--metric-cache", str(tmp_path / "cache.sqlite")]
+    )
+
+    assert recorder.stages["generate"]["items"] == 2 and recorder.stages["metrics"]["peak_bytes"] > 0
+    assert json.loads((tmp_path / "all_metrics.json").read_text())["0"]["Triplet Match Accuracy"] == 1.0
+    report = capsys.readouterr().err
+    assert "items/s" in report and "peak MiB" in report
+
+
+def test_evaluate_generation_and_profile(tmp_path, capsys):
+    pairs = tmp_path / "pairs.json"
+    pairs.write_text(json.dumps([{"dialog": item["dialog"], "graph": item["target_graph"]} for item in DATA]))
+    recorder = cli.run(["--profile", "evaluate-generation", str(pairs), str(tmp_path)])
+
+    assert recorder.stages["evaluate-generation"]["items"] == len(DATA)
+    assert (tmp_path / "generation_metrics.json").exists()
+    assert "cumulative" in capsys.readouterr().err
+
+
+def test_sample_and_render(tmp_path):
+    cli.main(["sample", "data/data.json", str(tmp_path / "dialogues.json"), "--count", "2", "--limit", "3", "--seed", "0"])
+    samples = json.loads((tmp_path / "dialogues.json").read_text())
+    assert len(samples) == 6
+    assert samples[0]["dialog"][0]["participant"] == "assistant"
+
+    cli.main(["--profile-output", str(tmp_path / "render.prof"), "render", str(tmp_path / "dialogues.json"), str(tmp_path / "plots"), "--limit", "1"])
+    assert (tmp_path / "plots" / "graph_0.png").exists() and (tmp_path / "render.prof").exists()
+
+
+def test_main_exits_with_zero(tmp_path):
+    assert cli.main(["sample", "data/data.json", str(tmp_path / "dialogues.json"), "--limit", "1", "--seed", "0"]) == 0
+
+
+def test_missing_subcommand_is_an_error():
+    with pytest.raises(SystemExit):
+        cli.main([])
+
+
+def test_sample_dialogue_without_topic():
+    graph = Graph(DATA[0]["target_graph"], TYPES_OF_GRAPH.DI)
+    dialogue, _ = sample_dialogue(graph.nx_graph, start_node=1)
+    assert dialogue[0]["participant"] == "assistant" and len(dialogue) > 1
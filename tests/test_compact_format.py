@@ -0,0 +1,110 @@
+import json
+import os
+import sys
+from types import SimpleNamespace
+
+import pytest
+
+from chatsky_llm_autoconfig import prompts
+from chatsky_llm_autoconfig.compact_format import CompactFormatError, format_dialogue, parse_compact_graph, to_compact
+from chatsky_llm_autoconfig.graph import Graph
+from chatsky_llm_autoconfig.model import DialogModel
+from chatsky_llm_autoconfig.validation import validate_graph
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "benchmarks"))
+
+from output_format import main  # noqa: E402
+
+with open("data/data.json") as f:
+    DATA = json.load(f)
+
+DIALOGUE = [
+    {"text": "How can I help?", "participant": "assistant"},
+    {"text": "Do you have apples?", "participant": "user"},
+    {"text": "Yes, add it to your cart?", "participant": "assistant"},
+    {"text": "No", "participant": "user"},
+    {"text": "Okay. Anything else?", "participant": "assistant"},
+    {"text": "I need chips", "participant": "user"},
+    {"text": "Yes, add it to your cart?", "participant": "assistant"},
+    {"text": "Bye", "participant": "user"},
+]
+ANSWER = '```\nN1* start 0\nN2 ask_to_add\t2 6\nN3 anything_else 4\n\nE1>2 1\nE2>3 3\nE3>2 5\nE3>1 7 "See you"\n```'
+
+
+def as_lists(entry: dict) -> list:
+    utterances = entry["utterances"]
+    return [utterances] if isinstance(utterances, str) else utterances
+
+
+def test_parse():
+    graph = parse_compact_graph(ANSWER, DIALOGUE)
+    assert graph["nodes"][0] == {"id": 1, "label": "start", "is_start": True, "utterances": ["How can I help?"]}
+    # the loop repeats turn 2 as turn 6, the node keeps one utterance
+    assert graph["nodes"][1]["utterances"] == ["Yes, add it to your cart?"]
+    assert graph["edges"][-1] == {"source": 3, "target": 1, "utterances": ["Bye", "See you"]}
+    assert not validate_graph(graph)
+    assert Graph(graph).nx_graph.number_of_nodes() == 3
+
+
+@pytest.mark.parametrize(
+    "answer, line, message",
+    [
+        ("N1* start 0\nhello", 2, "expected a node"),
+        ("N1* start 1", 1, "user turn"),
+        ("N1* start 0\nE1>1 9", 2, "out of the dialogue"),
+        ("N1* start 0\nN1 again 2", 2, "defined twice"),
+        ("N1* 0", 1, "label"),
+        ("N1* start", 1, "no utterances"),
+        ("N1* start 0\nE1>2 1", 2, "is not a node"),
+        ("Nx start 0", 1, "node id"),
+        ("N1* start 0 maybe", 1, "turn number or a JSON string"),
+        ("E1>2 1", 0, "no node lines"),
+    ],
+)
+def test_strict_errors(answer, line, message):
+    with pytest.raises(CompactFormatError, match=message) as e:
+        parse_compact_graph(answer, DIALOGUE)
+    assert e.value.line == line
+
+
+def test_roundtrip_dataset():
+    for item in DATA:
+        compact = to_compact(item["target_graph"], item["dialog"])
+        graph = parse_compact_graph(compact, item["dialog"])
+        target = item["target_graph"]
+        assert [(n["id"], n["is_start"], n["utterances"]) for n in graph["nodes"]] == [
+            (n["id"], n.get("is_start", False), as_lists(n)) for n in target["nodes"]
+        ]
+        assert [(e["source"], e["target"], e["utterances"]) for e in graph["edges"]] == [
+            (e["source"], e["target"], as_lists(e)) for e in target["edges"]
+        ]
+        assert len(compact) * 2 < len(json.dumps(target))
+
+
+class FakeModel:
+    def __init__(self, answer):
+        self.answer = answer
+        self.prompts = []
+
+    def invoke(self, messages):
+        self.prompts.append(messages[0].content)
+        return SimpleNamespace(content=self.answer)
+
+
+def test_dialog_model_compact_output():
+    model = FakeModel(ANSWER)
+    graph = json.loads(DialogModel().create_graph(DIALOGUE, model, output_format="compact"))
+    assert graph == parse_compact_graph(ANSWER, DIALOGUE)
+    assert model.prompts[0].endswith(format_dialogue(DIALOGUE)) and "7 user: Bye" in model.prompts[0]
+    assert model.prompts[0].startswith(prompts.compact_graph_generation_prompt.format(dialog="")[:100])
+    assert DialogModel().create_graph(DIALOGUE, FakeModel("not a graph"), output_format="compact") is None
+    with pytest.raises(ValueError):
+        DialogModel().create_graph(DIALOGUE, model, output_format="yaml")
+
+
+def test_benchmark_main(tmp_path, capsys):
+    output = tmp_path / "output_format.json"
+    assert main(["--limit", "3", "--ttft-ms", "0", "--ms-per-token", "0", "--encoding", "missing_encoding", "--output", str(output)]) == 0
+    results = json.loads(output.read_text())["results"]
+    assert results["same_graphs"] == 3 and results["token_ratio"] > 2
+    assert "fewer completion tokens" in capsys.readouterr().out
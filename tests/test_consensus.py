@@ -0,0 +1,99 @@
+import copy
+import json
+import os
+import sys
+
+import pytest
+
+from chatsky_llm_autoconfig.cli import main as cli_main
+from chatsky_llm_autoconfig.consensus import ConsensusGraph, aggregate_graphs
+from chatsky_llm_autoconfig.graph import Graph
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "benchmarks"))
+
+from synthetic import make_graph, perturb  # noqa: E402
+
+with open("data/data.json") as f:
+    DATA = json.load(f)
+
+GRAPH = DATA[0]["target_graph"]
+
+
+def renumbered(graph: dict, offset: int = 100) -> dict:
+    result = copy.deepcopy(graph)
+    for node in result["nodes"]:
+        node["id"] += offset
+    for edge in result["edges"]:
+        edge["source"] += offset
+        edge["target"] += offset
+    return result
+
+
+def test_identical_graphs_align_whatever_their_ids():
+    consensus = ConsensusGraph()
+    assert consensus.add(GRAPH) == {node["id"]: node["id"] for node in GRAPH["nodes"]}
+    mapping = consensus.add(Graph(renumbered(GRAPH)))
+    assert mapping == {node["id"] + 100: node["id"] for node in GRAPH["nodes"]}
+
+    result = consensus.graph(min_support=2)
+    assert len(result["nodes"]) == len(GRAPH["nodes"])
+    assert all(node["support"] == 2 and node["weight"] == 1.0 for node in result["nodes"] + result["edges"])
+    assert [node["id"] for node in result["nodes"] if node["is_start"]] == [1]
+    assert {(edge["source"], edge["target"]) for edge in result["edges"]} == {(edge["source"], edge["target"]) for edge in GRAPH["edges"]}
+
+
+def test_support_thresholds():
+    rare = copy.deepcopy(GRAPH)
+    rare["nodes"].append({"id": 99, "label": "rare", "is_start": False, "utterances": ["A rare node"]})
+    rare["edges"].append({"source": 1, "target": 99, "utterances": ["Something rare"]})
+    rare["nodes"][1]["utterances"].append("A rare rephrasing")
+    consensus = ConsensusGraph().extend([GRAPH, None, rare, GRAPH])
+    assert consensus.graphs == 3
+
+    everything = consensus.graph()
+    assert {node["label"] for node in everything["nodes"]} >= {"rare"}
+    rare_node = next(node for node in everything["nodes"] if node["label"] == "rare")
+    assert rare_node["support"] == 1 and rare_node["weight"] == pytest.approx(1 / 3)
+
+    majority = consensus.graph(min_support=0.5, min_utterance_support=0.5)
+    assert "rare" not in {node["label"] for node in majority["nodes"]}
+    assert all(edge["target"] != rare_node["id"] for edge in majority["edges"])
+    assert "A rare rephrasing" not in majority["nodes"][1]["utterances"]
+    assert aggregate_graphs([GRAPH, rare, GRAPH], min_support=0.5) == consensus.graph(min_support=0.5)
+    with pytest.raises(ValueError):
+        consensus.graph(min_support=1.5)
+
+
+def test_alignment_by_utterance_overlap():
+    consensus = ConsensusGraph()
+    consensus.add({"nodes": [{"id": 1, "label": "a", "is_start": True, "utterances": ["Hello", "Hi there"]}], "edges": []})
+    partial = {"nodes": [{"id": 7, "label": "b", "is_start": True, "utterances": ["hello ", "Good morning", "Hey"]}], "edges": []}
+    assert ConsensusGraph(min_overlap=0.5).extend([consensus.graph(), partial]).graph()["nodes"][-1]["id"] == 2
+    assert consensus.add(partial) == {7: 1}
+    node = consensus.graph()["nodes"][0]
+    assert node["utterances"][0] == "Hello" and "Good morning" in node["utterances"]
+    assert node["is_start"] and node["support"] == 2
+
+
+def test_many_perturbed_graphs_recover_the_target():
+    target = make_graph(200, "branching", 2.0)
+    consensus = ConsensusGraph()
+    for seed in range(200):
+        consensus.add(perturb(target, seed=seed))
+    result = consensus.graph(min_support=0.5)
+    # a node whose utterances were all rephrased in the first graph keeps its id for the rephrasings
+    labels = {node["id"]: node["label"] for node in result["nodes"]}
+    assert sorted(labels.values()) == sorted(node["label"] for node in target["nodes"])
+    target_labels = {node["id"]: node["label"] for node in target["nodes"]}
+    assert {(labels[edge["source"]], labels[edge["target"]]) for edge in result["edges"]} == {
+        (target_labels[edge["source"]], target_labels[edge["target"]]) for edge in target["edges"]
+    }
+    assert all("(rephrased)" not in node["utterances"][0] for node in result["nodes"])
+
+
+def test_cli(tmp_path, capsys):
+    input_path, output_path = tmp_path / "generated.json", tmp_path / "consensus.json"
+    input_path.write_text(json.dumps([{"graph": GRAPH}, {"graph": None}, {"graph": renumbered(GRAPH)}]))
+    cli_main(["consensus", str(input_path), str(output_path), "--min-support", "0.5"])
+    assert len(json.loads(output_path.read_text())["nodes"]) == len(GRAPH["nodes"])
+    assert "Aggregated 2 graphs" in capsys.readouterr().out
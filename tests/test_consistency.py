@@ -0,0 +1,75 @@
+from chatsky_llm_autoconfig.consistency import check_dialogue
+from chatsky_llm_autoconfig.model import DialogModel
+from tests.helpers import turns
+
+GRAPH = {
+    "nodes": [
+        {"id": 1, "label": "start", "is_start": True, "utterances": ["How can I help?"]},
+        {"id": 2, "label": "ask_item", "is_start": False, "utterances": ["Which books would you like to order?"]},
+        {"id": 3, "label": "added", "is_start": False, "utterances": ["Added it to your cart. Anything else?"]},
+        {"id": 4, "label": "bye", "is_start": False, "utterances": "Okay, goodbye!"},
+    ],
+    "edges": [
+        {"source": 1, "target": 2, "utterances": ["I need to make an order"]},
+        {"source": 2, "target": 3, "utterances": ["I need Crime and Punishment"]},
+        {"source": 3, "target": 2, "utterances": ["Yes"]},
+        {"source": 3, "target": 4, "utterances": ["No, that's all"]},
+    ],
+}
+
+
+VALID = turns(
+    "How can I help?",
+    "I need to make an order",
+    "Which books would you like to order?",
+    "I need Crime and Punishment",
+    "Added it to your cart. Anything else?",
+    "No, that’s  all",
+    "Okay, goodbye!",
+)
+
+
+def test_valid_dialogue_with_normalization():
+    report = check_dialogue(VALID, GRAPH)
+    assert report.valid and report.decided
+    assert report.coverage == 1.0
+
+
+def test_missing_and_illegal_turns():
+    report = check_dialogue(turns("How can I help?", "I need Crime and Punishment", "Added it to your cart. Anything else?", "Maybe later"), GRAPH)
+    assert [t["turn"] for t in report.illegal_transitions] == [1]
+    assert report.illegal_transitions[0]["expected"] == [(2, 3)]
+    assert [t["text"] for t in report.missing_utterances] == ["Maybe later"]
+    assert report.coverage == 0.75
+    assert not report.decided
+
+
+def test_dialogue_must_begin_on_a_start_node():
+    report = check_dialogue(VALID[2:], GRAPH)
+    assert [t["turn"] for t in report.illegal_transitions] == [0]
+    assert report.illegal_transitions[0]["from"] == [1]
+    unmarked = {**GRAPH, "nodes": [{**node, "is_start": False} for node in GRAPH["nodes"]]}
+    assert check_dialogue(VALID[2:], unmarked).valid
+
+
+class FailingModel:
+    def invoke(self, messages):
+        raise AssertionError("LLM must not be called")
+
+
+class EchoModel:
+    class Response:
+        content = "LLM"
+
+    def invoke(self, messages):
+        return self.Response()
+
+
+def test_dialog_model_uses_local_check_first():
+    model = DialogModel()
+    assert model.check_graph_validity(VALID, GRAPH, FailingModel()) == "YES"
+    illegal = turns("How can I help?", "No, that's all")
+    assert model.check_graph_validity(illegal, GRAPH, FailingModel()) == "NO"
+    assert "edge 1->2" in model.check_graph_utterances(VALID, GRAPH, FailingModel())
+    assert model.check_graph_validity(turns("Hi there"), GRAPH, EchoModel()) == "LLM"
+    assert model.check_graph_validity("free-form dialogue text", GRAPH, EchoModel()) == "LLM"
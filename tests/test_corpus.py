@@ -0,0 +1,114 @@
+import json
+import os
+import sys
+
+import numpy as np
+import pytest
+
+from chatsky_llm_autoconfig.corpus import DialogueCorpus, Vocabulary, load_corpus, save_corpus
+from chatsky_llm_autoconfig.dedup import dialogue_hash
+from chatsky_llm_autoconfig.dialogue import Dialogue
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "benchmarks"))
+
+from corpus_loading import main  # noqa: E402
+
+with open("data/data.json") as f:
+    DIALOGUES = [item["dialog"] for item in json.load(f)]
+
+
+@pytest.mark.parametrize("format", ["tsv", "jsonl"])
+@pytest.mark.parametrize("chunk_size", [64, 1 << 24])
+def test_roundtrip(tmp_path, format, chunk_size):
+    path = str(tmp_path / f"corpus.{format}")
+    save_corpus(DIALOGUES, path)
+    corpus = load_corpus(path, chunk_size=chunk_size)
+    assert len(corpus) == len(DIALOGUES)
+    assert corpus.turns == sum(len(dialogue) for dialogue in DIALOGUES)
+    assert [dialogue.dialogue for dialogue in corpus] == DIALOGUES
+    assert corpus.participants[:2] == ["assistant", "user"]
+    assert corpus.text_ids.dtype == np.int32 and corpus.participant_codes.dtype == np.int8
+    assert len(corpus.vocabulary) == len({turn["text"] for dialogue in DIALOGUES for turn in dialogue})
+
+
+def test_dialogue_api():
+    corpus = DialogueCorpus.from_dialogues([Dialogue(dialogue=DIALOGUES[0]), [], DIALOGUES[1]])
+    assert len(corpus) == 3 and len(corpus[1]) == 0
+    dialogue = corpus[-1]
+    assert len(dialogue) == len(DIALOGUES[1])
+    assert dialogue[1] == DIALOGUES[1][1]
+    assert list(dialogue.participant_codes[:2]) == [0, 1]
+    assert str(dialogue) == str(Dialogue(dialogue=DIALOGUES[1]))
+    assert dialogue.to_dialogue().dialogue == DIALOGUES[1]
+    assert dialogue_hash(dialogue) == dialogue_hash(DIALOGUES[1])
+    with pytest.raises(IndexError):
+        corpus[3]
+
+
+def test_tsv_format(tmp_path):
+    path = tmp_path / "corpus.tsv"
+    path.write_bytes("assistant\tHi\r\nuser\tHello\tthere\r\n\r\n\r\nnarrator\tThe end\nassistant\tBye".encode("utf-8"))
+    corpus = load_corpus(str(path))
+    assert [dialogue.dialogue for dialogue in corpus] == [
+        [{"text": "Hi", "participant": "assistant"}, {"text": "Hello\tthere", "participant": "user"}],
+        [{"text": "The end", "participant": "narrator"}, {"text": "Bye", "participant": "assistant"}],
+    ]
+    assert corpus.participants == ["assistant", "user", "narrator"]
+    # a tab too many in one line and none in another still has as many tabs as lines
+    for text in ("assistant\tHi\nno tab here\n", "assistant\tHi\tthere\nno tab here\n"):
+        path.write_text(text)
+        with pytest.raises(ValueError, match="participant<TAB>text"):
+            load_corpus(str(path))
+    (tmp_path / "empty.tsv").write_text("")
+    assert len(load_corpus(str(tmp_path / "empty.tsv"))) == 0
+
+
+def test_jsonl_format(tmp_path):
+    path = tmp_path / "corpus.jsonl"
+    lines = [json.dumps(DIALOGUES[0]), "", json.dumps({"dialog": DIALOGUES[1]}), json.dumps({"dialogue": []})]
+    path.write_text("\n".join(lines))
+    assert [dialogue.dialogue for dialogue in load_corpus(str(path))] == [DIALOGUES[0], DIALOGUES[1], []]
+    path.write_text(json.dumps(DIALOGUES[0]) + "\n{broken\n")
+    with pytest.raises(ValueError):
+        load_corpus(str(path))
+    path.write_text('{"graph": {}}\n')
+    with pytest.raises(ValueError, match="list of turns"):
+        load_corpus(str(path))
+    with pytest.raises(ValueError, match="format"):
+        load_corpus(str(path), format="csv")
+
+
+def test_shared_vocabulary(tmp_path):
+    vocabulary = Vocabulary()
+    save_corpus(DIALOGUES[:5], str(tmp_path / "a.jsonl"))
+    save_corpus(DIALOGUES[3:], str(tmp_path / "b.tsv"))
+    first = load_corpus(str(tmp_path / "a.jsonl"), vocabulary=vocabulary)
+    second = load_corpus(str(tmp_path / "b.tsv"), vocabulary=vocabulary)
+    assert np.array_equal(first[3].text_ids, second[0].text_ids)
+    assert second.vocabulary is vocabulary
+
+
+def test_cache_is_mapped_and_invalidated(tmp_path):
+    path, cache_dir = str(tmp_path / "corpus.tsv"), str(tmp_path / "cache")
+    save_corpus(DIALOGUES, path)
+    parsed = load_corpus(path, cache_dir=cache_dir)
+    cached = load_corpus(path, cache_dir=cache_dir)
+    assert isinstance(cached.text_ids, np.memmap)
+    assert [dialogue.dialogue for dialogue in cached] == [dialogue.dialogue for dialogue in parsed]
+    assert cached.nbytes() < 2 * parsed.nbytes()
+
+    # a mapped vocabulary still accepts new texts
+    assert cached.vocabulary.intern("a new text") == len(parsed.vocabulary)
+    assert cached.vocabulary.intern(DIALOGUES[0][0]["text"]) == parsed.vocabulary.intern(DIALOGUES[0][0]["text"])
+
+    save_corpus(DIALOGUES[:2], path)
+    assert len(load_corpus(path, cache_dir=cache_dir)) == 2
+    assert len(DialogueCorpus.load(cache_dir)) == 2
+
+
+def test_benchmark_main(tmp_path, capsys):
+    output = tmp_path / "corpus_loading.json"
+    assert main(["--dialogues", "200", "--repeat", "1", "--output", str(output)]) == 0
+    results = json.loads(output.read_text())["results"]
+    assert results["corpus_tsv"]["bytes_per_dialogue"] * 10 < results["dialogue_tsv"]["bytes_per_dialogue"]
+    assert "B/dialogue" in capsys.readouterr().out
@@ -0,0 +1,46 @@
+from chatsky_llm_autoconfig.dedup import Deduplicator, dialogue_hash, graph_hash, deduplicate_dialogues
+
+GRAPH = {
+    "nodes": [
+        {"id": 1, "label": "start", "is_start": True, "utterances": ["How can I help?"]},
+        {"id": 2, "label": "ask_item", "is_start": False, "utterances": ["Which books would you like to order?"]},
+    ],
+    "edges": [{"source": 1, "target": 2, "utterances": ["I need to make an order"]}],
+}
+
+RENUMBERED = {
+    "nodes": [
+        {"id": 7, "label": "ask", "is_start": False, "utterances": "Which books would you like to order?"},
+        {"id": 3, "label": "hello", "is_start": True, "utterances": ["How can I  help?"]},
+    ],
+    "edges": [{"source": 3, "target": 7, "utterances": ["I need to make an order"]}],
+}
+
+
+def test_graph_hash_ignores_ids_and_order():
+    assert graph_hash(GRAPH) == graph_hash(RENUMBERED)
+    reversed_edge = {"nodes": GRAPH["nodes"], "edges": [{"source": 2, "target": 1, "utterances": ["I need to make an order"]}]}
+    assert graph_hash(GRAPH) != graph_hash(reversed_edge)
+
+
+def test_exact_dialogue_dedup():
+    d1 = [{"text": "Hi", "participant": "assistant"}, {"text": "Hello", "participant": "user"}]
+    d2 = [{"text": "Hi", "participant": "assistant"}, {"text": "Bye", "participant": "user"}]
+    assert dialogue_hash(d1) != dialogue_hash(d2)
+    assert list(deduplicate_dialogues([d1, d2, list(d1)])) == [d1, d2]
+
+
+def test_near_duplicate_graphs():
+    near = {"nodes": GRAPH["nodes"] + [{"id": 3, "label": "bye", "utterances": ["Goodbye"]}], "edges": GRAPH["edges"]}
+    other = {"nodes": [{"id": 1, "label": "x", "utterances": ["Completely different question here"]}], "edges": []}
+    dedup = Deduplicator.for_graphs(near_duplicate_threshold=0.5)
+    assert [dedup.is_duplicate(g) for g in (GRAPH, RENUMBERED, near, other)] == [False, True, True, False]
+    assert dedup.stats == {"seen": 4, "unique": 2, "exact_duplicates": 1, "near_duplicates": 1}
+
+
+def test_bounded_memory():
+    dedup = Deduplicator.for_dialogues(near_duplicate_threshold=0.8, max_entries=2)
+    dialogues = [[{"text": f"utterance number {i}", "participant": "user"}] for i in range(5)]
+    assert len(list(dedup.filter(dialogues))) == 5
+    assert len(dedup._seen) == 2
+    assert not dedup.is_duplicate(dialogues[0])
@@ -0,0 +1,116 @@
+import json
+import multiprocessing
+
+import numpy as np
+import pytest
+
+from chatsky_llm_autoconfig.evaluate import calculate_metrics
+from chatsky_llm_autoconfig.graph import TYPES_OF_GRAPH, Graph
+from chatsky_llm_autoconfig.metrics.fuzzy import (
+    VectorStore,
+    fuzzy_edges,
+    fuzzy_nodes,
+    fuzzy_similarity_matrix,
+    hashed_vector,
+    set_vector_store,
+    utterance_id,
+)
+from chatsky_llm_autoconfig.graph_diff import diff_graphs
+from chatsky_llm_autoconfig.utils import normalize_utterance
+
+with open("data/data.json") as f:
+    DATA = json.load(f)
+
+UTTERANCES = ["No, that's all", "No, that’s all", "No, that is all for now", "I want to book a table", ""]
+
+
+def test_normalization():
+    assert normalize_utterance("  No, That’s   ALL — thanks ") == "no, that's all - thanks"
+    assert utterance_id("No, that's all") == utterance_id("no, that’s  all")
+    # the exact-match paths key utterances the same way as the fuzzy metric
+    graph = {"nodes": [{"id": 1, "label": "", "is_start": True, "utterances": ["Fine — thanks"]}], "edges": []}
+    renamed = {"nodes": [{"id": 1, "label": "", "is_start": True, "utterances": ["fine - thanks"]}], "edges": []}
+    assert diff_graphs(graph, renamed).is_exact
+
+
+def test_hashed_vectors():
+    vectors = np.stack([hashed_vector(text) for text in UTTERANCES])
+    assert vectors.dtype == np.float32 and vectors.shape == (5, 1024)
+    assert np.allclose(np.linalg.norm(vectors[:4], axis=1), 1.0)
+    assert not vectors[4].any()
+    cosine = vectors @ vectors.T
+    assert cosine[0, 1] == pytest.approx(1.0)
+    assert cosine[0, 3] < 0.2 < cosine[0, 2] < 0.9
+
+
+def test_set_similarity():
+    matrix = fuzzy_similarity_matrix({1: ["No, that's all", "Thanks"], 2: ["Hello"], 3: []}, {1: ["thanks", "No, that’s all"], 2: ["Goodbye"]})
+    assert matrix.shape == (3, 2) and matrix.dtype == np.float32
+    assert matrix[0, 0] == pytest.approx(1.0)
+    assert matrix[0, 1] < 0.2
+    assert not matrix[2].any()
+    assert fuzzy_similarity_matrix({}, {1: ["a"]}).shape == (0, 1)
+
+
+def test_fuzzy_metrics_reward_typography_changes():
+    target = DATA[0]["target_graph"]
+    generated = json.loads(json.dumps(target).replace("'", "\\u2019"))
+    true_graph, gen_graph = Graph(target, TYPES_OF_GRAPH.MULTI).nx_graph, Graph(generated, TYPES_OF_GRAPH.MULTI).nx_graph
+    values, indices = fuzzy_nodes(true_graph.nodes(data=True), gen_graph.nodes(data=True))
+    assert values == pytest.approx([1.0] * len(values))
+    assert indices == list(range(len(values)))
+    edge_values, _ = fuzzy_edges(true_graph.edges(data=True), gen_graph.edges(data=True))
+    assert len(edge_values) == len({(u, v) for u, v in true_graph.edges()})
+
+    metrics = calculate_metrics(target, target)
+    assert metrics["Fuzzy Node Similarity"] == pytest.approx([1.0] * len(target["nodes"]))
+    assert len(metrics["Fuzzy Edge Similarity"]) == len(metrics["Jaccard Edge Similarity"])
+
+
+def test_vector_store_roundtrip(tmp_path):
+    path = str(tmp_path / "vectors")
+    store = VectorStore(path)
+    vectors = store.get(UTTERANCES)
+    assert len(store) == 4  # the two spellings share an id
+    assert np.allclose(vectors, np.stack([hashed_vector(text) for text in UTTERANCES]))
+    store.get(UTTERANCES[:2])
+    assert store.stats == {"hits": 3, "misses": 4}
+
+    reopened = VectorStore(path)
+    assert len(reopened) == 4
+    assert np.array_equal(reopened.get(UTTERANCES), vectors)
+    assert reopened.stats["misses"] == 0
+    with pytest.raises(ValueError):
+        VectorStore(path, dim=256)
+
+
+def test_store_results_match_uncached(tmp_path):
+    graph = Graph(DATA[1]["target_graph"], TYPES_OF_GRAPH.MULTI).nx_graph
+    expected = fuzzy_edges(graph.edges(data=True), graph.edges(data=True), return_matrix=True)[2]
+    set_vector_store(VectorStore(str(tmp_path / "vectors")))
+    try:
+        cached = fuzzy_edges(graph.edges(data=True), graph.edges(data=True), return_matrix=True)[2]
+    finally:
+        set_vector_store(None)
+    assert np.allclose(cached, expected)
+
+
+def fill_store(path, offset):
+    VectorStore(path).get([f"utterance {i}" for i in range(offset, offset + 300)])
+
+
+def test_vector_store_shared_by_processes(tmp_path):
+    path = str(tmp_path / "vectors")
+    context = multiprocessing.get_context("fork")
+    processes = [context.Process(target=fill_store, args=(path, offset)) for offset in (0, 150, 200)]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+        assert process.exitcode == 0
+
+    store = VectorStore(path)
+    assert len(store) == 500
+    texts = [f"utterance {i}" for i in range(500)]
+    assert np.allclose(store.get(texts), np.stack([hashed_vector(text) for text in texts]))
+    assert store.stats["misses"] == 0
@@ -0,0 +1,119 @@
+import asyncio
+import json
+
+from chatsky_llm_autoconfig.generation_pipeline import Pipeline, Stage, build_generation_pipeline, make_graph_templates
+
+TARGET = {
+    "nodes": [
+        {"id": 1, "label": "start", "is_start": True, "utterances": ["How can I help?"]},
+        {"id": 2, "label": "bye", "is_start": False, "utterances": ["Goodbye"]},
+    ],
+    "edges": [{"source": 1, "target": 2, "utterances": ["Nothing, thanks"]}],
+}
+
+
+class FakeResponse:
+    def __init__(self, content):
+        self.content = content
+
+
+class FakeModel:
+    def __init__(self, delay=0.01):
+        self.delay = delay
+        self.calls = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def ainvoke(self, prompt):
+        self.calls += 1
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        await asyncio.sleep(self.delay)
+        self.in_flight -= 1
+        theme = prompt.split("THEME=")[1] if "THEME=" in prompt else "base"
+        graph = json.loads(json.dumps(TARGET))
+        graph["nodes"][1]["utterances"] = [f"Goodbye from {theme}"]
+        return FakeResponse(json.dumps(graph))
+
+
+class FakePrompt:
+    def __init__(self, name):
+        self.name = name
+
+    def format(self, **kwargs):
+        return f"{self.name} " + " ".join(f"{k}={v}" for k, v in kwargs.items() if k == "THEME")
+
+
+def test_pipeline_fan_out_and_failures():
+    async def double(x):
+        return [x, x]
+
+    async def fail_on_odd(x):
+        if x % 2:
+            raise ValueError("odd")
+        return [x]
+
+    pipeline = Pipeline([Stage("double", double, concurrency=2), Stage("even", fail_on_odd, concurrency=3)], queue_size=1)
+    stats = asyncio.run(pipeline.run(range(5)))
+    assert stats["double"]["emitted"] == 10
+    assert stats["even"]["received"] == 10
+    assert stats["even"]["failed"] == 4
+    assert stats["even"]["emitted"] == 6
+
+
+def test_generation_pipeline_writes_incrementally_and_resumes(tmp_path):
+    templates = make_graph_templates([{"samping_method": "chain", "target_graph": TARGET}])
+    assert templates[0]["empty"]["nodes"][0]["utterances"] == []
+    assert TARGET["nodes"][0]["utterances"] == ["How can I help?"]
+
+    output = tmp_path / "dataset.jsonl"
+    model = FakeModel()
+    kwargs = dict(themes={"shop", "cooking", "travel"}, variants_per_theme=2, near_duplicate_threshold=None)
+    pipeline = build_generation_pipeline(model, FakePrompt("gen"), FakePrompt("aug"), str(output), **kwargs)
+    stats = asyncio.run(pipeline.run(templates))
+
+    records = [json.loads(line) for line in output.read_text().splitlines()]
+    # variants of one theme are exact duplicates of each other and get dropped
+    assert sorted(r["theme"] for r in records) == ["cooking", "shop", "travel"]
+    assert stats["augment"]["received"] == 6
+    assert model.max_in_flight > 1
+
+    model = FakeModel()
+    pipeline = build_generation_pipeline(model, FakePrompt("gen"), FakePrompt("aug"), str(output), **{**kwargs, "variants_per_theme": 1})
+    asyncio.run(pipeline.run(templates))
+    assert model.calls == 0
+
+
+def test_resume_skips_dropped_jobs_and_keeps_deduplicating(tmp_path):
+    templates = make_graph_templates([{"samping_method": "chain", "target_graph": TARGET}])
+    output = tmp_path / "dataset.jsonl"
+    kwargs = dict(themes={"shop", "cooking"}, near_duplicate_threshold=None)
+
+    class BrokenForCooking(FakeModel):
+        async def ainvoke(self, prompt):
+            response = await super().ainvoke(prompt)
+            graph = json.loads(response.content)
+            if "THEME=cooking" in prompt:
+                graph["nodes"][0]["is_start"] = False
+            return FakeResponse(json.dumps(graph))
+
+    asyncio.run(
+        build_generation_pipeline(BrokenForCooking(), FakePrompt("gen"), FakePrompt("aug"), str(output), variants_per_theme=2, **kwargs).run(
+            templates
+        )
+    )
+    skipped = [json.loads(line) for line in (tmp_path / "dataset.jsonl.skipped.jsonl").read_text().splitlines()]
+    assert sorted((r["theme"], r["variant"], r["reason"]) for r in skipped) == [
+        ("cooking", 0, "invalid_graph"),
+        ("cooking", 1, "invalid_graph"),
+        ("shop", 1, "duplicate_graph"),
+    ]
+
+    # only the new variants are generated, and their graphs duplicate the rows already written
+    model = FakeModel()
+    stats = asyncio.run(
+        build_generation_pipeline(model, FakePrompt("gen"), FakePrompt("aug"), str(output), variants_per_theme=3, **kwargs).run(templates)
+    )
+    assert stats["augment"]["received"] == 2
+    assert model.calls == 1 + 2
+    assert [json.loads(line)["theme"] for line in output.read_text().splitlines()] == ["shop", "cooking"]
@@ -0,0 +1,131 @@
+import json
+import os
+import sys
+import time
+
+from chatsky_llm_autoconfig.cli import main
+from chatsky_llm_autoconfig.graph_diff import ERROR_TYPES, aggregate_diffs, diff_graphs, map_nodes
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "benchmarks"))
+
+from synthetic import make_graph  # noqa: E402
+
+with open("data/data.json") as f:
+    DATA = json.load(f)
+
+
+def graph(nodes, edges):
+    return {
+        "nodes": [{"id": i, "label": "", "is_start": i == 1, "utterances": utterances} for i, utterances in nodes.items()],
+        "edges": [{"source": s, "target": t, "utterances": utterances} for (s, t), utterances in edges.items()],
+    }
+
+
+TARGET = graph(
+    {1: ["Hi, how can I help?"], 2: ["Which size?", "What size do you need?"], 3: ["Anything else?"]},
+    {(1, 2): ["I want a pizza"], (2, 3): ["Large", "Small"], (3, 1): ["Yes"], (3, 2): ["No, that's all"]},
+)
+
+
+def test_identical_and_renumbered_graphs():
+    assert diff_graphs(TARGET, TARGET).is_exact
+    renumbered = json.loads(
+        json.dumps(TARGET).replace('"id": 1', '"id": 9').replace('"source": 1', '"source": 9').replace('"target": 1', '"target": 9')
+    )
+    diff = diff_graphs(TARGET, renumbered)
+    assert diff.is_exact
+    assert diff.node_mapping == {1: 9, 2: 2, 3: 3}
+    assert map_nodes(TARGET, renumbered) == diff.node_mapping
+
+
+def test_typography_is_ignored():
+    predicted = json.loads(json.dumps(TARGET).replace("that's", "That\\u2019s"))
+    assert diff_graphs(TARGET, predicted).is_exact
+
+
+def test_missing_extra_and_changed():
+    predicted = graph(
+        {1: ["Hi, how can I help?"], 2: ["Which size?"], 4: ["Bye"]},
+        {(1, 2): ["I want a pizza", "Pizza please"], (2, 4): ["Large"]},
+    )
+    diff = diff_graphs(TARGET, predicted)
+    assert diff.missing_nodes == [{"id": 3, "utterances": ["Anything else?"]}]
+    assert diff.extra_nodes == [{"id": 4, "utterances": ["Bye"]}]
+    assert diff.changed_nodes == [{"target": 2, "predicted": 2, "missing_utterances": ["What size do you need?"], "extra_utterances": []}]
+    assert diff.changed_edges == [{"target": "1->2", "predicted": "1->2", "missing_utterances": [], "extra_utterances": ["Pizza please"]}]
+    assert [edge["edge"] for edge in diff.missing_edges] == ["2->3", "3->1", "3->2"]
+    assert diff.missing_edges[0]["found_in"] == ["2->4"]
+    assert diff.missing_edges[0]["mapped"] is None
+    assert diff.extra_edges == [{"edge": "2->4", "utterances": ["Large"], "found_in": ["2->3"]}]
+
+
+def test_split_and_merged():
+    predicted = graph(
+        {1: ["Hi, how can I help?", "Anything else?"], 2: ["Which size?"], 5: ["What size do you need?"]},
+        {(1, 2): ["I want a pizza", "Yes"], (2, 1): ["Large"], (5, 1): ["Small"], (1, 5): ["No, that's all"]},
+    )
+    diff = diff_graphs(TARGET, predicted)
+    assert diff.split_nodes == [{"target": 2, "predicted": [2, 5], "utterances": {"2": ["Which size?"], "5": ["What size do you need?"]}}]
+    assert diff.merged_nodes == [{"predicted": 1, "target": [1, 3], "utterances": {"1": ["Hi, how can I help?"], "3": ["Anything else?"]}}]
+    assert diff.split_edges == [{"target": "2->3", "predicted": ["2->1", "5->1"], "utterances": {"2->1": ["Large"], "5->1": ["Small"]}}]
+    assert diff.merged_edges == [{"predicted": "1->2", "target": ["1->2", "3->1"], "utterances": {"1->2": ["I want a pizza"], "3->1": ["Yes"]}}]
+    assert diff.node_mapping == {1: 1, 2: 2, 3: 1}
+
+
+def test_repeated_utterances_are_not_splits():
+    # "No, that's all" legitimately leaves several nodes, here in both graphs
+    target = graph({1: ["a"], 2: ["b"], 3: ["c"]}, {(1, 3): ["No, that's all"], (2, 3): ["No, that's all"], (1, 2): ["next"]})
+    diff = diff_graphs(target, target)
+    assert diff.is_exact
+
+
+def test_explicit_mapping():
+    diff = diff_graphs(TARGET, TARGET, node_mapping={1: 1, 2: 3, 3: 2, 99: 1})
+    assert diff.node_mapping == {1: 1, 2: 3, 3: 2}
+    assert len(diff.changed_nodes) == 2
+    assert diff_graphs(TARGET, TARGET, node_mapping={1: 1, 2: 2}).missing_nodes[0]["id"] == 3
+
+
+def test_aggregate_objects_and_dicts():
+    diffs = [diff_graphs(item["target_graph"], item["predicted_graph"]) for item in DATA if item["predicted_graph"]]
+    summary = aggregate_diffs(diffs)
+    assert summary == aggregate_diffs(json.loads(json.dumps([diff.as_dict() for diff in diffs])))
+    assert summary["pairs"] == len(diffs)
+    assert summary["exact"] == sum(diff.is_exact for diff in diffs)
+    assert set(summary["totals"]) == set(ERROR_TYPES)
+    assert all(0 <= summary["error_rate"][name] <= 1 for name in ERROR_TYPES)
+    assert aggregate_diffs([])["pairs"] == 0
+
+
+def test_large_graph_is_fast():
+    target = make_graph(20_000, "branching", 2.0)
+    start = time.perf_counter()
+    diff = diff_graphs(target, target)
+    assert time.perf_counter() - start < 10
+    assert diff.is_exact
+
+
+def test_cli_diff(tmp_path):
+    main(["diff", "data/data.json", str(tmp_path), "--limit", "4"])
+    lines = (tmp_path / "graph_diffs.jsonl").read_text().splitlines()
+    assert [json.loads(line)["idx"] for line in lines] == [i for i in range(4) if DATA[i]["predicted_graph"]]
+    assert json.loads((tmp_path / "diff_summary.json").read_text())["pairs"] == len(lines)
+
+
+def test_cli_triplet_mapping_keeps_original_ids(tmp_path, capsys):
+    relabel = {1: 10, 2: 20, 3: 30}
+    target = {
+        "nodes": [{**node, "id": relabel[node["id"]]} for node in TARGET["nodes"]],
+        "edges": [{**edge, "source": relabel[edge["source"]], "target": relabel[edge["target"]]} for edge in TARGET["edges"]],
+    }
+    predicted = {
+        "nodes": [{**node, "id": node["id"] - 1} for node in TARGET["nodes"]],
+        "edges": [{**edge, "source": edge["source"] - 1, "target": edge["target"] - 1} for edge in TARGET["edges"]],
+    }
+    input_path = tmp_path / "data.json"
+    input_path.write_text(json.dumps([{"target_graph": target, "predicted_graph": predicted}]))
+    for flags in ([], ["--triplet-mapping"]):
+        main(["diff", str(input_path), str(tmp_path / "out"), *flags])
+        diff = json.loads((tmp_path / "out" / "graph_diffs.jsonl").read_text())
+        assert not any(diff["counts"].values()), flags
+        assert diff["node_mapping"] == {"10": 0, "20": 1, "30": 2}
@@ -0,0 +1,55 @@
+import json
+import random
+
+import networkx as nx
+import pytest
+
+from chatsky_llm_autoconfig.evaluate import calculate_text_to_utterance_percentage, evaluate_generation, has_cycle
+from chatsky_llm_autoconfig.graph import TYPES_OF_GRAPH, Graph
+from chatsky_llm_autoconfig.graph_stats import CorpusStats, compute_graph_stats
+
+with open("data/data.json") as f:
+    DATA = json.load(f)
+
+
+def random_graph(rng, n):
+    nodes = [{"id": i, "label": "", "is_start": i == 1, "utterances": [f"node {i}"]} for i in range(1, n + 1)]
+    edges = [{"source": rng.randint(1, n), "target": rng.randint(1, n), "utterances": [f"edge {k}"]} for k in range(rng.randint(0, 2 * n))]
+    return {"nodes": nodes, "edges": edges}
+
+
+@pytest.mark.parametrize("seed", range(30))
+def test_matches_networkx(seed):
+    rng = random.Random(seed)
+    graph_dict = random_graph(rng, rng.randint(1, 12))
+    nx_graph = nx.MultiDiGraph()
+    nx_graph.add_nodes_from(node["id"] for node in graph_dict["nodes"])
+    nx_graph.add_edges_from((edge["source"], edge["target"]) for edge in graph_dict["edges"])
+
+    stats = compute_graph_stats(graph_dict)
+    assert stats.has_cycle == has_cycle(nx_graph)
+    assert stats.scc_count == nx.number_strongly_connected_components(nx_graph)
+    assert stats.reachable_nodes == len(nx.descendants(nx_graph, 1) | {1})
+    assert stats.dead_ends == sum(1 for _, degree in nx_graph.out_degree() if degree == 0)
+    assert sorted(stats.out_degrees.tolist()) == sorted(degree for _, degree in nx_graph.out_degree())
+
+
+def test_evaluate_generation_keeps_previous_numbers(tmp_path):
+    items = [{"dialog": item["dialog"], "graph": item["target_graph"]} for item in DATA]
+    input_path = tmp_path / "pairs.json"
+    input_path.write_text(json.dumps(items))
+
+    report = evaluate_generation(str(input_path), str(tmp_path))
+    graphs = [Graph(item["graph"], TYPES_OF_GRAPH.MULTI).nx_graph for item in items]
+    assert report["total_graphs"] == len(items)
+    assert report["total_nodes"] == sum(graph.number_of_nodes() for graph in graphs)
+    assert report["total_edges"] == sum(graph.number_of_edges() for graph in graphs)
+    assert report["with_cycles"] == sum(has_cycle(graph) for graph in graphs)
+    expected = sum(calculate_text_to_utterance_percentage(item) for item in items) / len(items)
+    assert report["text_to_utterance_percentage"] == pytest.approx(expected)
+    assert sum(report["out_degree_histogram"]) == report["total_nodes"]
+    assert json.loads((tmp_path / "generation_metrics.json").read_text()) == report
+
+
+def test_empty_corpus():
+    assert CorpusStats.from_items([]).summary()["total_graphs"] == 0
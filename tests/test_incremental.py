@@ -0,0 +1,88 @@
+import json
+
+import pytest
+
+from chatsky_llm_autoconfig.incremental import IncrementalGraphBuilder, merge_delta
+from chatsky_llm_autoconfig.validation import validate_graph
+from tests.helpers import ScriptedModel, turns
+
+
+def test_merge_delta_extends_and_adds():
+    graph = {"nodes": [{"id": 1, "label": "start", "is_start": True, "utterances": "Hi"}], "edges": []}
+    added = merge_delta(
+        graph,
+        {
+            "nodes": [{"id": 1, "utterances": ["hi", "Hello"]}, {"id": 2, "utterances": ["Bye"]}],
+            "edges": [{"source": 1, "target": 2, "utterances": "ok"}],
+        },
+    )
+    assert added == {"nodes": 1, "edges": 1}
+    assert graph["nodes"][0]["utterances"] == ["Hi", "Hello"]
+
+
+def test_merge_delta_refuses_edges_to_unknown_nodes():
+    graph = {"nodes": [{"id": 1, "label": "start", "is_start": True, "utterances": ["Hi"]}], "edges": []}
+    with pytest.raises(ValueError, match="unknown nodes"):
+        merge_delta(graph, {"nodes": [{"id": 2, "utterances": ["Bye"]}], "edges": [{"source": 1, "target": 7, "utterances": ["ok"]}]})
+    assert graph == {"nodes": [{"id": 1, "label": "start", "is_start": True, "utterances": ["Hi"]}], "edges": []}
+
+
+def test_builder_without_model_reuses_known_turns():
+    builder = IncrementalGraphBuilder()
+    builder.add_dialogue(turns("How can I help?", "I need an order", "Which books?", "Thanks", "Bye"))
+    summary = builder.add_dialogue(turns("How can I help?", "I want to order", "Which books?", "Nothing", "Goodbye"))
+    assert summary["matched_turns"] == 2
+    assert summary["new_nodes"] == 1
+    assert len(builder.graph_dict["nodes"]) == 4
+    edge_utterances = {(e["source"], e["target"]): e["utterances"] for e in builder.graph_dict["edges"]}
+    assert edge_utterances[(1, 2)] == ["I need an order", "I want to order"]
+    assert validate_graph(builder.graph_dict) == []
+
+
+def test_builder_asks_llm_only_for_unmatched_fragment():
+    bootstrap = {
+        "nodes": [
+            {"id": 1, "label": "start", "is_start": True, "utterances": ["How can I help?"]},
+            {"id": 2, "label": "ask_item", "utterances": ["Which books?"]},
+        ],
+        "edges": [{"source": 1, "target": 2, "utterances": ["I need an order"]}],
+    }
+    delta = {"nodes": [{"id": 1, "utterances": ["Hello!"]}], "edges": []}
+    model = ScriptedModel([json.dumps(bootstrap), json.dumps(delta)])
+    builder = IncrementalGraphBuilder(model=model)
+    builder.add_dialogue(turns("How can I help?", "I need an order", "Which books?"))
+    summary = builder.add_dialogue(turns("Hello!", "I want to order", "Which books?"))
+
+    assert summary == {"matched_turns": 1, "llm_calls": 1, "new_nodes": 0, "new_edges": 0}
+    assert "Hello!" in model.prompts[1] and "[node 2]" in model.prompts[1]
+    assert builder.graph_dict["nodes"][0]["utterances"] == ["How can I help?", "Hello!"]
+    assert builder.graph_dict["edges"][0]["utterances"] == ["I need an order", "I want to order"]
+    assert builder.stats["llm_calls"] == 2
+
+
+def test_builder_without_model_reuses_repeated_new_utterances():
+    builder = IncrementalGraphBuilder()
+    builder.add_dialogue(turns("Hi", "I want to order", "Which size?", "Large", "Which color?", "Other size", "Which size?", "Small", "Which color?"))
+    assert [node["utterances"] for node in builder.graph_dict["nodes"]] == [["Hi"], ["Which size?"], ["Which color?"]]
+    assert validate_graph(builder.graph_dict) == []
+
+
+def test_builder_drops_delta_edges_to_unknown_nodes():
+    bootstrap = {
+        "nodes": [
+            {"id": 1, "label": "start", "is_start": True, "utterances": ["How can I help?"]},
+            {"id": 2, "label": "ask_item", "utterances": ["Which books?"]},
+        ],
+        "edges": [{"source": 1, "target": 2, "utterances": ["I need an order"]}],
+    }
+    delta = {
+        "nodes": [{"id": 3, "label": "bye", "utterances": ["Goodbye"]}],
+        "edges": [{"source": 2, "target": 3, "utterances": ["Nothing"]}, {"source": 3, "target": 7, "utterances": ["Again"]}],
+    }
+    builder = IncrementalGraphBuilder(model=ScriptedModel([json.dumps(bootstrap), json.dumps(delta)]))
+    builder.add_dialogue(turns("How can I help?", "I need an order", "Which books?"))
+    summary = builder.add_dialogue(turns("How can I help?", "I need an order", "Which books?", "Nothing", "Goodbye"))
+
+    assert summary["new_nodes"] == 1 and summary["new_edges"] == 1
+    assert {(e["source"], e["target"]) for e in builder.graph_dict["edges"]} == {(1, 2), (2, 3)}
+    assert validate_graph(builder.graph_dict) == []
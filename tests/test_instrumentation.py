@@ -0,0 +1,105 @@
+import asyncio
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+import pytest
+
+from chatsky_llm_autoconfig import cli, instrumentation
+from chatsky_llm_autoconfig.evaluate import calculate_metrics
+from chatsky_llm_autoconfig.instrumentation import InMemorySink, JsonlSink, OtlpHttpSink, count, instrumented, span, traced
+from chatsky_llm_autoconfig.sample_dialogue import dialogues_from_graph
+
+with open("data/data.json") as f:
+    DATA = json.load(f)
+GRAPH = DATA[0]["target_graph"]
+
+
+def test_disabled_spans_are_noops():
+    assert not instrumentation.is_enabled()
+    with span("nothing") as record:
+        assert record is None
+    count("nothing")
+
+
+def test_nested_spans_and_counters(tmp_path):
+    memory = InMemorySink()
+    trace = tmp_path / "trace.jsonl"
+    with instrumented(memory, JsonlSink(str(trace))):
+        calculate_metrics(GRAPH, GRAPH)
+        count("llm.calls", 2)
+    assert not instrumentation.is_enabled()
+
+    summary = memory.summary()
+    assert summary["spans"]["graph.load"]["count"] == 2
+    assert {"metrics.calculate", "metrics.jaccard_edges", "metrics.jaccard_nodes", "metrics.triplet_match"} <= set(summary["spans"])
+    assert summary["counters"] == {"llm.calls": 2}
+
+    entries = [json.loads(line) for line in trace.read_text().splitlines()]
+    spans = {entry["name"]: entry for entry in entries if entry["type"] == "span"}
+    outer = spans["metrics.calculate"]
+    assert outer["parent_id"] is None
+    assert spans["metrics.triplet_match"]["parent_id"] == outer["span_id"]
+    assert spans["metrics.triplet_match"]["trace_id"] == outer["trace_id"]
+
+
+def test_sampling_spans_are_separate():
+    memory = InMemorySink()
+    with instrumented(memory):
+        dialogues_from_graph(GRAPH)
+    assert memory.summary()["spans"]["sample.dialogues"]["count"] == 1
+    assert "sample.walk" not in memory.summary()["spans"]
+
+
+def test_async_functions_and_errors_are_traced():
+    @traced("work")
+    async def work(fail):
+        if fail:
+            raise ValueError("boom")
+        return 1
+
+    memory = InMemorySink()
+    with instrumented(memory):
+        assert asyncio.run(work(False)) == 1
+        with pytest.raises(ValueError):
+            asyncio.run(work(True))
+    assert memory.summary()["spans"]["work"]["count"] == 2
+
+
+def test_otlp_exporter_posts_json():
+    received = []
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            received.append((self.path, json.loads(self.rfile.read(int(self.headers["Content-Length"])))))
+            self.send_response(200)
+            self.end_headers()
+
+        def log_message(self, *args):
+            pass
+
+    server = HTTPServer(("127.0.0.1", 0), Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        with instrumented(OtlpHttpSink(f"http://127.0.0.1:{server.server_port}/v1/traces")):
+            with span("outer", dialogue=3):
+                with span("inner"):
+                    pass
+    finally:
+        server.shutdown()
+
+    path, payload = received[0]
+    assert path == "/v1/traces"
+    spans = payload["resourceSpans"][0]["scopeSpans"][0]["spans"]
+    inner, outer = spans
+    assert inner["parentSpanId"] == outer["spanId"]
+    assert outer["attributes"] == [{"key": "dialogue", "value": {"intValue": "3"}}]
+
+
+def test_cli_saves_latency_summary(tmp_path, monkeypatch):
+    monkeypatch.setattr(cli, "generate_graph", lambda dialogue, model, retries=2, output_format="json", repair=False: GRAPH)
+    cli.main(["--spans", "--trace-file", str(tmp_path / "trace.jsonl"), "evaluate", "data/data.json", str(tmp_path), "--limit", "2"])
+    summary = json.loads((tmp_path / "latency_summary.json").read_text())
+    assert summary["spans"]["metrics.calculate"]["count"] == 2
+    assert (tmp_path / "trace.jsonl").exists()
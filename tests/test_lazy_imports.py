@@ -0,0 +1,42 @@
+import subprocess
+import sys
+
+import pytest
+
+from chatsky_llm_autoconfig import prompts
+
+LIGHT_MODULES = [
+    "evaluate",
+    "model",
+    "sweep",
+    "workqueue",
+    "incremental",
+    "generation_pipeline",
+    "consensus",
+    "compact_format",
+    "repair",
+    "metrics.triplet_matching",
+]
+
+
+@pytest.mark.parametrize("module", LIGHT_MODULES)
+def test_import_does_not_load_heavy_dependencies(module):
+    code = (
+        "import os, sys\n"
+        "before = dict(os.environ)\n"
+        f"import chatsky_llm_autoconfig.{module}\n"
+        "heavy = [name for name in ('matplotlib', 'langchain', 'langchain_core', 'langchain_openai', 'dotenv', 'scipy') if name in sys.modules]\n"
+        "assert not heavy, heavy\n"
+        "assert dict(os.environ) == before\n"
+    )
+    result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True)
+    assert result.returncode == 0, result.stderr
+
+
+def test_prompts_are_built_on_first_access():
+    from chatsky_llm_autoconfig.prompts import cycle_graph_generation_prompt
+
+    assert cycle_graph_generation_prompt is prompts.cycle_graph_generation_prompt
+    assert "Dialogue: [1, 2]" in prompts.create_graph_prompt.format(dialog=[1, 2])
+    with pytest.raises(AttributeError):
+        prompts.missing_prompt
@@ -0,0 +1,94 @@
+import json
+import multiprocessing
+import pickle
+import sqlite3
+
+import pytest
+
+from chatsky_llm_autoconfig import evaluate
+from chatsky_llm_autoconfig.metric_cache import MetricCache, metric_key
+
+with open("data/data.json") as f:
+    DATA = json.load(f)
+# targets repeat across sampling methods, keep one of each
+GRAPHS = list({json.dumps(item["target_graph"], sort_keys=True): item["target_graph"] for item in DATA}.values())
+TARGET, OTHER = GRAPHS[0], GRAPHS[1]
+
+
+def counting_metrics(calls):
+    def compute(generated, target):
+        calls.append(1)
+        return {"Node Accuracy": 1.0}
+
+    return compute
+
+
+def test_key_ignores_key_order_but_not_version():
+    reordered = json.loads(json.dumps(TARGET, sort_keys=True))
+    reordered["nodes"] = [dict(reversed(list(node.items()))) for node in reordered["nodes"]]
+    assert metric_key(reordered, OTHER, 1) == metric_key(TARGET, OTHER, 1)
+    assert metric_key(TARGET, OTHER, 1) != metric_key(TARGET, OTHER, 2)
+    assert metric_key(TARGET, OTHER, 1) != metric_key(OTHER, TARGET, 1)
+
+
+def test_hits_misses_and_version(tmp_path):
+    calls = []
+    cache = MetricCache(str(tmp_path / "cache.sqlite"), version=1)
+    for _ in range(3):
+        assert cache.get_or_compute(TARGET, OTHER, counting_metrics(calls)) == {"Node Accuracy": 1.0}
+    assert len(calls) == 1 and cache.stats["hits"] == 2
+
+    bumped = MetricCache(str(tmp_path / "cache.sqlite"), version=2)
+    bumped.get_or_compute(TARGET, OTHER, counting_metrics(calls))
+    assert len(calls) == 2
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path):
+    cache = MetricCache(str(tmp_path / "cache.sqlite"), version=1, max_entries=2, evict_every=1)
+    graphs = GRAPHS[:3]
+    cache.put(graphs[0], TARGET, {"n": 0})
+    cache.put(graphs[1], TARGET, {"n": 1})
+    assert cache.get(graphs[0], TARGET) == {"n": 0}
+    cache.put(graphs[2], TARGET, {"n": 2})
+    assert len(cache) == 2
+    assert cache.get(graphs[1], TARGET) is None
+    assert cache.get(graphs[0], TARGET) == {"n": 0}
+
+
+def fill(cache, idx):
+    cache.put(GRAPHS[idx], TARGET, {"idx": idx})
+    return idx
+
+
+def test_cache_is_shared_between_processes(tmp_path):
+    cache = MetricCache(str(tmp_path / "cache.sqlite"), version=1)
+    with multiprocessing.get_context("fork").Pool(3) as pool:
+        pool.starmap(fill, [(cache, idx) for idx in range(6)])
+    assert len(cache) == 6
+    assert cache.get(GRAPHS[5], TARGET) == {"idx": 5}
+
+
+def test_rescore_uses_cache(tmp_path, monkeypatch):
+    input_path = tmp_path / "data.json"
+    input_path.write_text(json.dumps(DATA[:2]))
+    (tmp_path / "generated_graphs.json").write_text(json.dumps({"0": DATA[0]["target_graph"], "1": None}))
+    cache = MetricCache(str(tmp_path / "cache.sqlite"))
+
+    first = evaluate.rescore(str(input_path), str(tmp_path), cache)
+    assert first[0]["Triplet Match Accuracy"] == 1.0 and first[1]["Node Accuracy"] == 0
+
+    calls = []
+    monkeypatch.setattr(evaluate, "calculate_metrics", counting_metrics(calls))
+    second = evaluate.rescore(str(input_path), str(tmp_path), cache)
+    assert calls == [] and second[0]["Triplet Match Accuracy"] == 1.0
+    assert json.loads((tmp_path / "all_metrics.json").read_text())["0"]["Edge Accuracy"] == 1.0
+
+
+def test_journal_mode(tmp_path):
+    path = str(tmp_path / "cache.sqlite")
+    MetricCache(path, version=1).close()
+    assert sqlite3.connect(path).execute("PRAGMA journal_mode").fetchone()[0] == "delete"
+    cache = pickle.loads(pickle.dumps(MetricCache(path, version=1, journal_mode="WAL")))
+    assert cache.journal_mode == "WAL" and cache._connection.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+    with pytest.raises(ValueError):
+        MetricCache(path, journal_mode="MEMORY")
@@ -0,0 +1,75 @@
+import json
+import os
+import sys
+import xml.etree.ElementTree as ET
+
+import pytest
+
+from chatsky_llm_autoconfig import cli
+from chatsky_llm_autoconfig.render import EXACT_LAYOUT_NODES, LayoutCache, comparison_html, graph_svg, layout_key, match_classes, render_pairs
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "benchmarks"))
+
+from synthetic import make_graph, perturb  # noqa: E402
+
+with open("data/data.json") as f:
+    DATA = json.load(f)
+
+TARGET = DATA[0]["target_graph"]
+SVG = "{http://www.w3.org/2000/svg}"
+
+
+def test_svg_is_valid_and_has_tooltips():
+    root = ET.fromstring(graph_svg(TARGET))
+    groups = root.findall(f"{SVG}g")
+    assert len([g for g in groups if "node" in g.get("class")]) == len(TARGET["nodes"])
+    assert len([g for g in groups if "edge" in g.get("class")]) == len({(e["source"], e["target"]) for e in TARGET["edges"]})
+    assert any("I want to order" in g.find(f"{SVG}title").text for g in groups)
+    assert [g.get("class") for g in groups if "start" in g.get("class")] == ["node start"]
+
+
+def test_layout_cache(tmp_path):
+    cache = LayoutCache(str(tmp_path))
+    big = make_graph(EXACT_LAYOUT_NODES + 50, "branching", 2.0)
+    positions = cache.layout(big)
+    assert len(positions) == len(big["nodes"]) and len(set(positions.values())) == len(positions)
+    # utterances do not change the layout, the structure does
+    assert cache.layout(perturb(big)) is positions
+    assert cache.stats == {"hits": 1, "misses": 1}
+    assert LayoutCache(str(tmp_path)).layout(big) == positions
+    renumbered = dict(big, nodes=[dict(node, id=node["id"] + 1000) for node in big["nodes"]])
+    assert layout_key(renumbered) != layout_key(big)
+    assert len(os.listdir(tmp_path)) == 1
+
+
+def test_match_classes():
+    predicted = json.loads(json.dumps(TARGET))
+    predicted["nodes"].append({"id": 99, "label": "extra", "is_start": False, "utterances": ["Something else"]})
+    predicted["edges"] = predicted["edges"][1:] + [{"source": 1, "target": 99, "utterances": ["Other"]}]
+    (target_nodes, target_edges), (predicted_nodes, predicted_edges) = match_classes(TARGET, predicted)
+    assert set(target_nodes.values()) == {"matched"} and predicted_nodes[99] == "extra"
+    assert target_edges[(1, 2)] == "missing" and target_edges[(2, 3)] == "matched"
+    assert predicted_edges[(1, 99)] == "extra"
+    page = comparison_html(TARGET, predicted)
+    assert page.count("<svg") == 2 and "1 extra" in page
+
+
+def test_render_pairs_and_cli(tmp_path):
+    pairs = [(item["target_graph"], item["predicted_graph"]) for item in DATA[:4]] + [(None, None)]
+    names = render_pairs(pairs, str(tmp_path / "pages"), workers=2, cache_dir=str(tmp_path / "layouts"))
+    assert len(names) == 4 and all((tmp_path / "pages" / name).exists() for name in names)
+    assert names[0] == "graph_comparison_0.html"
+    assert all(name in (tmp_path / "pages" / "index.html").read_text() for name in names)
+
+    generated = tmp_path / "generated_graphs.json"
+    generated.write_text(json.dumps({"0": DATA[0]["target_graph"], "1": None}))
+    cli.main(["render", "data/data.json", str(tmp_path / "cli"), "--format", "html", "--generated", str(generated), "--limit", "2", "--workers", "1"])
+    assert sorted(os.listdir(tmp_path / "cli")) == ["graph_1.html", "graph_comparison_0.html", "index.html"]
+
+
+@pytest.mark.parametrize("flags", [["--generated", "generated_graphs.json"], ["--workers", "2"], ["--layout-cache", "layouts"]])
+def test_cli_rejects_html_flags_for_png(tmp_path, capsys, flags):
+    with pytest.raises(SystemExit):
+        cli.main(["render", "data/data.json", str(tmp_path), *flags])
+    assert f"{flags[0]} only apply with --format html" in capsys.readouterr().err
+    assert not os.listdir(tmp_path)
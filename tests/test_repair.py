@@ -0,0 +1,146 @@
+import json
+import os
+import sys
+
+import pytest
+
+from chatsky_llm_autoconfig.repair import apply_patch, find_problems, repair_graph, repair_prompt
+from tests.helpers import ScriptedModel, turns
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "benchmarks"))
+
+from repair import main  # noqa: E402
+
+DIALOGUE = turns("Hi! How can I help?", "I want a pizza", "Which size?", "Large", "Anything else?", "No, thanks", "Goodbye!")
+
+
+def graph():
+    return {
+        "nodes": [
+            {"id": 1, "label": "greeting", "is_start": True, "utterances": ["Hi! How can I help?"]},
+            {"id": 2, "label": "ask_size", "is_start": False, "utterances": ["Which size?"]},
+            {"id": 3, "label": "ask_more", "is_start": False, "utterances": ["Anything else?"]},
+            {"id": 4, "label": "bye", "is_start": False, "utterances": ["Goodbye!"]},
+        ],
+        "edges": [
+            {"source": 1, "target": 2, "utterances": ["I want a pizza"]},
+            {"source": 2, "target": 3, "utterances": ["Large"]},
+            {"source": 3, "target": 4, "utterances": ["No, thanks"]},
+        ],
+    }
+
+
+def test_valid_graph_needs_no_model():
+    result = repair_graph(graph(), DIALOGUE, model=None)
+    assert result.valid
+    assert result.stats["llm_calls"] == 0
+
+
+def test_local_fixes_for_start_node_and_missing_edge():
+    broken = graph()
+    broken["nodes"][0]["is_start"] = False
+    del broken["edges"][1]
+    result = repair_graph(broken, DIALOGUE, model=None)
+    assert result.valid
+    assert result.stats == {"llm_calls": 0, "prompt_chars": 0, "completion_chars": 0, "local_fixes": 2}
+    assert result.graph_dict["nodes"] == graph()["nodes"]
+    assert sorted(result.graph_dict["edges"], key=lambda edge: edge["source"]) == graph()["edges"]
+    assert broken["nodes"][0]["is_start"] is False
+
+
+def test_prompt_shows_only_the_offending_part():
+    broken = graph()
+    broken["nodes"][2]["utterances"] = ["Do you want a drink?"]
+    broken["edges"][2]["target"] = 9
+    problems = find_problems(broken, DIALOGUE)
+    assert [error.code for error in problems.errors] == ["dangling_edge", "unreachable_node"]
+    assert problems.missing_turns == [4]
+    prompt, focus = repair_prompt(broken, DIALOGUE, problems)
+    assert focus == {"nodes": {3}, "edges": {2}}
+    assert "4 assistant: Anything else? [missing]" in prompt
+    assert '"target": 9' in prompt
+    assert '"source": 1, "target": 2' not in prompt
+
+
+def test_repair_patches_the_answer_into_the_graph():
+    broken = graph()
+    del broken["nodes"][2]
+    broken["edges"][2]["source"] = 9
+    patch = {
+        "nodes": [{"id": 3, "label": "ask_more", "is_start": False, "utterances": ["Anything else?"]}],
+        "edges": [{"source": 3, "target": 4, "utterances": ["No, thanks"]}],
+    }
+    model = ScriptedModel(["not json", json.dumps(patch)])
+    result = repair_graph(broken, DIALOGUE, model, max_rounds=2)
+    assert result.valid
+    assert result.stats["llm_calls"] == 2
+    assert len(model.prompts) == 2 and "Which size?" in model.prompts[1]
+    assert sorted(node["id"] for node in result.graph_dict["nodes"]) == [1, 2, 3, 4]
+    assert {(edge["source"], edge["target"]) for edge in result.graph_dict["edges"]} == {(1, 2), (2, 3), (3, 4)}
+
+
+def test_repair_stops_after_max_rounds():
+    broken = graph()
+    broken["nodes"][3]["utterances"] = ["See you"]
+    model = ScriptedModel(['{"nodes": [], "edges": []}'] * 3)
+    result = repair_graph(broken, DIALOGUE, model, max_rounds=1)
+    assert not result.valid
+    assert result.stats["llm_calls"] == 1
+    assert result.problems.missing_turns == [6]
+
+
+def test_apply_patch_replaces_duplicate_nodes():
+    broken = graph()
+    broken["nodes"][3]["id"] = 3
+    problems = find_problems(broken, DIALOGUE, check_reachability=False)
+    _, focus = repair_prompt(broken, DIALOGUE, problems)
+    assert focus["nodes"] == {2, 3}
+    patch = {
+        "nodes": [{"id": 3, "label": "ask_more", "utterances": ["Anything else?"]}, {"id": 4, "label": "bye", "utterances": ["Goodbye!"]}],
+        "edges": [{"source": 3, "target": 4, "utterances": ["No, thanks"]}],
+    }
+    changes = apply_patch(broken, patch, focus)
+    assert changes == {"removed_nodes": 2, "removed_edges": 1, "nodes": 2, "edges": 1}
+    assert find_problems(broken, DIALOGUE).ok
+    assert sorted(node["id"] for node in broken["nodes"]) == [1, 2, 3, 4]
+
+
+def test_apply_patch_refuses_edges_to_unknown_nodes():
+    broken = graph()
+    broken["edges"][2]["target"] = 9
+    problems = find_problems(broken, DIALOGUE)
+    _, focus = repair_prompt(broken, DIALOGUE, problems)
+    before = json.loads(json.dumps(broken))
+    with pytest.raises(ValueError, match="unknown nodes"):
+        apply_patch(broken, {"edges": [{"source": 3, "target": 5, "utterances": ["No, thanks"]}]}, focus)
+    assert broken == before
+
+    model = ScriptedModel([json.dumps({"edges": [{"source": 3, "target": 5, "utterances": ["No, thanks"]}]})])
+    result = repair_graph(broken, DIALOGUE, model, max_rounds=1)
+    assert not result.valid and result.stats["llm_calls"] == 1
+
+
+def test_benchmark_main(tmp_path, capsys):
+    output = tmp_path / "repair.json"
+    assert main(["--limit", "3", "--ttft-ms", "0", "--ms-per-token", "0", "--encoding", "missing_encoding", "--output", str(output)]) == 0
+    results = json.loads(output.read_text())["results"]
+    assert results["regenerate"]["valid_graphs"] == results["repair"]["valid_graphs"] == 3
+    assert results["repair"]["fix_llm_calls"] < results["regenerate"]["fix_llm_calls"] and results["fix_token_ratio"] > 2
+    assert "fewer tokens spent on fixing" in capsys.readouterr().out
+
+
+def test_generate_graph_repairs_instead_of_regenerating(monkeypatch):
+    from chatsky_llm_autoconfig import evaluate
+
+    broken = graph()
+    broken["nodes"][0]["is_start"] = False
+    answers = [json.dumps(broken), json.dumps(graph())]
+
+    class FakeDialogModel:
+        def create_graph(self, dialogue, model, output_format="json"):
+            return answers.pop(0)
+
+    monkeypatch.setattr(evaluate, "get_dialog_model", lambda: FakeDialogModel())
+    monkeypatch.setenv("OPENAI_API_KEY", "fake")
+    assert evaluate.generate_graph(DIALOGUE, "fake", repair=True) == graph()
+    assert len(answers) == 1
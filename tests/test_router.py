@@ -0,0 +1,80 @@
+import json
+import os
+import sys
+import time
+
+import pytest
+from chatsky.script import Message
+
+from chatsky_llm_autoconfig.chatsky_export import FALLBACK_RESPONSE, build_pipeline
+from chatsky_llm_autoconfig.graph import Graph
+from chatsky_llm_autoconfig.router import IntentRouter, Route
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "benchmarks"))
+
+from synthetic import make_graph  # noqa: E402
+
+with open("data/data.json") as f:
+    DATA = json.load(f)
+
+GRAPH = DATA[0]["target_graph"]
+PARAPHRASES = [
+    (1, "i'd like to place an order", 2),
+    (2, "do you have war and peace", 4),
+    (2, "crime and punishment please", 3),
+    (4, "yes please", 5),
+    (4, "no thanks", 6),
+]
+
+
+def test_exact_and_rephrased_input():
+    router = IntentRouter(Graph(GRAPH))
+    route = router.route(1, "  I WANT to order ")
+    assert route == Route(target=2, score=1.0, edge=0, exact=True)
+    for node, text, target in PARAPHRASES:
+        route = router.route(node, text)
+        assert route.target == target and route.matched and not route.exact, (text, route)
+        assert router.threshold <= route.score < 1.0
+
+
+def test_threshold_and_fallback():
+    router = IntentRouter(GRAPH, fallback=1)
+    assert router.route(4, "what's the weather") == Route(target=1, score=0.0)
+    assert not router.route(4, "what's the weather").matched
+    assert router.route(99, "yes").target == 1
+    strict = IntentRouter(GRAPH, threshold=0.9)
+    assert strict.route(2, "do you have war and peace").target is None
+    assert strict.route(4, "Yes").target == 5
+
+
+def test_batch_matches_single_routes():
+    router = IntentRouter(GRAPH)
+    nodes = [node for node, _, _ in PARAPHRASES] + [4, 99, 1]
+    texts = [text for _, text, _ in PARAPHRASES] + ["what's the weather", "yes", "I want to order"]
+    batch = router.route_batch(nodes, texts)
+    single = [router.route(node, text) for node, text in zip(nodes, texts)]
+    assert [(route.target, route.edge, route.exact) for route in batch] == [(route.target, route.edge, route.exact) for route in single]
+    assert [route.score for route in batch] == pytest.approx([route.score for route in single], abs=1e-6)
+    with pytest.raises(ValueError):
+        router.route_batch([1], [])
+
+
+def test_latency_on_large_graph():
+    graph = make_graph(2000, "branching", 3.0)
+    router = IntentRouter(graph)
+    edges = graph["edges"][:500]
+    start = time.perf_counter()
+    routes = [router.route(edge["source"], f"well, {edge['utterances'][0]} maybe") for edge in edges]
+    per_turn = (time.perf_counter() - start) / len(edges)
+    assert per_turn < 1e-3
+    assert sum(route.target == edge["target"] for route, edge in zip(routes, edges)) / len(edges) > 0.95
+
+
+def test_pipeline_with_router():
+    pipeline = build_pipeline(GRAPH, router=IntentRouter(GRAPH))
+    assert pipeline(Message(text="hello"), 0).last_label == ("graph", "node_1")
+    assert pipeline(Message(text="i'd like to place an order"), 0).last_label == ("graph", "node_2")
+    assert pipeline(Message(text="what's the weather"), 0).last_response.text == FALLBACK_RESPONSE
+    plain = build_pipeline(GRAPH)
+    plain(Message(text="hello"), 0)
+    assert plain(Message(text="i'd like to place an order"), 0).last_response.text == FALLBACK_RESPONSE
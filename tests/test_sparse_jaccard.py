@@ -0,0 +1,99 @@
+import contextlib
+import io
+import json
+import os
+import sys
+import tracemalloc
+
+import numpy as np
+import pytest
+
+from chatsky_llm_autoconfig.graph import TYPES_OF_GRAPH, Graph
+from chatsky_llm_autoconfig.metrics.jaccard import jaccard_edges, jaccard_nodes
+from chatsky_llm_autoconfig.metrics.sparse_jaccard import blockwise_jaccard, sparse_jaccard_edges, sparse_jaccard_nodes
+from chatsky_llm_autoconfig.metrics.triplet_matching import triplet_match
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "benchmarks"))
+
+from synthetic import SHAPES, make_graph, perturb  # noqa: E402
+
+with open("data/data.json") as f:
+    DATA = json.load(f)
+
+
+def graph_pair(n_nodes, shape, density=1.5):
+    target = make_graph(n_nodes, shape, density)
+    return Graph(target, TYPES_OF_GRAPH.MULTI), Graph(perturb(target, drop_share=0.5), TYPES_OF_GRAPH.MULTI)
+
+
+@pytest.mark.parametrize("shape", SHAPES)
+@pytest.mark.parametrize("block_size", [7, 1024])
+def test_matches_dense_matrices(shape, block_size):
+    target, generated = graph_pair(60, shape)
+    g1, g2 = target.nx_graph, generated.nx_graph
+    with contextlib.redirect_stdout(io.StringIO()):
+        edge_values, edge_indices, edge_matrix = jaccard_edges(g1.edges(data=True), g2.edges(data=True), return_matrix=True)
+        _, _, node_matrix = jaccard_nodes(g1.nodes(data=True), g2.nodes(data=True), return_matrix=True)
+
+    edges = sparse_jaccard_edges(g1.edges(data=True), g2.edges(data=True), block_size=block_size)
+    assert edges.matrix.dtype == np.float32
+    assert np.allclose(edges.to_dense(), edge_matrix)
+    values, indices = edges.best()
+    assert np.allclose(values, edge_values)
+    assert list(indices) == list(edge_indices)
+
+    nodes = sparse_jaccard_nodes(g1.nodes(data=True), g2.nodes(data=True), block_size=block_size)
+    assert np.allclose(nodes.to_dense(), node_matrix)
+    assert nodes.get(1, 1) == pytest.approx(node_matrix[0][0])
+
+
+def test_top_k_keeps_best_columns():
+    left = {"a": ["x", "y"], "b": ["z"], "c": ["w"]}
+    right = {1: ["x"], 2: ["x", "y"], 3: ["y", "q"], 4: ["z"]}
+    similarity = blockwise_jaccard(left, right, top_k=2, block_size=2)
+    assert similarity.matrix.nnz == 3
+    assert similarity.get("a", 2) == 1.0
+    assert similarity.get("a", 1) == 0.5
+    assert similarity.get("a", 3) == 0.0
+    assert list(similarity.row(1)) == [(3, 1.0)]
+    assert list(similarity.row(2)) == []
+    assert similarity.get("missing", 1) == 0.0
+
+    values, indices = similarity.best()
+    assert list(values) == [1.0, 1.0, 0.0]
+    assert list(indices) == [1, 3, 0]
+
+
+def test_empty_graphs():
+    similarity = blockwise_jaccard({}, {1: ["x"]})
+    assert similarity.matrix.shape == (0, 1)
+    values, indices = blockwise_jaccard({1: ["x"]}, {}).best()
+    assert list(values) == [0.0] and list(indices) == [0]
+
+
+def test_top_k_memory_is_bounded():
+    target, generated = graph_pair(5000, "branching", density=2.0)
+    g1, g2 = target.nx_graph, generated.nx_graph
+    tracemalloc.start()
+    similarity = sparse_jaccard_edges(g1.edges(data=True), g2.edges(data=True), top_k=1, block_size=512)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    assert similarity.matrix.nnz <= len(similarity.row_keys)
+    # a dense float64 matrix of these edges alone would take ~360 MiB
+    assert peak < 64 * 2**20
+
+
+@pytest.mark.parametrize("shape", SHAPES)
+def test_triplet_match_sparse_mode(shape):
+    target, generated = graph_pair(40, shape)
+    with contextlib.redirect_stdout(io.StringIO()):
+        assert triplet_match(target, generated, sparse=True) == triplet_match(target, generated)
+
+
+def test_triplet_match_sparse_mode_on_data():
+    for item in DATA:
+        if not item.get("predicted_graph"):
+            continue
+        target, predicted = Graph(item["target_graph"], TYPES_OF_GRAPH.MULTI), Graph(item["predicted_graph"], TYPES_OF_GRAPH.MULTI)
+        with contextlib.redirect_stdout(io.StringIO()):
+            assert triplet_match(target, predicted, sparse=True, block_size=2) == triplet_match(target, predicted)
@@ -0,0 +1,106 @@
+import asyncio
+import json
+import threading
+
+from chatsky_llm_autoconfig.sweep import SweepRunner, expand_grid
+
+GRAPH = {
+    "nodes": [
+        {"id": 1, "label": "start", "is_start": True, "utterances": ["How can I help?"]},
+        {"id": 2, "label": "ask_item", "is_start": False, "utterances": ["Which books would you like to order?"]},
+    ],
+    "edges": [{"source": 1, "target": 2, "utterances": ["I need to make an order"]}],
+}
+DIALOG = [
+    {"text": "How can I help?", "participant": "assistant"},
+    {"text": "I need to make an order", "participant": "user"},
+    {"text": "Which books would you like to order?", "participant": "assistant"},
+]
+
+
+class CountingModel:
+    calls = 0
+    in_flight = {}
+    max_in_flight = {}
+
+    def __init__(self, provider):
+        self.provider = provider
+
+    async def ainvoke(self, messages):
+        CountingModel.calls += 1
+        CountingModel.in_flight[self.provider] = CountingModel.in_flight.get(self.provider, 0) + 1
+        CountingModel.max_in_flight[self.provider] = max(CountingModel.max_in_flight.get(self.provider, 0), CountingModel.in_flight[self.provider])
+        await asyncio.sleep(0.01)
+        CountingModel.in_flight[self.provider] -= 1
+
+        class Response:
+            content = json.dumps(GRAPH)
+
+        return Response()
+
+
+def test_expand_grid_names_match_experiment_layout():
+    configs = expand_grid({"models": ["gpt-4o", "local:llama"], "temperatures": [0, 0.5], "prompts": ["prompted"]})
+    assert [config.name for config in configs] == [
+        "gpt-4o-prompted_temp0",
+        "gpt-4o-prompted_temp0.5",
+        "llama-prompted_temp0",
+        "llama-prompted_temp0.5",
+    ]
+    assert configs[2].provider == "local"
+
+
+def test_sweep_runs_grid_and_shares_identical_requests(tmp_path):
+    dataset = [{"dialog": DIALOG, "target_graph": GRAPH}] * 3
+    input_path = tmp_path / "data.json"
+    input_path.write_text(json.dumps(dataset))
+
+    configs = expand_grid({"models": ["gpt-4o", "local:llama"], "temperatures": [0, 1], "prompts": ["cycles"]})
+    runner = SweepRunner(str(input_path), str(tmp_path / "out"), model_factory=lambda c: CountingModel(c.provider), provider_limits={"local": 1})
+    results = runner.run(configs)
+
+    # temperature 0: one request per model for three identical dialogues, temperature 1: one per dialogue
+    assert CountingModel.calls == 2 + 6
+    assert runner.stats["shared_responses"] == 4
+    assert CountingModel.max_in_flight["local"] == 1
+    assert results["llama-cycles_temp1"]["Mean Triplet Match Accuracy"] == 1.0
+    for config in configs:
+        directory = tmp_path / "out" / config.name
+        assert json.loads((directory / "all_metrics.json").read_text())["0"]["Node Accuracy"] == 1.0
+        assert (directory / "mean_metrics.txt").read_text().startswith("Mean Triplet Match Accuracy: 1.0000")
+
+
+def test_sweep_scores_off_the_event_loop(tmp_path, monkeypatch):
+    from chatsky_llm_autoconfig import sweep
+
+    input_path = tmp_path / "data.json"
+    input_path.write_text(json.dumps([{"dialog": DIALOG, "target_graph": GRAPH}]))
+    threads, evaluate_pair = [], sweep.evaluate_pair
+    monkeypatch.setattr(sweep, "evaluate_pair", lambda *args: threads.append(threading.current_thread()) or evaluate_pair(*args))
+    runner = SweepRunner(str(input_path), str(tmp_path / "out"), model_factory=lambda c: CountingModel(c.provider))
+    runner.run(expand_grid({"models": ["gpt-4o"], "temperatures": [0], "prompts": ["cycles"]}))
+    assert threads and threading.main_thread() not in threads
+
+
+def test_capped_provider_does_not_hold_pool_slots(tmp_path):
+    # distinct dialogues at temperature 1, so no request is shared
+    dataset = [{"dialog": DIALOG[:-1] + [{"text": f"Bye {i}", "participant": "assistant"}], "target_graph": GRAPH} for i in range(6)]
+    input_path = tmp_path / "data.json"
+    input_path.write_text(json.dumps(dataset))
+    starts = []
+
+    class RecordingModel(CountingModel):
+        async def ainvoke(self, messages):
+            starts.append((self.provider, dict(CountingModel.in_flight)))
+            return await super().ainvoke(messages)
+
+    configs = expand_grid({"models": ["local:llama", "gpt-4o"], "temperatures": [1], "prompts": ["cycles"]})
+    runner = SweepRunner(
+        str(input_path), str(tmp_path / "out"), model_factory=lambda c: RecordingModel(c.provider), max_workers=4, provider_limits={"local": 1}
+    )
+    runner.run(configs)
+
+    assert len(starts) == 12
+    overlapping = [in_flight.get("local", 0) for provider, in_flight in starts if provider == "openai"]
+    assert overlapping.count(1) >= 3
+    assert [provider for provider, _ in starts[:4]].count("openai") >= 3
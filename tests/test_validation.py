@@ -0,0 +1,59 @@
+import json
+
+import pytest
+
+from chatsky_llm_autoconfig.validation import GraphValidationError, ensure_valid_graph, validate_graph
+
+GRAPH = {
+    "nodes": [
+        {"id": 1, "label": "start", "is_start": True, "utterances": ["How can I help?"]},
+        {"id": 2, "label": "ask_item", "is_start": False, "utterances": "Which books would you like to order?"},
+    ],
+    "edges": [{"source": 1, "target": 2, "utterances": ["I need to make an order"]}],
+}
+
+
+def codes(graph, **kwargs):
+    return [error.code for error in validate_graph(graph, **kwargs)]
+
+
+def test_valid_graph_and_raw_json():
+    assert codes(GRAPH) == []
+    assert codes(json.dumps(GRAPH)) == []
+    assert codes("{'nodes': []") == ["json"]
+
+
+def test_schema_errors_are_located():
+    errors = validate_graph({"nodes": [{"id": "one", "utterances": []}], "edges": [{"source": 1}]})
+    assert {error.code for error in errors} == {"schema"}
+    assert ("nodes", 0, "id") in [error.location for error in errors]
+    assert ("edges", 0, "target") in [error.location for error in errors]
+
+
+def test_ids_and_start_flags_are_not_coerced():
+    graph = json.loads(json.dumps(GRAPH))
+    graph["nodes"][0]["id"] = "1"
+    graph["nodes"][1]["is_start"] = "yes"
+    graph["edges"][0]["target"] = 2.0
+    errors = validate_graph(graph)
+    assert {error.code for error in errors} == {"schema"}
+    assert {error.location for error in errors} == {("nodes", 0, "id"), ("nodes", 1, "is_start"), ("edges", 0, "target")}
+
+
+def test_structural_errors():
+    graph = {
+        "nodes": GRAPH["nodes"] + [{"id": 2, "utterances": []}, {"id": 3, "utterances": ["Bye"]}],
+        "edges": GRAPH["edges"] + [{"source": 2, "target": 5, "utterances": []}],
+    }
+    assert sorted(codes(graph)) == ["dangling_edge", "duplicate_node_id", "empty_utterances", "empty_utterances", "unreachable_node"]
+
+    no_start = {"nodes": [{**node, "is_start": False} for node in GRAPH["nodes"]], "edges": GRAPH["edges"]}
+    assert codes(no_start) == ["no_start_node"]
+    assert codes(no_start, require_start=False) == []
+
+
+def test_ensure_valid_graph():
+    assert ensure_valid_graph(json.dumps(GRAPH)) == GRAPH
+    with pytest.raises(GraphValidationError) as e:
+        ensure_valid_graph({"nodes": GRAPH["nodes"], "edges": [{"source": 1, "target": 9, "utterances": ["x"]}]})
+    assert [error.code for error in e.value.errors] == ["dangling_edge", "unreachable_node"]
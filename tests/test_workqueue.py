@@ -0,0 +1,86 @@
+import json
+import multiprocessing
+import sqlite3
+import time
+
+import pytest
+
+from chatsky_llm_autoconfig.workqueue import WorkQueue, run_worker
+
+GRAPH = {
+    "nodes": [
+        {"id": 1, "label": "start", "is_start": True, "utterances": ["How can I help?"]},
+        {"id": 2, "label": "ask_item", "is_start": False, "utterances": ["Which books would you like to order?"]},
+    ],
+    "edges": [{"source": 1, "target": 2, "utterances": ["I need to make an order"]}],
+}
+
+
+def echo_target(dialogue):
+    time.sleep(0.01)
+    return GRAPH
+
+
+def write_dataset(tmp_path, size):
+    path = tmp_path / "data.json"
+    path.write_text(json.dumps([{"dialog": [], "target_graph": GRAPH}] * size))
+    return str(path)
+
+
+def test_expired_lease_is_reassigned_and_stale_result_dropped(tmp_path):
+    queue = WorkQueue(str(tmp_path / "queue.sqlite"), lease_seconds=0.05)
+    assert queue.submit("job", 2) == 2
+    assert queue.submit("job", 2) == 0
+
+    assert queue.claim("job", "slow", limit=1) == [0]
+    time.sleep(0.1)
+    assert queue.claim("job", "fast", limit=2) == [0, 1]
+    assert not queue.complete("job", "slow", 0, {"Node Accuracy": 0})
+    assert queue.heartbeat("job", "slow", [0]) == []
+    assert queue.complete("job", "fast", 0, {"Node Accuracy": 1})
+    assert queue.progress("job") == {"pending": 0, "leased": 1, "done": 1, "failed": 0}
+
+
+def test_lease_gives_up_after_max_attempts(tmp_path):
+    queue = WorkQueue(str(tmp_path / "queue.sqlite"), lease_seconds=0.01, max_attempts=2)
+    queue.submit("job", 1)
+    for worker in ("a", "b"):
+        assert queue.claim("job", worker) == [0]
+        time.sleep(0.02)
+    assert queue.claim("job", "c") == []
+    assert queue.progress("job")["failed"] == 1
+    assert queue.is_finished("job")
+
+
+def test_several_worker_processes_and_merge(tmp_path):
+    queue_path = str(tmp_path / "queue.sqlite")
+    input_path = write_dataset(tmp_path, 20)
+    queue = WorkQueue(queue_path)
+    queue.submit("job", 20)
+
+    context = multiprocessing.get_context("fork")
+    workers = [
+        context.Process(target=run_worker, args=(queue_path, "job", input_path), kwargs={"generate_fn": echo_target, "batch_size": 2})
+        for _ in range(3)
+    ]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join(timeout=60)
+        assert worker.exitcode == 0
+
+    assert queue.progress("job")["done"] == 20
+    queue.merge("job", str(tmp_path / "out"))
+    all_metrics = json.loads((tmp_path / "out" / "all_metrics.json").read_text())
+    assert len(all_metrics) == 20 and all(metrics["Node Accuracy"] == 1.0 for metrics in all_metrics.values())
+    assert (tmp_path / "out" / "mean_metrics.txt").read_text().startswith("Mean Triplet Match Accuracy: 1.0000")
+
+
+def test_journal_mode(tmp_path):
+    queue_path = str(tmp_path / "queue.sqlite")
+    WorkQueue(queue_path)
+    assert sqlite3.connect(queue_path).execute("PRAGMA journal_mode").fetchone()[0] == "delete"
+    WorkQueue(queue_path, journal_mode="WAL")
+    assert sqlite3.connect(queue_path).execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+    with pytest.raises(ValueError):
+        WorkQueue(queue_path, journal_mode="OFF")